@@ -0,0 +1,296 @@
+import json
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from datetime import date
+
+import pandas as pd
+
+import constants
+from configuration import Config
+
+logger = logging.getLogger(__name__)
+
+RULE_CPI_LOW = 'cpi_low'
+RULE_WBS_OVER_BUDGET = 'wbs_over_budget'
+RULE_PROGRESS_STALE = 'progress_stale'
+RULE_CERTIFICATION_EXPIRING = 'certification_expiring'
+
+ALERT_STATUS_OPEN = 'Open'
+ALERT_STATUS_ACKNOWLEDGED = 'Acknowledged'
+ALERT_STATUS_RESOLVED = 'Resolved'
+SEVERITY_WARNING = 'warning'
+SEVERITY_CRITICAL = 'critical'
+
+# One active (not resolved) alert per rule and subject: a repeat bumps its count instead of adding a row.
+# Message and values are refreshed, and the returned row says whether (and when) it was last notified.
+_RAISE_SQL = """
+INSERT INTO alerts (RuleName, SubjectKey, ProjectID, WBSElementID, EmployeeID, Severity, Message, MetricValue, Threshold)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (RuleName, SubjectKey) WHERE Status != 'Resolved' DO UPDATE SET
+    Severity = excluded.Severity, Message = excluded.Message, MetricValue = excluded.MetricValue,
+    Threshold = excluded.Threshold, OccurrenceCount = OccurrenceCount + 1, LastRaisedAt = CURRENT_TIMESTAMP
+RETURNING AlertID, Status, OccurrenceCount, LastNotifiedAt
+"""
+
+# Closes the active alerts among the (rule, subject) pairs in the JSON array (?2) whose re-check passed.
+# Only rows still active are touched, through the partial unique index on active alerts.
+_RESOLVE_SQL = """
+UPDATE alerts SET Status = ?1, ResolvedAt = CURRENT_TIMESTAMP
+WHERE Status != 'Resolved' AND (RuleName, SubjectKey) IN (
+    SELECT json_extract(value, '$[0]'), json_extract(value, '$[1]') FROM json_each(?2))
+RETURNING RuleName, SubjectKey
+"""
+
+# Per-element rollup state for a project (?1), optionally one element (?2): budget, actual cost,
+# latest progress and first cost date; reads rollup rows only, never the cost or progress history
+_WBS_STATE_SQL = """
+SELECT w.WBSElementID, w.WBSCode, COALESCE(w.EstimatedCost, 0) AS EstimatedCost,
+       COALESCE(r.TotalActualCost, 0) AS TotalActualCost, COALESCE(r.CostEntryCount, 0) AS CostEntryCount,
+       r.CompletionPercentage, r.LatestUpdateDate,
+       (SELECT MIN(d.TransactionDate) FROM cost_daily_rollups d
+        WHERE d.ProjectID = w.ProjectID AND d.WBSElementID = w.WBSElementID AND d.EntryCount > 0) AS FirstCostDate
+FROM wbs_elements w
+LEFT JOIN wbs_actual_rollups r ON r.ProjectID = w.ProjectID AND r.WBSElementID = w.WBSElementID
+WHERE w.ProjectID = ?1 AND (?2 IS NULL OR w.WBSElementID = ?2) AND w.IsSummary = 0 AND COALESCE(w.Status, '') != ?3
+"""
+
+
+class AlertEngine:
+    """
+    Threshold alerts raised as costs, progress and daily logs are written, instead of waiting
+    for someone to run an analysis.
+
+    ExecutionManagement.record_actual_cost / record_progress_update and
+    DataProcessing.process_daily_log_entry call the evaluate_* hooks after their commit. Each
+    hook re-checks only the rules the write can affect, for the touched WBS element or project,
+    against the trigger-maintained rollups (wbs_actual_rollups, cost_daily_rollups), so the
+    cost is a few rollup rows per write:
+
+        cpi_low                 project CPI (EV / AC) below Config.ALERT_CPI_THRESHOLD
+        wbs_over_budget         element actual cost over its estimate by Config.ALERT_WBS_OVERRUN_PCT
+        progress_stale          element with costs but no progress update for Config.ALERT_PROGRESS_STALE_DAYS
+        certification_expiring  certification of the logging employee expiring within Config.ALERT_CERT_EXPIRY_DAYS
+
+    Alerts are stored in the alerts table, deduplicated per rule and subject (a repeat updates the
+    open alert) and resolved automatically once a re-check passes; each hook resolves its passing checks
+    in one UPDATE and commit. Notifications for the GUI status
+    bar are rate limited: an alert is re-announced at most every Config.ALERT_RENOTIFY_MINUTES (never
+    once acknowledged), and at most Config.ALERT_MAX_NOTIFICATIONS_PER_MINUTE go out; the rest are
+    counted into the next message. Hooks may run on any thread; drain_notifications() is for the GUI thread.
+    """
+
+    def __init__(self, db_m_instance):
+        if db_m_instance is None:
+            raise ValueError("DatabaseManager instance is required for AlertEngine.")
+        self.db_manager = db_m_instance
+        self._notifications = queue.Queue()
+        self._notify_lock = threading.Lock()
+        self._recent_notifications = deque() # perf_counter() of notifications in the last minute
+        self._suppressed_count = 0
+        logger.info("AlertEngine initialized with provided db_manager.")
+
+    # --- Write hooks ---
+
+    def evaluate_cost_change(self, project_id, wbs_element_id=None):
+        """After an actual cost is written: project CPI, and the element's budget and progress staleness."""
+        passed = [] # (rule, subject) of checks that passed, resolved together at the end
+        notified = self._check_project_cpi(project_id, passed)
+        if wbs_element_id is not None:
+            for state in self._wbs_state(project_id, wbs_element_id):
+                notified += self._check_wbs_budget(project_id, state, passed)
+                notified += self._check_progress_stale(project_id, state, passed)
+        self._resolve(passed)
+        return notified
+
+    def evaluate_progress_change(self, project_id, wbs_element_id=None):
+        """After a progress update: project CPI (earned value moved) and the element's staleness."""
+        passed = []
+        notified = self._check_project_cpi(project_id, passed)
+        if wbs_element_id is not None:
+            for state in self._wbs_state(project_id, wbs_element_id):
+                notified += self._check_progress_stale(project_id, state, passed)
+        self._resolve(passed)
+        return notified
+
+    def evaluate_daily_log(self, project_id, employee_id):
+        """After a daily log: the employee's certifications, and staleness across the project being worked."""
+        passed = []
+        notified = self._check_certifications(employee_id, passed) if employee_id is not None else []
+        if project_id is not None:
+            for state in self._wbs_state(project_id):
+                notified += self._check_progress_stale(project_id, state, passed)
+        self._resolve(passed)
+        return notified
+
+    # --- Rules ---
+
+    def _wbs_state(self, project_id, wbs_element_id=None):
+        rows = self.db_manager.execute_query(_WBS_STATE_SQL, (project_id, wbs_element_id, constants.WBS_STATUS_RETIRED), fetch_all=True)
+        return [dict(row) for row in rows or []]
+
+    def _check_project_cpi(self, project_id, passed):
+        row = self.db_manager.execute_query("""
+            SELECT (SELECT TOTAL(r.CompletionPercentage / 100.0 * w.EstimatedCost)
+                    FROM wbs_actual_rollups r JOIN wbs_elements w ON w.WBSElementID = r.WBSElementID
+                    WHERE r.ProjectID = ?1 AND w.IsSummary = 0 AND COALESCE(w.Status, '') != ?2) AS EarnedValue,
+                   (SELECT TOTAL(TotalActualCost) FROM wbs_actual_rollups WHERE ProjectID = ?1) AS ActualCost
+        """, (project_id, constants.WBS_STATUS_RETIRED), fetch_one=True)
+        earned_value, actual_cost = (row['EarnedValue'], row['ActualCost']) if row else (0.0, 0.0)
+        if actual_cost < Config.ALERT_MIN_ACTUAL_COST:
+            return self._passed(passed, RULE_CPI_LOW, f"project:{project_id}")
+        cpi = earned_value / actual_cost
+        if cpi >= Config.ALERT_CPI_THRESHOLD:
+            return self._passed(passed, RULE_CPI_LOW, f"project:{project_id}")
+        return self._raise(RULE_CPI_LOW, f"project:{project_id}", project_id=project_id, metric_value=cpi,
+                           threshold=Config.ALERT_CPI_THRESHOLD,
+                           message=f"Project {project_id}: CPI {cpi:.2f} is below {Config.ALERT_CPI_THRESHOLD:.2f} "
+                                   f"(earned ${earned_value:,.2f} for ${actual_cost:,.2f} spent).")
+
+    def _check_wbs_budget(self, project_id, state, passed):
+        subject = f"wbs:{state['WBSElementID']}"
+        if state['EstimatedCost'] <= 0:
+            return self._passed(passed, RULE_WBS_OVER_BUDGET, subject)
+        overrun_pct = (state['TotalActualCost'] - state['EstimatedCost']) / state['EstimatedCost'] * 100
+        if overrun_pct <= Config.ALERT_WBS_OVERRUN_PCT:
+            return self._passed(passed, RULE_WBS_OVER_BUDGET, subject)
+        return self._raise(RULE_WBS_OVER_BUDGET, subject, project_id=project_id, wbs_element_id=state['WBSElementID'],
+                           metric_value=overrun_pct, threshold=Config.ALERT_WBS_OVERRUN_PCT,
+                           message=f"Project {project_id} WBS {state['WBSCode']}: actual cost ${state['TotalActualCost']:,.2f} is "
+                                   f"{overrun_pct:.1f}% over its ${state['EstimatedCost']:,.2f} estimate.")
+
+    def _check_progress_stale(self, project_id, state, passed):
+        subject = f"wbs:{state['WBSElementID']}"
+        last_activity = state['LatestUpdateDate'] or state['FirstCostDate'] # No progress yet: count from the first cost
+        if not state['CostEntryCount'] or (state['CompletionPercentage'] or 0) >= 100 or not last_activity:
+            return self._passed(passed, RULE_PROGRESS_STALE, subject)
+        idle_days = (date.today() - date.fromisoformat(str(last_activity)[:10])).days
+        if idle_days < Config.ALERT_PROGRESS_STALE_DAYS:
+            return self._passed(passed, RULE_PROGRESS_STALE, subject)
+        since = f"since {state['LatestUpdateDate']}" if state['LatestUpdateDate'] else f"since costs started on {state['FirstCostDate']}"
+        return self._raise(RULE_PROGRESS_STALE, subject, project_id=project_id, wbs_element_id=state['WBSElementID'],
+                           metric_value=idle_days, threshold=Config.ALERT_PROGRESS_STALE_DAYS,
+                           message=f"Project {project_id} WBS {state['WBSCode']}: no progress reported {since} ({idle_days} days) "
+                                   f"while costs are being charged.")
+
+    def _check_certifications(self, employee_id, passed):
+        rows = self.db_manager.execute_query("""
+            SELECT ec.EmployeeCertificationID, ec.ExpiryDate, ct.Name, e.FirstName || ' ' || e.LastName AS EmployeeName
+            FROM EmployeeCertifications ec
+            JOIN CertificationTypes ct ON ct.CertificationTypeID = ec.CertificationTypeID
+            JOIN Employees e ON e.EmployeeID = ec.EmployeeID
+            WHERE ec.EmployeeID = ? AND ec.ExpiryDate IS NOT NULL
+        """, (employee_id,), fetch_all=True)
+        notified = []
+        for row in rows or []:
+            subject = f"certification:{row['EmployeeCertificationID']}"
+            days_left = (date.fromisoformat(str(row['ExpiryDate'])[:10]) - date.today()).days
+            if days_left > Config.ALERT_CERT_EXPIRY_DAYS:
+                passed.append((RULE_CERTIFICATION_EXPIRING, subject))
+                continue
+            status = f"expired on {row['ExpiryDate']}" if days_left < 0 else f"expires on {row['ExpiryDate']} ({days_left} days)"
+            notified += self._raise(RULE_CERTIFICATION_EXPIRING, subject, employee_id=employee_id, metric_value=days_left,
+                                    threshold=Config.ALERT_CERT_EXPIRY_DAYS,
+                                    severity=SEVERITY_CRITICAL if days_left < 0 else SEVERITY_WARNING,
+                                    message=f"{row['EmployeeName']}: {row['Name']} certification {status}.")
+        return notified
+
+    # --- Storage, dedupe and rate limiting ---
+
+    def _raise(self, rule_name, subject_key, message, project_id=None, wbs_element_id=None, employee_id=None,
+               metric_value=None, threshold=None, severity=SEVERITY_WARNING):
+        """Stores (or refreshes) the alert; returns [alert dict] if it should be announced, else []."""
+        conn = self.db_manager.get_connection()
+        with self.db_manager.lock:
+            try:
+                cursor = conn.cursor()
+                cursor.execute(_RAISE_SQL, (rule_name, subject_key, project_id, wbs_element_id, employee_id,
+                                            severity, message, metric_value, threshold))
+                alert = dict(cursor.fetchone())
+                due = alert['Status'] == ALERT_STATUS_OPEN and (alert['LastNotifiedAt'] is None or cursor.execute(
+                    "SELECT julianday('now') - julianday(?) >= ? / 1440.0", (alert['LastNotifiedAt'], Config.ALERT_RENOTIFY_MINUTES)
+                ).fetchone()[0])
+                if due:
+                    cursor.execute("UPDATE alerts SET LastNotifiedAt = CURRENT_TIMESTAMP WHERE AlertID = ?", (alert['AlertID'],))
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                logger.error(f"Error raising {rule_name} alert for {subject_key}: {e}", exc_info=True)
+                return []
+        if alert['OccurrenceCount'] == 1:
+            logger.warning(f"Alert raised ({rule_name}): {message}")
+        if not due:
+            return []
+        alert.update({'RuleName': rule_name, 'SubjectKey': subject_key, 'Severity': severity, 'Message': message})
+        self._notify(alert)
+        return [alert]
+
+    @staticmethod
+    def _passed(passed, rule_name, subject_key):
+        """Queues the subject's alert for resolution. Returns [] so checks can be summed."""
+        passed.append((rule_name, subject_key))
+        return []
+
+    def _resolve(self, passed):
+        """Closes the active alerts of the passed (rule, subject) checks in one UPDATE and commit."""
+        if not passed:
+            return
+        conn = self.db_manager.get_connection()
+        with self.db_manager.lock:
+            try:
+                cursor = conn.cursor()
+                cursor.execute(_RESOLVE_SQL, (ALERT_STATUS_RESOLVED, json.dumps(passed)))
+                resolved = cursor.fetchall()
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                logger.error(f"Error resolving {len(passed)} passed alert checks: {e}", exc_info=True)
+                return
+        for row in resolved:
+            logger.info(f"Alert resolved ({row['RuleName']}) for {row['SubjectKey']}.")
+
+    def _notify(self, alert):
+        with self._notify_lock:
+            now = time.perf_counter()
+            while self._recent_notifications and now - self._recent_notifications[0] >= 60:
+                self._recent_notifications.popleft()
+            if len(self._recent_notifications) >= Config.ALERT_MAX_NOTIFICATIONS_PER_MINUTE:
+                self._suppressed_count += 1
+                return
+            self._recent_notifications.append(now)
+            suppressed, self._suppressed_count = self._suppressed_count, 0
+        more = f" (+{suppressed} more alerts)" if suppressed else ""
+        self._notifications.put(f"[{alert['Severity'].upper()}] {alert['Message']}{more}")
+
+    def drain_notifications(self):
+        """Returns the alert messages to announce since the last call, oldest first. Call from the GUI thread."""
+        messages = []
+        while True:
+            try:
+                messages.append(self._notifications.get_nowait())
+            except queue.Empty:
+                return messages
+
+    # --- Queries ---
+
+    def get_alerts(self, project_id=None, include_resolved=False):
+        """Alerts, newest first, optionally for one project; only active (open or acknowledged) ones by default."""
+        rows = self.db_manager.execute_query("""
+            SELECT AlertID, RuleName, SubjectKey, ProjectID, WBSElementID, EmployeeID, Severity, Message, MetricValue,
+                   Threshold, Status, OccurrenceCount, FirstRaisedAt, LastRaisedAt, ResolvedAt
+            FROM alerts
+            WHERE (?1 IS NULL OR ProjectID = ?1) AND (?2 OR Status != ?3)
+            ORDER BY LastRaisedAt DESC, AlertID DESC
+        """, (project_id, 1 if include_resolved else 0, ALERT_STATUS_RESOLVED), fetch_all=True)
+        return pd.DataFrame([dict(row) for row in rows or []])
+
+    def acknowledge_alert(self, alert_id):
+        """Marks an open alert as seen: it stays active (and deduplicated) but is no longer re-announced."""
+        cursor = self.db_manager.execute_query(
+            "UPDATE alerts SET Status = ? WHERE AlertID = ? AND Status = ?",
+            (ALERT_STATUS_ACKNOWLEDGED, alert_id, ALERT_STATUS_OPEN), commit=True)
+        if cursor and cursor.rowcount:
+            return True, f"Alert {alert_id} acknowledged."
+        return False, f"Alert {alert_id} is not open."
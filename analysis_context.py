@@ -0,0 +1,70 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Signature of everything a project analysis reads: the project row, its WBS and budgets, and the
+# cost/progress revision bumped by the rollup triggers on actual_costs and progress_updates.
+_DATA_VERSION_SQL = """
+SELECT
+    (SELECT LastModifiedDate || ':' || IFNULL(StartDate, '') || ':' || IFNULL(EndDate, '') FROM Projects WHERE ProjectID = ?1) AS ProjectVersion,
+    (SELECT COUNT(*) || ':' || TOTAL(EstimatedCost) || ':' || TOTAL(julianday(StartDate)) || ':' || TOTAL(julianday(EndDate)) || ':'
+            || GROUP_CONCAT(COALESCE(SpreadCurve, '') || COALESCE(Status, '') || IsSummary, '')
+     FROM wbs_elements WHERE ProjectID = ?1) AS WBSVersion,
+    (SELECT COUNT(*) || ':' || TOTAL(Amount) FROM project_budgets WHERE ProjectID = ?1) AS BudgetVersion,
+    (SELECT Revision FROM cost_rollup_revisions WHERE ProjectID = ?1) AS CostRevision
+"""
+
+
+class ProjectAnalysisContext:
+    """
+    Memoizes the datasets one analysis request reads for a project.
+
+    Generating a report runs cost variance, schedule variance and the project summary, and
+    the summary runs both analyses again; with a context passed through MonitoringControl,
+    Reporting and Closeout each dataset (WBS variance inputs, baseline, latest progress, EVM
+    performance, ...) is queried at most once. Entries are keyed by dataset name, arguments
+    and the project's data version, which is read once on first use; call refresh() to pick
+    up writes made while the context is alive. Contexts are meant to live for one request,
+    not to be shared between threads.
+    """
+
+    def __init__(self, db_m_instance, project_id):
+        if db_m_instance is None:
+            raise ValueError("DatabaseManager instance is required for ProjectAnalysisContext.")
+        self.db_manager = db_m_instance
+        self.project_id = project_id
+        self._data_version = None
+        self._datasets = {} # (data version, name, args) -> dataset
+
+    @property
+    def data_version(self):
+        """Signature of the project's WBS, budgets, costs and progress when the context first read them."""
+        if self._data_version is None:
+            row = self.db_manager.execute_query(_DATA_VERSION_SQL, (self.project_id,), fetch_one=True)
+            self._data_version = tuple(row) if row else ()
+        return self._data_version
+
+    def refresh(self):
+        """Re-reads the data version, dropping memoized datasets if the project changed. Returns True if it did."""
+        previous_version = self._data_version
+        self._data_version = None
+        if previous_version is None or self.data_version == previous_version:
+            return False
+        self._datasets.clear()
+        logger.info(f"Analysis context for project {self.project_id} refreshed after data changes.")
+        return True
+
+    def get(self, name, loader, *args):
+        """
+        Returns the memoized dataset `name` (for `args`), calling loader(*args) on first use.
+        Callers must not mutate the result; copy it first.
+        """
+        key = (self.data_version, name, args)
+        if key not in self._datasets:
+            self._datasets[key] = loader(*args)
+        return self._datasets[key]
+
+    def check_project(self, project_id):
+        """Raises ValueError if the context was created for a different project."""
+        if project_id != self.project_id:
+            raise ValueError(f"Analysis context for project {self.project_id} cannot be used for project {project_id}.")
@@ -0,0 +1,95 @@
+"""
+Lightweight background job runner for long-running module operations.
+
+Work runs on a daemon worker thread. Progress and completion are posted to a
+queue that the Tkinter thread drains with after() polling, so widgets are only
+ever touched from the GUI thread.
+"""
+import logging
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+JOB_EVENT_PROGRESS = "progress"
+JOB_EVENT_DONE = "done"
+JOB_EVENT_ERROR = "error"
+
+
+class BackgroundJob:
+    """
+    Runs a callable on a worker thread and exposes its progress to the GUI thread.
+
+    The target is called as target(*args, progress_callback=..., cancel_event=..., **kwargs).
+    It reports progress through progress_callback(stage_name, message, fraction) and should
+    check cancel_event.is_set() at safe points. Its return value is delivered as a 'done'
+    event; an uncaught exception is delivered as an 'error' event.
+    """
+
+    def __init__(self, name, target, *args, **kwargs):
+        self.name = name
+        self._target = target
+        self._args = args
+        self._kwargs = kwargs
+        self._events = queue.Queue()
+        self._thread = None
+        self.cancel_event = threading.Event()
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.error = None
+
+    def start(self):
+        """Starts the worker thread. A job can only be started once."""
+        if self._thread is not None:
+            raise RuntimeError(f"Background job '{self.name}' has already been started.")
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name=f"job-{self.name}", daemon=True)
+        self._thread.start()
+        logger.info(f"Background job '{self.name}' started.")
+
+    def cancel(self):
+        """Requests cancellation; the target stops at its next cancellation check."""
+        self.cancel_event.set()
+        logger.info(f"Cancellation requested for background job '{self.name}'.")
+
+    def wait(self, timeout=None):
+        """Blocks until the worker finishes (or timeout elapses). Not for use on the GUI thread."""
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def elapsed_seconds(self):
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.perf_counter()) - self.started_at
+
+    def report_progress(self, stage_name, message, fraction=None):
+        """Posts a progress event. Safe to call from the worker thread."""
+        self._events.put((JOB_EVENT_PROGRESS, {'stage': stage_name, 'message': message, 'fraction': fraction}))
+
+    def drain_events(self):
+        """Returns all events posted since the last call, oldest first. Call from the GUI thread."""
+        events = []
+        while True:
+            try:
+                events.append(self._events.get_nowait())
+            except queue.Empty:
+                return events
+
+    def _run(self):
+        try:
+            self.result = self._target(*self._args, progress_callback=self.report_progress,
+                                       cancel_event=self.cancel_event, **self._kwargs)
+            self.finished_at = time.perf_counter()
+            self._events.put((JOB_EVENT_DONE, self.result))
+            logger.info(f"Background job '{self.name}' finished in {self.elapsed_seconds:.2f}s.")
+        except Exception as e:
+            self.finished_at = time.perf_counter()
+            self.error = e
+            logger.error(f"Background job '{self.name}' failed: {e}", exc_info=True)
+            self._events.put((JOB_EVENT_ERROR, e))
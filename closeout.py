@@ -40,9 +40,11 @@ class Closeout:
         """
         logger.info(f"Finalizing reports for Project ID: {project_id}")
         reports_generated = []
+        # All final reports read the project's data through one analysis context
+        context = self.reporting_module.monitor_control.create_analysis_context(project_id)
 
         # Generate Estimate vs. Actual Report (Excel)
-        eva_df, success_eva, msg_eva = self.reporting_module.generate_estimate_vs_actual_report(project_id)
+        eva_df, success_eva, msg_eva = self.reporting_module.generate_estimate_vs_actual_report(project_id, context)
         if success_eva:
             export_success, export_msg = self.reporting_module.export_report(eva_df, 'Estimate vs. Actual', project_id, 'excel')
             reports_generated.append({'name': 'Estimate vs. Actual', 'path': os.path.join(Config.get_reports_dir(), f"project_{project_id}_estimate_vs._actual_report.xlsx") if export_success else None, 'status': export_msg})
@@ -51,7 +53,7 @@ class Closeout:
             logger.error(f"Failed to generate Estimate vs. Actual Report for project {project_id}: {msg_eva}")
 
         # Generate Performance Summary Report (Text)
-        perf_text, success_perf, msg_perf = self.reporting_module.generate_performance_report(project_id)
+        perf_text, success_perf, msg_perf = self.reporting_module.generate_performance_report(project_id, context)
         if success_perf:
             export_success, export_msg = self.reporting_module.export_report(perf_text, 'Performance Summary', project_id, 'text')
             reports_generated.append({'name': 'Performance Summary', 'path': os.path.join(Config.get_reports_dir(), f"project_{project_id}_performance_summary_report.txt") if export_success else None, 'status': export_msg})
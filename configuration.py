@@ -14,6 +14,8 @@ class Config:
     REPORTS_DIR = os.path.join(BASE_DIR, 'reports')
     ARCHIVE_DIR = os.path.join(REPORTS_DIR, 'archive')
     LOGS_DIR = os.path.join(BASE_DIR, 'logs')
+    DOCUMENT_STORE_DIR = os.path.join(DATA_DIR, 'document_store') # Content-addressed project documents
+    PDF_PAGE_CACHE_DIR = os.path.join(DATA_DIR, 'page_cache') # Rendered drawing pages, keyed by document hash
 
     # Ensure directories exist
     for directory in [DATABASE_DIR, DATA_DIR, REPORTS_DIR, ARCHIVE_DIR, LOGS_DIR]:
@@ -26,7 +28,8 @@ class Config:
             'integration_data_processing', 'execution_management',
             'monitoring_control', 'reporting', 'closeout',
             'reporting_closeout', 'project_scheduling', 'user_management',
-            'configuration', 'purchasing_logistics', 'production_prefab', 'daily_log'
+            'configuration', 'purchasing_logistics', 'production_prefab', 'daily_log',
+            'portfolio_dashboard'
         ],
         'project_manager': [
             'integration', 'data_processing', 'project_startup',
@@ -64,8 +67,8 @@ class Config:
             'reporting', 'closeout', 'integration'
         ],
         'division_manager': ['reporting', 'monitoring_control', 'user_management'],
-        'president': ['reporting', 'monitoring_control'],
-        'ceo': ['reporting', 'monitoring_control'],
+        'president': ['reporting', 'monitoring_control', 'portfolio_dashboard'],
+        'ceo': ['reporting', 'monitoring_control', 'portfolio_dashboard'],
         'board_of_directors': ['reporting', 'monitoring_control'],
         'contractor': ['execution_management', 'reporting'],
         'Project Partner': ['execution_management', 'project_startup', 'reporting']
@@ -84,6 +87,62 @@ class Config:
         'Phase': 'phase'
     }
 
+    # Working calendars (work_calendar.CalendarManager)
+    COMPANY_CALENDAR_NAME = 'Company'
+    DEFAULT_WORKING_DAYS = [0, 1, 2, 3, 4] # Monday to Friday (0=Monday, 6=Sunday)
+    CALENDAR_HOLIDAY_YEARS = range(2020, 2041) # Years seeded with standard holidays when the company calendar is created
+
+    # Critical path scheduling (CPMScheduler)
+    CPM_HOURS_PER_DAY = 8.0 # Converts Tasks.EstimatedHours to working days when a task has no scheduled dates
+
+    # Time-phased earned value (EarnedValueEngine)
+    EVM_DEFAULT_SPREAD_CURVE = 'linear' # For WBS elements without a SpreadCurve: 'linear', 'front' or 'back'
+
+    # EVM snapshot history (EvmSnapshotManager)
+    EVM_SNAPSHOT_PERIOD = 'W-SUN' # pandas period alias; one snapshot row per WBS element per period ('W-SUN' = weeks ending Sunday, 'M' = months)
+    EVM_SNAPSHOT_BACKFILL_PERIODS = 26 # Past periods reconstructed the first time a project is captured
+    EVM_SNAPSHOT_INTERVAL_MINUTES = 60 # How often the running application captures snapshots
+
+    # Portfolio dashboard (PortfolioPerformance)
+    PORTFOLIO_WARNING_INDEX = 0.95 # Projects with SPI or CPI below this are flagged
+
+    # EAC/ETC forecasting (CostForecaster)
+    FORECAST_PRIMARY_METHOD = 'cpi' # 'cpi', 'cpi_spi' or 'regression'; drives EstimateAtCompletion and overrun flags
+    FORECAST_REGRESSION_PERIODS = 12 # Recent snapshot periods the cost-curve regression is fitted on
+    FORECAST_MIN_REGRESSION_POINTS = 3
+    FORECAST_OVERRUN_WARNING_PCT = 5.0 # Forecast overrun of budget (%) flagged as 'warning'
+    FORECAST_OVERRUN_CRITICAL_PCT = 10.0 # ... and as 'critical'
+    FORECAST_OVERRUN_MIN_AMOUNT = 1000.0 # Smaller overruns are not flagged whatever their percentage
+
+    # Threshold alerts on cost, progress and daily log writes (AlertEngine)
+    ALERT_CPI_THRESHOLD = 0.9 # Project CPI below this raises an alert...
+    ALERT_MIN_ACTUAL_COST = 1000.0 # ...once at least this much has been spent
+    ALERT_WBS_OVERRUN_PCT = 10.0 # WBS actual cost over its estimate by more than this (%)
+    ALERT_PROGRESS_STALE_DAYS = 14 # WBS elements charged with costs but without a progress update for this long
+    ALERT_CERT_EXPIRY_DAYS = 30 # Certifications expiring within this many days
+    ALERT_RENOTIFY_MINUTES = 240 # An open alert that fires again is re-announced at most this often
+    ALERT_MAX_NOTIFICATIONS_PER_MINUTE = 5 # Status bar announcements; extra alerts are summarized in the next one
+
+    # Unusual and duplicate actual costs (CostAnomalyDetector)
+    COST_ANOMALY_ZSCORE_THRESHOLD = 3.5 # Robust z-score beyond which an amount is flagged against its peers
+    COST_ANOMALY_MIN_PEERS = 8 # Smaller category/vendor/WBS groups are not scored
+    COST_ANOMALY_DUPLICATE_WINDOW_DAYS = 7 # Same amount and payee posted within this many days is a possible duplicate
+    COST_ANOMALY_SCAN_INTERVAL_MINUTES = 30 # How often the running application checks new costs
+
+    # Monte Carlo schedule and cost risk (RiskSimulator); factors apply to tasks/WBS elements without three-point estimates
+    RISK_DEFAULT_ITERATIONS = 10000
+    RISK_BATCH_SIZE = 2000 # Iterations simulated together; each batch has its own seed stream
+    RISK_DURATION_OPTIMISTIC_FACTOR = 0.9
+    RISK_DURATION_PESSIMISTIC_FACTOR = 1.5
+    RISK_COST_OPTIMISTIC_FACTOR = 0.95
+    RISK_COST_PESSIMISTIC_FACTOR = 1.25
+
+    # Prefab shop scheduling (PrefabScheduler)
+    PREFAB_SHOP_DEPARTMENTS = ['Prefab', 'Shop'] # Employees.DepartmentArea values that staff the shop
+    PREFAB_SHOP_HOURS_PER_DAY = 8.0 # Default weekday hours; ShopEmployeeAvailability overrides per day
+    PREFAB_LABOR_UNIT_COLUMN = 'Labor1' # Materials labor-unit column used for shop hours
+    PREFAB_SHOP_CALENDAR_NAME = 'Prefab Shop' # Crew calendar for shop working days; the company calendar if absent
+
     REPORT_TEMPLATES = {
         'estimate_vs_actual': 'templates/estimate_vs_actual_template.xlsx'
     }
@@ -112,6 +171,14 @@ class Config:
     def get_logs_dir(cls):
         return cls.LOGS_DIR
 
+    @classmethod
+    def get_document_store_dir(cls):
+        return cls.DOCUMENT_STORE_DIR
+
+    @classmethod
+    def get_pdf_page_cache_dir(cls):
+        return cls.PDF_PAGE_CACHE_DIR
+
     @classmethod
     def get_role_permissions(cls):
         return cls.ROLE_PERMISSIONS
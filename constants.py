@@ -17,6 +17,7 @@ WBS_STATUS_PLANNED = "Planned"
 WBS_STATUS_IN_PROGRESS = "In Progress"
 WBS_STATUS_COMPLETED = "Completed"
 WBS_STATUS_ON_HOLD = "On Hold"
+WBS_STATUS_RETIRED = "Retired" # Soft-deleted: cost code no longer present in the project's estimates
 
 
 # Task Statuses (should align with 'TaskStatuses' table in schema.sql)
@@ -42,10 +43,25 @@ RESOURCE_TYPE_SUBCONTRACTOR = "Subcontractor"
 RESOURCE_TYPE_LUMP_SUM = "Lump Sum"
 RESOURCE_TYPE_OTHER = "Other"
 
+# Estimate unit of measure -> resource type, used by ProjectStartup.allocate_resources.
+# Exact (upper-cased) unit matches win; units not listed fall back to the 'HR'/'LS'
+# substring rules and finally to RESOURCE_TYPE_MATERIAL.
+RESOURCE_TYPE_BY_UNIT = {
+    "HR": RESOURCE_TYPE_LABOR,
+    "HRS": RESOURCE_TYPE_LABOR,
+    "MH": RESOURCE_TYPE_LABOR,
+    "MHR": RESOURCE_TYPE_LABOR,
+    "LS": RESOURCE_TYPE_LUMP_SUM,
+    "LOT": RESOURCE_TYPE_LUMP_SUM,
+    "SUB": RESOURCE_TYPE_SUBCONTRACTOR,
+}
+
 
 # Purchasing Log Statuses (align with domain logic for Purchasing_Log.Status)
 PURCHASE_STATUS_REQUESTED = "Requested"
 PURCHASE_STATUS_APPROVED = "Approved"
+PURCHASE_STATUS_APPROVED_BY_PM = "Approved by PM" # Purchasing_Log CHECK value
+PURCHASE_STATUS_PO_ISSUED = "PO Issued" # Purchasing_Log CHECK value; set when linked to a PO line
 PURCHASE_STATUS_ORDERED = "Ordered"
 PURCHASE_STATUS_SHIPPED = "Shipped"
 PURCHASE_STATUS_RECEIVED_PARTIAL = "Received Partial"
@@ -54,6 +70,10 @@ PURCHASE_STATUS_CANCELLED = "Cancelled"
 PURCHASE_STATUS_CLOSED = "Closed" # If applicable
 
 
+# Purchase Order Statuses (align with the 'OrderStatuses' table in schema.sql)
+ORDER_STATUS_DRAFT = "Draft" # Purchase orders generated by ProjectStartup.consolidate_material_requests
+
+
 # Production Assembly Tracking Statuses (align with Production_Assembly_Tracking.Status)
 PRODUCTION_STATUS_PLANNED = "Planned"
 PRODUCTION_STATUS_IN_PROGRESS = "In Progress"
@@ -116,6 +136,18 @@ MODULE_USER_MANAGEMENT = "user_management"
 MODULE_CONFIGURATION = "configuration" # Though this is often just the Config class
 MODULE_CRM = "crm"
 MODULE_ESTIMATE = "estimate"
+MODULE_PREFAB_SCHEDULING = "prefab_scheduling"
+MODULE_FIELD_SEARCH = "field_search"
+MODULE_CALENDAR = "calendar"
+MODULE_CPM_SCHEDULING = "cpm_scheduling"
+MODULE_RESOURCE_LEVELING = "resource_leveling"
+MODULE_RISK_SIMULATION = "risk_simulation"
+MODULE_EARNED_VALUE = "earned_value"
+MODULE_PORTFOLIO_PERFORMANCE = "portfolio_performance"
+MODULE_EVM_SNAPSHOTS = "evm_snapshots"
+MODULE_FORECASTING = "forecasting"
+MODULE_ALERTS = "alerts"
+MODULE_COST_ANOMALIES = "cost_anomalies"
 
 # GUI Frame / Activity Bar Identifiers (might overlap with module names or be specific UI identifiers)
 FRAME_IDP = "integration_data_processing" # Integration & Data Processing
@@ -130,3 +162,4 @@ FRAME_PROD_PREFAB = "production_prefab"
 FRAME_USER_MGMT = "user_management" # Matches module name
 FRAME_CRM = "crm"
 FRAME_ESTIMATE = "estimate"
+FRAME_PORTFOLIO_DASHBOARD = "portfolio_dashboard"
@@ -0,0 +1,242 @@
+import logging
+import sys
+
+import numpy as np
+import pandas as pd
+
+from configuration import Config
+
+logger = logging.getLogger(__name__)
+
+ANOMALY_OUTLIER = 'outlier'
+ANOMALY_DUPLICATE = 'duplicate'
+REVIEW_PENDING = 'Pending'
+REVIEW_CONFIRMED = 'Confirmed'
+REVIEW_DISMISSED = 'Dismissed'
+
+# Peer groups an amount is scored against; a row without a vendor or WBS element is only scored in the others
+_PEER_GROUPS = {'category': ['CostCategory'], 'vendor': ['VendorID'], 'WBS element': ['WBSElementID']}
+_MAD_SCALE = 0.6745 # MAD of a normal distribution in standard deviations
+_MEAN_AD_SCALE = 1.2533 # Mean absolute deviation of a normal distribution in standard deviations
+
+_UPSERT_SQL = """
+INSERT INTO cost_anomalies (ActualCostID, AnomalyType, Score, RelatedActualCostID, Details) VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (ActualCostID, AnomalyType) DO UPDATE SET
+    Score = excluded.Score, RelatedActualCostID = excluded.RelatedActualCostID, Details = excluded.Details
+WHERE cost_anomalies.ReviewStatus = 'Pending'
+"""
+
+
+def robust_z_scores(amounts, group_codes, min_peers):
+    """
+    Robust z-score of each amount within its group: 0.6745 * (x - median) / MAD, falling back
+    to the mean absolute deviation when more than half the group shares one amount.
+    NaN for rows without a group (code -1), in groups smaller than min_peers, or with no spread.
+    Returns (z, group median, group size) arrays.
+    """
+    codes = pd.Series(group_codes)
+    values = pd.Series(amounts).where(codes >= 0)
+    grouped = values.groupby(codes)
+    median = grouped.transform('median').to_numpy()
+    deviation = pd.Series(np.abs(values.to_numpy() - median))
+    mad = deviation.groupby(codes).transform('median').to_numpy()
+    mean_ad = deviation.groupby(codes).transform('mean').to_numpy()
+    size = grouped.transform('count').to_numpy()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z = np.where(mad > 0, _MAD_SCALE * (values.to_numpy() - median) / mad,
+                     np.where(mean_ad > 0, (values.to_numpy() - median) / (_MEAN_AD_SCALE * mean_ad), np.nan))
+    z[(codes.to_numpy() < 0) | (size < min_peers)] = np.nan
+    return z, median, size
+
+
+class CostAnomalyDetector:
+    """
+    Flags actual_costs rows for review: fat-fingered amounts and near-duplicate postings.
+
+        outlier    amount with a robust z-score beyond Config.COST_ANOMALY_ZSCORE_THRESHOLD against
+                   its cost category, vendor or WBS element peers (whichever deviates most; groups
+                   need Config.COST_ANOMALY_MIN_PEERS rows)
+        duplicate  same amount to the cent and vendor (same project and category when there is no
+                   vendor) within Config.COST_ANOMALY_DUPLICATE_WINDOW_DAYS of an earlier posting
+
+    A scan reads the cost table once and scores it with grouped numpy operations; duplicates are
+    found by hashing the posting key and comparing neighbours in (key, date) order. The
+    incremental scan (the default) scores every row's peers but only flags rows added since the
+    last scan, and returns at once when there are none; run a full scan after bulk edits or
+    threshold changes. Flags land in cost_anomalies as a review queue; reviewed flags are never
+    reopened or removed by later scans.
+    """
+
+    def __init__(self, db_m_instance):
+        if db_m_instance is None:
+            raise ValueError("DatabaseManager instance is required for CostAnomalyDetector.")
+        self.db_manager = db_m_instance
+        logger.info("CostAnomalyDetector initialized with provided db_manager.")
+
+    def scan(self, incremental=True, progress_callback=None, cancel_event=None):
+        """
+        Scans actual_costs for anomalies. Can run as a background_jobs.BackgroundJob target.
+        Args:
+            incremental (bool): Flag only rows added since the last scan; False re-checks every row and
+                                drops pending flags that no longer apply.
+        Returns:
+            tuple: (dict with scanned/new row counts and outlier/duplicate flags written, message)
+        """
+        result = {'scanned': 0, 'new': 0, 'outliers': 0, 'duplicates': 0}
+        status = self.db_manager.execute_query("""
+            SELECT (SELECT LastActualCostID FROM cost_anomaly_scan_status WHERE ScanID = 1) AS LastActualCostID,
+                   (SELECT MAX(ActualCostID) FROM actual_costs) AS MaxActualCostID
+        """, fetch_one=True)
+        if not status:
+            return result, "Could not read the cost anomaly scan status."
+        watermark = (status['LastActualCostID'] or 0) if incremental else 0
+        if status['MaxActualCostID'] is None or status['MaxActualCostID'] <= watermark:
+            return result, "No new costs to scan."
+
+        if progress_callback:
+            progress_callback("Cost anomalies", "Reading actual costs", 0.0)
+        rows = self.db_manager.execute_query("""
+            SELECT ActualCostID, ProjectID, WBSElementID, VendorID, CostCategory, Amount, TransactionDate
+            FROM actual_costs ORDER BY ActualCostID
+        """, fetch_all=True) or []
+        costs = pd.DataFrame.from_records([tuple(row) for row in rows], columns=[
+            'ActualCostID', 'ProjectID', 'WBSElementID', 'VendorID', 'CostCategory', 'Amount', 'TransactionDate'])
+        if cancel_event is not None and cancel_event.is_set():
+            return result, "Cost anomaly scan cancelled."
+
+        candidates = costs['ActualCostID'].to_numpy() > watermark
+        if progress_callback:
+            progress_callback("Cost anomalies", f"Scoring {len(costs)} costs", 0.4)
+        flags = self._find_outliers(costs, candidates) + self._find_duplicates(costs, candidates)
+        result.update({'scanned': len(costs), 'new': int(candidates.sum()),
+                       'outliers': sum(flag[1] == ANOMALY_OUTLIER for flag in flags),
+                       'duplicates': sum(flag[1] == ANOMALY_DUPLICATE for flag in flags)})
+        if cancel_event is not None and cancel_event.is_set():
+            return result, "Cost anomaly scan cancelled."
+
+        if not self._save_flags(flags, int(status['MaxActualCostID']), full_scan=not incremental):
+            return result, "Failed to save cost anomalies (see log)."
+        logger.info(f"Cost anomaly scan ({'incremental' if incremental else 'full'}): {result['new']} of {result['scanned']} costs checked, "
+                    f"{result['outliers']} outliers and {result['duplicates']} possible duplicates flagged.")
+        return result, (f"Checked {result['new']} costs: {result['outliers']} unusual amounts and "
+                        f"{result['duplicates']} possible duplicates flagged for review.")
+
+    def _find_outliers(self, costs, candidates):
+        """[(ActualCostID, 'outlier', z, None, details)] for candidate rows beyond the z-score threshold."""
+        amounts = costs['Amount'].to_numpy(dtype=float)
+        scores, medians, sizes = [], [], []
+        for columns in _PEER_GROUPS.values():
+            codes = costs.groupby(columns, dropna=True, sort=False).ngroup().to_numpy()
+            z, median, size = robust_z_scores(amounts, codes, Config.COST_ANOMALY_MIN_PEERS)
+            scores.append(z)
+            medians.append(median)
+            sizes.append(size)
+        scores = np.vstack(scores)
+        best = np.argmax(np.nan_to_num(np.abs(scores), nan=-1.0), axis=0) # Peer group that deviates most
+        columns = np.arange(len(costs))
+        best_z = scores[best, columns]
+        flagged = np.flatnonzero(candidates & (np.abs(np.nan_to_num(best_z)) > Config.COST_ANOMALY_ZSCORE_THRESHOLD))
+        labels = list(_PEER_GROUPS)
+        medians, sizes = np.vstack(medians)[best, columns], np.vstack(sizes)[best, columns]
+        cost_ids = costs['ActualCostID'].to_numpy()
+        return [(int(cost_ids[i]), ANOMALY_OUTLIER, float(best_z[i]), None,
+                 f"Amount ${amounts[i]:,.2f} vs median ${medians[i]:,.2f} of {int(sizes[i])} costs in its {labels[best[i]]} "
+                 f"(robust z {best_z[i]:+.1f}).") for i in flagged]
+
+    def _find_duplicates(self, costs, candidates):
+        """[(ActualCostID, 'duplicate', days apart, earlier ActualCostID, details)] for candidate rows repeating a posting."""
+        days = pd.to_datetime(costs['TransactionDate'], errors='coerce').to_numpy().astype('datetime64[D]')
+        dated = ~np.isnat(days)
+        vendor_known = costs['VendorID'].notna().to_numpy()
+        key = pd.DataFrame({
+            'cents': np.round(costs['Amount'].to_numpy(dtype=float) * 100).astype(np.int64),
+            'payee': np.where(vendor_known, costs['VendorID'].fillna(0).to_numpy(), -costs['ProjectID'].to_numpy()).astype(np.int64),
+            'category': np.where(vendor_known, '', costs['CostCategory'].to_numpy()),
+        })
+        key_hash = pd.util.hash_pandas_object(key, index=False).to_numpy()
+        day_numbers = np.where(dated, days, np.datetime64('1970-01-01', 'D')).astype(np.int64)
+        cost_ids = costs['ActualCostID'].to_numpy()
+
+        # Sort-merge: within a key, rows are in date order, so each repeat sits right after its predecessor
+        order = np.lexsort((cost_ids, day_numbers, key_hash))
+        order = order[dated[order]]
+        previous, current = order[:-1], order[1:]
+        gap = day_numbers[current] - day_numbers[previous]
+        repeat = (key_hash[current] == key_hash[previous]) & (gap <= Config.COST_ANOMALY_DUPLICATE_WINDOW_DAYS)
+        repeat &= candidates[current] | candidates[previous]
+        # Flag the later posting, or the new one when a back-dated cost repeats one already scanned
+        flagged = np.where(candidates[current], current, previous)[repeat]
+        related = np.where(candidates[current], previous, current)[repeat]
+        amounts, dates = costs['Amount'].to_numpy(dtype=float), costs['TransactionDate'].to_numpy()
+        return [(int(cost_ids[i]), ANOMALY_DUPLICATE, float(g), int(cost_ids[j]),
+                 f"Same amount ${amounts[i]:,.2f} and payee as cost {int(cost_ids[j])} on {dates[j]} ({int(g)} days apart).")
+                for i, j, g in zip(flagged, related, gap[repeat])]
+
+    def _save_flags(self, flags, last_cost_id, full_scan):
+        """Upserts the flags (pending ones are refreshed, reviewed ones kept) and advances the scan watermark."""
+        conn = self.db_manager.get_connection()
+        with self.db_manager.lock:
+            try:
+                cursor = conn.cursor()
+                if full_scan:
+                    flagged = {(flag[0], flag[1]) for flag in flags}
+                    stale = [(row['AnomalyID'],) for row in cursor.execute(
+                        "SELECT AnomalyID, ActualCostID, AnomalyType FROM cost_anomalies WHERE ReviewStatus = ?", (REVIEW_PENDING,)
+                    ) if (row['ActualCostID'], row['AnomalyType']) not in flagged]
+                    cursor.executemany("DELETE FROM cost_anomalies WHERE AnomalyID = ?", stale)
+                cursor.executemany(_UPSERT_SQL, flags)
+                cursor.execute("""
+                    INSERT INTO cost_anomaly_scan_status (ScanID, LastActualCostID) VALUES (1, ?)
+                    ON CONFLICT (ScanID) DO UPDATE SET LastActualCostID = excluded.LastActualCostID, LastScanAt = CURRENT_TIMESTAMP
+                """, (last_cost_id,))
+                conn.commit()
+                return True
+            except Exception as e:
+                conn.rollback()
+                logger.error(f"Error saving cost anomalies: {e}", exc_info=True)
+                return False
+
+    def get_review_queue(self, project_id=None, include_reviewed=False):
+        """Flagged costs, duplicates first and then by largest amount; pending review only by default."""
+        rows = self.db_manager.execute_query("""
+            SELECT an.AnomalyID, an.AnomalyType, an.Score, an.Details, an.RelatedActualCostID, an.ReviewStatus,
+                   an.DetectedAt, an.ReviewedAt, an.ReviewedBy, an.ReviewNotes,
+                   ac.ActualCostID, ac.ProjectID, ac.WBSElementID, ac.CostCategory, v.VendorName, ac.Description,
+                   ac.Amount, ac.TransactionDate
+            FROM cost_anomalies an
+            JOIN actual_costs ac ON ac.ActualCostID = an.ActualCostID
+            LEFT JOIN Vendors v ON v.VendorID = ac.VendorID
+            WHERE (?1 IS NULL OR ac.ProjectID = ?1) AND (?2 OR an.ReviewStatus = ?3)
+            ORDER BY an.AnomalyType = ?4 DESC, ac.Amount DESC, an.AnomalyID
+        """, (project_id, 1 if include_reviewed else 0, REVIEW_PENDING, ANOMALY_DUPLICATE), fetch_all=True)
+        return pd.DataFrame([dict(row) for row in rows or []])
+
+    def review_anomaly(self, anomaly_id, review_status, reviewed_by=None, notes=None):
+        """
+        Records the outcome of reviewing a flagged cost.
+        Args:
+            review_status (str): REVIEW_CONFIRMED (a real error, to be corrected) or REVIEW_DISMISSED (legitimate).
+        Returns:
+            tuple: (bool success, str message)
+        """
+        if review_status not in (REVIEW_CONFIRMED, REVIEW_DISMISSED):
+            return False, f"Review status must be '{REVIEW_CONFIRMED}' or '{REVIEW_DISMISSED}'."
+        cursor = self.db_manager.execute_query("""
+            UPDATE cost_anomalies SET ReviewStatus = ?, ReviewedBy = ?, ReviewNotes = ?, ReviewedAt = CURRENT_TIMESTAMP
+            WHERE AnomalyID = ?
+        """, (review_status, reviewed_by, notes, anomaly_id), commit=True)
+        if cursor and cursor.rowcount:
+            logger.info(f"Cost anomaly {anomaly_id} reviewed as {review_status} by {reviewed_by}.")
+            return True, f"Anomaly {anomaly_id} marked {review_status}."
+        return False, f"Anomaly {anomaly_id} not found."
+
+
+if __name__ == "__main__":
+    # python cost_anomalies.py [full]; run after cost imports, "full" after bulk corrections or threshold changes
+    from database_manager import db_manager
+    detector = CostAnomalyDetector(db_manager)
+    _, message = detector.scan(incremental=not (len(sys.argv) > 1 and sys.argv[1] == 'full'))
+    print(message)
+    queue_df = detector.get_review_queue()
+    if not queue_df.empty:
+        print(queue_df[['AnomalyID', 'AnomalyType', 'ProjectID', 'VendorName', 'Amount', 'TransactionDate', 'Details']].to_string(index=False))
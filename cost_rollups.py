@@ -0,0 +1,141 @@
+import logging
+import sys
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Rollup rows recomputed from the source tables; ?1 is an optional ProjectID filter (NULL = all projects).
+# Amounts are rounded so verification is not tripped by float summation order.
+_EXPECTED_DAILY_SQL = """
+SELECT ProjectID, COALESCE(WBSElementID, 0) AS WBSElementID, CostCategory, TransactionDate,
+       ROUND(SUM(Amount), 4) AS TotalAmount, COUNT(*) AS EntryCount
+FROM actual_costs
+WHERE ?1 IS NULL OR ProjectID = ?1
+GROUP BY ProjectID, COALESCE(WBSElementID, 0), CostCategory, TransactionDate
+"""
+_STORED_DAILY_SQL = """
+SELECT ProjectID, WBSElementID, CostCategory, TransactionDate, ROUND(TotalAmount, 4) AS TotalAmount, EntryCount
+FROM cost_daily_rollups
+WHERE ?1 IS NULL OR ProjectID = ?1
+"""
+_EXPECTED_WBS_SQL = """
+SELECT ProjectID, WBSElementID, ROUND(SUM(TotalActualCost), 4) AS TotalActualCost, SUM(CostEntryCount) AS CostEntryCount,
+       MAX(LatestProgressUpdateID) AS LatestProgressUpdateID, MAX(LatestUpdateDate) AS LatestUpdateDate,
+       MAX(CompletionPercentage) AS CompletionPercentage
+FROM (
+    SELECT ProjectID, COALESCE(WBSElementID, 0) AS WBSElementID, SUM(Amount) AS TotalActualCost, COUNT(*) AS CostEntryCount,
+           NULL AS LatestProgressUpdateID, NULL AS LatestUpdateDate, NULL AS CompletionPercentage
+    FROM actual_costs
+    WHERE ?1 IS NULL OR ProjectID = ?1
+    GROUP BY ProjectID, COALESCE(WBSElementID, 0)
+    UNION ALL
+    SELECT ProjectID, WBSElementID, 0.0, 0, ProgressUpdateID, UpdateDate, CompletionPercentage
+    FROM (
+        SELECT ProjectID, WBSElementID, ProgressUpdateID, UpdateDate, CompletionPercentage,
+               ROW_NUMBER() OVER (PARTITION BY ProjectID, WBSElementID ORDER BY UpdateDate DESC, ProgressUpdateID DESC) AS UpdateRank
+        FROM progress_updates
+        WHERE WBSElementID IS NOT NULL AND (?1 IS NULL OR ProjectID = ?1)
+    )
+    WHERE UpdateRank = 1
+)
+GROUP BY ProjectID, WBSElementID
+"""
+_STORED_WBS_SQL = """
+SELECT ProjectID, WBSElementID, ROUND(TotalActualCost, 4) AS TotalActualCost, CostEntryCount,
+       LatestProgressUpdateID, LatestUpdateDate, CompletionPercentage
+FROM wbs_actual_rollups
+WHERE ?1 IS NULL OR ProjectID = ?1
+"""
+# (rollup table, rows recomputed from source, rows as stored)
+_ROLLUPS = (
+    ('cost_daily_rollups', _EXPECTED_DAILY_SQL, _STORED_DAILY_SQL),
+    ('wbs_actual_rollups', _EXPECTED_WBS_SQL, _STORED_WBS_SQL),
+)
+
+
+class CostRollupManager:
+    """
+    Rebuild and verification for the cost and progress rollups.
+
+    cost_daily_rollups (actual cost per project / WBS element / category / day) and
+    wbs_actual_rollups (total actual cost and latest progress per WBS element) are kept
+    current by triggers on actual_costs and progress_updates (see schema.sql), so variance,
+    reports and dashboards read one row per WBS element however long the cost history is.
+    These methods recompute them from the source rows, for recovery after bulk loads done
+    with triggers disabled, or to check that nothing has drifted.
+    """
+
+    def __init__(self, db_m_instance):
+        if db_m_instance is None:
+            raise ValueError("DatabaseManager instance is required for CostRollupManager.")
+        self.db_manager = db_m_instance
+        logger.info("CostRollupManager initialized with provided db_manager.")
+
+    def rebuild_rollups(self, project_id=None):
+        """
+        Recomputes the rollups for one project (or all projects) from actual_costs and
+        progress_updates and bumps the projects' cost revisions so cached analyses reload.
+        Returns (success, message).
+        """
+        conn = self.db_manager.get_connection()
+        with self.db_manager.lock:
+            try:
+                cursor = conn.cursor()
+                counts = []
+                for table, expected_sql, _ in _ROLLUPS:
+                    cursor.execute(f"DELETE FROM {table} WHERE ?1 IS NULL OR ProjectID = ?1", (project_id,))
+                    cursor.execute(f"INSERT INTO {table} {expected_sql}", (project_id,))
+                    counts.append(cursor.rowcount)
+                cursor.execute("""
+                INSERT INTO cost_rollup_revisions (ProjectID, Revision)
+                SELECT ProjectID, 1 FROM Projects WHERE ?1 IS NULL OR ProjectID = ?1
+                ON CONFLICT (ProjectID) DO UPDATE SET Revision = Revision + 1
+                """, (project_id,))
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                logger.error(f"Error rebuilding cost rollups for project {project_id}: {e}", exc_info=True)
+                return False, f"Failed to rebuild cost rollups: {e}"
+        scope = f"project {project_id}" if project_id is not None else "all projects"
+        logger.info(f"Rebuilt cost rollups for {scope}: {counts[0]} daily rows, {counts[1]} WBS rows.")
+        return True, f"Rebuilt cost rollups for {scope}: {counts[0]} daily rows, {counts[1]} WBS rows."
+
+    def verify_rollups(self, project_id=None):
+        """
+        Compares the rollups with totals recomputed from the source rows.
+        Returns:
+            tuple: (DataFrame of mismatched rows with RollupTable, Side ('expected' = recomputed
+                   from source, 'stored' = in the rollup table), ProjectID, WBSElementID and Detail;
+                   message). The DataFrame is empty when the rollups are in step.
+        """
+        mismatches = []
+        for table, expected_sql, stored_sql in _ROLLUPS:
+            for side, query in (('expected', f"{expected_sql} EXCEPT {stored_sql}"),
+                                ('stored', f"{stored_sql} EXCEPT {expected_sql}")):
+                for row in self.db_manager.execute_query(query, (project_id,), fetch_all=True) or []:
+                    row = dict(row)
+                    detail = ', '.join(f"{column}={value}" for column, value in row.items()
+                                       if column not in ('ProjectID', 'WBSElementID'))
+                    mismatches.append({'RollupTable': table, 'Side': side, 'ProjectID': row['ProjectID'],
+                                       'WBSElementID': row['WBSElementID'], 'Detail': detail})
+        mismatches_df = pd.DataFrame(mismatches, columns=['RollupTable', 'Side', 'ProjectID', 'WBSElementID', 'Detail'])
+        if mismatches_df.empty:
+            return mismatches_df, "Cost rollups match the source rows."
+        logger.warning(f"Cost rollups out of step with source rows: {len(mismatches_df)} mismatched rows.")
+        return mismatches_df, f"{len(mismatches_df)} rollup rows differ from the source rows; run rebuild_rollups to repair."
+
+
+if __name__ == "__main__":
+    # python cost_rollups.py [verify|rebuild] [project_id]
+    from database_manager import db_manager
+    command = sys.argv[1] if len(sys.argv) > 1 else 'verify'
+    target_project = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    manager = CostRollupManager(db_manager)
+    if command == 'rebuild':
+        _, message = manager.rebuild_rollups(target_project)
+        print(message)
+    mismatches_df, message = manager.verify_rollups(target_project)
+    print(message)
+    if not mismatches_df.empty:
+        print(mismatches_df.to_string(index=False))
@@ -0,0 +1,558 @@
+import heapq
+import logging
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from configuration import Config
+from exceptions import AppValidationError
+from work_calendar import CalendarManager, to_day_array
+
+logger = logging.getLogger(__name__)
+
+DEPENDENCY_TYPES = ('FS', 'SS', 'FF')
+_FS, _SS, _FF = 0, 1, 2
+_TYPE_CODES = {'FS': _FS, 'SS': _SS, 'FF': _FF}
+
+
+class CPMScheduler:
+    """
+    Critical Path Method scheduling over a project's Tasks and TaskDependencies.
+
+    Time is measured in working days on the project calendar (see work_calendar), as integer
+    offsets from the project start. A task occupies [ES, EF) with EF = ES + duration. Links are
+    finish-to-start, start-to-start or finish-to-finish with a lag in working days:
+        FS: ES(succ) >= EF(pred) + lag
+        SS: ES(succ) >= ES(pred) + lag
+        FF: EF(succ) >= EF(pred) + lag
+    The forward pass gives early dates, the backward pass late dates against the project
+    finish, and total float is LS - ES; tasks with no float are critical.
+
+    Durations come from a task's actual dates, else its scheduled dates, else EstimatedHours
+    over Config.CPM_HOURS_PER_DAY, else one day. Started tasks are pinned to ActualStartDate;
+    StartNoEarlierThan constrains the others, and tasks without predecessors keep their
+    ScheduledStartDate.
+
+    The network of each project is cached with its TaskScheduleRevision; update_task_dates
+    re-propagates only the tasks downstream (and, for duration changes, upstream) of the
+    changed one and writes back only rows whose dates moved. Computed dates are stored in
+    TaskCPMResults; a task's own ScheduledStartDate/ScheduledEndDate are planner input and
+    are only rewritten for the task update_task_dates was asked to change.
+    """
+
+    def __init__(self, db_m_instance, calendar_manager_instance=None):
+        if db_m_instance is None:
+            raise ValueError("DatabaseManager instance is required for CPMScheduler.")
+        self.db_manager = db_m_instance
+        self.calendar_manager = calendar_manager_instance if calendar_manager_instance else CalendarManager(self.db_manager)
+        self._networks = {} # ProjectID -> network (see _load_network)
+        logger.info("CPMScheduler initialized with provided db_manager.")
+
+    # ---- Network loading ----
+
+    def _get_revision(self, project_id):
+        row = self.db_manager.execute_query(
+            "SELECT Revision FROM TaskScheduleRevision WHERE ProjectID = ?", (project_id,), fetch_one=True
+        )
+        return row['Revision'] if row else 0
+
+    @staticmethod
+    def _to_index(calendar, anchor, values, roll='forward'):
+        """Working-day offsets from anchor for an array of date strings (None/NaN -> None)."""
+        values = pd.Series(values, dtype=object)
+        present = values.notna() & (values.astype(str).str.len() >= 10)
+        result = np.full(len(values), None, dtype=object)
+        if present.any():
+            days = calendar.offset(values[present].astype(str).str[:10].to_numpy(), 0, roll=roll)
+            result[present.to_numpy()] = calendar.days_between(np.full(len(days), anchor), days)
+        return result
+
+    @staticmethod
+    def _to_dates(calendar, anchor, offsets):
+        return calendar.offset(np.full(len(offsets), anchor), np.asarray(offsets, dtype=np.int64)).astype(str)
+
+    def _load_network(self, project_id):
+        """
+        Reads the project's tasks and dependencies into adjacency lists and topological order.
+        Raises AppValidationError if the dependencies contain a cycle.
+        """
+        revision = self._get_revision(project_id)
+        task_columns = ['TaskID', 'EstimatedHours', 'ScheduledStartDate', 'ScheduledEndDate', 'ActualStartDate', 'ActualEndDate',
+                        'StartNoEarlierThan', 'EarlyStart', 'EarlyFinish', 'DurationDays']
+        tasks = pd.DataFrame.from_records([tuple(row) for row in self.db_manager.execute_query("""
+            SELECT t.TaskID, t.EstimatedHours, t.ScheduledStartDate, t.ScheduledEndDate, t.ActualStartDate, t.ActualEndDate,
+                   t.StartNoEarlierThan, r.EarlyStart, r.EarlyFinish, r.DurationDays
+            FROM Tasks t LEFT JOIN TaskCPMResults r ON r.TaskID = t.TaskID
+            WHERE t.ProjectID = ? ORDER BY t.TaskID
+        """, (project_id,), fetch_all=True) or []], columns=task_columns)
+        if tasks.empty:
+            return None
+        dependencies = self.db_manager.execute_query("""
+            SELECT d.PredecessorTaskID, d.SuccessorTaskID, d.DependencyType, d.LagDays
+            FROM TaskDependencies d
+            JOIN Tasks p ON p.TaskID = d.PredecessorTaskID AND p.ProjectID = ?
+            JOIN Tasks s ON s.TaskID = d.SuccessorTaskID AND s.ProjectID = ?
+        """, (project_id, project_id), fetch_all=True) or []
+
+        calendar = self.calendar_manager.get_project_calendar(project_id)
+        project = self.db_manager.execute_query("SELECT StartDate FROM Projects WHERE ProjectID = ?", (project_id,), fetch_one=True)
+        anchor_source = project['StartDate'] if project and project['StartDate'] else None
+        if not anchor_source:
+            scheduled_starts = tasks['ScheduledStartDate'].dropna().astype(str)
+            anchor_source = scheduled_starts.min() if not scheduled_starts.empty else str(np.datetime64('today', 'D'))
+        anchor = calendar.offset(str(anchor_source)[:10], 0)[0]
+
+        task_ids = tasks['TaskID'].astype(int).tolist()
+        index = {task_id: i for i, task_id in enumerate(task_ids)}
+        n = len(task_ids)
+        preds, succs = [[] for _ in range(n)], [[] for _ in range(n)]
+        edge_src, edge_dst, edge_type, edge_lag = [], [], [], []
+        for dep in dependencies:
+            p, s = index[dep['PredecessorTaskID']], index[dep['SuccessorTaskID']]
+            code, lag = _TYPE_CODES.get(dep['DependencyType'], _FS), int(dep['LagDays'] or 0)
+            preds[s].append((p, code, lag))
+            succs[p].append((s, code, lag))
+            edge_src.append(p)
+            edge_dst.append(s)
+            edge_type.append(code)
+            edge_lag.append(lag)
+
+        durations = self._task_durations(tasks, calendar)
+        actual_start = self._to_index(calendar, anchor, tasks['ActualStartDate'])
+        snet = self._to_index(calendar, anchor, tasks['StartNoEarlierThan'])
+        scheduled_start = self._to_index(calendar, anchor, tasks['ScheduledStartDate'])
+        floor, fixed = [0] * n, [False] * n
+        for i in range(n):
+            if actual_start[i] is not None:
+                floor[i], fixed[i] = int(actual_start[i]), True
+            elif snet[i] is not None:
+                floor[i] = int(snet[i])
+            elif not preds[i] and scheduled_start[i] is not None:
+                floor[i] = int(scheduled_start[i])
+
+        network = {
+            'project_id': project_id, 'revision': revision, 'calendar': calendar, 'anchor': anchor,
+            'task_ids': task_ids, 'index': index, 'duration': durations, 'floor': floor, 'fixed': fixed,
+            'preds': preds, 'succs': succs,
+            'edges': (np.array(edge_src, dtype=np.int64), np.array(edge_dst, dtype=np.int64),
+                      np.array(edge_type, dtype=np.int64), np.array(edge_lag, dtype=np.int64)),
+            'es': [0] * n, 'ef': [0] * n, 'ls': [0] * n, 'lf': [0] * n, 'finish': 0,
+        }
+        network['order'] = self._topological_order(network)
+        network['position'] = [0] * n
+        for position, i in enumerate(network['order']):
+            network['position'][i] = position
+        return network
+
+    def _task_durations(self, tasks, calendar):
+        """Working-day durations (see class docstring); scheduled dates the engine wrote itself keep its duration, so milestones stay at zero."""
+        def day_strings(column):
+            # 'YYYY-MM-DD' or '' so the columns compare as plain strings
+            return tasks[column].astype(object).map(lambda v: str(v)[:10] if isinstance(v, str) else '')
+        actual_start, actual_end = day_strings('ActualStartDate'), day_strings('ActualEndDate')
+        start, end = day_strings('ScheduledStartDate'), day_strings('ScheduledEndDate')
+        hours = pd.to_numeric(tasks['EstimatedHours'], errors='coerce')
+        durations = np.where(hours.notna(), np.ceil(hours.fillna(0) / float(Config.CPM_HOURS_PER_DAY)), 1).astype(np.int64)
+
+        has_scheduled = (start != '') & (end != '') & (end >= start)
+        if has_scheduled.any():
+            durations[has_scheduled.to_numpy()] = calendar.count(start[has_scheduled].tolist(), end[has_scheduled].tolist())
+        engine_duration = pd.to_numeric(tasks['DurationDays'], errors='coerce')
+        engine_written = has_scheduled & engine_duration.notna() & (start == day_strings('EarlyStart')) & (end == day_strings('EarlyFinish'))
+        if engine_written.any():
+            durations[engine_written.to_numpy()] = engine_duration[engine_written].astype(np.int64).to_numpy()
+        has_actual = (actual_start != '') & (actual_end != '') & (actual_end >= actual_start)
+        if has_actual.any():
+            durations[has_actual.to_numpy()] = calendar.count(actual_start[has_actual].tolist(), actual_end[has_actual].tolist())
+        return [max(int(d), 0) for d in durations]
+
+    @staticmethod
+    def _topological_order(network):
+        n = len(network['task_ids'])
+        in_degree = [len(p) for p in network['preds']]
+        queue = deque(i for i in range(n) if in_degree[i] == 0)
+        order = []
+        while queue:
+            i = queue.popleft()
+            order.append(i)
+            for s, _, _ in network['succs'][i]:
+                in_degree[s] -= 1
+                if in_degree[s] == 0:
+                    queue.append(s)
+        if len(order) < n:
+            in_cycle = sorted(network['task_ids'][i] for i in range(n) if in_degree[i] > 0)
+            raise AppValidationError(f"Task dependencies contain a cycle involving tasks: {in_cycle[:20]}")
+        return order
+
+    # ---- Passes ----
+
+    def _early_start(self, network, i):
+        es, ef, duration = network['es'], network['ef'], network['duration']
+        if network['fixed'][i]:
+            return network['floor'][i]
+        start = network['floor'][i]
+        for p, code, lag in network['preds'][i]:
+            if code == _FS:
+                required = ef[p] + lag
+            elif code == _SS:
+                required = es[p] + lag
+            else:
+                required = ef[p] + lag - duration[i]
+            if required > start:
+                start = required
+        return start
+
+    def _late_finish(self, network, i):
+        ls, lf, duration = network['ls'], network['lf'], network['duration']
+        finish = network['finish']
+        for s, code, lag in network['succs'][i]:
+            if code == _FS:
+                allowed = ls[s] - lag
+            elif code == _SS:
+                allowed = ls[s] - lag + duration[i]
+            else:
+                allowed = lf[s] - lag
+            if allowed < finish:
+                finish = allowed
+        return finish
+
+    def _forward_pass(self, network):
+        es, ef, duration = network['es'], network['ef'], network['duration']
+        for i in network['order']:
+            es[i] = self._early_start(network, i)
+            ef[i] = es[i] + duration[i]
+        network['finish'] = max(ef)
+
+    def _backward_pass(self, network):
+        ls, lf, duration = network['ls'], network['lf'], network['duration']
+        for i in reversed(network['order']):
+            lf[i] = self._late_finish(network, i)
+            ls[i] = lf[i] - duration[i]
+
+    def _floats(self, network):
+        """Total and free float for every task, vectorized over the dependency arrays."""
+        es, ef = np.array(network['es']), np.array(network['ef'])
+        total_float = np.array(network['ls']) - es
+        src, dst, code, lag = network['edges']
+        free_float = np.where([bool(s) for s in network['succs']], np.iinfo(np.int64).max, network['finish'] - ef)
+        if len(src):
+            slack = np.select(
+                [code == _FS, code == _SS],
+                [es[dst] - (ef[src] + lag), es[dst] - (es[src] + lag)],
+                ef[dst] - (ef[src] + lag)
+            )
+            np.minimum.at(free_float, src, slack)
+        return total_float, free_float
+
+    def _get_network(self, project_id):
+        """Returns the project's network with current CPM results, reloading it if the tasks changed."""
+        network = self._networks.get(project_id)
+        if network is None or network['revision'] != self._get_revision(project_id):
+            network = self._load_network(project_id)
+            if network is None:
+                self._networks.pop(project_id, None)
+                return None
+            self._forward_pass(network)
+            self._backward_pass(network)
+            network['persisted'] = None
+            self._networks[project_id] = network
+        return network
+
+    # ---- Results ----
+
+    def _result_arrays(self, network):
+        """Offsets and floats of every task as a (tasks x 7) matrix: ES, EF, LS, LF, duration, total float, free float."""
+        es, ef = np.array(network['es']), np.array(network['ef'])
+        ls, lf = np.array(network['ls']), np.array(network['lf'])
+        total_float, free_float = self._floats(network)
+        return np.column_stack([es, ef, ls, lf, network['duration'], total_float, free_float])
+
+    def _results_frame(self, network, arrays, rows=None):
+        """Result rows (all, or the given row positions) with offsets converted to calendar dates."""
+        if rows is not None:
+            arrays = arrays[rows]
+        es, ef, ls, lf, duration, total_float, free_float = arrays.T
+        calendar, anchor = network['calendar'], network['anchor']
+        task_ids = np.asarray(network['task_ids'])
+        # Finish dates are the last working day occupied (the start day for zero-duration milestones)
+        return pd.DataFrame({
+            'TaskID': task_ids if rows is None else task_ids[rows],
+            'EarlyStart': self._to_dates(calendar, anchor, es),
+            'EarlyFinish': self._to_dates(calendar, anchor, np.maximum(ef - 1, es)),
+            'LateStart': self._to_dates(calendar, anchor, ls),
+            'LateFinish': self._to_dates(calendar, anchor, np.maximum(lf - 1, ls)),
+            'DurationDays': duration,
+            'TotalFloat': total_float,
+            'FreeFloat': free_float,
+            'IsCritical': total_float <= 0,
+        })
+
+    def _persist(self, network, arrays, changed_task_id=None):
+        """
+        Writes the TaskCPMResults rows whose results changed since the last write. The scheduled
+        dates in Tasks are left to the planner, except for changed_task_id (see update_task_dates),
+        whose new early dates become its scheduled dates so its duration survives a reload.
+        """
+        previous = network.get('persisted')
+        if previous is None:
+            rows = np.arange(len(arrays))
+        else:
+            rows = np.flatnonzero((arrays != previous).any(axis=1))
+        if changed_task_id is not None:
+            rows = np.union1d(rows, [network['index'][changed_task_id]])
+        network['persisted'] = arrays
+        if not len(rows):
+            return 0
+        changed = self._results_frame(network, arrays, rows)
+        project_id = network['project_id']
+        columns = {name: changed[name].tolist() for name in changed.columns}
+        task_ids = [int(task_id) for task_id in columns['TaskID']]
+        result_rows = list(zip(
+            task_ids, [project_id] * len(task_ids), columns['EarlyStart'], columns['EarlyFinish'], columns['LateStart'],
+            columns['LateFinish'], columns['DurationDays'], columns['TotalFloat'], columns['FreeFloat'],
+            [int(bool(flag)) for flag in columns['IsCritical']]
+        ))
+        task_rows = [(start, finish, task_id) for start, finish, task_id in zip(columns['EarlyStart'], columns['EarlyFinish'], task_ids)
+                     if task_id == changed_task_id]
+        conn = self.db_manager.get_connection()
+        with self.db_manager.lock:
+            try:
+                cursor = conn.cursor()
+                cursor.executemany("""
+                    INSERT INTO TaskCPMResults (TaskID, ProjectID, EarlyStart, EarlyFinish, LateStart, LateFinish,
+                                                DurationDays, TotalFloat, FreeFloat, IsCritical, LastCalculated)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                    ON CONFLICT (TaskID) DO UPDATE SET
+                        ProjectID = excluded.ProjectID, EarlyStart = excluded.EarlyStart, EarlyFinish = excluded.EarlyFinish,
+                        LateStart = excluded.LateStart, LateFinish = excluded.LateFinish, DurationDays = excluded.DurationDays,
+                        TotalFloat = excluded.TotalFloat, FreeFloat = excluded.FreeFloat, IsCritical = excluded.IsCritical,
+                        LastCalculated = excluded.LastCalculated
+                """, result_rows)
+                if task_rows:
+                    cursor.executemany("""
+                        UPDATE Tasks SET ScheduledStartDate = ?1, ScheduledEndDate = ?2, LastModifiedDate = CURRENT_TIMESTAMP
+                        WHERE TaskID = ?3 AND (ScheduledStartDate IS NOT ?1 OR ScheduledEndDate IS NOT ?2)
+                    """, task_rows)
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                network['persisted'] = previous
+                logger.error(f"Error saving CPM results for project {project_id}: {e}", exc_info=True)
+                raise
+        # Our own date writes bump the revision; the cached network already reflects them
+        network['revision'] = self._get_revision(project_id)
+        return len(rows)
+
+    def calculate_schedule(self, project_id, persist=True):
+        """
+        Runs the forward and backward passes for a project.
+        Returns:
+            tuple: (DataFrame with TaskID, EarlyStart, EarlyFinish, LateStart, LateFinish,
+                   DurationDays, TotalFloat, FreeFloat and IsCritical; message).
+        Raises:
+            AppValidationError: If the task dependencies contain a cycle.
+        """
+        network = self._get_network(project_id)
+        if network is None:
+            return pd.DataFrame(), f"Project {project_id} has no tasks to schedule."
+        arrays = self._result_arrays(network)
+        results = self._results_frame(network, arrays)
+        written = self._persist(network, arrays) if persist else 0
+        critical_count = int(results['IsCritical'].sum())
+        finish = results['EarlyFinish'].max()
+        return results, f"Scheduled {len(results)} tasks; project finish {finish}, {critical_count} critical tasks, {written} rows updated."
+
+    def get_critical_path(self, project_id):
+        """TaskIDs of the critical tasks, in dependency order."""
+        network = self._get_network(project_id)
+        if network is None:
+            return []
+        total_float, _ = self._floats(network)
+        return [network['task_ids'][i] for i in network['order'] if total_float[i] <= 0]
+
+    def get_network_model(self, project_id):
+        """
+        A copy of the project's network for simulations that re-run the forward pass with
+        other durations: TaskIDs, topological order, durations, start floors and fixed flags
+        (arrays by task position), dependency edges as (source, target, type code, lag) arrays
+        with codes FS=0, SS=1, FF=2, the deterministic finish, and the calendar and anchor date
+        that offsets count from. Returns None if the project has no tasks.
+        """
+        network = self._get_network(project_id)
+        if network is None:
+            return None
+        src, dst, code, lag = network['edges']
+        return {
+            'task_ids': list(network['task_ids']), 'order': np.array(network['order'], dtype=np.int64),
+            'duration': np.array(network['duration'], dtype=np.int64), 'floor': np.array(network['floor'], dtype=np.int64),
+            'fixed': np.array(network['fixed'], dtype=bool), 'edges': (src.copy(), dst.copy(), code.copy(), lag.copy()),
+            'finish': network['finish'], 'calendar': network['calendar'], 'anchor': network['anchor'],
+        }
+
+    def update_task_dates(self, task_id, start_date=None, duration_days=None, end_date=None):
+        """
+        Moves or resizes one task and re-propagates the schedule incrementally.
+        Args:
+            task_id (int): Task to change.
+            start_date (str, optional): New start-no-earlier-than date (YYYY-MM-DD).
+            duration_days (int, optional): New duration in working days.
+            end_date (str, optional): New finish date; sets the duration from the (new) start. A
+                                      milestone finishing on its start day stays at zero days.
+        Returns:
+            tuple: (number of tasks whose dates changed, message).
+        Raises:
+            AppValidationError: For unknown tasks, invalid values or moving a started task.
+        """
+        task = self.db_manager.execute_query("SELECT ProjectID FROM Tasks WHERE TaskID = ?", (task_id,), fetch_one=True)
+        if not task:
+            raise AppValidationError(f"Task {task_id} not found.")
+        project_id = task['ProjectID']
+        network = self._get_network(project_id)
+        if network.get('persisted') is None:
+            self._persist(network, self._result_arrays(network))
+        i = network['index'][task_id]
+        calendar, anchor = network['calendar'], network['anchor']
+
+        if start_date is not None:
+            if network['fixed'][i]:
+                raise AppValidationError(f"Task {task_id} has already started; its start date is its actual start.")
+            network['floor'][i] = int(self._to_index(calendar, anchor, [start_date])[0])
+            self.db_manager.execute_query(
+                "UPDATE Tasks SET StartNoEarlierThan = ?, LastModifiedDate = CURRENT_TIMESTAMP WHERE TaskID = ?",
+                (str(to_day_array(start_date)[0]), task_id), commit=True
+            )
+        duration_changed = False
+        if end_date is not None:
+            start_index = self._early_start(network, i)
+            end_index = int(self._to_index(calendar, anchor, [end_date], roll='backward')[0])
+            if end_index < start_index:
+                raise AppValidationError("End date cannot be before the task's start.")
+            milestone = end_index == start_index and network['duration'][i] == 0
+            duration_days = 0 if milestone else end_index - start_index + 1
+        if duration_days is not None:
+            if int(duration_days) < 0:
+                raise AppValidationError("Duration must be non-negative.")
+            duration_changed = network['duration'][i] != int(duration_days)
+            network['duration'][i] = int(duration_days)
+
+        old_finish = network['finish']
+        self._propagate_forward(network, i)
+        if network['finish'] != old_finish:
+            self._backward_pass(network) # Late dates hang off the project finish, which moved
+        elif duration_changed:
+            self._propagate_backward(network, i)
+        written = self._persist(network, self._result_arrays(network), changed_task_id=task_id)
+        return written, f"Task {task_id} updated; {written} tasks rescheduled."
+
+    def _propagate_forward(self, network, start):
+        """Recomputes early dates of `start` and of successors whose early dates actually move, in topological order."""
+        es, ef, duration, position = network['es'], network['ef'], network['duration'], network['position']
+        heap, queued = [(position[start], start)], {start}
+        while heap:
+            _, i = heapq.heappop(heap)
+            new_es = self._early_start(network, i)
+            new_ef = new_es + duration[i]
+            if i != start and new_es == es[i] and new_ef == ef[i]:
+                continue
+            es[i], ef[i] = new_es, new_ef
+            for s, _, _ in network['succs'][i]:
+                if s not in queued:
+                    queued.add(s)
+                    heapq.heappush(heap, (position[s], s))
+        network['finish'] = max(ef)
+
+    def _propagate_backward(self, network, start):
+        """Recomputes late dates of `start` and of predecessors whose late dates actually move, in reverse topological order."""
+        ls, lf, duration, position = network['ls'], network['lf'], network['duration'], network['position']
+        heap, queued = [(-position[start], start)], {start}
+        while heap:
+            _, i = heapq.heappop(heap)
+            new_lf = self._late_finish(network, i)
+            new_ls = new_lf - duration[i]
+            if i != start and new_lf == lf[i] and new_ls == ls[i]:
+                continue
+            lf[i], ls[i] = new_lf, new_ls
+            for p, _, _ in network['preds'][i]:
+                if p not in queued:
+                    queued.add(p)
+                    heapq.heappush(heap, (-position[p], p))
+
+    # ---- Dependencies ----
+
+    def add_dependency(self, predecessor_task_id, successor_task_id, dependency_type='FS', lag_days=0):
+        """
+        Links two tasks of the same project.
+        Returns:
+            tuple: (DependencyID, message), or (False, message) if the link could not be saved.
+        Raises:
+            AppValidationError: For unknown or cross-project tasks, bad types, or a link that would create a cycle.
+        """
+        if dependency_type not in DEPENDENCY_TYPES:
+            raise AppValidationError(f"Dependency type must be one of: {', '.join(DEPENDENCY_TYPES)}.")
+        if predecessor_task_id == successor_task_id:
+            raise AppValidationError("A task cannot depend on itself.")
+        rows = self.db_manager.execute_query(
+            "SELECT TaskID, ProjectID FROM Tasks WHERE TaskID IN (?, ?)", (predecessor_task_id, successor_task_id), fetch_all=True
+        ) or []
+        projects = {row['TaskID']: row['ProjectID'] for row in rows}
+        if len(projects) < 2:
+            raise AppValidationError("Both tasks must exist.")
+        if projects[predecessor_task_id] != projects[successor_task_id]:
+            raise AppValidationError("Dependencies can only link tasks of the same project.")
+
+        network = self._get_network(projects[successor_task_id])
+        index = network['index']
+        # A path successor -> ... -> predecessor would close a loop
+        target, seen, stack = index[predecessor_task_id], set(), [index[successor_task_id]]
+        while stack:
+            i = stack.pop()
+            if i == target:
+                raise AppValidationError(
+                    f"Linking task {predecessor_task_id} before task {successor_task_id} would create a dependency cycle."
+                )
+            for s, _, _ in network['succs'][i]:
+                if s not in seen:
+                    seen.add(s)
+                    stack.append(s)
+
+        # RETURNING gives the row's ID on the update path too, where lastrowid would be stale
+        conn = self.db_manager.get_connection()
+        with self.db_manager.lock:
+            try:
+                dependency_id = conn.execute("""
+                    INSERT INTO TaskDependencies (PredecessorTaskID, SuccessorTaskID, DependencyType, LagDays) VALUES (?, ?, ?, ?)
+                    ON CONFLICT (PredecessorTaskID, SuccessorTaskID) DO UPDATE SET DependencyType = excluded.DependencyType, LagDays = excluded.LagDays
+                    RETURNING DependencyID
+                """, (predecessor_task_id, successor_task_id, dependency_type, int(lag_days))).fetchone()[0]
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                logger.error(f"Error linking task {predecessor_task_id} before task {successor_task_id}: {e}", exc_info=True)
+                return False, f"Failed to save the dependency of task {successor_task_id} on task {predecessor_task_id} (database error)."
+        return dependency_id, f"Task {successor_task_id} now depends on task {predecessor_task_id} ({dependency_type}{int(lag_days):+d})."
+
+    def remove_dependency(self, predecessor_task_id, successor_task_id):
+        cursor = self.db_manager.execute_query(
+            "DELETE FROM TaskDependencies WHERE PredecessorTaskID = ? AND SuccessorTaskID = ?",
+            (predecessor_task_id, successor_task_id), commit=True
+        )
+        removed = cursor.rowcount if cursor else 0
+        return removed > 0, "Dependency removed." if removed else "Dependency not found."
+
+    def get_task_dependencies(self, project_id):
+        rows = self.db_manager.execute_query("""
+            SELECT d.DependencyID, d.PredecessorTaskID, d.SuccessorTaskID, d.DependencyType, d.LagDays
+            FROM TaskDependencies d JOIN Tasks s ON s.TaskID = d.SuccessorTaskID
+            WHERE s.ProjectID = ? ORDER BY d.SuccessorTaskID, d.PredecessorTaskID
+        """, (project_id,), fetch_all=True)
+        return [dict(row) for row in rows] if rows else []
+
+
+if __name__ == "__main__":
+    from database_manager import db_manager
+    scheduler = CPMScheduler(db_manager)
+    projects = db_manager.execute_query("SELECT DISTINCT ProjectID FROM Tasks", fetch_all=True) or []
+    for project in projects:
+        results, message = scheduler.calculate_schedule(project['ProjectID'], persist=False)
+        print(f"Project {project['ProjectID']}: {message}")
@@ -7,6 +7,7 @@ from datetime import datetime # Added for daily log date fallback
 # import sqlite3 # No longer needed as db_manager handles sqlite3.Error
 from database_manager import db_manager # Import the singleton database manager
 from configuration import Config
+from alerts import AlertEngine
 
 import sqlite3 # Import for exception handling
 
@@ -19,11 +20,12 @@ class DataProcessing:
     for subsequent project planning and management.
     Also handles parsing of unstructured data like daily logs.
     """
-    def __init__(self, db_m_instance=None): # Accept optional db_manager
+    def __init__(self, db_m_instance=None, alert_engine_instance=None): # Accept optional db_manager
         """
         Initializes the DataProcessing module.
         """
         self.db_manager = db_m_instance if db_m_instance else db_manager # Use passed or global
+        self.alert_engine = alert_engine_instance if alert_engine_instance else AlertEngine(self.db_manager)
         logger.info("Data Processing module initialized.")
 
     def _call_llm_for_parsing(self, text_input: str, schema_hint: str = None):
@@ -293,35 +295,36 @@ class DataProcessing:
         """
 
         conn = self.db_manager.get_connection()
-        try:
-            cursor = conn.cursor()
-            cursor.executemany(insert_query, data_to_insert)
-
-            # Update status of raw_estimates
-            if raw_estimate_ids_to_update:
-                # Ensure IDs are integers for the SQL query
-                valid_ids = [int(id_val) for id_val in raw_estimate_ids_to_update if pd.notna(id_val)]
-                if valid_ids:
-                    placeholders = ', '.join(['?'] * len(valid_ids))
-                    update_raw_status_query = f"UPDATE raw_estimates SET Status = 'Processed' WHERE RawEstimateID IN ({placeholders})"
-                    cursor.execute(update_raw_status_query, valid_ids)
-                    logger.info(f"Updated status to 'Processed' for {len(valid_ids)} raw estimate records.")
-                else:
-                    logger.warning("No valid RawEstimateIDs provided to update status, though save was attempted.")
-
-            conn.commit()
-            logger.info(f"Successfully saved {len(data_to_insert)} processed estimate records and updated raw statuses.")
-            return True, f"Successfully processed and saved {len(data_to_insert)} estimate items."
-
-        except sqlite3.Error as e_sql:
-            if conn: conn.rollback()
-            logger.error(f"SQLite error during saving processed data or updating raw_estimates: {e_sql}")
-            logger.error(f"Failed query might be related to: {insert_query[:100]} or update_raw_status_query")
-            return False, f"Database error saving processed data: {e_sql}"
-        except Exception as e: # Catch any other unexpected error during this process
-            if conn: conn.rollback()
-            logger.exception(f"An unexpected error occurred in _save_processed_data: {e}")
-            return False, f"An unexpected error occurred: {e}"
+        with self.db_manager.lock:
+            try:
+                cursor = conn.cursor()
+                cursor.executemany(insert_query, data_to_insert)
+
+                # Update status of raw_estimates
+                if raw_estimate_ids_to_update:
+                    # Ensure IDs are integers for the SQL query
+                    valid_ids = [int(id_val) for id_val in raw_estimate_ids_to_update if pd.notna(id_val)]
+                    if valid_ids:
+                        placeholders = ', '.join(['?'] * len(valid_ids))
+                        update_raw_status_query = f"UPDATE raw_estimates SET Status = 'Processed' WHERE RawEstimateID IN ({placeholders})"
+                        cursor.execute(update_raw_status_query, valid_ids)
+                        logger.info(f"Updated status to 'Processed' for {len(valid_ids)} raw estimate records.")
+                    else:
+                        logger.warning("No valid RawEstimateIDs provided to update status, though save was attempted.")
+
+                conn.commit()
+                logger.info(f"Successfully saved {len(data_to_insert)} processed estimate records and updated raw statuses.")
+                return True, f"Successfully processed and saved {len(data_to_insert)} estimate items."
+
+            except sqlite3.Error as e_sql:
+                if conn: conn.rollback()
+                logger.error(f"SQLite error during saving processed data or updating raw_estimates: {e_sql}")
+                logger.error(f"Failed query might be related to: {insert_query[:100]} or update_raw_status_query")
+                return False, f"Database error saving processed data: {e_sql}"
+            except Exception as e: # Catch any other unexpected error during this process
+                if conn: conn.rollback()
+                logger.exception(f"An unexpected error occurred in _save_processed_data: {e}")
+                return False, f"An unexpected error occurred: {e}"
 
 
     def process_turnover_file(self, file_path, project_id=None):
@@ -495,83 +498,87 @@ class DataProcessing:
 
         logger.info(f"Initial Parsed Daily Log Data: {parsed_data}")
 
+        # LLM Parsing for free-form text sections, done before the transaction so a slow
+        # parser never holds the shared connection's lock
+        free_form_texts_for_llm = {
+            "SafetyObservations": parsed_data["safety_observations"],
+            "IssuesBlockers": parsed_data["issues_blockers"],
+            "ToolNotes": parsed_data["tool_notes"],
+            "MaterialsUsed": parsed_data["materials_used"], # Could also be parsed by LLM if complex
+            "MaterialsNeeded": parsed_data["materials_needed"] # Could also be parsed by LLM
+        }
+        llm_results = []
+        for section_name, text_content in free_form_texts_for_llm.items():
+            if text_content and text_content.lower() not in ["n/a", "none", ""]:
+                logger.info(f"Calling LLM for daily log section: {section_name}")
+                parsed_json, confidence = self._call_llm_for_parsing(text_content, schema_hint=f"DailyLog_{section_name}")
+                llm_results.append((section_name, text_content, parsed_json, confidence))
+
         conn = self.db_manager.get_connection()
         daily_log_id = None # Initialize daily_log_id
         llm_processed_info = "" # To store info about LLM processing
 
-        try:
-            cursor = conn.cursor()
-
-            # 1. Insert into DailyLogs table
-            insert_daily_log_query = """
-            INSERT INTO DailyLogs (EmployeeID, ProjectID, LogDate, JobSite, HoursWorked, Notes)
-            VALUES (?, ?, ?, ?, ?, ?)
-            """
-            # Combine some free-form text fields for the main DailyLogs.Notes if needed, or handle separately
-            # For now, let's assume general notes might be added later or are not directly from these specific fields.
-            main_notes = f"Safety: {parsed_data['safety_observations']}\nIssues: {parsed_data['issues_blockers']}\nTools: {parsed_data['tool_notes']}"
-
-            daily_log_params = (
-                parsed_data["employee_id"],
-                parsed_data["project_id"],
-                parsed_data["log_date"],
-                parsed_data["job_site"],
-                parsed_data["hours_worked"],
-                main_notes # Storing combined notes from specific sections
-            )
-            cursor.execute(insert_daily_log_query, daily_log_params)
-            daily_log_id = cursor.lastrowid
-            logger.info(f"DailyLog record created with ID: {daily_log_id}")
-
-            # 2. Insert tasks into DailyLogTasks
-            insert_task_query = """
-            INSERT INTO DailyLogTasks (DailyLogID, TaskDescription, IsCompleted)
-            VALUES (?, ?, ?)
-            """
-            for task_desc in parsed_data["tasks_completed"]:
-                cursor.execute(insert_task_query, (daily_log_id, task_desc, 1))
-            for task_desc in parsed_data["tasks_ongoing"]:
-                cursor.execute(insert_task_query, (daily_log_id, task_desc, 0))
-
-            # 3. Insert materials into DailyLogMaterials
-            insert_material_query = """
-            INSERT INTO DailyLogMaterials (DailyLogID, MaterialDescription, Type)
-            VALUES (?, ?, ?)
-            """
-            if parsed_data["materials_used"] and parsed_data["materials_used"].lower() not in ["n/a", "none", ""]:
-                cursor.execute(insert_material_query, (daily_log_id, parsed_data["materials_used"], "Used"))
-            if parsed_data["materials_needed"] and parsed_data["materials_needed"].lower() not in ["n/a", "none", ""]:
-                cursor.execute(insert_material_query, (daily_log_id, parsed_data["materials_needed"], "Needed"))
-
-            # 4. Insert observations into DailyLogObservations (Original Regex Parsed)
-            # This is now more for specific, structured observations if the regex was very precise.
-            # The LLM will handle the more free-form text from these sections.
-            insert_observation_query = """
-            INSERT INTO DailyLogObservations (DailyLogID, ObservationType, Description)
-            VALUES (?, ?, ?)
-            """
-            # Example: If safety_observations was a very structured list, insert here.
-            # For now, these are passed to LLM.
-
-            # LLM Parsing for free-form text sections
-            free_form_texts_for_llm = {
-                "SafetyObservations": parsed_data["safety_observations"],
-                "IssuesBlockers": parsed_data["issues_blockers"],
-                "ToolNotes": parsed_data["tool_notes"],
-                "MaterialsUsed": parsed_data["materials_used"], # Could also be parsed by LLM if complex
-                "MaterialsNeeded": parsed_data["materials_needed"] # Could also be parsed by LLM
-            }
-
-            llm_log_insert_query = """
-            INSERT INTO LLM_Parsed_Data_Log (SourceModule, SourceRecordID, OriginalInput, ParsedJSON, ConfidenceScore, ParsingTimestamp)
-            VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
-            """
-
-            for section_name, text_content in free_form_texts_for_llm.items():
-                if text_content and text_content.lower() not in ["n/a", "none", ""]:
-                    logger.info(f"Calling LLM for section: {section_name} of DailyLogID: {daily_log_id}")
-                    parsed_json, confidence = self._call_llm_for_parsing(text_content, schema_hint=f"DailyLog_{section_name}")
-
+        with self.db_manager.lock:
+            try:
+                cursor = conn.cursor()
+
+                # 1. Insert into DailyLogs table
+                insert_daily_log_query = """
+                INSERT INTO DailyLogs (EmployeeID, ProjectID, LogDate, JobSite, HoursWorked, Notes)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """
+                # Combine some free-form text fields for the main DailyLogs.Notes if needed, or handle separately
+                # For now, let's assume general notes might be added later or are not directly from these specific fields.
+                main_notes = f"Safety: {parsed_data['safety_observations']}\nIssues: {parsed_data['issues_blockers']}\nTools: {parsed_data['tool_notes']}"
+
+                daily_log_params = (
+                    parsed_data["employee_id"],
+                    parsed_data["project_id"],
+                    parsed_data["log_date"],
+                    parsed_data["job_site"],
+                    parsed_data["hours_worked"],
+                    main_notes # Storing combined notes from specific sections
+                )
+                cursor.execute(insert_daily_log_query, daily_log_params)
+                daily_log_id = cursor.lastrowid
+                logger.info(f"DailyLog record created with ID: {daily_log_id}")
+
+                # 2. Insert tasks into DailyLogTasks
+                insert_task_query = """
+                INSERT INTO DailyLogTasks (DailyLogID, TaskDescription, IsCompleted)
+                VALUES (?, ?, ?)
+                """
+                for task_desc in parsed_data["tasks_completed"]:
+                    cursor.execute(insert_task_query, (daily_log_id, task_desc, 1))
+                for task_desc in parsed_data["tasks_ongoing"]:
+                    cursor.execute(insert_task_query, (daily_log_id, task_desc, 0))
+
+                # 3. Insert materials into DailyLogMaterials
+                insert_material_query = """
+                INSERT INTO DailyLogMaterials (DailyLogID, MaterialDescription, Type)
+                VALUES (?, ?, ?)
+                """
+                if parsed_data["materials_used"] and parsed_data["materials_used"].lower() not in ["n/a", "none", ""]:
+                    cursor.execute(insert_material_query, (daily_log_id, parsed_data["materials_used"], "Used"))
+                if parsed_data["materials_needed"] and parsed_data["materials_needed"].lower() not in ["n/a", "none", ""]:
+                    cursor.execute(insert_material_query, (daily_log_id, parsed_data["materials_needed"], "Needed"))
+
+                # 4. Insert observations into DailyLogObservations (Original Regex Parsed)
+                # This is now more for specific, structured observations if the regex was very precise.
+                # The LLM will handle the more free-form text from these sections.
+                insert_observation_query = """
+                INSERT INTO DailyLogObservations (DailyLogID, ObservationType, Description)
+                VALUES (?, ?, ?)
+                """
+                # Example: If safety_observations was a very structured list, insert here.
+                # For now, these are passed to LLM.
+
+                llm_log_insert_query = """
+                INSERT INTO LLM_Parsed_Data_Log (SourceModule, SourceRecordID, OriginalInput, ParsedJSON, ConfidenceScore, ParsingTimestamp)
+                VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                """
+
+                for section_name, text_content, parsed_json, confidence in llm_results:
                     llm_log_params = (
                         f"DailyLog_{section_name}", # SourceModule
                         daily_log_id,             # SourceRecordID (link to the DailyLogs table entry)
@@ -582,18 +589,23 @@ class DataProcessing:
                     cursor.execute(llm_log_insert_query, llm_log_params)
                     logger.info(f"LLM parsing result for {section_name} (DailyLogID: {daily_log_id}) logged to LLM_Parsed_Data_Log.")
 
-            llm_processed_info = " LLM processing attempted for relevant sections."
+                llm_processed_info = " LLM processing attempted for relevant sections."
 
-            conn.commit()
-            success_message = f"Daily log entry (ID: {daily_log_id}) saved successfully.{llm_processed_info}"
-            logger.info(success_message)
-            return True, success_message, daily_log_id
+                conn.commit()
+                success_message = f"Daily log entry (ID: {daily_log_id}) saved successfully.{llm_processed_info}"
+                logger.info(success_message)
 
-        except sqlite3.Error as e_sql:
-            if conn: conn.rollback()
-            logger.error(f"SQLite error during daily log storage (DailyLogID attempted: {daily_log_id}): {e_sql}")
-            return False, f"Database error saving daily log: {e_sql}", None
-        except Exception as e:
-            if conn: conn.rollback()
-            logger.exception(f"An unexpected error occurred during daily log storage (DailyLogID attempted: {daily_log_id}): {e}")
-            return False, f"An unexpected error occurred: {e}", None
+            except sqlite3.Error as e_sql:
+                if conn: conn.rollback()
+                logger.error(f"SQLite error during daily log storage (DailyLogID attempted: {daily_log_id}): {e_sql}")
+                return False, f"Database error saving daily log: {e_sql}", None
+            except Exception as e:
+                if conn: conn.rollback()
+                logger.exception(f"An unexpected error occurred during daily log storage (DailyLogID attempted: {daily_log_id}): {e}")
+                return False, f"An unexpected error occurred: {e}", None
+
+        try:
+            self.alert_engine.evaluate_daily_log(parsed_data["project_id"], employee_id)
+        except Exception as e_alert:
+            logger.error(f"Alert evaluation failed after daily log {daily_log_id}: {e_alert}", exc_info=True)
+        return True, success_message, daily_log_id
@@ -7,6 +7,29 @@
 -- ========================================================================== --
 
 -- == Drop Objects In Reverse Order of Creation (Safety First!) ==
+DROP TABLE IF EXISTS cost_anomaly_scan_status; -- Added
+DROP TABLE IF EXISTS cost_anomalies; -- Added
+DROP TABLE IF EXISTS alerts; -- Added
+DROP TABLE IF EXISTS evm_snapshot_status; -- Added
+DROP TABLE IF EXISTS evm_snapshots; -- Added
+DROP TABLE IF EXISTS cost_rollup_revisions; -- Added
+DROP TABLE IF EXISTS wbs_actual_rollups; -- Added
+DROP TABLE IF EXISTS cost_daily_rollups; -- Added
+DROP TABLE IF EXISTS WBSCostEstimates; -- Added
+DROP TABLE IF EXISTS TaskDurationEstimates; -- Added
+DROP TABLE IF EXISTS TaskScheduleRevision; -- Added
+DROP TABLE IF EXISTS TaskCPMResults; -- Added
+DROP TABLE IF EXISTS TaskDependencies; -- Added
+DROP TABLE IF EXISTS CalendarHolidays; -- Added
+DROP TABLE IF EXISTS WorkCalendars; -- Added
+DROP TABLE IF EXISTS field_search_fts; -- Added
+DROP TABLE IF EXISTS field_search_entries; -- Added
+DROP TABLE IF EXISTS ProductionSchedule; -- Added
+DROP TABLE IF EXISTS ShopEmployeeAvailability; -- Added
+DROP TABLE IF EXISTS AssemblyBOMRevision; -- Added
+DROP TABLE IF EXISTS materials_fts; -- Added
+DROP TABLE IF EXISTS wbs_rollups; -- Added
+DROP TABLE IF EXISTS wbs_estimate_links; -- Added
 DROP TABLE IF EXISTS document_notes; -- Added
 DROP TABLE IF EXISTS LaborLevels;
 DROP TABLE IF EXISTS TaskTags;
@@ -239,6 +262,30 @@ CREATE INDEX IX_Materials_ManufacturerPartNumber ON Materials (ManufacturerPartN
 CREATE INDEX IX_Materials_Category ON Materials (Category);
 CREATE INDEX IX_Materials_SubCategory ON Materials (SubCategory);
 
+-- BEGIN materials_search
+-- Full-text index over Materials for ranked type-ahead search (external content; kept in sync by triggers).
+-- Needs FTS5, so it is applied separately by _ensure_materials_search_schema; search falls back to LIKE without it.
+CREATE VIRTUAL TABLE IF NOT EXISTS materials_fts USING fts5(
+    StockNumber, MaterialName, ExtendedDescription, Manufacturer, ManufacturerPartNumber, PartNumber,
+    content='Materials', content_rowid='MaterialSystemID', prefix='2 3'
+);
+CREATE TRIGGER IF NOT EXISTS TR_Materials_FTS_Insert AFTER INSERT ON Materials BEGIN
+    INSERT INTO materials_fts (rowid, StockNumber, MaterialName, ExtendedDescription, Manufacturer, ManufacturerPartNumber, PartNumber)
+    VALUES (new.MaterialSystemID, new.StockNumber, new.MaterialName, new.ExtendedDescription, new.Manufacturer, new.ManufacturerPartNumber, new.PartNumber);
+END;
+CREATE TRIGGER IF NOT EXISTS TR_Materials_FTS_Delete AFTER DELETE ON Materials BEGIN
+    INSERT INTO materials_fts (materials_fts, rowid, StockNumber, MaterialName, ExtendedDescription, Manufacturer, ManufacturerPartNumber, PartNumber)
+    VALUES ('delete', old.MaterialSystemID, old.StockNumber, old.MaterialName, old.ExtendedDescription, old.Manufacturer, old.ManufacturerPartNumber, old.PartNumber);
+END;
+CREATE TRIGGER IF NOT EXISTS TR_Materials_FTS_Update AFTER UPDATE ON Materials BEGIN
+    INSERT INTO materials_fts (materials_fts, rowid, StockNumber, MaterialName, ExtendedDescription, Manufacturer, ManufacturerPartNumber, PartNumber)
+    VALUES ('delete', old.MaterialSystemID, old.StockNumber, old.MaterialName, old.ExtendedDescription, old.Manufacturer, old.ManufacturerPartNumber, old.PartNumber);
+    INSERT INTO materials_fts (rowid, StockNumber, MaterialName, ExtendedDescription, Manufacturer, ManufacturerPartNumber, PartNumber)
+    VALUES (new.MaterialSystemID, new.StockNumber, new.MaterialName, new.ExtendedDescription, new.Manufacturer, new.ManufacturerPartNumber, new.PartNumber);
+END;
+INSERT INTO materials_fts (materials_fts) VALUES ('rebuild'); -- Index rows that predate the triggers
+-- END materials_search
+
 CREATE TABLE Assemblies (
     AssemblyID INTEGER PRIMARY KEY AUTOINCREMENT,
     AssemblyItemNumber TEXT UNIQUE NOT NULL,
@@ -256,16 +303,49 @@ CREATE INDEX IX_Assemblies_AssemblyName ON Assemblies (AssemblyName);
 CREATE TABLE AssemblyComponents (
     AssemblyComponentID INTEGER PRIMARY KEY AUTOINCREMENT,
     AssemblyID INTEGER NOT NULL,
-    MaterialStockNumber TEXT NOT NULL,
+    MaterialStockNumber TEXT NULL, -- Set for a material component
+    ChildAssemblyID INTEGER NULL, -- Set for a nested sub-assembly component
     QuantityInAssembly REAL NOT NULL,
     UnitOfMeasure TEXT NULL,
     DateCreated TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
     LastModifiedDate TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (AssemblyID) REFERENCES Assemblies(AssemblyID) ON DELETE CASCADE,
-    FOREIGN KEY (MaterialStockNumber) REFERENCES Materials(StockNumber) ON DELETE RESTRICT
+    FOREIGN KEY (MaterialStockNumber) REFERENCES Materials(StockNumber) ON DELETE RESTRICT,
+    FOREIGN KEY (ChildAssemblyID) REFERENCES Assemblies(AssemblyID) ON DELETE RESTRICT,
+    CHECK ((MaterialStockNumber IS NULL) <> (ChildAssemblyID IS NULL))
 );
 CREATE INDEX IX_AssemblyComponents_AssemblyID ON AssemblyComponents (AssemblyID);
 CREATE INDEX IX_AssemblyComponents_MaterialStockNumber ON AssemblyComponents (MaterialStockNumber);
+CREATE INDEX IX_AssemblyComponents_ChildAssemblyID ON AssemblyComponents (ChildAssemblyID);
+
+-- Single-row change counter for bill-of-materials data. Bumped by triggers on any
+-- AssemblyComponents change and on assemblies being added, removed or renumbered;
+-- cached BOM explosions are keyed on it.
+CREATE TABLE IF NOT EXISTS AssemblyBOMRevision (
+    RevisionID INTEGER PRIMARY KEY CHECK (RevisionID = 1),
+    Revision INTEGER NOT NULL DEFAULT 0,
+    LastModifiedDate TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+INSERT OR IGNORE INTO AssemblyBOMRevision (RevisionID, Revision) VALUES (1, 0);
+
+CREATE TRIGGER IF NOT EXISTS TR_AssemblyComponents_BOM_Insert AFTER INSERT ON AssemblyComponents BEGIN
+    UPDATE AssemblyBOMRevision SET Revision = Revision + 1, LastModifiedDate = CURRENT_TIMESTAMP WHERE RevisionID = 1;
+END;
+CREATE TRIGGER IF NOT EXISTS TR_AssemblyComponents_BOM_Update AFTER UPDATE ON AssemblyComponents BEGIN
+    UPDATE AssemblyBOMRevision SET Revision = Revision + 1, LastModifiedDate = CURRENT_TIMESTAMP WHERE RevisionID = 1;
+END;
+CREATE TRIGGER IF NOT EXISTS TR_AssemblyComponents_BOM_Delete AFTER DELETE ON AssemblyComponents BEGIN
+    UPDATE AssemblyBOMRevision SET Revision = Revision + 1, LastModifiedDate = CURRENT_TIMESTAMP WHERE RevisionID = 1;
+END;
+CREATE TRIGGER IF NOT EXISTS TR_Assemblies_BOM_ItemNumber AFTER UPDATE OF AssemblyItemNumber ON Assemblies BEGIN
+    UPDATE AssemblyBOMRevision SET Revision = Revision + 1, LastModifiedDate = CURRENT_TIMESTAMP WHERE RevisionID = 1;
+END;
+CREATE TRIGGER IF NOT EXISTS TR_Assemblies_BOM_Insert AFTER INSERT ON Assemblies BEGIN
+    UPDATE AssemblyBOMRevision SET Revision = Revision + 1, LastModifiedDate = CURRENT_TIMESTAMP WHERE RevisionID = 1;
+END;
+CREATE TRIGGER IF NOT EXISTS TR_Assemblies_BOM_Delete AFTER DELETE ON Assemblies BEGIN
+    UPDATE AssemblyBOMRevision SET Revision = Revision + 1, LastModifiedDate = CURRENT_TIMESTAMP WHERE RevisionID = 1;
+END;
 
 CREATE TABLE ToolTypes (
     ToolTypeID INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -557,6 +637,7 @@ CREATE TABLE Tasks (
     Phase TEXT NULL, ScheduledStartDate TEXT NULL, ScheduledEndDate TEXT NULL, ActualStartDate TEXT NULL, ActualEndDate TEXT NULL,
     EstimatedHours REAL NULL, ActualHours REAL NULL, PercentComplete REAL NULL DEFAULT 0.0, TaskStatusID INT NULL,
     Priority INT NULL, LeadEmployeeID INT NULL, CreatedByEmployeeID INT NULL, PredecessorTaskID INT NULL, Notes TEXT NULL,
+    StartNoEarlierThan TEXT NULL, -- CPM start constraint (see cpm_scheduling.py)
     DateCreated TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP, LastModifiedDate TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
     CONSTRAINT FK_Tasks_Projects FOREIGN KEY (ProjectID) REFERENCES Projects(ProjectID) ON DELETE CASCADE,
     CONSTRAINT FK_Tasks_WBSElements FOREIGN KEY (WBSElementID) REFERENCES wbs_elements(WBSElementID) ON DELETE SET NULL,
@@ -605,11 +686,13 @@ CREATE TABLE ProjectDocuments (
     ProjectDocumentID INTEGER PRIMARY KEY AUTOINCREMENT, ProjectID INT NOT NULL, DocumentName TEXT(255) NOT NULL,
     DocumentType TEXT(100) NULL, FilePath TEXT(1000) NOT NULL, UploadedByEmployeeID INT NULL,
     UploadDate TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP, Description TEXT NULL,
+    ContentHash TEXT(64) NULL, FileSizeBytes INTEGER NULL, PageCount INTEGER NULL, OriginalFilePath TEXT(1000) NULL,
     DateCreated TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP, LastModifiedDate TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
     CONSTRAINT FK_ProjectDocuments_Projects FOREIGN KEY (ProjectID) REFERENCES Projects(ProjectID) ON DELETE CASCADE,
     CONSTRAINT FK_ProjectDocuments_UploadedBy FOREIGN KEY (UploadedByEmployeeID) REFERENCES Employees(EmployeeID)
 );
 CREATE INDEX IX_ProjectDocuments_ProjectID ON ProjectDocuments (ProjectID);
+CREATE INDEX IX_ProjectDocuments_ContentHash ON ProjectDocuments (ContentHash);
 
 CREATE TABLE ChangeOrders (
     ChangeOrderID INTEGER PRIMARY KEY AUTOINCREMENT, ProjectID INT NOT NULL, ChangeOrderNumber TEXT(100) NOT NULL,
@@ -692,6 +775,11 @@ CREATE TABLE IF NOT EXISTS wbs_elements (
     WBSElementID INTEGER PRIMARY KEY AUTOINCREMENT, ProjectID INT NOT NULL, ProcessedEstimateID INT NULL,
     ParentWBSElementID INT NULL, WBSCode TEXT NOT NULL, Description TEXT NOT NULL, StartDate TEXT NULL,
     EndDate TEXT NULL, EstimatedCost REAL NULL, ActualCost REAL NULL DEFAULT 0.0, Status TEXT NULL,
+    WBSLevel INT NOT NULL DEFAULT 1, -- 1 = top level; derived from cost-code segments (01-010-010 is level 3)
+    WBSPath TEXT NULL, -- Materialized path of WBSElementIDs from the root, e.g. '/12/15/31/'
+    IsSummary BOOLEAN NOT NULL DEFAULT 0, -- 1 for parent nodes synthesized from cost-code segments
+    SpreadCurve TEXT NULL, -- Planned-value spread between StartDate and EndDate: 'linear' (default), 'front' or 'back'
+    IsEstimateDerived BOOLEAN NOT NULL DEFAULT 0, -- 1 once written by WBS generation; kept if the estimate link is later nulled
     CONSTRAINT FK_WBSElements_Projects FOREIGN KEY (ProjectID) REFERENCES Projects(ProjectID) ON DELETE CASCADE,
     CONSTRAINT FK_WBSElements_Parent FOREIGN KEY (ParentWBSElementID) REFERENCES wbs_elements(WBSElementID) ON DELETE CASCADE,
     CONSTRAINT FK_WBSElements_ProcessedEstimates FOREIGN KEY (ProcessedEstimateID) REFERENCES processed_estimates(ProcessedEstimateID) ON DELETE SET NULL,
@@ -699,6 +787,16 @@ CREATE TABLE IF NOT EXISTS wbs_elements (
 );
 CREATE INDEX IF NOT EXISTS IX_WBSElements_ProjectID ON wbs_elements (ProjectID);
 CREATE INDEX IF NOT EXISTS IX_WBSElements_ParentWBSElementID ON wbs_elements (ParentWBSElementID);
+CREATE INDEX IF NOT EXISTS IX_WBSElements_Project_Path ON wbs_elements (ProjectID, WBSPath);
+
+-- WBS to Processed Estimate mapping (every estimate line aggregated into a WBS element)
+CREATE TABLE IF NOT EXISTS wbs_estimate_links (
+    WBSElementID INT NOT NULL, ProcessedEstimateID INT NOT NULL,
+    CONSTRAINT PK_WBSEstimateLinks PRIMARY KEY (WBSElementID, ProcessedEstimateID),
+    CONSTRAINT FK_WBSEstimateLinks_WBSElements FOREIGN KEY (WBSElementID) REFERENCES wbs_elements(WBSElementID) ON DELETE CASCADE,
+    CONSTRAINT FK_WBSEstimateLinks_ProcessedEstimates FOREIGN KEY (ProcessedEstimateID) REFERENCES processed_estimates(ProcessedEstimateID) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS IX_WBSEstimateLinks_ProcessedEstimateID ON wbs_estimate_links (ProcessedEstimateID);
 
 -- Project Budgets
 CREATE TABLE IF NOT EXISTS project_budgets (
@@ -740,6 +838,19 @@ CREATE TABLE IF NOT EXISTS progress_updates (
 CREATE INDEX IF NOT EXISTS IX_ProgressUpdates_ProjectID ON progress_updates (ProjectID);
 CREATE INDEX IF NOT EXISTS IX_ProgressUpdates_WBSElementID ON progress_updates (WBSElementID);
 CREATE INDEX IF NOT EXISTS IX_ProgressUpdates_TaskID ON progress_updates (TaskID);
+-- Covering index for the latest update per WBS element (MonitoringControl.get_wbs_variance_data)
+CREATE INDEX IF NOT EXISTS IX_ProgressUpdates_Project_WBS_Date ON progress_updates (ProjectID, WBSElementID, UpdateDate, CompletionPercentage);
+
+-- WBS Rollups (Materialized subtree totals per WBS node, rebuilt by WBS and budget generation; see wbs_rollup_actuals)
+CREATE TABLE IF NOT EXISTS wbs_rollups (
+    WBSElementID INTEGER PRIMARY KEY, ProjectID INT NOT NULL, WBSLevel INT NOT NULL DEFAULT 1,
+    RolledEstimatedCost REAL NOT NULL DEFAULT 0.0, RolledBudgetAmount REAL NOT NULL DEFAULT 0.0,
+    RolledActualCost REAL NOT NULL DEFAULT 0.0, -- Kept current by the wbs_rollup_actuals triggers
+    LastRefreshed TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT FK_WBSRollups_WBSElements FOREIGN KEY (WBSElementID) REFERENCES wbs_elements(WBSElementID) ON DELETE CASCADE,
+    CONSTRAINT FK_WBSRollups_Projects FOREIGN KEY (ProjectID) REFERENCES Projects(ProjectID) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS IX_WBSRollups_Project_Level ON wbs_rollups (ProjectID, WBSLevel);
 
 -- Material Log Table
 CREATE TABLE IF NOT EXISTS MaterialLog (
@@ -885,6 +996,7 @@ CREATE INDEX IF NOT EXISTS IX_Purchasing_Log_ProjectID ON Purchasing_Log (Projec
 CREATE INDEX IF NOT EXISTS IX_Purchasing_Log_RequestedByEmployeeID ON Purchasing_Log (RequestedByEmployeeID);
 CREATE INDEX IF NOT EXISTS IX_Purchasing_Log_Status ON Purchasing_Log (Status);
 CREATE INDEX IF NOT EXISTS IX_Purchasing_Log_RequiredByDate ON Purchasing_Log (RequiredByDate);
+CREATE INDEX IF NOT EXISTS IX_Purchasing_Log_AssociatedPOLineItemID ON Purchasing_Log (AssociatedPOLineItemID);
 
 -- Production_Assembly_Tracking Table
 CREATE TABLE IF NOT EXISTS Production_Assembly_Tracking ( -- Ensured IF NOT EXISTS
@@ -909,6 +1021,34 @@ CREATE INDEX IF NOT EXISTS IX_Production_Assembly_Tracking_ProjectID ON Producti
 CREATE INDEX IF NOT EXISTS IX_Production_Assembly_Tracking_Status ON Production_Assembly_Tracking (Status);
 CREATE INDEX IF NOT EXISTS IX_Production_Assembly_Tracking_AssignedToEmployeeID ON Production_Assembly_Tracking (AssignedToEmployeeID);
 
+-- Per-day shop availability overrides (time off, overtime). Days without a row use the
+-- default weekday shop hours from Config.PREFAB_SHOP_HOURS_PER_DAY.
+CREATE TABLE IF NOT EXISTS ShopEmployeeAvailability (
+    AvailabilityID INTEGER PRIMARY KEY AUTOINCREMENT,
+    EmployeeID INTEGER NOT NULL,
+    AvailabilityDate TEXT NOT NULL,
+    AvailableHours REAL NOT NULL CHECK (AvailableHours >= 0 AND AvailableHours <= 24),
+    Notes TEXT NULL,
+    FOREIGN KEY (EmployeeID) REFERENCES Employees(EmployeeID) ON DELETE CASCADE,
+    UNIQUE (EmployeeID, AvailabilityDate)
+);
+
+-- Latest prefab shop schedule produced by PrefabScheduler, one row per open production order
+CREATE TABLE IF NOT EXISTS ProductionSchedule (
+    ProductionID INTEGER PRIMARY KEY,
+    SequenceNo INTEGER NOT NULL,
+    ScheduledEmployeeID INTEGER NULL,
+    LaborHours REAL NOT NULL DEFAULT 0,
+    ScheduledStartDate TEXT NULL,
+    ScheduledEndDate TEXT NULL,
+    DueDate TEXT NULL,
+    IsLate BOOLEAN NOT NULL DEFAULT 0,
+    LastScheduled TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (ProductionID) REFERENCES Production_Assembly_Tracking(ProductionID) ON DELETE CASCADE,
+    FOREIGN KEY (ScheduledEmployeeID) REFERENCES Employees(EmployeeID) ON DELETE SET NULL
+);
+CREATE INDEX IF NOT EXISTS IX_ProductionSchedule_Employee ON ProductionSchedule (ScheduledEmployeeID, ScheduledStartDate);
+
 -- Document Notes Table (Added)
 CREATE TABLE IF NOT EXISTS document_notes (
     note_id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -923,4 +1063,580 @@ CREATE TABLE IF NOT EXISTS document_notes (
 CREATE INDEX IF NOT EXISTS IX_document_notes_document_id ON document_notes (document_id);
 CREATE INDEX IF NOT EXISTS IX_document_notes_employee_id ON document_notes (employee_id);
 
+-- == Working calendars (company, per-project and crew) used for business-day scheduling ==
+CREATE TABLE IF NOT EXISTS WorkCalendars (
+    CalendarID INTEGER PRIMARY KEY AUTOINCREMENT,
+    CalendarName TEXT NOT NULL UNIQUE,
+    CalendarType TEXT NOT NULL DEFAULT 'Company', -- 'Company', 'Project', 'Crew'
+    ProjectID INTEGER NULL,
+    ParentCalendarID INTEGER NULL, -- Holidays are inherited from the parent calendar
+    WorkingDays TEXT NOT NULL DEFAULT '1111100', -- numpy weekmask, Monday first
+    DateCreated TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (ProjectID) REFERENCES Projects(ProjectID) ON DELETE CASCADE,
+    FOREIGN KEY (ParentCalendarID) REFERENCES WorkCalendars(CalendarID) ON DELETE SET NULL,
+    CHECK (CalendarType IN ('Company', 'Project', 'Crew'))
+);
+CREATE INDEX IF NOT EXISTS IX_WorkCalendars_ProjectID ON WorkCalendars (ProjectID);
+
+CREATE TABLE IF NOT EXISTS CalendarHolidays (
+    CalendarID INTEGER NOT NULL,
+    HolidayDate TEXT NOT NULL, -- YYYY-MM-DD
+    Description TEXT NULL,
+    PRIMARY KEY (CalendarID, HolidayDate),
+    FOREIGN KEY (CalendarID) REFERENCES WorkCalendars(CalendarID) ON DELETE CASCADE
+);
+
+-- == Critical path scheduling over Tasks ==
+-- Statements between the cpm_scheduling markers are also applied to existing databases by
+-- DatabaseManager._ensure_cpm_scheduling_schema, so keep them idempotent.
+-- BEGIN cpm_scheduling
+CREATE TABLE IF NOT EXISTS TaskDependencies (
+    DependencyID INTEGER PRIMARY KEY AUTOINCREMENT,
+    PredecessorTaskID INTEGER NOT NULL,
+    SuccessorTaskID INTEGER NOT NULL,
+    DependencyType TEXT NOT NULL DEFAULT 'FS', -- 'FS' finish-to-start, 'SS' start-to-start, 'FF' finish-to-finish
+    LagDays INTEGER NOT NULL DEFAULT 0, -- Working days; negative for lead
+    DateCreated TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (PredecessorTaskID) REFERENCES Tasks(TaskID) ON DELETE CASCADE,
+    FOREIGN KEY (SuccessorTaskID) REFERENCES Tasks(TaskID) ON DELETE CASCADE,
+    UNIQUE (PredecessorTaskID, SuccessorTaskID),
+    CHECK (DependencyType IN ('FS', 'SS', 'FF')),
+    CHECK (PredecessorTaskID <> SuccessorTaskID)
+);
+CREATE INDEX IF NOT EXISTS IX_TaskDependencies_SuccessorTaskID ON TaskDependencies (SuccessorTaskID);
+
+-- Results of the last CPM pass, in working-day dates on the project calendar
+CREATE TABLE IF NOT EXISTS TaskCPMResults (
+    TaskID INTEGER PRIMARY KEY,
+    ProjectID INTEGER NOT NULL,
+    EarlyStart TEXT NULL, EarlyFinish TEXT NULL, LateStart TEXT NULL, LateFinish TEXT NULL,
+    DurationDays INTEGER NOT NULL DEFAULT 0,
+    TotalFloat INTEGER NULL, FreeFloat INTEGER NULL,
+    IsCritical BOOLEAN NOT NULL DEFAULT 0,
+    LastCalculated TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (TaskID) REFERENCES Tasks(TaskID) ON DELETE CASCADE,
+    FOREIGN KEY (ProjectID) REFERENCES Projects(ProjectID) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS IX_TaskCPMResults_Project_Critical ON TaskCPMResults (ProjectID, IsCritical);
+
+-- Per-project counter bumped by any change that affects the task network; CPMScheduler
+-- reloads a cached network when it moves
+CREATE TABLE IF NOT EXISTS TaskScheduleRevision (
+    ProjectID INTEGER PRIMARY KEY,
+    Revision INTEGER NOT NULL DEFAULT 0
+);
+CREATE TRIGGER IF NOT EXISTS TR_Tasks_Schedule_Insert AFTER INSERT ON Tasks BEGIN
+    INSERT INTO TaskScheduleRevision (ProjectID, Revision) VALUES (new.ProjectID, 1)
+    ON CONFLICT (ProjectID) DO UPDATE SET Revision = Revision + 1;
+    -- The single PredecessorTaskID column maps to a finish-to-start dependency
+    INSERT OR IGNORE INTO TaskDependencies (PredecessorTaskID, SuccessorTaskID)
+    SELECT new.PredecessorTaskID, new.TaskID WHERE new.PredecessorTaskID IS NOT NULL AND new.PredecessorTaskID <> new.TaskID;
+END;
+CREATE TRIGGER IF NOT EXISTS TR_Tasks_Schedule_Update AFTER UPDATE OF ProjectID, EstimatedHours, ScheduledStartDate, ScheduledEndDate,
+    ActualStartDate, ActualEndDate, StartNoEarlierThan, PredecessorTaskID ON Tasks BEGIN
+    INSERT INTO TaskScheduleRevision (ProjectID, Revision) VALUES (new.ProjectID, 1)
+    ON CONFLICT (ProjectID) DO UPDATE SET Revision = Revision + 1;
+    INSERT OR IGNORE INTO TaskDependencies (PredecessorTaskID, SuccessorTaskID)
+    SELECT new.PredecessorTaskID, new.TaskID
+    WHERE new.PredecessorTaskID IS NOT NULL AND new.PredecessorTaskID <> new.TaskID AND new.PredecessorTaskID IS NOT old.PredecessorTaskID;
+END;
+CREATE TRIGGER IF NOT EXISTS TR_Tasks_Schedule_Delete AFTER DELETE ON Tasks BEGIN
+    UPDATE TaskScheduleRevision SET Revision = Revision + 1 WHERE ProjectID = old.ProjectID;
+END;
+CREATE TRIGGER IF NOT EXISTS TR_TaskDependencies_Schedule_Insert AFTER INSERT ON TaskDependencies BEGIN
+    INSERT INTO TaskScheduleRevision (ProjectID, Revision)
+    SELECT ProjectID, 1 FROM Tasks WHERE TaskID = new.SuccessorTaskID
+    ON CONFLICT (ProjectID) DO UPDATE SET Revision = Revision + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS TR_TaskDependencies_Schedule_Update AFTER UPDATE ON TaskDependencies BEGIN
+    INSERT INTO TaskScheduleRevision (ProjectID, Revision)
+    SELECT ProjectID, 1 FROM Tasks WHERE TaskID = new.SuccessorTaskID
+    ON CONFLICT (ProjectID) DO UPDATE SET Revision = Revision + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS TR_TaskDependencies_Schedule_Delete AFTER DELETE ON TaskDependencies BEGIN
+    UPDATE TaskScheduleRevision SET Revision = Revision + 1
+    WHERE ProjectID = (SELECT ProjectID FROM Tasks WHERE TaskID = old.SuccessorTaskID);
+END;
+
+-- Backfill dependencies from the legacy single-predecessor column (no-op on a new database)
+INSERT OR IGNORE INTO TaskDependencies (PredecessorTaskID, SuccessorTaskID)
+SELECT PredecessorTaskID, TaskID FROM Tasks WHERE PredecessorTaskID IS NOT NULL AND PredecessorTaskID <> TaskID;
+-- END cpm_scheduling
+
+-- == Three-point estimates for Monte Carlo schedule and cost risk (risk_simulation.py) ==
+CREATE TABLE IF NOT EXISTS TaskDurationEstimates (
+    TaskID INTEGER PRIMARY KEY, -- Working days; tasks without a row use their CPM duration
+    OptimisticDays REAL NOT NULL,
+    MostLikelyDays REAL NOT NULL,
+    PessimisticDays REAL NOT NULL,
+    LastModifiedDate TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (TaskID) REFERENCES Tasks(TaskID) ON DELETE CASCADE,
+    CHECK (OptimisticDays >= 0 AND OptimisticDays <= MostLikelyDays AND MostLikelyDays <= PessimisticDays)
+);
+
+CREATE TABLE IF NOT EXISTS WBSCostEstimates (
+    WBSElementID INTEGER PRIMARY KEY, -- Total cost at completion; elements without a row use EstimatedCost
+    OptimisticCost REAL NOT NULL,
+    MostLikelyCost REAL NOT NULL,
+    PessimisticCost REAL NOT NULL,
+    LastModifiedDate TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (WBSElementID) REFERENCES wbs_elements(WBSElementID) ON DELETE CASCADE,
+    CHECK (OptimisticCost >= 0 AND OptimisticCost <= MostLikelyCost AND MostLikelyCost <= PessimisticCost)
+);
+
+-- == Incrementally maintained cost and progress rollups (cost_rollups.py) ==
+-- Statements between the cost_rollups markers are also applied to existing databases by
+-- DatabaseManager._ensure_cost_rollups_schema, so keep them idempotent. The triggers keep the
+-- rollups in step with actual_costs and progress_updates; CostRollupManager rebuilds and verifies them.
+-- BEGIN cost_rollups
+-- Per-WBS cost sums now read wbs_actual_rollups, so the covering index on actual_costs only slows inserts
+DROP INDEX IF EXISTS IX_ActualCosts_Project_WBS_Amount;
+-- Actual cost per project / WBS element / category / day; WBSElementID 0 holds costs not charged to an element
+CREATE TABLE IF NOT EXISTS cost_daily_rollups (
+    ProjectID INTEGER NOT NULL,
+    WBSElementID INTEGER NOT NULL,
+    CostCategory TEXT NOT NULL,
+    TransactionDate TEXT NOT NULL,
+    TotalAmount REAL NOT NULL DEFAULT 0.0,
+    EntryCount INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (ProjectID, WBSElementID, CostCategory, TransactionDate)
+) WITHOUT ROWID;
+
+-- One row per WBS element with costs or progress: total actual cost and the latest progress update
+CREATE TABLE IF NOT EXISTS wbs_actual_rollups (
+    ProjectID INTEGER NOT NULL,
+    WBSElementID INTEGER NOT NULL, -- 0 = costs not charged to an element
+    TotalActualCost REAL NOT NULL DEFAULT 0.0,
+    CostEntryCount INTEGER NOT NULL DEFAULT 0,
+    LatestProgressUpdateID INTEGER NULL,
+    LatestUpdateDate TEXT NULL,
+    CompletionPercentage REAL NULL,
+    PRIMARY KEY (ProjectID, WBSElementID)
+) WITHOUT ROWID;
+
+-- Per-project counter bumped by any cost or progress change; cached analyses reload when it moves
+CREATE TABLE IF NOT EXISTS cost_rollup_revisions (
+    ProjectID INTEGER PRIMARY KEY,
+    Revision INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TRIGGER IF NOT EXISTS TR_ActualCosts_Rollup_Insert AFTER INSERT ON actual_costs BEGIN
+    INSERT INTO cost_daily_rollups (ProjectID, WBSElementID, CostCategory, TransactionDate, TotalAmount, EntryCount)
+    VALUES (new.ProjectID, COALESCE(new.WBSElementID, 0), new.CostCategory, new.TransactionDate, new.Amount, 1)
+    ON CONFLICT (ProjectID, WBSElementID, CostCategory, TransactionDate)
+    DO UPDATE SET TotalAmount = TotalAmount + excluded.TotalAmount, EntryCount = EntryCount + 1;
+    INSERT INTO wbs_actual_rollups (ProjectID, WBSElementID, TotalActualCost, CostEntryCount)
+    VALUES (new.ProjectID, COALESCE(new.WBSElementID, 0), new.Amount, 1)
+    ON CONFLICT (ProjectID, WBSElementID)
+    DO UPDATE SET TotalActualCost = TotalActualCost + excluded.TotalActualCost, CostEntryCount = CostEntryCount + 1;
+    INSERT INTO cost_rollup_revisions (ProjectID, Revision) VALUES (new.ProjectID, 1)
+    ON CONFLICT (ProjectID) DO UPDATE SET Revision = Revision + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS TR_ActualCosts_Rollup_Delete AFTER DELETE ON actual_costs BEGIN
+    -- Totals snap to exactly zero when the last entry goes, so float drift cannot linger
+    UPDATE cost_daily_rollups
+    SET TotalAmount = CASE WHEN EntryCount <= 1 THEN 0.0 ELSE TotalAmount - old.Amount END, EntryCount = EntryCount - 1
+    WHERE ProjectID = old.ProjectID AND WBSElementID = COALESCE(old.WBSElementID, 0)
+      AND CostCategory = old.CostCategory AND TransactionDate = old.TransactionDate;
+    DELETE FROM cost_daily_rollups
+    WHERE ProjectID = old.ProjectID AND WBSElementID = COALESCE(old.WBSElementID, 0)
+      AND CostCategory = old.CostCategory AND TransactionDate = old.TransactionDate AND EntryCount <= 0;
+    UPDATE wbs_actual_rollups
+    SET TotalActualCost = CASE WHEN CostEntryCount <= 1 THEN 0.0 ELSE TotalActualCost - old.Amount END, CostEntryCount = CostEntryCount - 1
+    WHERE ProjectID = old.ProjectID AND WBSElementID = COALESCE(old.WBSElementID, 0);
+    DELETE FROM wbs_actual_rollups
+    WHERE ProjectID = old.ProjectID AND WBSElementID = COALESCE(old.WBSElementID, 0)
+      AND CostEntryCount <= 0 AND LatestProgressUpdateID IS NULL;
+    UPDATE cost_rollup_revisions SET Revision = Revision + 1 WHERE ProjectID = old.ProjectID;
+END;
+-- An update moves the old row's amount out of its buckets and the new row's amount in
+CREATE TRIGGER IF NOT EXISTS TR_ActualCosts_Rollup_Update AFTER UPDATE OF ProjectID, WBSElementID, CostCategory, Amount, TransactionDate ON actual_costs BEGIN
+    UPDATE cost_daily_rollups
+    SET TotalAmount = CASE WHEN EntryCount <= 1 THEN 0.0 ELSE TotalAmount - old.Amount END, EntryCount = EntryCount - 1
+    WHERE ProjectID = old.ProjectID AND WBSElementID = COALESCE(old.WBSElementID, 0)
+      AND CostCategory = old.CostCategory AND TransactionDate = old.TransactionDate;
+    DELETE FROM cost_daily_rollups
+    WHERE ProjectID = old.ProjectID AND WBSElementID = COALESCE(old.WBSElementID, 0)
+      AND CostCategory = old.CostCategory AND TransactionDate = old.TransactionDate AND EntryCount <= 0;
+    UPDATE wbs_actual_rollups
+    SET TotalActualCost = CASE WHEN CostEntryCount <= 1 THEN 0.0 ELSE TotalActualCost - old.Amount END, CostEntryCount = CostEntryCount - 1
+    WHERE ProjectID = old.ProjectID AND WBSElementID = COALESCE(old.WBSElementID, 0);
+    DELETE FROM wbs_actual_rollups
+    WHERE ProjectID = old.ProjectID AND WBSElementID = COALESCE(old.WBSElementID, 0)
+      AND CostEntryCount <= 0 AND LatestProgressUpdateID IS NULL;
+    INSERT INTO cost_daily_rollups (ProjectID, WBSElementID, CostCategory, TransactionDate, TotalAmount, EntryCount)
+    VALUES (new.ProjectID, COALESCE(new.WBSElementID, 0), new.CostCategory, new.TransactionDate, new.Amount, 1)
+    ON CONFLICT (ProjectID, WBSElementID, CostCategory, TransactionDate)
+    DO UPDATE SET TotalAmount = TotalAmount + excluded.TotalAmount, EntryCount = EntryCount + 1;
+    INSERT INTO wbs_actual_rollups (ProjectID, WBSElementID, TotalActualCost, CostEntryCount)
+    VALUES (new.ProjectID, COALESCE(new.WBSElementID, 0), new.Amount, 1)
+    ON CONFLICT (ProjectID, WBSElementID)
+    DO UPDATE SET TotalActualCost = TotalActualCost + excluded.TotalActualCost, CostEntryCount = CostEntryCount + 1;
+    UPDATE cost_rollup_revisions SET Revision = Revision + 1 WHERE ProjectID = old.ProjectID;
+    INSERT INTO cost_rollup_revisions (ProjectID, Revision) VALUES (new.ProjectID, 1)
+    ON CONFLICT (ProjectID) DO UPDATE SET Revision = Revision + 1;
+END;
+
+-- A new update only replaces the latest if it sorts after it (UpdateDate, then ProgressUpdateID)
+CREATE TRIGGER IF NOT EXISTS TR_ProgressUpdates_Rollup_Insert AFTER INSERT ON progress_updates BEGIN
+    INSERT INTO wbs_actual_rollups (ProjectID, WBSElementID, LatestProgressUpdateID, LatestUpdateDate, CompletionPercentage)
+    SELECT new.ProjectID, new.WBSElementID, new.ProgressUpdateID, new.UpdateDate, new.CompletionPercentage
+    WHERE new.WBSElementID IS NOT NULL
+    ON CONFLICT (ProjectID, WBSElementID) DO UPDATE SET
+        LatestProgressUpdateID = excluded.LatestProgressUpdateID, LatestUpdateDate = excluded.LatestUpdateDate,
+        CompletionPercentage = excluded.CompletionPercentage
+    WHERE LatestProgressUpdateID IS NULL
+       OR (excluded.LatestUpdateDate, excluded.LatestProgressUpdateID) > (LatestUpdateDate, LatestProgressUpdateID);
+    INSERT INTO cost_rollup_revisions (ProjectID, Revision) VALUES (new.ProjectID, 1)
+    ON CONFLICT (ProjectID) DO UPDATE SET Revision = Revision + 1;
+END;
+-- Deletes and edits re-read the latest update for the affected element (an index seek)
+CREATE TRIGGER IF NOT EXISTS TR_ProgressUpdates_Rollup_Delete AFTER DELETE ON progress_updates BEGIN
+    UPDATE wbs_actual_rollups
+    SET (LatestProgressUpdateID, LatestUpdateDate, CompletionPercentage) = (
+        SELECT ProgressUpdateID, UpdateDate, CompletionPercentage FROM progress_updates
+        WHERE ProjectID = old.ProjectID AND WBSElementID = old.WBSElementID
+        ORDER BY UpdateDate DESC, ProgressUpdateID DESC LIMIT 1)
+    WHERE ProjectID = old.ProjectID AND WBSElementID = old.WBSElementID;
+    DELETE FROM wbs_actual_rollups
+    WHERE ProjectID = old.ProjectID AND WBSElementID = old.WBSElementID
+      AND CostEntryCount <= 0 AND LatestProgressUpdateID IS NULL;
+    UPDATE cost_rollup_revisions SET Revision = Revision + 1 WHERE ProjectID = old.ProjectID;
+END;
+CREATE TRIGGER IF NOT EXISTS TR_ProgressUpdates_Rollup_Update AFTER UPDATE OF ProjectID, WBSElementID, UpdateDate, CompletionPercentage ON progress_updates BEGIN
+    UPDATE wbs_actual_rollups
+    SET (LatestProgressUpdateID, LatestUpdateDate, CompletionPercentage) = (
+        SELECT ProgressUpdateID, UpdateDate, CompletionPercentage FROM progress_updates
+        WHERE ProjectID = old.ProjectID AND WBSElementID = old.WBSElementID
+        ORDER BY UpdateDate DESC, ProgressUpdateID DESC LIMIT 1)
+    WHERE ProjectID = old.ProjectID AND WBSElementID = old.WBSElementID;
+    DELETE FROM wbs_actual_rollups
+    WHERE ProjectID = old.ProjectID AND WBSElementID = old.WBSElementID
+      AND CostEntryCount <= 0 AND LatestProgressUpdateID IS NULL;
+    INSERT OR IGNORE INTO wbs_actual_rollups (ProjectID, WBSElementID)
+    SELECT new.ProjectID, new.WBSElementID WHERE new.WBSElementID IS NOT NULL;
+    UPDATE wbs_actual_rollups
+    SET (LatestProgressUpdateID, LatestUpdateDate, CompletionPercentage) = (
+        SELECT ProgressUpdateID, UpdateDate, CompletionPercentage FROM progress_updates
+        WHERE ProjectID = new.ProjectID AND WBSElementID = new.WBSElementID
+        ORDER BY UpdateDate DESC, ProgressUpdateID DESC LIMIT 1)
+    WHERE ProjectID = new.ProjectID AND WBSElementID = new.WBSElementID;
+    UPDATE cost_rollup_revisions SET Revision = Revision + 1 WHERE ProjectID = old.ProjectID;
+    INSERT INTO cost_rollup_revisions (ProjectID, Revision) VALUES (new.ProjectID, 1)
+    ON CONFLICT (ProjectID) DO UPDATE SET Revision = Revision + 1;
+END;
+
+-- Backfill from existing rows (no-op on a new database)
+INSERT OR IGNORE INTO cost_daily_rollups (ProjectID, WBSElementID, CostCategory, TransactionDate, TotalAmount, EntryCount)
+SELECT ProjectID, COALESCE(WBSElementID, 0), CostCategory, TransactionDate, SUM(Amount), COUNT(*)
+FROM actual_costs GROUP BY ProjectID, COALESCE(WBSElementID, 0), CostCategory, TransactionDate;
+INSERT OR IGNORE INTO wbs_actual_rollups (ProjectID, WBSElementID, TotalActualCost, CostEntryCount)
+SELECT ProjectID, COALESCE(WBSElementID, 0), SUM(Amount), COUNT(*)
+FROM actual_costs GROUP BY ProjectID, COALESCE(WBSElementID, 0);
+INSERT INTO wbs_actual_rollups (ProjectID, WBSElementID, LatestProgressUpdateID, LatestUpdateDate, CompletionPercentage)
+SELECT ProjectID, WBSElementID, ProgressUpdateID, UpdateDate, CompletionPercentage
+FROM (
+    SELECT ProjectID, WBSElementID, ProgressUpdateID, UpdateDate, CompletionPercentage,
+           ROW_NUMBER() OVER (PARTITION BY ProjectID, WBSElementID ORDER BY UpdateDate DESC, ProgressUpdateID DESC) AS UpdateRank
+    FROM progress_updates WHERE WBSElementID IS NOT NULL
+) WHERE UpdateRank = 1
+ON CONFLICT (ProjectID, WBSElementID) DO UPDATE SET
+    LatestProgressUpdateID = excluded.LatestProgressUpdateID, LatestUpdateDate = excluded.LatestUpdateDate,
+    CompletionPercentage = excluded.CompletionPercentage;
+-- END cost_rollups
+
+-- == Subtree actual costs on wbs_rollups kept in step with wbs_actual_rollups ==
+-- Statements between the wbs_rollup_actuals markers are also applied to existing databases by
+-- DatabaseManager._ensure_wbs_rollup_actuals_schema. Each change to an element's actual cost is
+-- added to the element and its ancestors, read from the element's WBSPath ('/12/15/31/').
+-- BEGIN wbs_rollup_actuals
+CREATE TRIGGER IF NOT EXISTS TR_WBSActualRollups_Subtree_Insert AFTER INSERT ON wbs_actual_rollups
+    WHEN new.TotalActualCost != 0 BEGIN
+    UPDATE wbs_rollups SET RolledActualCost = RolledActualCost + new.TotalActualCost
+    WHERE WBSElementID IN (
+        SELECT value FROM wbs_elements w, json_each('[' || replace(trim(w.WBSPath, '/'), '/', ',') || ']')
+        WHERE w.WBSElementID = new.WBSElementID AND w.ProjectID = new.ProjectID);
+END;
+CREATE TRIGGER IF NOT EXISTS TR_WBSActualRollups_Subtree_Update AFTER UPDATE OF TotalActualCost ON wbs_actual_rollups
+    WHEN new.TotalActualCost != old.TotalActualCost BEGIN
+    UPDATE wbs_rollups SET RolledActualCost = RolledActualCost + new.TotalActualCost - old.TotalActualCost
+    WHERE WBSElementID IN (
+        SELECT value FROM wbs_elements w, json_each('[' || replace(trim(w.WBSPath, '/'), '/', ',') || ']')
+        WHERE w.WBSElementID = new.WBSElementID AND w.ProjectID = new.ProjectID);
+END;
+CREATE TRIGGER IF NOT EXISTS TR_WBSActualRollups_Subtree_Delete AFTER DELETE ON wbs_actual_rollups
+    WHEN old.TotalActualCost != 0 BEGIN
+    UPDATE wbs_rollups SET RolledActualCost = RolledActualCost - old.TotalActualCost
+    WHERE WBSElementID IN (
+        SELECT value FROM wbs_elements w, json_each('[' || replace(trim(w.WBSPath, '/'), '/', ',') || ']')
+        WHERE w.WBSElementID = old.WBSElementID AND w.ProjectID = old.ProjectID);
+END;
+
+-- Backfill rollups stored before the triggers existed (no-op on a new database)
+UPDATE wbs_rollups SET RolledActualCost = (
+    SELECT TOTAL(a.TotalActualCost) FROM wbs_elements e, wbs_elements d
+    JOIN wbs_actual_rollups a ON a.ProjectID = d.ProjectID AND a.WBSElementID = d.WBSElementID
+    WHERE e.WBSElementID = wbs_rollups.WBSElementID AND d.ProjectID = e.ProjectID
+      AND substr(d.WBSPath, 1, length(e.WBSPath)) = e.WBSPath);
+-- END wbs_rollup_actuals
+
+-- == EVM metric history for trend lines (evm_snapshots.py) ==
+-- Statements between the evm_snapshots markers are also applied to existing databases by
+-- DatabaseManager._ensure_evm_snapshots_schema, so keep them idempotent.
+-- BEGIN evm_snapshots
+-- One row per project / WBS element / period; SV, CV, SPI and CPI are derived when read
+CREATE TABLE IF NOT EXISTS evm_snapshots (
+    ProjectID INTEGER NOT NULL,
+    WBSElementID INTEGER NOT NULL, -- 0 = project total (AC includes costs not charged to a leaf element)
+    PeriodEnd TEXT NOT NULL, -- Last day of the period (Config.EVM_SNAPSHOT_PERIOD)
+    BudgetAtCompletion REAL NOT NULL DEFAULT 0.0,
+    PlannedValue REAL NOT NULL DEFAULT 0.0,
+    EarnedValue REAL NOT NULL DEFAULT 0.0,
+    ActualCost REAL NOT NULL DEFAULT 0.0,
+    PRIMARY KEY (ProjectID, WBSElementID, PeriodEnd),
+    FOREIGN KEY (ProjectID) REFERENCES Projects(ProjectID) ON DELETE CASCADE
+) WITHOUT ROWID;
+
+-- Latest period captured per project, as of which day and at which data version; unchanged projects are skipped
+CREATE TABLE IF NOT EXISTS evm_snapshot_status (
+    ProjectID INTEGER PRIMARY KEY,
+    PeriodEnd TEXT NOT NULL,
+    AsOfDate TEXT NOT NULL,
+    DataVersion TEXT NOT NULL,
+    CapturedAt TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (ProjectID) REFERENCES Projects(ProjectID) ON DELETE CASCADE
+);
+-- END evm_snapshots
+
+-- == Threshold alerts raised on cost, progress and daily log writes (alerts.py) ==
+-- Statements between the alerts markers are also applied to existing databases by
+-- DatabaseManager._ensure_alerts_schema, so keep them idempotent.
+-- BEGIN alerts
+CREATE TABLE IF NOT EXISTS alerts (
+    AlertID INTEGER PRIMARY KEY AUTOINCREMENT,
+    RuleName TEXT NOT NULL,
+    SubjectKey TEXT NOT NULL, -- What the alert is about, e.g. 'project:12', 'wbs:34', 'certification:5'
+    ProjectID INTEGER NULL,
+    WBSElementID INTEGER NULL,
+    EmployeeID INTEGER NULL,
+    Severity TEXT NOT NULL DEFAULT 'warning',
+    Message TEXT NOT NULL,
+    MetricValue REAL NULL,
+    Threshold REAL NULL,
+    Status TEXT NOT NULL DEFAULT 'Open', -- Open, Acknowledged (no longer announced) or Resolved
+    OccurrenceCount INTEGER NOT NULL DEFAULT 1, -- Times the rule fired while the alert was active
+    FirstRaisedAt TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    LastRaisedAt TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    LastNotifiedAt TEXT NULL,
+    ResolvedAt TEXT NULL,
+    FOREIGN KEY (ProjectID) REFERENCES Projects(ProjectID) ON DELETE CASCADE,
+    FOREIGN KEY (WBSElementID) REFERENCES wbs_elements(WBSElementID) ON DELETE CASCADE,
+    FOREIGN KEY (EmployeeID) REFERENCES Employees(EmployeeID) ON DELETE CASCADE
+);
+-- At most one active alert per rule and subject (dedupe target of AlertEngine's upsert)
+CREATE UNIQUE INDEX IF NOT EXISTS UX_Alerts_Rule_Subject_Active ON alerts (RuleName, SubjectKey) WHERE Status != 'Resolved';
+CREATE INDEX IF NOT EXISTS IX_Alerts_Project_Status ON alerts (ProjectID, Status);
+-- END alerts
+
+-- == Review queue of unusual and duplicate actual costs (cost_anomalies.py) ==
+-- Statements between the cost_anomalies markers are also applied to existing databases by
+-- DatabaseManager._ensure_cost_anomalies_schema, so keep them idempotent.
+-- BEGIN cost_anomalies
+CREATE TABLE IF NOT EXISTS cost_anomalies (
+    AnomalyID INTEGER PRIMARY KEY AUTOINCREMENT,
+    ActualCostID INTEGER NOT NULL,
+    AnomalyType TEXT NOT NULL, -- 'outlier' or 'duplicate'
+    Score REAL NULL, -- Robust z-score for outliers, days from the repeated posting for duplicates
+    RelatedActualCostID INTEGER NULL, -- The posting a duplicate repeats
+    Details TEXT NOT NULL,
+    ReviewStatus TEXT NOT NULL DEFAULT 'Pending', -- Pending, Confirmed or Dismissed
+    DetectedAt TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    ReviewedAt TEXT NULL,
+    ReviewedBy TEXT NULL,
+    ReviewNotes TEXT NULL,
+    UNIQUE (ActualCostID, AnomalyType),
+    FOREIGN KEY (ActualCostID) REFERENCES actual_costs(ActualCostID) ON DELETE CASCADE,
+    FOREIGN KEY (RelatedActualCostID) REFERENCES actual_costs(ActualCostID) ON DELETE SET NULL
+);
+CREATE INDEX IF NOT EXISTS IX_CostAnomalies_ReviewStatus ON cost_anomalies (ReviewStatus);
+
+-- Highest ActualCostID checked so far; incremental scans flag only rows above it
+CREATE TABLE IF NOT EXISTS cost_anomaly_scan_status (
+    ScanID INTEGER PRIMARY KEY CHECK (ScanID = 1),
+    LastActualCostID INTEGER NOT NULL,
+    LastScanAt TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+-- END cost_anomalies
+
+-- == Unified field search (daily logs, tasks, document notes, LLM parses) ==
+-- Statements between the field_search markers are also applied to existing databases by
+-- DatabaseManager._ensure_field_search_schema, so keep them idempotent.
+-- BEGIN field_search
+-- One row per searchable record, with the project and date it belongs to, kept in sync by triggers on each source table
+CREATE TABLE IF NOT EXISTS field_search_entries (
+    EntryID INTEGER PRIMARY KEY AUTOINCREMENT,
+    SourceType TEXT NOT NULL, -- 'DailyLog', 'DailyLogTask', 'DailyLogObservation', 'DocumentNote', 'Task', 'LLMParse'
+    SourceID INTEGER NOT NULL,
+    ProjectID INTEGER NULL,
+    EntryDate TEXT NULL, -- YYYY-MM-DD
+    Title TEXT NULL,
+    Body TEXT NOT NULL DEFAULT '',
+    UNIQUE (SourceType, SourceID)
+);
+CREATE INDEX IF NOT EXISTS IX_FieldSearchEntries_Project_Date ON field_search_entries (ProjectID, EntryDate);
+CREATE INDEX IF NOT EXISTS IX_FieldSearchEntries_Date ON field_search_entries (EntryDate);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS field_search_fts USING fts5(
+    Title, Body, content='field_search_entries', content_rowid='EntryID', tokenize='porter unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS TR_FieldSearchEntries_FTS_Insert AFTER INSERT ON field_search_entries BEGIN
+    INSERT INTO field_search_fts (rowid, Title, Body) VALUES (new.EntryID, new.Title, new.Body);
+END;
+CREATE TRIGGER IF NOT EXISTS TR_FieldSearchEntries_FTS_Delete AFTER DELETE ON field_search_entries BEGIN
+    INSERT INTO field_search_fts (field_search_fts, rowid, Title, Body) VALUES ('delete', old.EntryID, old.Title, old.Body);
+END;
+-- Project/date moves (e.g. CPM rescheduling a task) don't touch the text index. Older databases
+-- have an unconditional version of this trigger, so it is dropped and recreated rather than
+-- skipped; _ensure_field_search_schema reapplies this block on every start.
+-- BEGIN search_reindex_trigger
+DROP TRIGGER IF EXISTS TR_FieldSearchEntries_FTS_Update;
+CREATE TRIGGER TR_FieldSearchEntries_FTS_Update AFTER UPDATE OF Title, Body ON field_search_entries
+    WHEN old.Title IS NOT new.Title OR old.Body IS NOT new.Body BEGIN
+    INSERT INTO field_search_fts (field_search_fts, rowid, Title, Body) VALUES ('delete', old.EntryID, old.Title, old.Body);
+    INSERT INTO field_search_fts (rowid, Title, Body) VALUES (new.EntryID, new.Title, new.Body);
+END;
+-- END search_reindex_trigger
+
+CREATE TRIGGER IF NOT EXISTS TR_DailyLogs_Search_Insert AFTER INSERT ON DailyLogs BEGIN
+    INSERT INTO field_search_entries (SourceType, SourceID, ProjectID, EntryDate, Title, Body)
+    VALUES ('DailyLog', new.DailyLogID, new.ProjectID, COALESCE(date(new.LogDate), new.LogDate), 'Daily log', COALESCE(new.Notes, ''));
+END;
+CREATE TRIGGER IF NOT EXISTS TR_DailyLogs_Search_Update AFTER UPDATE OF Notes, ProjectID, LogDate ON DailyLogs BEGIN
+    UPDATE field_search_entries
+    SET ProjectID = new.ProjectID, EntryDate = COALESCE(date(new.LogDate), new.LogDate), Body = COALESCE(new.Notes, '')
+    WHERE SourceType = 'DailyLog' AND SourceID = new.DailyLogID;
+    -- Tasks, observations and parses of the log follow its project and date
+    UPDATE field_search_entries
+    SET ProjectID = new.ProjectID, EntryDate = COALESCE(date(new.LogDate), new.LogDate)
+    WHERE (SourceType = 'DailyLogTask' AND SourceID IN (SELECT DailyLogTaskID FROM DailyLogTasks WHERE DailyLogID = new.DailyLogID))
+       OR (SourceType = 'DailyLogObservation' AND SourceID IN (SELECT DailyLogObservationID FROM DailyLogObservations WHERE DailyLogID = new.DailyLogID))
+       OR (SourceType = 'LLMParse' AND SourceID IN (SELECT ParsedDataID FROM LLM_Parsed_Data_Log WHERE SourceModule LIKE 'DailyLog%' AND SourceRecordID = new.DailyLogID));
+END;
+CREATE TRIGGER IF NOT EXISTS TR_DailyLogs_Search_Delete AFTER DELETE ON DailyLogs BEGIN
+    DELETE FROM field_search_entries WHERE SourceType = 'DailyLog' AND SourceID = old.DailyLogID;
+END;
+
+CREATE TRIGGER IF NOT EXISTS TR_DailyLogTasks_Search_Insert AFTER INSERT ON DailyLogTasks BEGIN
+    INSERT INTO field_search_entries (SourceType, SourceID, ProjectID, EntryDate, Title, Body)
+    VALUES ('DailyLogTask', new.DailyLogTaskID,
+            (SELECT ProjectID FROM DailyLogs WHERE DailyLogID = new.DailyLogID),
+            (SELECT COALESCE(date(LogDate), LogDate) FROM DailyLogs WHERE DailyLogID = new.DailyLogID),
+            'Daily log task', new.TaskDescription);
+END;
+CREATE TRIGGER IF NOT EXISTS TR_DailyLogTasks_Search_Update AFTER UPDATE OF TaskDescription, DailyLogID ON DailyLogTasks BEGIN
+    UPDATE field_search_entries
+    SET ProjectID = (SELECT ProjectID FROM DailyLogs WHERE DailyLogID = new.DailyLogID),
+        EntryDate = (SELECT COALESCE(date(LogDate), LogDate) FROM DailyLogs WHERE DailyLogID = new.DailyLogID),
+        Body = new.TaskDescription
+    WHERE SourceType = 'DailyLogTask' AND SourceID = new.DailyLogTaskID;
+END;
+CREATE TRIGGER IF NOT EXISTS TR_DailyLogTasks_Search_Delete AFTER DELETE ON DailyLogTasks BEGIN
+    DELETE FROM field_search_entries WHERE SourceType = 'DailyLogTask' AND SourceID = old.DailyLogTaskID;
+END;
+
+CREATE TRIGGER IF NOT EXISTS TR_DailyLogObservations_Search_Insert AFTER INSERT ON DailyLogObservations BEGIN
+    INSERT INTO field_search_entries (SourceType, SourceID, ProjectID, EntryDate, Title, Body)
+    VALUES ('DailyLogObservation', new.DailyLogObservationID,
+            (SELECT ProjectID FROM DailyLogs WHERE DailyLogID = new.DailyLogID),
+            (SELECT COALESCE(date(LogDate), LogDate) FROM DailyLogs WHERE DailyLogID = new.DailyLogID),
+            new.ObservationType, new.Description);
+END;
+CREATE TRIGGER IF NOT EXISTS TR_DailyLogObservations_Search_Update AFTER UPDATE OF ObservationType, Description, DailyLogID ON DailyLogObservations BEGIN
+    UPDATE field_search_entries
+    SET ProjectID = (SELECT ProjectID FROM DailyLogs WHERE DailyLogID = new.DailyLogID),
+        EntryDate = (SELECT COALESCE(date(LogDate), LogDate) FROM DailyLogs WHERE DailyLogID = new.DailyLogID),
+        Title = new.ObservationType, Body = new.Description
+    WHERE SourceType = 'DailyLogObservation' AND SourceID = new.DailyLogObservationID;
+END;
+CREATE TRIGGER IF NOT EXISTS TR_DailyLogObservations_Search_Delete AFTER DELETE ON DailyLogObservations BEGIN
+    DELETE FROM field_search_entries WHERE SourceType = 'DailyLogObservation' AND SourceID = old.DailyLogObservationID;
+END;
+
+CREATE TRIGGER IF NOT EXISTS TR_DocumentNotes_Search_Insert AFTER INSERT ON document_notes BEGIN
+    INSERT INTO field_search_entries (SourceType, SourceID, ProjectID, EntryDate, Title, Body)
+    VALUES ('DocumentNote', new.note_id,
+            (SELECT ProjectID FROM ProjectDocuments WHERE ProjectDocumentID = new.document_id),
+            COALESCE(date(new.created_at), new.created_at),
+            COALESCE((SELECT DocumentName FROM ProjectDocuments WHERE ProjectDocumentID = new.document_id), 'Document')
+                || COALESCE(' p. ' || new.page_number, ''),
+            new.note_text);
+END;
+CREATE TRIGGER IF NOT EXISTS TR_DocumentNotes_Search_Update AFTER UPDATE OF note_text, page_number, document_id ON document_notes BEGIN
+    UPDATE field_search_entries
+    SET ProjectID = (SELECT ProjectID FROM ProjectDocuments WHERE ProjectDocumentID = new.document_id),
+        Title = COALESCE((SELECT DocumentName FROM ProjectDocuments WHERE ProjectDocumentID = new.document_id), 'Document')
+                || COALESCE(' p. ' || new.page_number, ''),
+        Body = new.note_text
+    WHERE SourceType = 'DocumentNote' AND SourceID = new.note_id;
+END;
+CREATE TRIGGER IF NOT EXISTS TR_DocumentNotes_Search_Delete AFTER DELETE ON document_notes BEGIN
+    DELETE FROM field_search_entries WHERE SourceType = 'DocumentNote' AND SourceID = old.note_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS TR_Tasks_Search_Insert AFTER INSERT ON Tasks BEGIN
+    INSERT INTO field_search_entries (SourceType, SourceID, ProjectID, EntryDate, Title, Body)
+    VALUES ('Task', new.TaskID, new.ProjectID, COALESCE(date(new.ScheduledStartDate), date(new.DateCreated)),
+            COALESCE(new.TaskName, new.TaskType), new.Description);
+END;
+CREATE TRIGGER IF NOT EXISTS TR_Tasks_Search_Update AFTER UPDATE OF TaskName, TaskType, Description, ProjectID, ScheduledStartDate ON Tasks BEGIN
+    UPDATE field_search_entries
+    SET ProjectID = new.ProjectID, EntryDate = COALESCE(date(new.ScheduledStartDate), date(new.DateCreated)),
+        Title = COALESCE(new.TaskName, new.TaskType), Body = new.Description
+    WHERE SourceType = 'Task' AND SourceID = new.TaskID;
+END;
+CREATE TRIGGER IF NOT EXISTS TR_Tasks_Search_Delete AFTER DELETE ON Tasks BEGIN
+    DELETE FROM field_search_entries WHERE SourceType = 'Task' AND SourceID = old.TaskID;
+END;
+
+-- Parses of daily log sections (SourceModule 'DailyLog_<Section>') take the log's project and date
+CREATE TRIGGER IF NOT EXISTS TR_LLMParsedDataLog_Search_Insert AFTER INSERT ON LLM_Parsed_Data_Log BEGIN
+    INSERT INTO field_search_entries (SourceType, SourceID, ProjectID, EntryDate, Title, Body)
+    VALUES ('LLMParse', new.ParsedDataID,
+            (SELECT ProjectID FROM DailyLogs WHERE new.SourceModule LIKE 'DailyLog%' AND DailyLogID = new.SourceRecordID),
+            COALESCE((SELECT date(LogDate) FROM DailyLogs WHERE new.SourceModule LIKE 'DailyLog%' AND DailyLogID = new.SourceRecordID),
+                     date(new.ParsingTimestamp)),
+            new.SourceModule, new.OriginalInput);
+END;
+CREATE TRIGGER IF NOT EXISTS TR_LLMParsedDataLog_Search_Update AFTER UPDATE OF OriginalInput, SourceModule, SourceRecordID ON LLM_Parsed_Data_Log BEGIN
+    UPDATE field_search_entries
+    SET ProjectID = (SELECT ProjectID FROM DailyLogs WHERE new.SourceModule LIKE 'DailyLog%' AND DailyLogID = new.SourceRecordID),
+        EntryDate = COALESCE((SELECT date(LogDate) FROM DailyLogs WHERE new.SourceModule LIKE 'DailyLog%' AND DailyLogID = new.SourceRecordID),
+                             date(new.ParsingTimestamp)),
+        Title = new.SourceModule, Body = new.OriginalInput
+    WHERE SourceType = 'LLMParse' AND SourceID = new.ParsedDataID;
+END;
+CREATE TRIGGER IF NOT EXISTS TR_LLMParsedDataLog_Search_Delete AFTER DELETE ON LLM_Parsed_Data_Log BEGIN
+    DELETE FROM field_search_entries WHERE SourceType = 'LLMParse' AND SourceID = old.ParsedDataID;
+END;
+
+-- Backfill rows that existed before the triggers (no-ops on a new database)
+INSERT OR IGNORE INTO field_search_entries (SourceType, SourceID, ProjectID, EntryDate, Title, Body)
+SELECT 'DailyLog', DailyLogID, ProjectID, COALESCE(date(LogDate), LogDate), 'Daily log', COALESCE(Notes, '') FROM DailyLogs;
+INSERT OR IGNORE INTO field_search_entries (SourceType, SourceID, ProjectID, EntryDate, Title, Body)
+SELECT 'DailyLogTask', t.DailyLogTaskID, dl.ProjectID, COALESCE(date(dl.LogDate), dl.LogDate), 'Daily log task', t.TaskDescription
+FROM DailyLogTasks t LEFT JOIN DailyLogs dl ON dl.DailyLogID = t.DailyLogID;
+INSERT OR IGNORE INTO field_search_entries (SourceType, SourceID, ProjectID, EntryDate, Title, Body)
+SELECT 'DailyLogObservation', o.DailyLogObservationID, dl.ProjectID, COALESCE(date(dl.LogDate), dl.LogDate), o.ObservationType, o.Description
+FROM DailyLogObservations o LEFT JOIN DailyLogs dl ON dl.DailyLogID = o.DailyLogID;
+INSERT OR IGNORE INTO field_search_entries (SourceType, SourceID, ProjectID, EntryDate, Title, Body)
+SELECT 'DocumentNote', n.note_id, pd.ProjectID, COALESCE(date(n.created_at), n.created_at),
+       COALESCE(pd.DocumentName, 'Document') || COALESCE(' p. ' || n.page_number, ''), n.note_text
+FROM document_notes n LEFT JOIN ProjectDocuments pd ON pd.ProjectDocumentID = n.document_id;
+INSERT OR IGNORE INTO field_search_entries (SourceType, SourceID, ProjectID, EntryDate, Title, Body)
+SELECT 'Task', TaskID, ProjectID, COALESCE(date(ScheduledStartDate), date(DateCreated)), COALESCE(TaskName, TaskType), Description FROM Tasks;
+INSERT OR IGNORE INTO field_search_entries (SourceType, SourceID, ProjectID, EntryDate, Title, Body)
+SELECT 'LLMParse', l.ParsedDataID, dl.ProjectID, COALESCE(date(dl.LogDate), date(l.ParsingTimestamp)), l.SourceModule, l.OriginalInput
+FROM LLM_Parsed_Data_Log l LEFT JOIN DailyLogs dl ON l.SourceModule LIKE 'DailyLog%' AND dl.DailyLogID = l.SourceRecordID;
+-- END field_search
+
 -- Database Schema Creation Script Completed Successfully!
@@ -2,11 +2,14 @@ import sqlite3
 import os
 import hashlib
 import logging
+import threading
 
 logger = logging.getLogger(__name__)
 
 from configuration import Config
 
+# schema.sql sections that need the FTS5 extension; a fresh database gets them via their _ensure_* methods
+_FTS5_SCHEMA_SECTIONS = ('materials_search', 'field_search')
 
 class DatabaseManager:
     _instance = None
@@ -28,12 +31,15 @@ class DatabaseManager:
 
         db_uri = f"file:{self._db_file}?mode=rwc"
         try:
-            self.conn = sqlite3.connect(db_uri, uri=True)
+            # check_same_thread=False lets background jobs (e.g. the Data DNA pipeline) share the
+            # connection; access from worker threads must hold self.lock.
+            self.conn = sqlite3.connect(db_uri, uri=True, check_same_thread=False)
             logger.info(f"DatabaseManager connected to DB via URI: {db_uri}")
         except sqlite3.OperationalError as e:
             logger.error(f"Failed to connect to DB with URI {db_uri}: {e}. Falling back to path only.")
-            self.conn = sqlite3.connect(self._db_file)
+            self.conn = sqlite3.connect(self._db_file, check_same_thread=False)
 
+        self.lock = threading.RLock() # Serializes use of the shared connection across threads
         self.conn.row_factory = sqlite3.Row
         self.cursor = self.conn.cursor()
         logger.info(f"DatabaseManager connection established to DB: {self._db_file}")
@@ -46,6 +52,22 @@ class DatabaseManager:
             logger.info(f"Database file '{self._db_file}' found. Connecting to existing database.")
             # If DB exists, still ensure users table and EmployeeID column are up-to-date
             self._ensure_users_table_schema()
+            self._ensure_wbs_planning_schema()
+            self._ensure_materials_search_schema()
+            self._ensure_assembly_bom_schema()
+            self._ensure_prefab_scheduling_schema()
+            self._ensure_purchasing_indexes()
+            self._ensure_document_store_schema()
+            self._ensure_field_search_schema()
+            self._ensure_work_calendar_schema()
+            self._ensure_cpm_scheduling_schema()
+            self._ensure_risk_estimates_schema()
+            self._ensure_variance_indexes()
+            self._ensure_cost_rollups_schema()
+            self._ensure_wbs_rollup_actuals_schema()
+            self._ensure_evm_snapshots_schema()
+            self._ensure_alerts_schema()
+            self._ensure_cost_anomalies_schema()
 
         self._create_default_admin_if_not_exists()
 
@@ -59,10 +81,18 @@ class DatabaseManager:
                 sql_script = f.read()
 
             # The schema.sql now includes the CREATE TABLE IF NOT EXISTS users with EmployeeID
-            # So, we can directly execute it.
+            # So, we can directly execute it. Sections that need FTS5 are left out and applied
+            # afterwards by their _ensure_* methods, so SQLite builds without FTS5 still get a database.
+            for section_name in _FTS5_SCHEMA_SECTIONS:
+                begin_marker, end_marker = f"-- BEGIN {section_name}", f"-- END {section_name}"
+                start, end = sql_script.find(begin_marker), sql_script.find(end_marker)
+                if start != -1 and end != -1:
+                    sql_script = sql_script[:start] + sql_script[end + len(end_marker):]
             self.cursor.executescript(sql_script) # Use executescript for multi-statement SQL from file
             self.conn.commit()
             logger.info(f"Schema from {self._schema_file} applied successfully.")
+            self._ensure_materials_search_schema()
+            self._ensure_field_search_schema()
         except sqlite3.Error as e:
             logger.error(f"Error applying schema from {self._schema_file}: {e}")
             if os.path.exists(self._db_file) and not os.path.exists(self._db_file): # Check if we were creating it
@@ -105,6 +135,420 @@ class DatabaseManager:
             logger.error(f"Error ensuring 'users' table schema: {e}")
             # Not raising, to allow app to attempt to continue
 
+    def _ensure_wbs_planning_schema(self):
+        """
+        Ensures the WBS planning additions exist if DB already existed: hierarchy and spread-curve
+        columns on wbs_elements, the wbs_rollups table and the wbs_estimate_links mapping table.
+        """
+        try:
+            self.cursor.execute("PRAGMA table_info(wbs_elements)")
+            columns = [column[1] for column in self.cursor.fetchall()]
+            if not columns:
+                return # Table missing entirely; nothing to migrate
+            hierarchy_columns = {
+                'WBSLevel': "INT NOT NULL DEFAULT 1",
+                'WBSPath': "TEXT NULL",
+                'IsSummary': "BOOLEAN NOT NULL DEFAULT 0",
+                'SpreadCurve': "TEXT NULL", # Planned-value curve used by earned_value.py
+                'IsEstimateDerived': "BOOLEAN NOT NULL DEFAULT 0",
+            }
+            for column_name, column_def in hierarchy_columns.items():
+                if column_name not in columns:
+                    self.cursor.execute(f"ALTER TABLE wbs_elements ADD COLUMN {column_name} {column_def}")
+                    logger.info(f"Added '{column_name}' column to existing 'wbs_elements' table.")
+            if 'IsEstimateDerived' not in columns:
+                # Elements still linked to an estimate (or synthesized as parents) came from WBS generation
+                self.cursor.execute("UPDATE wbs_elements SET IsEstimateDerived = 1 WHERE ProcessedEstimateID IS NOT NULL OR IsSummary = 1")
+            self.cursor.execute("CREATE INDEX IF NOT EXISTS IX_WBSElements_Project_Path ON wbs_elements (ProjectID, WBSPath)")
+            self.cursor.execute("""
+                CREATE TABLE IF NOT EXISTS wbs_rollups (
+                    WBSElementID INTEGER PRIMARY KEY, ProjectID INT NOT NULL, WBSLevel INT NOT NULL DEFAULT 1,
+                    RolledEstimatedCost REAL NOT NULL DEFAULT 0.0, RolledBudgetAmount REAL NOT NULL DEFAULT 0.0,
+                    RolledActualCost REAL NOT NULL DEFAULT 0.0, LastRefreshed TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (WBSElementID) REFERENCES wbs_elements(WBSElementID) ON DELETE CASCADE,
+                    FOREIGN KEY (ProjectID) REFERENCES Projects(ProjectID) ON DELETE CASCADE
+                )
+            """)
+            self.cursor.execute("CREATE INDEX IF NOT EXISTS IX_WBSRollups_Project_Level ON wbs_rollups (ProjectID, WBSLevel)")
+
+            self.cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'wbs_estimate_links'")
+            if not self.cursor.fetchone():
+                self.cursor.execute("""
+                    CREATE TABLE wbs_estimate_links (
+                        WBSElementID INT NOT NULL, ProcessedEstimateID INT NOT NULL,
+                        PRIMARY KEY (WBSElementID, ProcessedEstimateID),
+                        FOREIGN KEY (WBSElementID) REFERENCES wbs_elements(WBSElementID) ON DELETE CASCADE,
+                        FOREIGN KEY (ProcessedEstimateID) REFERENCES processed_estimates(ProcessedEstimateID) ON DELETE CASCADE
+                    )
+                """)
+                self.cursor.execute("CREATE INDEX IF NOT EXISTS IX_WBSEstimateLinks_ProcessedEstimateID ON wbs_estimate_links (ProcessedEstimateID)")
+                # Backfill from the single estimate link older WBS rows carry; regeneration fills in the rest
+                self.cursor.execute("""
+                    INSERT OR IGNORE INTO wbs_estimate_links (WBSElementID, ProcessedEstimateID)
+                    SELECT WBSElementID, ProcessedEstimateID FROM wbs_elements WHERE ProcessedEstimateID IS NOT NULL
+                """)
+                logger.info("Created 'wbs_estimate_links' table and backfilled it from wbs_elements.")
+            self.conn.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Error ensuring WBS planning schema: {e}")
+
+    def _ensure_materials_search_schema(self):
+        """
+        Ensures the materials_fts full-text index and its sync triggers exist, indexing existing rows.
+        The DDL lives once in schema.sql between the materials_search markers.
+        """
+        try:
+            self.cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'materials_fts'")
+            if self.cursor.fetchone():
+                return
+            section_sql = self._read_schema_section('materials_search')
+            if not section_sql:
+                return
+            self.cursor.executescript(f"BEGIN;\n{section_sql}\nCOMMIT;") # All or nothing, so a failed run is retried next start
+            logger.info("Created 'materials_fts' full-text index and sync triggers.")
+        except sqlite3.Error as e:
+            # FTS5 may be unavailable in some SQLite builds; material search falls back to LIKE matching.
+            self.conn.rollback()
+            logger.error(f"Error ensuring materials full-text search schema: {e}")
+
+    def _ensure_assembly_bom_schema(self):
+        """
+        Ensures AssemblyComponents has the ChildAssemblyID column and the AssemblyBOMRevision
+        counter and its triggers exist if DB already existed. Older databases stored nested
+        sub-assemblies by AssemblyItemNumber in MaterialStockNumber; those rows are moved to ChildAssemblyID.
+        """
+        bump = "UPDATE AssemblyBOMRevision SET Revision = Revision + 1, LastModifiedDate = CURRENT_TIMESTAMP WHERE RevisionID = 1;"
+        try:
+            self.cursor.execute("PRAGMA table_info(AssemblyComponents)")
+            columns = [column[1] for column in self.cursor.fetchall()]
+            if columns and 'ChildAssemblyID' not in columns:
+                # MaterialStockNumber loses NOT NULL, so the table is rebuilt rather than altered
+                self.cursor.executescript("""
+                    BEGIN;
+                    CREATE TABLE AssemblyComponents_new (
+                        AssemblyComponentID INTEGER PRIMARY KEY AUTOINCREMENT,
+                        AssemblyID INTEGER NOT NULL,
+                        MaterialStockNumber TEXT NULL,
+                        ChildAssemblyID INTEGER NULL,
+                        QuantityInAssembly REAL NOT NULL,
+                        UnitOfMeasure TEXT NULL,
+                        DateCreated TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                        LastModifiedDate TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                        FOREIGN KEY (AssemblyID) REFERENCES Assemblies(AssemblyID) ON DELETE CASCADE,
+                        FOREIGN KEY (MaterialStockNumber) REFERENCES Materials(StockNumber) ON DELETE RESTRICT,
+                        FOREIGN KEY (ChildAssemblyID) REFERENCES Assemblies(AssemblyID) ON DELETE RESTRICT,
+                        CHECK ((MaterialStockNumber IS NULL) <> (ChildAssemblyID IS NULL))
+                    );
+                    INSERT INTO AssemblyComponents_new (AssemblyComponentID, AssemblyID, MaterialStockNumber, ChildAssemblyID,
+                                                        QuantityInAssembly, UnitOfMeasure, DateCreated, LastModifiedDate)
+                    SELECT ac.AssemblyComponentID, ac.AssemblyID,
+                           CASE WHEN sub.AssemblyID IS NULL THEN ac.MaterialStockNumber END, sub.AssemblyID,
+                           ac.QuantityInAssembly, ac.UnitOfMeasure, ac.DateCreated, ac.LastModifiedDate
+                    FROM AssemblyComponents ac
+                    LEFT JOIN Assemblies sub ON sub.AssemblyItemNumber = ac.MaterialStockNumber;
+                    DROP TABLE AssemblyComponents;
+                    ALTER TABLE AssemblyComponents_new RENAME TO AssemblyComponents;
+                    CREATE INDEX IX_AssemblyComponents_AssemblyID ON AssemblyComponents (AssemblyID);
+                    CREATE INDEX IX_AssemblyComponents_MaterialStockNumber ON AssemblyComponents (MaterialStockNumber);
+                    CREATE INDEX IX_AssemblyComponents_ChildAssemblyID ON AssemblyComponents (ChildAssemblyID);
+                    COMMIT;
+                """)
+                logger.info("Rebuilt 'AssemblyComponents' with a 'ChildAssemblyID' column for nested sub-assemblies.")
+            self.cursor.executescript(f"""
+                CREATE TABLE IF NOT EXISTS AssemblyBOMRevision (
+                    RevisionID INTEGER PRIMARY KEY CHECK (RevisionID = 1),
+                    Revision INTEGER NOT NULL DEFAULT 0,
+                    LastModifiedDate TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+                );
+                INSERT OR IGNORE INTO AssemblyBOMRevision (RevisionID, Revision) VALUES (1, 0);
+                CREATE TRIGGER IF NOT EXISTS TR_AssemblyComponents_BOM_Insert AFTER INSERT ON AssemblyComponents BEGIN {bump} END;
+                CREATE TRIGGER IF NOT EXISTS TR_AssemblyComponents_BOM_Update AFTER UPDATE ON AssemblyComponents BEGIN {bump} END;
+                CREATE TRIGGER IF NOT EXISTS TR_AssemblyComponents_BOM_Delete AFTER DELETE ON AssemblyComponents BEGIN {bump} END;
+                CREATE TRIGGER IF NOT EXISTS TR_Assemblies_BOM_ItemNumber AFTER UPDATE OF AssemblyItemNumber ON Assemblies BEGIN {bump} END;
+                CREATE TRIGGER IF NOT EXISTS TR_Assemblies_BOM_Insert AFTER INSERT ON Assemblies BEGIN {bump} END;
+                CREATE TRIGGER IF NOT EXISTS TR_Assemblies_BOM_Delete AFTER DELETE ON Assemblies BEGIN {bump} END;
+            """)
+            self.conn.commit()
+        except sqlite3.Error as e:
+            self.conn.rollback()
+            logger.error(f"Error ensuring assembly BOM schema: {e}")
+
+    def _ensure_prefab_scheduling_schema(self):
+        """Ensures the shop availability and production schedule tables exist if DB already existed."""
+        try:
+            self.cursor.executescript("""
+                CREATE TABLE IF NOT EXISTS ShopEmployeeAvailability (
+                    AvailabilityID INTEGER PRIMARY KEY AUTOINCREMENT,
+                    EmployeeID INTEGER NOT NULL,
+                    AvailabilityDate TEXT NOT NULL,
+                    AvailableHours REAL NOT NULL CHECK (AvailableHours >= 0 AND AvailableHours <= 24),
+                    Notes TEXT NULL,
+                    FOREIGN KEY (EmployeeID) REFERENCES Employees(EmployeeID) ON DELETE CASCADE,
+                    UNIQUE (EmployeeID, AvailabilityDate)
+                );
+                CREATE TABLE IF NOT EXISTS ProductionSchedule (
+                    ProductionID INTEGER PRIMARY KEY,
+                    SequenceNo INTEGER NOT NULL,
+                    ScheduledEmployeeID INTEGER NULL,
+                    LaborHours REAL NOT NULL DEFAULT 0,
+                    ScheduledStartDate TEXT NULL,
+                    ScheduledEndDate TEXT NULL,
+                    DueDate TEXT NULL,
+                    IsLate BOOLEAN NOT NULL DEFAULT 0,
+                    LastScheduled TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (ProductionID) REFERENCES Production_Assembly_Tracking(ProductionID) ON DELETE CASCADE,
+                    FOREIGN KEY (ScheduledEmployeeID) REFERENCES Employees(EmployeeID) ON DELETE SET NULL
+                );
+                CREATE INDEX IF NOT EXISTS IX_ProductionSchedule_Employee ON ProductionSchedule (ScheduledEmployeeID, ScheduledStartDate);
+            """)
+            self.conn.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Error ensuring prefab scheduling schema: {e}")
+
+    def _ensure_purchasing_indexes(self):
+        """Ensures indexes used by purchase-order consolidation exist if DB already existed."""
+        try:
+            self.cursor.execute(
+                "CREATE INDEX IF NOT EXISTS IX_Purchasing_Log_AssociatedPOLineItemID ON Purchasing_Log (AssociatedPOLineItemID)"
+            )
+            self.conn.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Error ensuring purchasing indexes: {e}")
+
+    def _ensure_document_store_schema(self):
+        """Ensures ProjectDocuments has the content-store metadata columns if DB already existed."""
+        try:
+            self.cursor.execute("PRAGMA table_info(ProjectDocuments)")
+            existing_columns = {row[1] for row in self.cursor.fetchall()}
+            for column, definition in (
+                ('ContentHash', 'TEXT(64) NULL'),
+                ('FileSizeBytes', 'INTEGER NULL'),
+                ('PageCount', 'INTEGER NULL'),
+                ('OriginalFilePath', 'TEXT(1000) NULL'),
+            ):
+                if column not in existing_columns:
+                    self.cursor.execute(f"ALTER TABLE ProjectDocuments ADD COLUMN {column} {definition}")
+                    logger.info(f"Added '{column}' column to 'ProjectDocuments' table.")
+            self.cursor.execute("CREATE INDEX IF NOT EXISTS IX_ProjectDocuments_ContentHash ON ProjectDocuments (ContentHash)")
+            self.conn.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Error ensuring document store schema: {e}")
+
+    def _read_schema_section(self, section_name):
+        """Returns the statements between '-- BEGIN <name>' and '-- END <name>' in schema.sql, or None."""
+        try:
+            with open(self._schema_file, 'r') as f:
+                sql_script = f.read()
+        except OSError as e:
+            logger.error(f"Could not read schema file {self._schema_file}: {e}")
+            return None
+        begin_marker, end_marker = f"-- BEGIN {section_name}", f"-- END {section_name}"
+        start, end = sql_script.find(begin_marker), sql_script.find(end_marker)
+        if start == -1 or end == -1:
+            logger.error(f"Schema section '{section_name}' not found in {self._schema_file}.")
+            return None
+        return sql_script[start + len(begin_marker):end]
+
+    def _ensure_field_search_schema(self):
+        """
+        Ensures the unified field search index (field_search_entries, field_search_fts and the
+        triggers on every source table) exists if DB already existed, backfilling existing rows.
+        The DDL lives once in schema.sql between the field_search markers.
+        """
+        try:
+            self.cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'field_search_fts'")
+            if self.cursor.fetchone():
+                # Index already built; only bring the text reindex trigger up to date
+                trigger_sql = self._read_schema_section('search_reindex_trigger')
+                if trigger_sql:
+                    self.cursor.executescript(f"BEGIN;\n{trigger_sql}\nCOMMIT;")
+                return
+            section_sql = self._read_schema_section('field_search')
+            if not section_sql:
+                return
+            self.cursor.executescript(f"BEGIN;\n{section_sql}\nCOMMIT;") # All or nothing, so a failed run is retried next start
+            logger.info("Created unified field search index and backfilled existing records.")
+        except sqlite3.Error as e:
+            # FTS5 may be unavailable in some SQLite builds; field search then reports itself unavailable.
+            self.conn.rollback()
+            logger.error(f"Error ensuring field search schema: {e}")
+
+    def _ensure_work_calendar_schema(self):
+        """Ensures the WorkCalendars and CalendarHolidays tables exist if DB already existed."""
+        try:
+            self.cursor.executescript("""
+                CREATE TABLE IF NOT EXISTS WorkCalendars (
+                    CalendarID INTEGER PRIMARY KEY AUTOINCREMENT, CalendarName TEXT NOT NULL UNIQUE,
+                    CalendarType TEXT NOT NULL DEFAULT 'Company', ProjectID INTEGER NULL, ParentCalendarID INTEGER NULL,
+                    WorkingDays TEXT NOT NULL DEFAULT '1111100', DateCreated TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (ProjectID) REFERENCES Projects(ProjectID) ON DELETE CASCADE,
+                    FOREIGN KEY (ParentCalendarID) REFERENCES WorkCalendars(CalendarID) ON DELETE SET NULL,
+                    CHECK (CalendarType IN ('Company', 'Project', 'Crew'))
+                );
+                CREATE INDEX IF NOT EXISTS IX_WorkCalendars_ProjectID ON WorkCalendars (ProjectID);
+                CREATE TABLE IF NOT EXISTS CalendarHolidays (
+                    CalendarID INTEGER NOT NULL, HolidayDate TEXT NOT NULL, Description TEXT NULL,
+                    PRIMARY KEY (CalendarID, HolidayDate),
+                    FOREIGN KEY (CalendarID) REFERENCES WorkCalendars(CalendarID) ON DELETE CASCADE
+                );
+            """)
+            self.conn.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Error ensuring work calendar schema: {e}")
+
+    def _ensure_cpm_scheduling_schema(self):
+        """
+        Ensures the CPM scheduling additions exist if DB already existed: the StartNoEarlierThan
+        column on Tasks and the cpm_scheduling section of schema.sql (dependencies, results,
+        revision counter and triggers), backfilling dependencies from PredecessorTaskID.
+        """
+        try:
+            self.cursor.execute("PRAGMA table_info(Tasks)")
+            columns = [column[1] for column in self.cursor.fetchall()]
+            if not columns:
+                return # Table missing entirely; nothing to migrate
+            if 'StartNoEarlierThan' not in columns:
+                self.cursor.execute("ALTER TABLE Tasks ADD COLUMN StartNoEarlierThan TEXT NULL")
+                self.conn.commit()
+                logger.info("Added 'StartNoEarlierThan' column to existing 'Tasks' table.")
+            self.cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'TaskScheduleRevision'")
+            if self.cursor.fetchone():
+                return
+            section_sql = self._read_schema_section('cpm_scheduling')
+            if not section_sql:
+                return
+            self.cursor.executescript(f"BEGIN;\n{section_sql}\nCOMMIT;")
+            logger.info("Created CPM scheduling tables and backfilled task dependencies.")
+        except sqlite3.Error as e:
+            self.conn.rollback()
+            logger.error(f"Error ensuring CPM scheduling schema: {e}")
+
+    def _ensure_risk_estimates_schema(self):
+        """Ensures the TaskDurationEstimates and WBSCostEstimates tables exist if DB already existed."""
+        try:
+            self.cursor.executescript("""
+                CREATE TABLE IF NOT EXISTS TaskDurationEstimates (
+                    TaskID INTEGER PRIMARY KEY, OptimisticDays REAL NOT NULL, MostLikelyDays REAL NOT NULL,
+                    PessimisticDays REAL NOT NULL, LastModifiedDate TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (TaskID) REFERENCES Tasks(TaskID) ON DELETE CASCADE,
+                    CHECK (OptimisticDays >= 0 AND OptimisticDays <= MostLikelyDays AND MostLikelyDays <= PessimisticDays)
+                );
+                CREATE TABLE IF NOT EXISTS WBSCostEstimates (
+                    WBSElementID INTEGER PRIMARY KEY, OptimisticCost REAL NOT NULL, MostLikelyCost REAL NOT NULL,
+                    PessimisticCost REAL NOT NULL, LastModifiedDate TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (WBSElementID) REFERENCES wbs_elements(WBSElementID) ON DELETE CASCADE,
+                    CHECK (OptimisticCost >= 0 AND OptimisticCost <= MostLikelyCost AND MostLikelyCost <= PessimisticCost)
+                );
+            """)
+            self.conn.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Error ensuring risk estimate schema: {e}")
+
+    def _ensure_variance_indexes(self):
+        """Ensures the covering index behind the SQL progress variance query exists if DB already existed."""
+        try:
+            self.cursor.execute(
+                "CREATE INDEX IF NOT EXISTS IX_ProgressUpdates_Project_WBS_Date ON progress_updates (ProjectID, WBSElementID, UpdateDate, CompletionPercentage)"
+            )
+            self.conn.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Error ensuring variance indexes: {e}")
+
+    def _ensure_cost_rollups_schema(self):
+        """
+        Ensures the cost and progress rollup tables and their triggers on actual_costs and
+        progress_updates exist if DB already existed, backfilling from existing rows.
+        The DDL lives once in schema.sql between the cost_rollups markers.
+        """
+        try:
+            self.cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'wbs_actual_rollups'")
+            if self.cursor.fetchone():
+                # Rollups were created before the section dropped the superseded covering index
+                self.cursor.execute("DROP INDEX IF EXISTS IX_ActualCosts_Project_WBS_Amount")
+                self.conn.commit()
+                return
+            section_sql = self._read_schema_section('cost_rollups')
+            if not section_sql:
+                return
+            self.cursor.executescript(f"BEGIN;\n{section_sql}\nCOMMIT;") # All or nothing, so a failed run is retried next start
+            logger.info("Created cost rollup tables and backfilled them from existing costs and progress.")
+        except sqlite3.Error as e:
+            self.conn.rollback()
+            logger.error(f"Error ensuring cost rollup schema: {e}")
+
+    def _ensure_wbs_rollup_actuals_schema(self):
+        """
+        Ensures the triggers that keep wbs_rollups.RolledActualCost in step with wbs_actual_rollups
+        exist if DB already existed, backfilling the stored subtree totals.
+        The DDL lives once in schema.sql between the wbs_rollup_actuals markers.
+        """
+        try:
+            self.cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'TR_WBSActualRollups_Subtree_Insert'")
+            if self.cursor.fetchone():
+                return
+            section_sql = self._read_schema_section('wbs_rollup_actuals')
+            if not section_sql:
+                return
+            self.cursor.executescript(f"BEGIN;\n{section_sql}\nCOMMIT;")
+            logger.info("Created WBS rollup actual-cost triggers and backfilled stored subtree totals.")
+        except sqlite3.Error as e:
+            self.conn.rollback()
+            logger.error(f"Error ensuring WBS rollup actual-cost triggers: {e}")
+
+    def _ensure_evm_snapshots_schema(self):
+        """
+        Ensures the EVM snapshot history tables exist if DB already existed.
+        The DDL lives once in schema.sql between the evm_snapshots markers.
+        """
+        try:
+            self.cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'evm_snapshot_status'")
+            if self.cursor.fetchone():
+                return
+            section_sql = self._read_schema_section('evm_snapshots')
+            if not section_sql:
+                return
+            self.cursor.executescript(f"BEGIN;\n{section_sql}\nCOMMIT;")
+            logger.info("Created EVM snapshot history tables.")
+        except sqlite3.Error as e:
+            self.conn.rollback()
+            logger.error(f"Error ensuring EVM snapshot schema: {e}")
+
+    def _ensure_alerts_schema(self):
+        """
+        Ensures the alerts table and its indexes exist if DB already existed.
+        The DDL lives once in schema.sql between the alerts markers.
+        """
+        try:
+            self.cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'alerts'")
+            if self.cursor.fetchone():
+                return
+            section_sql = self._read_schema_section('alerts')
+            if not section_sql:
+                return
+            self.cursor.executescript(f"BEGIN;\n{section_sql}\nCOMMIT;")
+            logger.info("Created alerts table.")
+        except sqlite3.Error as e:
+            self.conn.rollback()
+            logger.error(f"Error ensuring alerts schema: {e}")
+
+    def _ensure_cost_anomalies_schema(self):
+        """
+        Ensures the cost anomaly review queue and scan status tables exist if DB already existed.
+        The DDL lives once in schema.sql between the cost_anomalies markers.
+        """
+        try:
+            self.cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'cost_anomalies'")
+            if self.cursor.fetchone():
+                return
+            section_sql = self._read_schema_section('cost_anomalies')
+            if not section_sql:
+                return
+            self.cursor.executescript(f"BEGIN;\n{section_sql}\nCOMMIT;")
+            logger.info("Created cost anomaly tables.")
+        except sqlite3.Error as e:
+            self.conn.rollback()
+            logger.error(f"Error ensuring cost anomalies schema: {e}")
+
     def _create_default_admin_if_not_exists(self):
         """Creates the default admin user if it doesn't exist."""
         try:
@@ -133,45 +577,47 @@ class DatabaseManager:
         return self.cursor
 
     def execute_query(self, query, params=None, commit=False, fetch_one=False, fetch_all=False):
-        try:
-            cursor = self.conn.cursor()
-            if params:
-                cursor.execute(query, params)
-            else:
-                cursor.execute(query)
+        with self.lock:
+            try:
+                cursor = self.conn.cursor()
+                if params:
+                    cursor.execute(query, params)
+                else:
+                    cursor.execute(query)
 
-            if commit:
-                self.conn.commit()
-                return cursor
-            elif fetch_one:
-                return cursor.fetchone()
-            elif fetch_all:
-                return cursor.fetchall()
-            return True
-        except sqlite3.Error as e:
-            logger.error(f"Database error executing query: {query[:100]}... - Error: {e}", exc_info=True)
-            if commit:
-                try:
-                    self.conn.rollback()
-                except sqlite3.Error as rb_err:
-                    logger.error(f"Rollback failed: {rb_err}")
-            return False
+                if commit:
+                    self.conn.commit()
+                    return cursor
+                elif fetch_one:
+                    return cursor.fetchone()
+                elif fetch_all:
+                    return cursor.fetchall()
+                return True
+            except sqlite3.Error as e:
+                logger.error(f"Database error executing query: {query[:100]}... - Error: {e}", exc_info=True)
+                if commit:
+                    try:
+                        self.conn.rollback()
+                    except sqlite3.Error as rb_err:
+                        logger.error(f"Rollback failed: {rb_err}")
+                return False
 
     def execute_many_query(self, query, params_list, commit=False):
-        try:
-            cursor = self.conn.cursor()
-            cursor.executemany(query, params_list)
-            if commit:
-                self.conn.commit()
-            return True
-        except sqlite3.Error as e:
-            logger.error(f"Database error during executemany: {query[:100]}... - Error: {e}", exc_info=True)
-            if commit:
-                try:
-                    self.conn.rollback()
-                except sqlite3.Error as rb_err:
-                    logger.error(f"Rollback failed: {rb_err}")
-            return False
+        with self.lock:
+            try:
+                cursor = self.conn.cursor()
+                cursor.executemany(query, params_list)
+                if commit:
+                    self.conn.commit()
+                return True
+            except sqlite3.Error as e:
+                logger.error(f"Database error during executemany: {query[:100]}... - Error: {e}", exc_info=True)
+                if commit:
+                    try:
+                        self.conn.rollback()
+                    except sqlite3.Error as rb_err:
+                        logger.error(f"Rollback failed: {rb_err}")
+                return False
 
     def close_connection(self):
         if self.conn:
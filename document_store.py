@@ -0,0 +1,140 @@
+"""
+Content-addressed storage for project documents.
+
+Each distinct file is stored once under objects/<first two hex chars>/<sha256>, read-only.
+Projects see documents through hard links named projects/<ProjectID>/<hash prefix>-<file name>,
+so the same drawing set uploaded to several projects or revisions costs no extra space
+and keeps a readable file name. Where hard links are unsupported the project path falls
+back to the object path itself.
+"""
+import hashlib
+import logging
+import os
+import re
+import stat
+import tempfile
+
+from configuration import Config
+
+logger = logging.getLogger(__name__)
+
+_CHUNK_SIZE = 1024 * 1024
+_UNSAFE_FILENAME_CHARS = re.compile(r'[^\w.\- ]+')
+
+
+def count_pdf_pages(file_path, file_name=None):
+    """
+    Returns the page count of a PDF, or None if it isn't a readable PDF or PyPDF2 is unavailable.
+    file_name is checked for the .pdf extension instead of file_path when given (stored objects have none).
+    """
+    if not str(file_name or file_path).lower().endswith('.pdf'):
+        return None
+    try:
+        import PyPDF2
+    except ImportError:
+        logger.warning("PyPDF2 is not installed; PDF page counts will not be recorded.")
+        return None
+    try:
+        with open(file_path, 'rb') as f:
+            return len(PyPDF2.PdfReader(f).pages)
+    except Exception as e:
+        logger.warning(f"Could not read page count of '{file_path}': {e}")
+        return None
+
+
+class DocumentStore:
+    """Stores files by SHA-256 and hands out per-project hard links to them."""
+
+    def __init__(self, root_dir=None):
+        self.root_dir = root_dir or Config.get_document_store_dir()
+        self.objects_dir = os.path.join(self.root_dir, 'objects')
+        self.projects_dir = os.path.join(self.root_dir, 'projects')
+        self.tmp_dir = os.path.join(self.root_dir, 'tmp')
+        for directory in (self.objects_dir, self.projects_dir, self.tmp_dir):
+            os.makedirs(directory, exist_ok=True)
+
+    def object_path(self, content_hash):
+        return os.path.join(self.objects_dir, content_hash[:2], content_hash)
+
+    def contains(self, content_hash):
+        return os.path.isfile(self.object_path(content_hash))
+
+    def store_file(self, source_path, project_id=None):
+        """
+        Copies a file into the store, hashing it in the same pass so the source (often on a
+        network share) is read only once.
+        Args:
+            source_path (str): File to store.
+            project_id (int, optional): Also create the project's hard link to the object.
+        Returns:
+            dict: content_hash, object_path, file_path (project link, or the object path),
+                  size_bytes, page_count (None for non-PDFs and for deduplicated content)
+                  and deduplicated (True if the content was already stored).
+        Raises:
+            FileNotFoundError: If source_path is not a file.
+        """
+        if not os.path.isfile(source_path):
+            raise FileNotFoundError(f"Document not found: {source_path}")
+
+        digest = hashlib.sha256()
+        size_bytes = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp_dir)
+        try:
+            with os.fdopen(fd, 'wb') as out, open(source_path, 'rb') as src:
+                for chunk in iter(lambda: src.read(_CHUNK_SIZE), b''):
+                    digest.update(chunk)
+                    out.write(chunk)
+                    size_bytes += len(chunk)
+            content_hash = digest.hexdigest()
+            object_path = self.object_path(content_hash)
+            deduplicated = os.path.isfile(object_path)
+            if not deduplicated:
+                os.makedirs(os.path.dirname(object_path), exist_ok=True)
+                os.replace(tmp_path, object_path)
+                os.chmod(object_path, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH) # Objects are immutable
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        # Count pages from the local copy; for known content the caller already has the count
+        page_count = None if deduplicated else count_pdf_pages(object_path, os.path.basename(source_path))
+        if deduplicated:
+            logger.info(f"Document '{source_path}' already stored as {content_hash[:12]}.")
+        file_path = self.link_for_project(content_hash, project_id, os.path.basename(source_path)) if project_id else object_path
+        return {
+            'content_hash': content_hash,
+            'object_path': object_path,
+            'file_path': file_path,
+            'size_bytes': size_bytes,
+            'page_count': page_count,
+            'deduplicated': deduplicated,
+        }
+
+    def link_for_project(self, content_hash, project_id, file_name):
+        """Returns a per-project hard link to a stored object, creating it if needed."""
+        object_path = self.object_path(content_hash)
+        safe_name = _UNSAFE_FILENAME_CHARS.sub('_', file_name).strip() or 'document'
+        project_dir = os.path.join(self.projects_dir, str(project_id))
+        link_path = os.path.join(project_dir, f"{content_hash[:12]}-{safe_name}")
+        if os.path.isfile(link_path):
+            return link_path
+        try:
+            os.makedirs(project_dir, exist_ok=True)
+            os.link(object_path, link_path)
+            return link_path
+        except OSError as e:
+            # e.g. filesystems without hard links; the object itself is still a valid path
+            logger.warning(f"Could not hard-link {content_hash[:12]} for project {project_id}: {e}")
+            return object_path
+
+    def disk_usage_bytes(self):
+        """Bytes actually used by stored objects (hard links are not counted twice)."""
+        total = 0
+        for dirpath, _, filenames in os.walk(self.objects_dir):
+            total += sum(os.path.getsize(os.path.join(dirpath, name)) for name in filenames)
+        return total
+
+
+if __name__ == "__main__":
+    store = DocumentStore()
+    print(f"Document store at {store.root_dir}: {store.disk_usage_bytes()} bytes in objects.")
@@ -0,0 +1,298 @@
+import logging
+from collections import OrderedDict
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+import constants
+from configuration import Config
+from exceptions import AppValidationError
+from work_calendar import CalendarManager, to_day_array
+
+logger = logging.getLogger(__name__)
+
+# wbs_elements.SpreadCurve values: how a budget is planned to be spent between StartDate and EndDate
+SPREAD_LINEAR = 'linear'
+SPREAD_FRONT_LOADED = 'front'
+SPREAD_BACK_LOADED = 'back'
+SPREAD_CURVES = (SPREAD_LINEAR, SPREAD_FRONT_LOADED, SPREAD_BACK_LOADED)
+# Projects whose daily matrices stay cached; each cube is dates x WBS elements, so keep only the recently used few
+_MAX_CACHED_CUBES = 4
+
+
+def safe_ratio(numerator, denominator):
+    """numerator / denominator with NaN where the denominator is zero."""
+    numerator = np.asarray(numerator, dtype=float)
+    denominator = np.asarray(denominator, dtype=float)
+    return np.divide(numerator, denominator, out=np.full(np.broadcast(numerator, denominator).shape, np.nan), where=denominator != 0)
+
+
+def apply_spread_curve(fraction, spread_curves):
+    """
+    Shapes the fraction of working days elapsed (0..1; the last axis runs over elements) into the
+    fraction of budget planned, per element SpreadCurve (None uses Config.EVM_DEFAULT_SPREAD_CURVE).
+    """
+    curves = pd.Series(spread_curves, dtype=object).fillna(Config.EVM_DEFAULT_SPREAD_CURVE).str.lower().to_numpy()
+    return np.where(curves == SPREAD_FRONT_LOADED, 1 - (1 - fraction) ** 2,
+                    np.where(curves == SPREAD_BACK_LOADED, fraction ** 2, fraction))
+
+
+class EarnedValueEngine:
+    """
+    Time-phased earned value for a project's WBS elements.
+
+    Each (non-summary, non-retired) WBS budget is spread over the working days between its
+    StartDate and EndDate (the project's dates when it has none) along its SpreadCurve:
+    linear, front-loaded (1 - (1 - t)^2) or back-loaded (t^2), where t is the fraction of
+    working days elapsed. Actual costs and progress updates are scattered into daily
+    (dates x WBS) increment matrices and summed cumulatively, so PV, EV and AC for any day
+    are one row of three cumulative matrices. EV uses the latest progress on or before a day.
+
+    The matrices are built once per project and reused until the project's WBS, costs or
+    progress change, so "as of" queries and time series do not re-read the raw tables. Only the
+    most recently used few projects are kept.
+    """
+
+    def __init__(self, db_m_instance, calendar_manager_instance=None):
+        if db_m_instance is None:
+            raise ValueError("DatabaseManager instance is required for EarnedValueEngine.")
+        self.db_manager = db_m_instance
+        self.calendar_manager = calendar_manager_instance if calendar_manager_instance else CalendarManager(self.db_manager)
+        self._cubes = OrderedDict() # ProjectID -> (fingerprint, cube), least recently used first
+        logger.info("EarnedValueEngine initialized with provided db_manager.")
+
+    def invalidate(self, project_id=None):
+        """Drops cached time series for one project, or all of them."""
+        if project_id is None:
+            self._cubes.clear()
+        else:
+            self._cubes.pop(project_id, None)
+
+    def _fingerprint(self, project_id):
+        """Cheap signature of the WBS rows plus the cost/progress revision bumped by the rollup triggers."""
+        row = self.db_manager.execute_query("""
+            SELECT
+                (SELECT COUNT(*) || ':' || TOTAL(EstimatedCost) || ':' || TOTAL(julianday(StartDate)) || ':'
+                        || TOTAL(julianday(EndDate)) || ':' || GROUP_CONCAT(COALESCE(SpreadCurve, '') || COALESCE(Status, '') || IsSummary, '')
+                 FROM wbs_elements WHERE ProjectID = ?1) AS WBS,
+                (SELECT Revision FROM cost_rollup_revisions WHERE ProjectID = ?1) AS CostRevision,
+                (SELECT IFNULL(StartDate, '') || IFNULL(EndDate, '') FROM Projects WHERE ProjectID = ?1) AS ProjectDates
+        """, (project_id,), fetch_one=True)
+        return tuple(row) if row else None
+
+    def _get_cube(self, project_id):
+        fingerprint = self._fingerprint(project_id)
+        cached = self._cubes.get(project_id)
+        if cached is not None and cached[0] == fingerprint:
+            self._cubes.move_to_end(project_id)
+            return cached[1]
+        cube = self._build_cube(project_id)
+        self._cubes[project_id] = (fingerprint, cube)
+        self._cubes.move_to_end(project_id)
+        while len(self._cubes) > _MAX_CACHED_CUBES:
+            self._cubes.popitem(last=False)
+        return cube
+
+    def _build_cube(self, project_id):
+        """Reads the project's WBS budgets, costs and progress into cumulative daily PV/EV/AC matrices."""
+        wbs = pd.DataFrame.from_records([tuple(row) for row in self.db_manager.execute_query("""
+            SELECT WBSElementID, WBSCode, Description, StartDate, EndDate, COALESCE(EstimatedCost, 0), SpreadCurve
+            FROM wbs_elements
+            WHERE ProjectID = ? AND IsSummary = 0 AND COALESCE(Status, '') != ?
+            ORDER BY WBSCode
+        """, (project_id, constants.WBS_STATUS_RETIRED), fetch_all=True) or []],
+            columns=['wbs_element_id', 'wbs_code', 'wbs_description', 'start_date', 'end_date', 'bac', 'spread_curve'])
+        costs = pd.DataFrame.from_records([tuple(row) for row in self.db_manager.execute_query(
+            "SELECT WBSElementID, TransactionDate, TotalAmount FROM cost_daily_rollups WHERE ProjectID = ?", (project_id,), fetch_all=True) or []],
+            columns=['wbs_element_id', 'date', 'amount'])
+        progress = pd.DataFrame.from_records([tuple(row) for row in self.db_manager.execute_query("""
+            SELECT WBSElementID, UpdateDate, CompletionPercentage FROM progress_updates
+            WHERE ProjectID = ? AND WBSElementID IS NOT NULL ORDER BY WBSElementID, UpdateDate, ProgressUpdateID
+        """, (project_id,), fetch_all=True) or []], columns=['wbs_element_id', 'date', 'percent'])
+        project = self.db_manager.execute_query("SELECT StartDate, EndDate FROM Projects WHERE ProjectID = ?", (project_id,), fetch_one=True)
+
+        # Elements without their own dates follow the project's
+        if project:
+            wbs['start_date'] = wbs['start_date'].fillna(project['StartDate'])
+            wbs['end_date'] = wbs['end_date'].fillna(project['EndDate'])
+        dated = wbs['start_date'].notna() & wbs['end_date'].notna()
+        wbs_start = np.full(len(wbs), np.datetime64('NaT'), dtype='datetime64[D]')
+        wbs_end = wbs_start.copy()
+        if dated.any():
+            wbs_start[dated.to_numpy()] = to_day_array(wbs.loc[dated, 'start_date'].astype(str).str[:10])
+            wbs_end[dated.to_numpy()] = to_day_array(wbs.loc[dated, 'end_date'].astype(str).str[:10])
+        cost_dates = to_day_array(costs['date'].astype(str).str[:10]) if not costs.empty else np.array([], dtype='datetime64[D]')
+        progress_dates = to_day_array(progress['date'].astype(str).str[:10]) if not progress.empty else np.array([], dtype='datetime64[D]')
+
+        all_dates = np.concatenate([wbs_start[~np.isnat(wbs_start)], wbs_end[~np.isnat(wbs_end)], cost_dates, progress_dates])
+        if not len(all_dates):
+            return None
+        first, last = all_dates.min(), all_dates.max()
+        days = np.arange(first, last + np.timedelta64(1, 'D'))
+        day_count, wbs_count = len(days), len(wbs)
+        wbs_index = {int(wbs_id): w for w, wbs_id in enumerate(wbs['wbs_element_id'])}
+        bac = wbs['bac'].to_numpy(dtype=float)
+
+        # PV: fraction of each element's working days elapsed by each day, shaped by its curve
+        calendar = self.calendar_manager.get_project_calendar(project_id)
+        working = calendar.is_working_day(days).astype(np.int64)
+        worked = np.cumsum(working)
+        fraction = np.ones((day_count, wbs_count)) # Undated elements are planned in full
+        has_dates = ~np.isnat(wbs_start) & ~np.isnat(wbs_end) & (wbs_end >= wbs_start)
+        if has_dates.any():
+            start_i = (wbs_start[has_dates] - first).astype(np.int64)
+            end_i = (wbs_end[has_dates] - first).astype(np.int64)
+            before = worked[start_i] - working[start_i]
+            total = worked[end_i] - before
+            elapsed = worked[:, None] - before[None, :]
+            # An element spanning no working days is planned in full on its start date
+            fraction[:, has_dates] = np.where(total > 0, np.clip(safe_ratio(elapsed, np.maximum(total, 1)[None, :]), 0, 1),
+                                              (np.arange(day_count)[:, None] >= start_i[None, :]).astype(float))
+        planned = apply_spread_curve(fraction, wbs['spread_curve']) * bac[None, :]
+
+        # EV: each progress update adds (percent - previous percent) of the budget on its day
+        earned = np.zeros((day_count, wbs_count))
+        if not progress.empty:
+            progress_wbs = progress['wbs_element_id'].map(wbs_index)
+            known = progress_wbs.notna().to_numpy()
+            w = progress_wbs[known].to_numpy(dtype=np.int64)
+            percent = progress['percent'].to_numpy(dtype=float)[known]
+            same_element = np.concatenate(([False], w[1:] == w[:-1]))
+            delta = percent - np.where(same_element, np.roll(percent, 1), 0)
+            np.add.at(earned, ((progress_dates[known] - first).astype(np.int64), w), delta / 100 * bac[w])
+        earned = np.cumsum(earned, axis=0)
+
+        # AC: costs on leaf elements by element, everything else (no WBS (0), summary, retired) project-level
+        actual = np.zeros((day_count, wbs_count))
+        actual_other = np.zeros(day_count)
+        if not costs.empty:
+            cost_wbs = costs['wbs_element_id'].map(wbs_index)
+            known = cost_wbs.notna().to_numpy()
+            cost_day = (cost_dates - first).astype(np.int64)
+            amount = costs['amount'].to_numpy(dtype=float)
+            np.add.at(actual, (cost_day[known], cost_wbs[known].to_numpy(dtype=np.int64)), amount[known])
+            np.add.at(actual_other, cost_day[~known], amount[~known])
+        actual = np.cumsum(actual, axis=0)
+        actual_other = np.cumsum(actual_other)
+
+        return {'days': days, 'wbs': wbs[['wbs_element_id', 'wbs_code', 'wbs_description', 'bac']].reset_index(drop=True),
+                'pv': planned, 'ev': earned, 'ac': actual, 'ac_other': actual_other}
+
+    @staticmethod
+    def _row_for(cube, as_of_date):
+        """Index of the last day on or before as_of_date, or -1 if it precedes the series."""
+        day = to_day_array(as_of_date or date.today())[0]
+        return int(np.searchsorted(cube['days'], day, side='right')) - 1
+
+    def get_wbs_performance(self, project_id, as_of_date=None):
+        """
+        PV, EV and AC per WBS element as of a date (default today), with variances and indices.
+        Returns:
+            DataFrame: wbs_element_id, wbs_code, wbs_description, bac, planned_value, earned_value,
+                       actual_cost, schedule_variance, cost_variance, spi, cpi. Empty if the
+                       project has no dated budgets, costs or progress.
+        """
+        cube = self._get_cube(project_id)
+        if cube is None:
+            return pd.DataFrame()
+        row = self._row_for(cube, as_of_date)
+        performance = cube['wbs'].copy()
+        if row < 0:
+            pv = ev = ac = np.zeros(len(performance))
+        else:
+            pv, ev, ac = cube['pv'][row], cube['ev'][row], cube['ac'][row]
+        performance['planned_value'] = pv
+        performance['earned_value'] = ev
+        performance['actual_cost'] = ac
+        performance['schedule_variance'] = ev - pv
+        performance['cost_variance'] = ev - ac
+        performance['spi'] = safe_ratio(ev, pv)
+        performance['cpi'] = safe_ratio(ev, ac)
+        return performance
+
+    def get_project_performance(self, project_id, as_of_date=None):
+        """
+        Project totals as of a date (default today): BAC, PV, EV, AC (including costs not charged
+        to a leaf WBS element), SV, CV, SPI and CPI. Returns an empty dict if there is no data.
+        """
+        cube = self._get_cube(project_id)
+        if cube is None:
+            return {}
+        row = self._row_for(cube, as_of_date)
+        pv, ev = (float(cube['pv'][row].sum()), float(cube['ev'][row].sum())) if row >= 0 else (0.0, 0.0)
+        ac = float(cube['ac'][row].sum() + cube['ac_other'][row]) if row >= 0 else 0.0
+        return {
+            'project_id': project_id,
+            'as_of_date': str(to_day_array(as_of_date or date.today())[0]),
+            'budget_at_completion': float(cube['wbs']['bac'].sum()),
+            'planned_value': pv,
+            'earned_value': ev,
+            'actual_cost': ac,
+            'schedule_variance': ev - pv,
+            'cost_variance': ev - ac,
+            'spi': float(safe_ratio(ev, pv)),
+            'cpi': float(safe_ratio(ev, ac)),
+        }
+
+    def get_period_values(self, project_id, as_of_dates):
+        """
+        Cumulative PV, EV and AC per WBS element and for the whole project as of each date, from
+        one pass over the cached matrices (used by evm_snapshots to capture several periods at once).
+        Returns:
+            DataFrame: as_of_date, wbs_element_id (0 = project total, whose AC includes costs not
+                       charged to a leaf element), bac, planned_value, earned_value, actual_cost.
+                       Dates before the project's first day of data are left out.
+        """
+        columns = ['as_of_date', 'wbs_element_id', 'bac', 'planned_value', 'earned_value', 'actual_cost']
+        cube = self._get_cube(project_id)
+        days = to_day_array(as_of_dates) if len(as_of_dates) else np.array([], dtype='datetime64[D]')
+        if cube is None or not len(days):
+            return pd.DataFrame(columns=columns)
+        rows = np.searchsorted(cube['days'], days, side='right') - 1
+        days, rows = days[rows >= 0], rows[rows >= 0]
+        wbs_ids = cube['wbs']['wbs_element_id'].to_numpy(dtype=np.int64)
+        bac = cube['wbs']['bac'].to_numpy(dtype=float)
+        pv, ev, ac = cube['pv'][rows], cube['ev'][rows], cube['ac'][rows]
+        totals = pd.DataFrame({'as_of_date': days, 'wbs_element_id': 0, 'bac': bac.sum(), 'planned_value': pv.sum(axis=1),
+                               'earned_value': ev.sum(axis=1), 'actual_cost': ac.sum(axis=1) + cube['ac_other'][rows]})
+        elements = pd.DataFrame({'as_of_date': np.repeat(days, len(wbs_ids)), 'wbs_element_id': np.tile(wbs_ids, len(days)),
+                                 'bac': np.tile(bac, len(days)), 'planned_value': pv.ravel(), 'earned_value': ev.ravel(),
+                                 'actual_cost': ac.ravel()})
+        return pd.concat([totals, elements], ignore_index=True)[columns]
+
+    def get_time_series(self, project_id, wbs_element_id=None, frequency=None):
+        """
+        Cumulative PV, EV and AC over time for the project (or one WBS element).
+        Args:
+            frequency (str, optional): pandas offset alias such as 'W' or 'ME' to keep one row
+                                       per period (its last day); daily by default.
+        Returns:
+            DataFrame indexed by date with planned_value, earned_value, actual_cost, spi and cpi.
+        """
+        cube = self._get_cube(project_id)
+        if cube is None:
+            return pd.DataFrame()
+        if wbs_element_id is None:
+            pv, ev = cube['pv'].sum(axis=1), cube['ev'].sum(axis=1)
+            ac = cube['ac'].sum(axis=1) + cube['ac_other']
+        else:
+            matches = np.flatnonzero(cube['wbs']['wbs_element_id'].to_numpy() == wbs_element_id)
+            if not len(matches):
+                raise AppValidationError(f"WBS element {wbs_element_id} has no earned value data in project {project_id}.")
+            w = matches[0]
+            pv, ev, ac = cube['pv'][:, w], cube['ev'][:, w], cube['ac'][:, w]
+        series = pd.DataFrame({'planned_value': pv, 'earned_value': ev, 'actual_cost': ac},
+                              index=pd.DatetimeIndex(cube['days'], name='date'))
+        if frequency:
+            series = series.resample(frequency).last()
+        series['spi'] = safe_ratio(series['earned_value'], series['planned_value'])
+        series['cpi'] = safe_ratio(series['earned_value'], series['actual_cost'])
+        return series
+
+
+if __name__ == "__main__":
+    from database_manager import db_manager
+    engine = EarnedValueEngine(db_manager)
+    print(engine.get_project_performance(1))
+    print(engine.get_time_series(1, frequency='ME').to_string())
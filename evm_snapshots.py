@@ -0,0 +1,202 @@
+import logging
+import sys
+from datetime import date
+
+import pandas as pd
+
+import constants
+from configuration import Config
+from earned_value import EarnedValueEngine, safe_ratio
+
+logger = logging.getLogger(__name__)
+
+TREND_COLUMNS = ['bac', 'planned_value', 'earned_value', 'actual_cost', 'schedule_variance', 'cost_variance', 'spi', 'cpi']
+
+# Each project's data version (cost/progress revision bumped by the rollup triggers, project dates and a
+# WBS signature) next to what the last capture recorded
+_CAPTURE_STATUS_SQL = """
+SELECT p.ProjectID,
+       COALESCE(r.Revision, 0) || '|' || IFNULL(p.StartDate, '') || IFNULL(p.EndDate, '') || '|' || COALESCE(w.Signature, '') AS DataVersion,
+       s.PeriodEnd, s.AsOfDate, s.DataVersion AS CapturedVersion
+FROM Projects p
+LEFT JOIN cost_rollup_revisions r ON r.ProjectID = p.ProjectID
+LEFT JOIN (
+    SELECT ProjectID, COUNT(*) || ':' || TOTAL(EstimatedCost) || ':' || TOTAL(julianday(StartDate)) || ':' || TOTAL(julianday(EndDate))
+           || ':' || GROUP_CONCAT(COALESCE(SpreadCurve, '') || COALESCE(Status, '') || IsSummary, '') AS Signature
+    FROM wbs_elements GROUP BY ProjectID
+) w ON w.ProjectID = p.ProjectID
+LEFT JOIN evm_snapshot_status s ON s.ProjectID = p.ProjectID
+WHERE p.ProjectID IN ({placeholders})
+ORDER BY p.ProjectID
+"""
+
+
+def _trend_frame(rows):
+    """Snapshot rows (PeriodEnd, BAC, PV, EV, AC) oldest first -> trend DataFrame indexed by period_end."""
+    trend = pd.DataFrame.from_records([tuple(row) for row in rows],
+                                      columns=['period_end', 'bac', 'planned_value', 'earned_value', 'actual_cost'])
+    trend.index = pd.DatetimeIndex(pd.to_datetime(trend.pop('period_end')), name='period_end')
+    trend['schedule_variance'] = trend['earned_value'] - trend['planned_value']
+    trend['cost_variance'] = trend['earned_value'] - trend['actual_cost']
+    trend['spi'] = safe_ratio(trend['earned_value'], trend['planned_value'])
+    trend['cpi'] = safe_ratio(trend['earned_value'], trend['actual_cost'])
+    return trend[TREND_COLUMNS]
+
+
+class EvmSnapshotManager:
+    """
+    Per-period history of earned value metrics, so trend lines read a few rows per period
+    instead of replaying every cost and progress record.
+
+    capture_snapshots() is the scheduled job: for each project it writes one evm_snapshots row
+    per WBS element (plus WBSElementID 0 for the project total) for the current period
+    (Config.EVM_SNAPSHOT_PERIOD) as of today. It is incremental: projects whose data version
+    (cost/progress revision from the rollup triggers, WBS and project dates) and as-of day are
+    unchanged since the last run are skipped, closed periods are rewritten once as of their last
+    day when the next run finds the period has rolled over, and older periods are never touched.
+    Values come from EarnedValueEngine, which reads the cost_daily_rollups.
+    A project's first capture backfills up to Config.EVM_SNAPSHOT_BACKFILL_PERIODS past periods.
+    """
+
+    def __init__(self, db_m_instance, earned_value_instance=None):
+        if db_m_instance is None:
+            raise ValueError("DatabaseManager instance is required for EvmSnapshotManager.")
+        self.db_manager = db_m_instance
+        self.earned_value = earned_value_instance if earned_value_instance else EarnedValueEngine(self.db_manager)
+        logger.info("EvmSnapshotManager initialized with provided db_manager.")
+
+    def get_project_ids(self, project_ids=None):
+        """The given project IDs de-duplicated and sorted, or every Active project when None."""
+        if project_ids is not None:
+            return sorted({int(project_id) for project_id in project_ids})
+        rows = self.db_manager.execute_query("""
+            SELECT p.ProjectID FROM Projects p JOIN ProjectStatuses ps ON ps.ProjectStatusID = p.ProjectStatusID
+            WHERE ps.StatusName = ? ORDER BY p.ProjectID
+        """, (constants.PROJECT_STATUS_ACTIVE,), fetch_all=True)
+        return [row['ProjectID'] for row in rows or []]
+
+    def capture_snapshots(self, project_ids=None, as_of_date=None, progress_callback=None, cancel_event=None):
+        """
+        Captures the current period's EVM snapshot for each project (every Active project by default).
+        Can run as a background_jobs.BackgroundJob target.
+        Args:
+            as_of_date (date or str, optional): Day the current period is measured as of; today by default.
+        Returns:
+            tuple: (dict with captured/skipped project counts and rows written, message)
+        """
+        as_of = pd.Timestamp(as_of_date or date.today()).date()
+        current_period = pd.Period(as_of, freq=Config.EVM_SNAPSHOT_PERIOD)
+        project_ids = self.get_project_ids(project_ids)
+        result = {'captured': 0, 'skipped': 0, 'failed': 0, 'rows': 0}
+        if not project_ids:
+            return result, "No projects to snapshot."
+
+        status_rows = self.db_manager.execute_query(
+            _CAPTURE_STATUS_SQL.format(placeholders=', '.join('?' for _ in project_ids)), project_ids, fetch_all=True) or []
+        for position, status in enumerate(status_rows):
+            if cancel_event is not None and cancel_event.is_set():
+                logger.info(f"EVM snapshot capture cancelled after {position} of {len(status_rows)} projects.")
+                return result, f"Snapshot capture cancelled: {result['captured']} projects captured before cancelling."
+            if progress_callback:
+                progress_callback("EVM snapshots", f"Project {status['ProjectID']}", position / len(status_rows))
+            if (status['CapturedVersion'] == status['DataVersion'] and status['AsOfDate'] == as_of.isoformat()
+                    and status['PeriodEnd'] == str(current_period.end_time.date())):
+                result['skipped'] += 1
+                continue
+            rows_written = self._capture_project(status, as_of, current_period)
+            if rows_written is None:
+                result['failed'] += 1
+            else:
+                result['rows'] += rows_written
+                result['captured'] += 1
+
+        logger.info(f"EVM snapshots: {result['captured']} projects captured ({result['rows']} rows), "
+                    f"{result['skipped']} unchanged, {result['failed']} failed.")
+        return result, (f"Captured EVM snapshots for {result['captured']} projects ({result['rows']} rows); "
+                        f"{result['skipped']} unchanged" + (f", {result['failed']} failed (see log)." if result['failed'] else "."))
+
+    def _capture_project(self, status, as_of, current_period):
+        """
+        Writes the periods from the last captured one (or the backfill window) through the current one.
+        Returns the number of rows written, or None if the project could not be captured.
+        """
+        project_id, freq = status['ProjectID'], Config.EVM_SNAPSHOT_PERIOD
+        if status['PeriodEnd']:
+            first_period = min(pd.Period(status['PeriodEnd'], freq=freq), current_period) # Finalize the last captured period
+        else:
+            first_period = current_period - Config.EVM_SNAPSHOT_BACKFILL_PERIODS
+        periods = pd.period_range(first_period, current_period, freq=freq)
+        # Closed periods are measured as of their last day, the current one as of today
+        as_of_dates = [min(period.end_time.date(), as_of) for period in periods]
+        values = self.earned_value.get_period_values(project_id, as_of_dates)
+        period_ends = pd.PeriodIndex(pd.DatetimeIndex(values['as_of_date']), freq=freq).end_time.strftime('%Y-%m-%d')
+        snapshot_rows = list(zip([project_id] * len(values), values['wbs_element_id'].astype(int).tolist(), period_ends,
+                                 *(values[column].astype(float).tolist()
+                                   for column in ('bac', 'planned_value', 'earned_value', 'actual_cost'))))
+
+        conn = self.db_manager.get_connection()
+        with self.db_manager.lock:
+            try:
+                cursor = conn.cursor()
+                cursor.execute("DELETE FROM evm_snapshots WHERE ProjectID = ? AND PeriodEnd BETWEEN ? AND ?",
+                               (project_id, str(first_period.end_time.date()), str(current_period.end_time.date())))
+                cursor.executemany("""
+                    INSERT INTO evm_snapshots (ProjectID, WBSElementID, PeriodEnd, BudgetAtCompletion, PlannedValue, EarnedValue, ActualCost)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                """, snapshot_rows)
+                cursor.execute("""
+                    INSERT INTO evm_snapshot_status (ProjectID, PeriodEnd, AsOfDate, DataVersion) VALUES (?, ?, ?, ?)
+                    ON CONFLICT (ProjectID) DO UPDATE SET PeriodEnd = excluded.PeriodEnd, AsOfDate = excluded.AsOfDate,
+                        DataVersion = excluded.DataVersion, CapturedAt = CURRENT_TIMESTAMP
+                """, (project_id, str(current_period.end_time.date()), as_of.isoformat(), status['DataVersion']))
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                logger.error(f"Error capturing EVM snapshots for project {project_id}: {e}", exc_info=True)
+                return None
+        return len(snapshot_rows)
+
+    def get_trend(self, project_id, wbs_element_id=None, periods=None):
+        """
+        Captured EVM metrics over time for a project (or one WBS element), oldest period first.
+        Args:
+            periods (int, optional): Keep only the most recent N periods; all by default.
+        Returns:
+            DataFrame indexed by period_end with bac, planned_value, earned_value, actual_cost,
+            schedule_variance, cost_variance, spi and cpi (NaN where PV/AC is zero).
+        """
+        rows = self.db_manager.execute_query("""
+            SELECT PeriodEnd, BudgetAtCompletion, PlannedValue, EarnedValue, ActualCost FROM (
+                SELECT * FROM evm_snapshots WHERE ProjectID = ? AND WBSElementID = ? ORDER BY PeriodEnd DESC LIMIT ?
+            ) ORDER BY PeriodEnd
+        """, (project_id, wbs_element_id or 0, periods if periods else -1), fetch_all=True)
+        return _trend_frame(rows or [])
+
+    def get_portfolio_trend(self, project_ids=None, periods=None):
+        """
+        Project totals summed across projects (every Active project by default) per period,
+        in the same shape as get_trend.
+        """
+        project_ids = self.get_project_ids(project_ids)
+        if not project_ids:
+            return _trend_frame([])
+        rows = self.db_manager.execute_query(f"""
+            SELECT PeriodEnd, TOTAL(BudgetAtCompletion), TOTAL(PlannedValue), TOTAL(EarnedValue), TOTAL(ActualCost) FROM (
+                SELECT * FROM evm_snapshots WHERE WBSElementID = 0 AND ProjectID IN ({', '.join('?' for _ in project_ids)})
+            ) GROUP BY PeriodEnd ORDER BY PeriodEnd
+        """, project_ids, fetch_all=True)
+        trend = _trend_frame(rows or [])
+        return trend.tail(periods) if periods else trend
+
+
+if __name__ == "__main__":
+    # python evm_snapshots.py [capture|trend] [project_id]; schedule "capture" (e.g. nightly) when the application is not running
+    from database_manager import db_manager
+    command = sys.argv[1] if len(sys.argv) > 1 else 'capture'
+    target_project = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    manager = EvmSnapshotManager(db_manager)
+    if command == 'trend':
+        print((manager.get_trend(target_project) if target_project else manager.get_portfolio_trend()).to_string())
+    else:
+        _, message = manager.capture_snapshots([target_project] if target_project else None)
+        print(message)
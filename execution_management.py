@@ -1,6 +1,8 @@
 import logging
 from database_manager import db_manager # Assuming global db_manager for now, refactor to DI later
 from datetime import datetime
+from exceptions import AppValidationError
+from alerts import AlertEngine
 
 logger = logging.getLogger(__name__)
 
@@ -10,13 +12,15 @@ class ExecutionManagement:
     progress updates, material usage, and managing schedule updates.
     """
 
-    def __init__(self, db_m_instance): # Removed default None and global fallback
+    def __init__(self, db_m_instance, cpm_scheduler_instance=None, alert_engine_instance=None): # Removed default None and global fallback
         if db_m_instance is None:
             raise ValueError("DatabaseManager instance is required for ExecutionManagement.")
         self.db_manager = db_m_instance
+        self._cpm_scheduler = cpm_scheduler_instance # Created on first schedule change if not given
+        self.alert_engine = alert_engine_instance if alert_engine_instance else AlertEngine(self.db_manager)
         logger.info("Execution Management module initialized with provided db_manager.")
 
-    def record_actual_cost(self, project_id, wbs_element_id, cost_category, description, amount, transaction_date=None):
+    def record_actual_cost(self, project_id, wbs_element_id, cost_category, description, amount, transaction_date=None, vendor_id=None):
         """
         Records an actual cost incurred on a project.
         Args:
@@ -26,6 +30,7 @@ class ExecutionManagement:
             description (str): Description of the cost item.
             amount (float): The amount of the cost.
             transaction_date (str, optional): Date of the transaction (YYYY-MM-DD). Defaults to current date.
+            vendor_id (int, optional): The vendor invoiced, used to spot duplicate invoices (cost_anomalies.py).
         Returns:
             tuple: (bool success, str message)
         """
@@ -44,22 +49,69 @@ class ExecutionManagement:
             return False, "Invalid transaction_date format. Please use YYYY-MM-DD."
 
         query = """
-        INSERT INTO actual_costs (ProjectID, WBSElementID, CostCategory, Description, Amount, TransactionDate, RecordedDate)
-        VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+        INSERT INTO actual_costs (ProjectID, WBSElementID, CostCategory, Description, Amount, TransactionDate, VendorID, RecordedDate)
+        VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
         """
         # Schema: ActualCostID, ProjectID, WBSElementID, TaskID, CostCategory, Description, Amount, TransactionDate, VendorID, PurchaseOrderID, Notes, RecordedDate
-        # For simplicity, TaskID, VendorID, PurchaseOrderID, Notes are omitted here but can be added.
-        params = (project_id, wbs_element_id, cost_category, description, amount, transaction_date)
+        # For simplicity, TaskID, PurchaseOrderID, Notes are omitted here but can be added.
+        params = (project_id, wbs_element_id, cost_category, description, amount, transaction_date, vendor_id)
 
         success = self.db_manager.execute_query(query, params, commit=True)
         if success:
             last_id = self.db_manager.execute_query("SELECT last_insert_rowid()", fetch_one=True)[0]
             logger.info(f"Actual cost (ID: {last_id}) of {amount} for project {project_id} (WBS: {wbs_element_id}) recorded successfully.")
+            self._evaluate_alerts(self.alert_engine.evaluate_cost_change, project_id, wbs_element_id)
             return True, f"Actual cost recorded successfully with ID {last_id}."
         else:
             logger.error(f"Failed to record actual cost for project {project_id}.")
             return False, "Failed to record actual cost (database error)."
 
+    def record_progress_update(self, project_id, wbs_element_id, completion_percentage, update_date=None, notes=None, recorded_by_employee_id=None):
+        """
+        Records the completion percentage of a WBS element as of a date.
+        Args:
+            project_id (int): The ID of the project.
+            wbs_element_id (int): The WBS element the progress is for.
+            completion_percentage (float): 0 to 100.
+            update_date (str, optional): Date of the update (YYYY-MM-DD). Defaults to current date.
+        Returns:
+            tuple: (bool success, str message)
+        """
+        if not project_id or not wbs_element_id or completion_percentage is None:
+            return False, "Project ID, WBS element, and completion percentage are required."
+        try:
+            completion_percentage = float(completion_percentage)
+        except (TypeError, ValueError):
+            return False, "Invalid completion percentage."
+        if not (0.0 <= completion_percentage <= 100.0):
+            return False, "Completion percentage must be between 0 and 100."
+
+        if update_date is None:
+            update_date = datetime.now().strftime("%Y-%m-%d")
+        try:
+            datetime.strptime(update_date, "%Y-%m-%d")
+        except ValueError:
+            return False, "Invalid update_date format. Please use YYYY-MM-DD."
+
+        query = """
+        INSERT INTO progress_updates (ProjectID, WBSElementID, UpdateDate, CompletionPercentage, Notes, RecordedByEmployeeID)
+        VALUES (?, ?, ?, ?, ?, ?)
+        """
+        cursor = self.db_manager.execute_query(query, (project_id, wbs_element_id, update_date, completion_percentage, notes, recorded_by_employee_id), commit=True)
+        if not cursor:
+            logger.error(f"Failed to record progress for project {project_id}, WBS {wbs_element_id}.")
+            return False, "Failed to record progress update (database error)."
+        logger.info(f"Progress update (ID: {cursor.lastrowid}) of {completion_percentage}% for project {project_id} (WBS: {wbs_element_id}) recorded.")
+        self._evaluate_alerts(self.alert_engine.evaluate_progress_change, project_id, wbs_element_id)
+        return True, f"Progress update recorded successfully with ID {cursor.lastrowid}."
+
+    def _evaluate_alerts(self, hook, *args):
+        """Runs an AlertEngine hook after a write; alerting problems never fail the write itself."""
+        try:
+            hook(*args)
+        except Exception as e:
+            logger.error(f"Alert evaluation failed after write for {args}: {e}", exc_info=True)
+
     def get_all_task_statuses(self):
         """
         Retrieves all available task statuses from the TaskStatuses table.
@@ -205,14 +257,18 @@ class ExecutionManagement:
             return False, "Failed to log material usage (database error)."
 
     # Placeholder for schedule task update - more complex, involves Task table and potentially Project schedule
+    def _get_cpm_scheduler(self):
+        if self._cpm_scheduler is None:
+            from cpm_scheduling import CPMScheduler
+            self._cpm_scheduler = CPMScheduler(self.db_manager)
+        return self._cpm_scheduler
+
     def update_task_schedule(self, task_id, new_end_date=None, new_status_id=None):
         """
         Updates schedule-related information for a task.
-        (This is a basic version, a full scheduling system would be more complex)
+        A new end date is applied through the CPM engine, which re-propagates dependent tasks.
         """
         logger.info(f"Attempting to update schedule for Task ID: {task_id} - New EndDate: {new_end_date}, New StatusID: {new_status_id}")
-        # This would typically update Tasks.ScheduledEndDate, Tasks.TaskStatusID, etc.
-        # For now, let's call the more generic update_task_details
 
         updates_made = False
         final_message = []
@@ -222,20 +278,17 @@ class ExecutionManagement:
             try: datetime.strptime(new_end_date, "%Y-%m-%d")
             except ValueError: return False, "Invalid New End Date format. Use YYYY-MM-DD."
 
-            # This is an example of how to call update_task_details for specific fields.
-            # However, update_task_details doesn't have a specific field for ScheduledEndDate.
-            # It has ActualEndDate. This indicates a potential mismatch or need for refinement in Task table updates.
-            # For now, this function is a placeholder.
-            # A more direct update to ScheduledEndDate in Tasks table might be:
-            # success_date, msg_date = self.db_manager.execute_query(
-            #    "UPDATE Tasks SET ScheduledEndDate = ?, LastModifiedDate = CURRENT_TIMESTAMP WHERE TaskID = ?",
-            #    (new_end_date, task_id), commit=True)
-            # if success_date: final_message.append(f"ScheduledEndDate updated to {new_end_date}.")
-            # else: final_message.append(f"Failed to update ScheduledEndDate.")
-            # updates_made = updates_made or success_date
-            logger.warning("Updating ScheduledEndDate via update_task_schedule is not fully implemented through update_task_details. Needs direct SQL or method enhancement.")
-            final_message.append("ScheduledEndDate update is conceptual in this version.")
-
+            # The new finish changes the task's duration; the CPM engine moves its successors to match
+            try:
+                rescheduled_count, _ = self._get_cpm_scheduler().update_task_dates(task_id, end_date=new_end_date)
+                final_message.append(f"ScheduledEndDate updated to {new_end_date}; {rescheduled_count} tasks rescheduled.")
+                updates_made = True
+            except AppValidationError as ve:
+                logger.warning(f"Could not reschedule task {task_id}: {ve}")
+                final_message.append(f"Failed to update ScheduledEndDate: {ve}")
+            except Exception as e:
+                logger.error(f"Error rescheduling task {task_id}: {e}", exc_info=True)
+                final_message.append("Failed to update ScheduledEndDate due to a system error.")
 
         if new_status_id:
             success_status, msg_status = self.update_task_details(task_id, task_status_id=new_status_id)
@@ -243,7 +296,7 @@ class ExecutionManagement:
             else: final_message.append(f"Failed to update TaskStatusID: {msg_status}")
             updates_made = updates_made or success_status
 
-        if not updates_made and not new_end_date: # new_end_date isn't really "made" yet
+        if not new_end_date and not new_status_id:
              return True, "No schedule information provided to update."
 
         return updates_made, " ".join(final_message)
@@ -0,0 +1,176 @@
+import logging
+import re
+from datetime import datetime
+
+from exceptions import AppError, AppValidationError
+
+logger = logging.getLogger(__name__)
+
+# Source types indexed in field_search_entries (maintained by triggers in schema.sql)
+SOURCE_TYPES = ('DailyLog', 'DailyLogTask', 'DailyLogObservation', 'DocumentNote', 'Task', 'LLMParse')
+ORDER_RELEVANCE = 'relevance'
+ORDER_NEWEST = 'newest'
+
+# "quoted phrases" are matched exactly, other words as prefixes
+_QUERY_TOKEN_PATTERN = re.compile(r'"([^"]+)"|(\w+)', re.UNICODE)
+_WORD_PATTERN = re.compile(r'\w+', re.UNICODE)
+# bm25 column weights follow the field_search_fts column order (Title, Body)
+_BM25_WEIGHTS = "2.0, 1.0"
+_MAX_PAGE_SIZE = 200
+
+
+class FieldSearch:
+    """
+    Full-text search over field notes: daily log notes, tasks and observations, document
+    notes, project task descriptions and the raw text of LLM parses.
+
+    Every source row has a field_search_entries row carrying its project and date, kept
+    current by triggers, and field_search_fts indexes the text. Results are BM25-ranked and
+    returned a page at a time with keyset cursors, so later pages never re-read or skip
+    over the earlier ones.
+    """
+
+    def __init__(self, db_m_instance):
+        if db_m_instance is None:
+            raise ValueError("DatabaseManager instance is required for FieldSearch.")
+        self.db_manager = db_m_instance
+        logger.info("FieldSearch initialized with provided db_manager.")
+
+    @staticmethod
+    def _build_match_query(search_text):
+        """
+        Converts user input into an FTS5 query in which every term must match, e.g.
+        'conduit "pull box"' -> '"conduit"* AND "pull box"'. Returns None if there is nothing to search.
+        """
+        terms = []
+        for phrase, word in _QUERY_TOKEN_PATTERN.findall(search_text or ''):
+            if phrase:
+                phrase_words = _WORD_PATTERN.findall(phrase)
+                if phrase_words:
+                    terms.append('"' + ' '.join(phrase_words) + '"')
+            else:
+                terms.append(f'"{word}"*')
+        return ' AND '.join(terms) if terms else None
+
+    @staticmethod
+    def _normalize_date(value, field_name):
+        if value is None or value == '':
+            return None
+        if hasattr(value, 'strftime'):
+            return value.strftime('%Y-%m-%d')
+        try:
+            return datetime.strptime(str(value).strip(), '%Y-%m-%d').strftime('%Y-%m-%d')
+        except ValueError:
+            raise AppValidationError(f"{field_name} must be in YYYY-MM-DD format.")
+
+    @staticmethod
+    def _encode_cursor(order_by, row):
+        if order_by == ORDER_NEWEST:
+            return f"{row['EntryDate'] or ''}|{row['EntryID']}"
+        return f"{row['Rank']!r}|{row['EntryID']}"
+
+    @staticmethod
+    def _decode_cursor(order_by, cursor):
+        try:
+            sort_value, entry_id = cursor.rsplit('|', 1)
+            return (sort_value if order_by == ORDER_NEWEST else float(sort_value)), int(entry_id)
+        except (AttributeError, ValueError):
+            raise AppValidationError("Invalid search cursor.")
+
+    def search(self, search_text, project_id=None, start_date=None, end_date=None, source_types=None,
+               order_by=ORDER_RELEVANCE, page_size=25, cursor=None):
+        """
+        Searches field notes.
+        Args:
+            search_text (str): Words (prefix-matched) and "quoted phrases"; all must match.
+            project_id (int, optional): Only entries belonging to this project.
+            start_date, end_date (str or date, optional): Inclusive YYYY-MM-DD bounds on the entry date
+                (log date for daily log records, scheduled start for tasks, note date for document notes).
+            source_types (iterable, optional): Restrict to some of SOURCE_TYPES.
+            order_by (str): ORDER_RELEVANCE (BM25, best first) or ORDER_NEWEST.
+            page_size (int): Results per page (max 200).
+            cursor (str, optional): next_cursor from the previous page.
+        Returns:
+            tuple: (list of dicts with EntryID, SourceType, SourceID, ProjectID, EntryDate, Title,
+                   Snippet and Rank; next_cursor str, or None on the last page).
+        Raises:
+            AppValidationError: For invalid dates, source types, order or cursor.
+            AppError: If the search index is unavailable.
+        """
+        match_query = self._build_match_query(search_text)
+        if not match_query:
+            return [], None
+        if order_by not in (ORDER_RELEVANCE, ORDER_NEWEST):
+            raise AppValidationError(f"Unknown search order '{order_by}'.")
+        page_size = max(1, min(int(page_size), _MAX_PAGE_SIZE))
+
+        conditions = ["field_search_fts MATCH ?"]
+        params = [match_query]
+        if project_id is not None:
+            conditions.append("e.ProjectID = ?")
+            params.append(project_id)
+        start_date = self._normalize_date(start_date, "Start date")
+        end_date = self._normalize_date(end_date, "End date")
+        if start_date:
+            conditions.append("e.EntryDate >= ?")
+            params.append(start_date)
+        if end_date:
+            conditions.append("e.EntryDate <= ?")
+            params.append(end_date)
+        if source_types:
+            source_types = list(source_types)
+            unknown = set(source_types) - set(SOURCE_TYPES)
+            if unknown:
+                raise AppValidationError(f"Unknown source types: {', '.join(sorted(unknown))}.")
+            conditions.append(f"e.SourceType IN ({', '.join('?' for _ in source_types)})")
+            params.extend(source_types)
+
+        rank_expression = f"bm25(field_search_fts, {_BM25_WEIGHTS})"
+        if order_by == ORDER_NEWEST:
+            sort_expression, sort_direction, compare = "COALESCE(e.EntryDate, '')", "DESC", "<"
+        else:
+            sort_expression, sort_direction, compare = rank_expression, "ASC", ">"
+        if cursor:
+            sort_value, last_entry_id = self._decode_cursor(order_by, cursor)
+            conditions.append(f"({sort_expression} {compare} ? OR ({sort_expression} = ? AND e.EntryID {compare} ?))")
+            params.extend([sort_value, sort_value, last_entry_id])
+
+        # Page first, then snippets for just the page's rows (snippet() is the costly part)
+        page_query = f"""
+        SELECT e.EntryID, e.SourceType, e.SourceID, e.ProjectID, e.EntryDate, e.Title, {rank_expression} AS Rank
+        FROM field_search_fts
+        JOIN field_search_entries e ON e.EntryID = field_search_fts.rowid
+        WHERE {' AND '.join(conditions)}
+        ORDER BY {sort_expression} {sort_direction}, e.EntryID {sort_direction}
+        LIMIT ?
+        """
+        params.append(page_size + 1)
+        try:
+            with self.db_manager.lock:
+                conn = self.db_manager.get_connection()
+                rows = [dict(row) for row in conn.execute(page_query, params).fetchall()]
+                has_more = len(rows) > page_size
+                rows = rows[:page_size]
+                if rows:
+                    snippet_rows = conn.execute(f"""
+                    SELECT rowid, snippet(field_search_fts, 1, '[', ']', '...', 16) AS Snippet
+                    FROM field_search_fts
+                    WHERE field_search_fts MATCH ? AND rowid IN ({', '.join('?' for _ in rows)})
+                    """, [match_query] + [row['EntryID'] for row in rows]).fetchall()
+                    snippets = {snippet_row['rowid']: snippet_row['Snippet'] for snippet_row in snippet_rows}
+                    for row in rows:
+                        row['Snippet'] = snippets.get(row['EntryID'], '')
+        except Exception as e:
+            logger.error(f"Field search for '{search_text}' failed: {e}", exc_info=True)
+            raise AppError(f"Field search is unavailable: {e}")
+
+        next_cursor = self._encode_cursor(order_by, rows[-1]) if has_more else None
+        return rows, next_cursor
+
+
+if __name__ == "__main__":
+    from database_manager import db_manager
+    results, next_cursor = FieldSearch(db_manager).search("conduit", page_size=10)
+    for result in results:
+        print(f"{result['EntryDate']} [{result['SourceType']} {result['SourceID']}] {result['Title']}: {result['Snippet']}")
+    print(f"More results: {'yes' if next_cursor else 'no'}")
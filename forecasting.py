@@ -0,0 +1,156 @@
+import logging
+import sys
+
+import numpy as np
+import pandas as pd
+
+from configuration import Config
+from earned_value import safe_ratio
+from evm_snapshots import EvmSnapshotManager
+
+logger = logging.getLogger(__name__)
+
+FORECAST_METHODS = ('cpi', 'cpi_spi', 'regression')
+_EAC_COLUMNS = dict(zip(FORECAST_METHODS, ('EAC_CPI', 'EAC_CPI_SPI', 'EAC_Regression')))
+FORECAST_COLUMNS = ['ProjectID', 'WBSElementID', 'WBSCode', 'WBSDescription', 'PeriodEnd', 'BudgetAtCompletion',
+                    'PlannedValue', 'EarnedValue', 'ActualCost', 'CPI', 'SPI', 'EAC_CPI', 'EAC_CPI_SPI', 'EAC_Regression',
+                    'EstimateAtCompletion', 'EstimateToComplete', 'VarianceAtCompletion', 'OverrunPercent', 'OverrunFlag']
+OVERRUN_WARNING = 'warning'
+OVERRUN_CRITICAL = 'critical'
+
+# The last ? snapshot periods of each project (chosen from its project-total rows), for every element, read in
+# primary key order; CurrentPeriodEnd lets elements missing from the latest capture be dropped
+_SNAPSHOT_HISTORY_SQL = """
+WITH recent AS (
+    SELECT ProjectID, MIN(PeriodEnd) AS FirstPeriodEnd FROM (
+        SELECT ProjectID, PeriodEnd, ROW_NUMBER() OVER (PARTITION BY ProjectID ORDER BY PeriodEnd DESC) AS PeriodRank
+        FROM evm_snapshots WHERE WBSElementID = 0 AND ProjectID IN ({placeholders})
+    ) WHERE PeriodRank <= ? GROUP BY ProjectID
+)
+SELECT s.ProjectID, s.WBSElementID, s.PeriodEnd, s.BudgetAtCompletion, s.PlannedValue, s.EarnedValue, s.ActualCost,
+       st.PeriodEnd AS CurrentPeriodEnd
+FROM recent r
+JOIN evm_snapshot_status st ON st.ProjectID = r.ProjectID
+JOIN evm_snapshots s ON s.ProjectID = r.ProjectID AND s.PeriodEnd >= r.FirstPeriodEnd
+ORDER BY s.ProjectID, s.WBSElementID, s.PeriodEnd
+"""
+
+
+class CostForecaster:
+    """
+    Estimate at completion (EAC) and to complete (ETC) for every WBS element and project total,
+    computed for the whole portfolio at once from the EVM snapshot history (evm_snapshots.py):
+
+        cpi:        EAC = AC + (BAC - EV) / CPI          remaining work at the cost efficiency so far
+        cpi_spi:    EAC = AC + (BAC - EV) / (CPI * SPI)  also penalizes running behind schedule
+        regression: EAC = AC + slope * (BAC - EV)        slope of cumulative cost against cumulative
+                                                         earned value over the recent periods
+
+    Remaining work is never negative; where an index is undefined the remaining budget is used as is.
+    EstimateAtCompletion uses Config.FORECAST_PRIMARY_METHOD (falling back to cpi where the
+    regression has too few periods), and elements forecast to overrun their budget by the
+    configured percentage and amount are flagged 'warning' or 'critical'.
+    """
+
+    def __init__(self, db_m_instance, snapshot_instance=None):
+        if db_m_instance is None:
+            raise ValueError("DatabaseManager instance is required for CostForecaster.")
+        self.db_manager = db_m_instance
+        self.snapshots = snapshot_instance if snapshot_instance else EvmSnapshotManager(self.db_manager)
+        logger.info("CostForecaster initialized with provided db_manager.")
+
+    def forecast(self, project_ids=None, capture=True):
+        """
+        Forecasts EAC/ETC for the projects' WBS elements (WBSElementID 0 = project total).
+        Args:
+            project_ids (iterable, optional): Projects to forecast; every Active project by default.
+            capture (bool): Bring the current period's snapshots up to date first (cheap for
+                            projects that have not changed since the last capture).
+        Returns:
+            tuple: (DataFrame with FORECAST_COLUMNS, message)
+        """
+        project_ids = self.snapshots.get_project_ids(project_ids)
+        if not project_ids:
+            return pd.DataFrame(columns=FORECAST_COLUMNS), "No projects to forecast."
+        if capture:
+            self.snapshots.capture_snapshots(project_ids)
+
+        placeholders = ', '.join('?' for _ in project_ids)
+        history = pd.DataFrame.from_records([tuple(row) for row in self.db_manager.execute_query(
+            _SNAPSHOT_HISTORY_SQL.format(placeholders=placeholders), project_ids + [Config.FORECAST_REGRESSION_PERIODS],
+            fetch_all=True) or []], columns=['ProjectID', 'WBSElementID', 'PeriodEnd', 'BAC', 'PV', 'EV', 'AC', 'CurrentPeriodEnd'])
+        if history.empty:
+            return pd.DataFrame(columns=FORECAST_COLUMNS), "No EVM snapshots to forecast from."
+
+        forecast_df = self._compute(history)
+        wbs = pd.DataFrame.from_records([tuple(row) for row in self.db_manager.execute_query(
+            f"SELECT WBSElementID, WBSCode, Description FROM wbs_elements WHERE ProjectID IN ({placeholders})",
+            project_ids, fetch_all=True) or []], columns=['WBSElementID', 'WBSCode', 'WBSDescription']).set_index('WBSElementID')
+        forecast_df['WBSCode'] = forecast_df['WBSElementID'].map(wbs['WBSCode']).where(forecast_df['WBSElementID'] != 0, 'PROJECT_TOTAL')
+        forecast_df['WBSDescription'] = forecast_df['WBSElementID'].map(wbs['WBSDescription'])
+        flagged = int((forecast_df['OverrunFlag'] != '').sum())
+        logger.info(f"Forecast {len(forecast_df)} WBS elements and project totals across {forecast_df['ProjectID'].nunique()} projects; {flagged} flagged.")
+        return forecast_df[FORECAST_COLUMNS], f"Forecast {len(forecast_df)} rows; {flagged} flagged for overrun."
+
+    def _compute(self, history):
+        """All forecasts at once: history rows are sorted by element then period, so each element is a contiguous run."""
+        group_key = history['ProjectID'].astype(np.int64) * (int(history['WBSElementID'].max()) + 1) + history['WBSElementID']
+        codes = pd.factorize(group_key, sort=False)[0]
+        group_count = codes.max() + 1
+        last = np.flatnonzero(np.r_[codes[1:] != codes[:-1], True]) # Latest period of each element
+
+        bac, pv, ev, ac = (history[column].to_numpy(dtype=float)[last] for column in ('BAC', 'PV', 'EV', 'AC'))
+        cpi, spi = safe_ratio(ev, ac), safe_ratio(ev, pv)
+        remaining = np.maximum(bac - ev, 0)
+
+        def at_completion(efficiency):
+            usable = np.nan_to_num(efficiency, nan=0.0) > 0
+            return ac + np.where(usable, remaining / np.where(usable, efficiency, 1.0), remaining)
+
+        # Least-squares slope of AC on EV per element from grouped sums
+        x, y = history['EV'].to_numpy(dtype=float), history['AC'].to_numpy(dtype=float)
+        n = np.bincount(codes, minlength=group_count).astype(float)
+        sx, sy = np.bincount(codes, x, group_count), np.bincount(codes, y, group_count)
+        sxx, sxy = np.bincount(codes, x * x, group_count), np.bincount(codes, x * y, group_count)
+        denominator = n * sxx - sx * sx
+        slope = safe_ratio(n * sxy - sx * sy, np.where(denominator > 1e-9 * np.maximum(n * sxx, 1), denominator, 0))
+        slope = np.where((n >= Config.FORECAST_MIN_REGRESSION_POINTS) & (slope > 0), slope, np.nan)
+
+        forecast_df = pd.DataFrame({
+            'ProjectID': history['ProjectID'].to_numpy()[last], 'WBSElementID': history['WBSElementID'].to_numpy()[last],
+            'PeriodEnd': history['PeriodEnd'].to_numpy()[last], 'BudgetAtCompletion': bac, 'PlannedValue': pv,
+            'EarnedValue': ev, 'ActualCost': ac, 'CPI': cpi, 'SPI': spi,
+            'EAC_CPI': at_completion(cpi), 'EAC_CPI_SPI': at_completion(cpi * spi), 'EAC_Regression': ac + slope * remaining,
+        })
+        # Elements retired or removed since an earlier capture have no row for the current period
+        current = history['PeriodEnd'].to_numpy()[last] == history['CurrentPeriodEnd'].to_numpy()[last]
+        forecast_df = forecast_df[current].reset_index(drop=True)
+        forecast_df['EstimateAtCompletion'] = forecast_df[_EAC_COLUMNS[Config.FORECAST_PRIMARY_METHOD]].fillna(forecast_df['EAC_CPI'])
+        forecast_df['EstimateToComplete'] = forecast_df['EstimateAtCompletion'] - forecast_df['ActualCost']
+        forecast_df['VarianceAtCompletion'] = forecast_df['BudgetAtCompletion'] - forecast_df['EstimateAtCompletion']
+        overrun = -forecast_df['VarianceAtCompletion'].to_numpy()
+        forecast_df['OverrunPercent'] = safe_ratio(overrun, forecast_df['BudgetAtCompletion'].to_numpy()) * 100
+        significant = overrun >= Config.FORECAST_OVERRUN_MIN_AMOUNT
+        percent = np.nan_to_num(forecast_df['OverrunPercent'].to_numpy(), nan=np.inf) # Any overrun of a zero budget counts
+        forecast_df['OverrunFlag'] = np.select(
+            [significant & (percent >= Config.FORECAST_OVERRUN_CRITICAL_PCT), significant & (percent >= Config.FORECAST_OVERRUN_WARNING_PCT)],
+            [OVERRUN_CRITICAL, OVERRUN_WARNING], '')
+        return forecast_df
+
+    @staticmethod
+    def get_flagged(forecast_df):
+        """Rows flagged for overrun, critical first and then by overrun amount."""
+        flagged = forecast_df[forecast_df['OverrunFlag'] != ''].copy()
+        flagged['_critical'] = flagged['OverrunFlag'] == OVERRUN_CRITICAL
+        return flagged.sort_values(['_critical', 'VarianceAtCompletion'], ascending=[False, True]).drop(columns='_critical')
+
+
+if __name__ == "__main__":
+    # python forecasting.py [project_id]; run after the nightly cost import to refresh snapshots and list overruns
+    from database_manager import db_manager
+    target_project = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    forecaster = CostForecaster(db_manager)
+    forecast_df, message = forecaster.forecast([target_project] if target_project else None)
+    print(message)
+    if not forecast_df.empty:
+        print(CostForecaster.get_flagged(forecast_df).to_string(index=False))
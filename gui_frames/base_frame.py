@@ -1,6 +1,7 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 import logging
+from background_jobs import BackgroundJob, JOB_EVENT_DONE, JOB_EVENT_ERROR
 
 logger = logging.getLogger(__name__)
 
@@ -38,6 +39,97 @@ class BaseModuleFrame(tk.Frame):
         else:
             messagebox.showinfo(title, message, parent=self)
 
+    def attach_typeahead(self, entry, search_func, format_func, on_select, min_chars=2, delay_ms=200):
+        """
+        Adds a type-ahead suggestion list under an Entry widget.
+        :param entry: The Entry to watch.
+        :param search_func: Callable(text) -> list of result dicts (e.g. ProjectStartup.search_materials).
+        :param format_func: Callable(result) -> str shown in the suggestion list.
+        :param on_select: Callable(result) invoked when a suggestion is chosen.
+        :param min_chars: Minimum characters typed before searching.
+        :param delay_ms: Debounce delay so a search runs only once typing pauses.
+        """
+        state = {'after_id': None, 'popup': None, 'listbox': None, 'results': [], 'job': None}
+
+        def close_popup(event=None):
+            if state['popup'] is not None:
+                state['popup'].destroy()
+                state['popup'] = None
+
+        def choose(event=None):
+            listbox = state['listbox']
+            if state['popup'] is None or not listbox.curselection():
+                return
+            result = state['results'][listbox.curselection()[0]]
+            close_popup()
+            on_select(result)
+
+        def show_results(results):
+            state['results'] = results
+            if not state['results']:
+                close_popup()
+                return
+            if state['popup'] is None:
+                popup = tk.Toplevel(self)
+                popup.wm_overrideredirect(True)
+                listbox = tk.Listbox(popup, height=8)
+                listbox.pack(fill='both', expand=True)
+                listbox.bind("<Double-Button-1>", choose)
+                listbox.bind("<Return>", choose)
+                listbox.bind("<Escape>", close_popup)
+                state['popup'], state['listbox'] = popup, listbox
+            state['popup'].wm_geometry(
+                f"{max(entry.winfo_width(), 300)}x160+{entry.winfo_rootx()}+{entry.winfo_rooty() + entry.winfo_height()}"
+            )
+            state['listbox'].delete(0, tk.END)
+            for result in state['results']:
+                state['listbox'].insert(tk.END, format_func(result))
+
+        def poll_search(job):
+            if job is not state['job']:
+                return # Superseded by a newer keystroke; its results are stale
+            for event_type, payload in job.drain_events():
+                if event_type == JOB_EVENT_DONE:
+                    state['job'] = None
+                    show_results(payload or [])
+                    return
+                if event_type == JOB_EVENT_ERROR:
+                    state['job'] = None
+                    logger.error(f"Type-ahead search failed: {payload}")
+                    show_results([])
+                    return
+            self.after(50, poll_search, job)
+
+        def run_search():
+            # The query runs on a worker thread so a slow search never blocks typing
+            state['after_id'] = None
+            text = entry.get().strip()
+            if len(text) < min_chars:
+                state['job'] = None
+                close_popup()
+                return
+            job = BackgroundJob(f"typeahead-{text}", lambda text, progress_callback, cancel_event: search_func(text), text)
+            state['job'] = job
+            job.start()
+            self.after(50, poll_search, job)
+
+        def on_key(event):
+            if event.keysym == 'Down' and state['popup'] is not None:
+                state['listbox'].focus_set()
+                state['listbox'].selection_clear(0, tk.END)
+                state['listbox'].selection_set(0)
+                return
+            if event.keysym == 'Escape':
+                close_popup()
+                return
+            if state['after_id'] is not None:
+                self.after_cancel(state['after_id'])
+            state['after_id'] = self.after(delay_ms, run_search)
+
+        entry.bind("<KeyRelease>", on_key, add='+')
+        entry.bind("<FocusOut>", lambda event: self.after(150, lambda: None if (
+            state['listbox'] is not None and self.focus_get() is state['listbox']) else close_popup()), add='+')
+
     def display_dataframe(self, df, title="Data View"):
         """
         Displays a pandas DataFrame in a new Toplevel window with a Treeview widget.
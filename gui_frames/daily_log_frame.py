@@ -1,6 +1,7 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 from .base_frame import BaseModuleFrame
+from exceptions import AppError, AppValidationError
 
 # Logger setup
 import logging
@@ -13,6 +14,7 @@ class DailyLogModuleFrame(BaseModuleFrame):
         # The original main.py uses self.app.modules.get('data_processing')
         # So, module_instance here might not be directly used if actions always call app.modules.get.
         self.log_text_input = None # Initialize attribute
+        self.search_next_cursor = None # Cursor for the next page of field search results
         self.create_widgets()
 
     def create_widgets(self):
@@ -23,12 +25,78 @@ class DailyLogModuleFrame(BaseModuleFrame):
 
         tk.Label(log_frame, text="Paste your daily log entry here:").pack(pady=5)
 
-        self.log_text_input = tk.Text(log_frame, height=20, width=80, wrap="word")
+        self.log_text_input = tk.Text(log_frame, height=12, width=80, wrap="word")
         self.log_text_input.pack(pady=5, padx=5, fill="both", expand=True) # Added padding
 
         submit_button = ttk.Button(log_frame, text="Submit Daily Log", command=self.submit_daily_log)
         submit_button.pack(pady=10)
 
+        search_frame = ttk.LabelFrame(self, text="Search Field Notes (logs, tasks, document notes)")
+        search_frame.pack(pady=10, padx=20, fill="both", expand=True)
+
+        controls = ttk.Frame(search_frame)
+        controls.pack(fill="x", padx=5, pady=5)
+        self.search_entry = ttk.Entry(controls, width=40)
+        self.search_entry.pack(side="left", padx=(0, 5))
+        self.search_entry.bind("<Return>", lambda e: self.search_field_notes())
+        ttk.Label(controls, text="From:").pack(side="left")
+        self.search_from_entry = ttk.Entry(controls, width=11)
+        self.search_from_entry.pack(side="left", padx=(0, 5))
+        ttk.Label(controls, text="To:").pack(side="left")
+        self.search_to_entry = ttk.Entry(controls, width=11)
+        self.search_to_entry.pack(side="left", padx=(0, 5))
+        self.search_project_only_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(controls, text="Active project only", variable=self.search_project_only_var).pack(side="left", padx=5)
+        ttk.Button(controls, text="Search", command=self.search_field_notes).pack(side="left", padx=5)
+        self.search_more_button = ttk.Button(controls, text="More Results", state="disabled",
+                                             command=lambda: self.search_field_notes(next_page=True))
+        self.search_more_button.pack(side="left")
+
+        columns = ("EntryDate", "Source", "Title", "Snippet")
+        self.search_results_tree = ttk.Treeview(search_frame, columns=columns, show="headings", height=8)
+        for col, heading, width in (("EntryDate", "Date", 90), ("Source", "Source", 130),
+                                    ("Title", "Title", 160), ("Snippet", "Match", 480)):
+            self.search_results_tree.heading(col, text=heading)
+            self.search_results_tree.column(col, width=width, stretch=(col == "Snippet"))
+        self.search_results_tree.pack(fill="both", expand=True, padx=5, pady=5)
+
+    def search_field_notes(self, next_page=False):
+        search_module = self.app.modules.get('field_search')
+        if not search_module:
+            self.show_message("Error", "Field search module not available.", True)
+            return
+        search_text = self.search_entry.get().strip()
+        if not search_text:
+            return
+        project_id = self.app.active_project_id if self.search_project_only_var.get() else None
+        if not next_page:
+            self.search_next_cursor = None
+        try:
+            results, self.search_next_cursor = search_module.search(
+                search_text, project_id=project_id,
+                start_date=self.search_from_entry.get().strip() or None,
+                end_date=self.search_to_entry.get().strip() or None,
+                cursor=self.search_next_cursor if next_page else None
+            )
+        except AppValidationError as ve:
+            self.show_message("Search", str(ve), True)
+            return
+        except AppError as e:
+            self.show_message("Search Error", str(e), True)
+            return
+
+        if not next_page:
+            for item in self.search_results_tree.get_children():
+                self.search_results_tree.delete(item)
+        for result in results:
+            self.search_results_tree.insert("", tk.END, values=(
+                result.get('EntryDate') or '', result['SourceType'], result.get('Title') or '',
+                (result.get('Snippet') or '').replace('\n', ' ')
+            ))
+        self.search_more_button.config(state="normal" if self.search_next_cursor else "disabled")
+        if not results and not next_page:
+            self.show_message("Search", "No matching field notes found.")
+
     def submit_daily_log(self):
         log_content = self.log_text_input.get("1.0", tk.END).strip()
         if not log_content:
@@ -19,6 +19,11 @@ class ExecutionManagementModuleFrame(BaseModuleFrame):
         self.cost_amount_entry = None
         self.cost_date_entry = None
         self.record_cost_button = None
+        self.wbs_progress_wbs_id_entry = None
+        self.wbs_progress_percent_entry = None
+        self.wbs_progress_date_entry = None
+        self.wbs_progress_notes_entry = None
+        self.record_wbs_progress_button = None
         self.task_id_entry_for_progress = None
         self.task_actual_start_date_entry = None
         self.task_actual_end_date_entry = None
@@ -72,6 +77,25 @@ class ExecutionManagementModuleFrame(BaseModuleFrame):
         self.record_cost_button = ttk.Button(cost_frame, text="Record Cost for Active Project", command=self.record_cost_action)
         self.record_cost_button.grid(row=len(cost_fields), column=0, columnspan=2, pady=10)
 
+        # --- Record WBS Progress (earned value; re-checks CPI and stale progress alerts) ---
+        wbs_progress_frame = ttk.LabelFrame(self, text="Record WBS Progress")
+        wbs_progress_frame.pack(pady=10, padx=20, fill="x")
+        wbs_progress_frame.columnconfigure(1, weight=1)
+
+        wbs_progress_fields = [
+            ("WBS Element ID:", "wbs_progress_wbs_id_entry"),
+            ("Completion % (0-100):", "wbs_progress_percent_entry"),
+            ("Date (YYYY-MM-DD, optional):", "wbs_progress_date_entry"),
+            ("Notes (optional):", "wbs_progress_notes_entry")
+        ]
+        for i, (label_text, entry_attr) in enumerate(wbs_progress_fields):
+            tk.Label(wbs_progress_frame, text=label_text).grid(row=i, column=0, padx=5, pady=2, sticky="w")
+            entry = tk.Entry(wbs_progress_frame)
+            entry.grid(row=i, column=1, padx=5, pady=2, sticky="ew")
+            setattr(self, entry_attr, entry)
+        self.record_wbs_progress_button = ttk.Button(wbs_progress_frame, text="Record Progress for Active Project", command=self.record_wbs_progress_action)
+        self.record_wbs_progress_button.grid(row=len(wbs_progress_fields), column=0, columnspan=2, pady=10)
+
         # --- Record Progress Update ---
         progress_frame = ttk.LabelFrame(self, text="Update Task Progress / Record Actuals")
         progress_frame.pack(pady=10, padx=20, fill="x")
@@ -179,6 +203,7 @@ class ExecutionManagementModuleFrame(BaseModuleFrame):
             self.info_label.config(text=f"Actions apply to: {self.app.active_project_name} (ID: {self.app.active_project_id})" if is_project_active else "No active project. Select in 'Project Startup'.")
 
         if self.record_cost_button: self.record_cost_button.config(state=state)
+        if self.record_wbs_progress_button: self.record_wbs_progress_button.config(state=state)
         if self.update_task_progress_button: self.update_task_progress_button.config(state=state)
         if self.log_material_button: self.log_material_button.config(state=state)
         # if self.update_schedule_task_button: self.update_schedule_task_button.config(state=state)
@@ -219,6 +244,38 @@ class ExecutionManagementModuleFrame(BaseModuleFrame):
             logger.error(f"Error in record_cost_action: {e}", exc_info=True)
             self.show_message("Error", f"An unexpected error occurred: {e}", True)
 
+    def record_wbs_progress_action(self):
+        if not self.module: self.show_message("Error", "Execution Module not available.", True); return
+        if not self.app.active_project_id: self.show_message("Error", "No active project.", True); return
+
+        try:
+            wbs_id_str = self.wbs_progress_wbs_id_entry.get().strip()
+            percent_str = self.wbs_progress_percent_entry.get().strip()
+            if not wbs_id_str or not percent_str:
+                self.show_message("Input Error", "WBS Element ID and completion % are required.", True); return
+            wbs_element_id = int(wbs_id_str)
+            completion_percentage = float(percent_str)
+            update_date = self.wbs_progress_date_entry.get().strip() or None # Optional date
+            notes = self.wbs_progress_notes_entry.get().strip() or None
+
+            user_details = self.app.user_manager.get_user_details_by_username(self.app.current_username)
+            employee_db_id = user_details.get('employee_db_id') if user_details else None
+
+            success, msg = self.module.record_progress_update(
+                self.app.active_project_id, wbs_element_id, completion_percentage, update_date, notes,
+                recorded_by_employee_id=employee_db_id
+            )
+            self.show_message("Record Progress", msg, not success)
+            if success: # Clear fields
+                for entry in [self.wbs_progress_wbs_id_entry, self.wbs_progress_percent_entry,
+                              self.wbs_progress_date_entry, self.wbs_progress_notes_entry]:
+                    entry.delete(0, tk.END)
+        except ValueError:
+            self.show_message("Input Error", "Invalid numeric value (WBS Element ID, %).", True)
+        except Exception as e:
+            logger.error(f"Error in record_wbs_progress_action: {e}", exc_info=True)
+            self.show_message("Error", f"An unexpected error occurred: {e}", True)
+
     def update_task_progress_action(self):
         if not self.module: self.show_message("Error", "Execution Module not available.", True); return
         if not self.app.active_project_id: self.show_message("Error", "No active project.", True); return
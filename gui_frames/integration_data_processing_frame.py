@@ -81,7 +81,10 @@ class IntegrationDataProcessingModuleFrame(BaseModuleFrame):
             self.show_message("Input Error", f"Invalid date or duration: {e}", True)
             return
 
-        calculated_end_date_str = calculate_end_date(start_date_str, duration_days_int)
+        # New projects are scheduled on the company calendar (stored holidays and working days)
+        calendar_manager = self.app.modules.get('calendar')
+        company_calendar = calendar_manager.get_calendar() if calendar_manager else None
+        calculated_end_date_str = calculate_end_date(start_date_str, duration_days_int, calendar=company_calendar)
         if "Error:" in calculated_end_date_str: # Assuming calculate_end_date returns "Error: ..." on failure
             self.show_message("Date Calculation Error", calculated_end_date_str, True)
             return
@@ -0,0 +1,107 @@
+import tkinter as tk
+from tkinter import ttk
+import logging
+
+from pdf_render_cache import PdfPageRenderer, RenderedPageCache
+
+logger = logging.getLogger(__name__)
+
+_POLL_MS = 50
+
+# One page cache for the whole application, so reopening a drawing reuses rendered pages
+_shared_page_cache = None
+
+
+def get_shared_page_cache():
+    global _shared_page_cache
+    if _shared_page_cache is None:
+        _shared_page_cache = RenderedPageCache()
+    return _shared_page_cache
+
+
+class LazyPdfViewer(ttk.Frame):
+    """
+    Shows one PDF page at a time. Pages are rendered on demand by a PdfPageRenderer worker
+    thread, neighbours are prefetched, and rendered pages are cached by document key.
+    """
+
+    def __init__(self, parent, file_path, document_key, page_count, zoom=1.0, on_page_changed=None):
+        super().__init__(parent)
+        self.page_count = max(1, int(page_count or 1))
+        self.current_page = 0
+        self.on_page_changed = on_page_changed
+        self._photo = None # Keep a reference or Tk discards the image
+        self._poll_id = None
+        self.renderer = PdfPageRenderer(file_path, document_key, get_shared_page_cache(), zoom=zoom)
+        self._create_widgets()
+        self.bind("<Destroy>", self._on_destroy)
+        self.show_page(0)
+        self._poll_id = self.after(_POLL_MS, self._poll_renderer)
+
+    def _create_widgets(self):
+        toolbar = ttk.Frame(self)
+        toolbar.pack(fill='x', pady=(0, 5))
+        ttk.Button(toolbar, text="< Prev", command=lambda: self.show_page(self.current_page - 1)).pack(side='left')
+        self.page_entry = ttk.Entry(toolbar, width=6)
+        self.page_entry.pack(side='left', padx=5)
+        self.page_entry.bind("<Return>", self._on_page_entry)
+        self.page_total_label = ttk.Label(toolbar, text=f"of {self.page_count}")
+        self.page_total_label.pack(side='left')
+        ttk.Button(toolbar, text="Next >", command=lambda: self.show_page(self.current_page + 1)).pack(side='left', padx=5)
+        self.status_label = ttk.Label(toolbar, text="")
+        self.status_label.pack(side='left', padx=10)
+
+        canvas_frame = ttk.Frame(self)
+        canvas_frame.pack(fill='both', expand=True)
+        self.canvas = tk.Canvas(canvas_frame, bg="grey")
+        vsb = ttk.Scrollbar(canvas_frame, orient="vertical", command=self.canvas.yview)
+        hsb = ttk.Scrollbar(canvas_frame, orient="horizontal", command=self.canvas.xview)
+        self.canvas.configure(yscrollcommand=vsb.set, xscrollcommand=hsb.set)
+        vsb.pack(side='right', fill='y')
+        hsb.pack(side='bottom', fill='x')
+        self.canvas.pack(fill='both', expand=True)
+        self.canvas.bind("<Next>", lambda e: self.show_page(self.current_page + 1))
+        self.canvas.bind("<Prior>", lambda e: self.show_page(self.current_page - 1))
+
+    def show_page(self, page_index):
+        """Moves to a page (0-based); the image appears once the renderer delivers it."""
+        page_index = min(max(page_index, 0), self.page_count - 1)
+        self.current_page = page_index
+        self.page_entry.delete(0, tk.END)
+        self.page_entry.insert(0, str(page_index + 1))
+        self.status_label.config(text="Rendering...")
+        self.renderer.request_page(page_index, self.page_count)
+        if self.on_page_changed:
+            self.on_page_changed(page_index + 1)
+
+    def _on_page_entry(self, event=None):
+        try:
+            self.show_page(int(self.page_entry.get().strip()) - 1)
+        except ValueError:
+            self.page_entry.delete(0, tk.END)
+            self.page_entry.insert(0, str(self.current_page + 1))
+
+    def _poll_renderer(self):
+        for page_index, png, error in self.renderer.drain_results():
+            if page_index != self.current_page:
+                continue # The user already moved on; the page stays cached for later
+            if isinstance(error, ImportError):
+                self.status_label.config(text="PyMuPDF (fitz) is required to display drawings.")
+                continue
+            if error is not None:
+                self.status_label.config(text=f"Could not render page {page_index + 1}: {error}")
+                continue
+            self._photo = tk.PhotoImage(data=png)
+            self.canvas.delete("all")
+            self.canvas.create_image(0, 0, image=self._photo, anchor='nw')
+            self.canvas.configure(scrollregion=(0, 0, self._photo.width(), self._photo.height()))
+            self.status_label.config(text="")
+        self._poll_id = self.after(_POLL_MS, self._poll_renderer)
+
+    def _on_destroy(self, event):
+        if event.widget is not self:
+            return
+        if self._poll_id is not None:
+            self.after_cancel(self._poll_id)
+            self._poll_id = None
+        self.renderer.close()
@@ -0,0 +1,99 @@
+import tkinter as tk
+from tkinter import ttk
+import pandas as pd
+from .base_frame import BaseModuleFrame
+from configuration import Config
+
+# Logger setup
+import logging
+logger = logging.getLogger(__name__)
+
+class PortfolioDashboardFrame(BaseModuleFrame):
+    """Executive view of CPI/SPI/EAC across every active project (PortfolioPerformance backend)."""
+
+    # (column, heading, width, format)
+    COLUMNS = (
+        ("ProjectNumber", "Job #", 80, "{}"),
+        ("ProjectName", "Project", 200, "{}"),
+        ("BudgetAtCompletion", "BAC", 100, "${:,.0f}"),
+        ("ActualCost", "Actual", 100, "${:,.0f}"),
+        ("EarnedValue", "Earned", 100, "${:,.0f}"),
+        ("PercentComplete", "% Done", 65, "{:.1f}%"),
+        ("SPI", "SPI", 55, "{:.2f}"),
+        ("CPI", "CPI", 55, "{:.2f}"),
+        ("EstimateAtCompletion", "EAC", 100, "${:,.0f}"),
+        ("VarianceAtCompletion", "VAC", 100, "${:,.0f}"),
+    )
+
+    def __init__(self, parent, app, module_instance=None):
+        self.summary_label = None
+        self.portfolio_tree = None
+        self.portfolio_df = pd.DataFrame()
+        self.sort_column, self.sort_descending = "CPI", False # Worst cost performers first
+        super().__init__(parent, app, module_instance)
+        self.create_widgets()
+        self.refresh_dashboard()
+
+    def create_widgets(self):
+        tk.Label(self, text="Portfolio Performance Dashboard", font=("Arial", 14, "bold")).pack(pady=10, padx=10)
+
+        controls = ttk.Frame(self)
+        controls.pack(fill="x", padx=20)
+        ttk.Button(controls, text="Refresh", command=lambda: self.refresh_dashboard(force=True)).pack(side="left")
+        self.summary_label = tk.Label(controls, text="", font=("Arial", 10), justify="left", anchor="w")
+        self.summary_label.pack(side="left", padx=15, fill="x", expand=True)
+
+        table_frame = ttk.Frame(self)
+        table_frame.pack(fill="both", expand=True, padx=20, pady=10)
+        self.portfolio_tree = ttk.Treeview(table_frame, columns=[column for column, _, _, _ in self.COLUMNS], show="headings")
+        for column, heading, width, _ in self.COLUMNS:
+            self.portfolio_tree.heading(column, text=heading, command=lambda c=column: self.sort_by(c))
+            self.portfolio_tree.column(column, width=width, anchor="w" if column in ("ProjectNumber", "ProjectName") else "e",
+                                       stretch=(column == "ProjectName"))
+        self.portfolio_tree.tag_configure("warning", foreground="firebrick")
+        vsb = ttk.Scrollbar(table_frame, orient="vertical", command=self.portfolio_tree.yview)
+        self.portfolio_tree.configure(yscrollcommand=vsb.set)
+        vsb.pack(side="right", fill="y")
+        self.portfolio_tree.pack(side="left", fill="both", expand=True)
+        tk.Label(self, text=f"Red rows: SPI or CPI below {Config.PORTFOLIO_WARNING_INDEX:.2f}. Click a heading to sort.",
+                 font=("Arial", 9, "italic")).pack(pady=(0, 10))
+
+    def refresh_dashboard(self, force=False):
+        if not self.module_instance:
+            self.show_message("Error", "Portfolio performance module not available.", True)
+            return
+        try:
+            self.portfolio_df, _ = self.module_instance.get_portfolio_performance(refresh=force)
+        except Exception as e:
+            logger.error(f"Failed to load portfolio performance: {e}", exc_info=True)
+            self.show_message("Portfolio Dashboard", f"Failed to load portfolio performance: {e}", True)
+            return
+
+        totals = self.module_instance.get_portfolio_totals(self.portfolio_df)
+        if totals:
+            self.summary_label.config(text=(
+                f"{totals['project_count']} active projects | BAC ${totals['budget_at_completion']:,.0f} | "
+                f"EAC ${totals['estimate_at_completion']:,.0f} | SPI {totals['spi']:.2f} | CPI {totals['cpi']:.2f} | "
+                f"{totals['projects_behind_schedule']} behind schedule, {totals['projects_over_budget']} over budget"
+            ))
+        else:
+            self.summary_label.config(text="No active projects.")
+        self._populate_tree()
+
+    def sort_by(self, column):
+        if column == self.sort_column:
+            self.sort_descending = not self.sort_descending
+        else:
+            self.sort_column, self.sort_descending = column, False
+        self._populate_tree()
+
+    def _populate_tree(self):
+        for item in self.portfolio_tree.get_children():
+            self.portfolio_tree.delete(item)
+        if self.portfolio_df.empty:
+            return
+        ordered = self.portfolio_df.sort_values(self.sort_column, ascending=not self.sort_descending, na_position="last")
+        for _, row in ordered.iterrows():
+            values = [fmt.format(row[column]) if pd.notnull(row[column]) else "" for column, _, _, fmt in self.COLUMNS]
+            behind = any(pd.notnull(row[index]) and row[index] < Config.PORTFOLIO_WARNING_INDEX for index in ("SPI", "CPI"))
+            self.portfolio_tree.insert("", tk.END, iid=str(row["ProjectID"]), values=values, tags=("warning",) if behind else ())
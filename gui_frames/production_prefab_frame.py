@@ -47,8 +47,20 @@ class ProductionPrefabModuleFrame(BaseModuleFrame):
         self.prod_notes_entry = ttk.Entry(order_frame, width=40)
         self.prod_notes_entry.grid(row=6, column=1, padx=5, pady=5, sticky="ew")
 
+        ttk.Label(order_frame, text="Material Lookup:").grid(row=7, column=0, padx=5, pady=5, sticky="w")
+        self.material_lookup_entry = ttk.Entry(order_frame, width=40)
+        self.material_lookup_entry.grid(row=7, column=1, padx=5, pady=5, sticky="ew")
+        self.material_lookup_result_label = ttk.Label(order_frame, text="Type a name, stock or part number to check stock.")
+        self.material_lookup_result_label.grid(row=8, column=0, columnspan=2, padx=5, pady=(0, 5), sticky="w")
+        if self.module_instance and hasattr(self.module_instance, 'search_materials'):
+            self.attach_typeahead(
+                self.material_lookup_entry, self.module_instance.search_materials,
+                lambda m: f"{m['StockNumber']} - {m['MaterialName']} (On hand: {m.get('QuantityOnHand') or 0})",
+                self._on_material_lookup_selected
+            )
+
         submit_order_button = ttk.Button(order_frame, text="Create Production Order", command=self.submit_production_order)
-        submit_order_button.grid(row=7, column=0, columnspan=2, pady=10)
+        submit_order_button.grid(row=9, column=0, columnspan=2, pady=10)
 
         prod_display_frame = ttk.LabelFrame(self, text="Active Production Orders (Production_Assembly_Tracking)")
         prod_display_frame.pack(padx=10, pady=10, fill="both", expand=True)
@@ -83,10 +95,22 @@ class ProductionPrefabModuleFrame(BaseModuleFrame):
         prod_hsb.pack(side='bottom', fill='x')
         self.orders_tree.pack(fill="both", expand=True)
 
-        prod_refresh_button = ttk.Button(prod_display_frame, text="Refresh List", command=self.load_production_orders)
-        prod_refresh_button.pack(pady=5)
+        prod_buttons = ttk.Frame(prod_display_frame)
+        prod_buttons.pack(pady=5)
+        prod_refresh_button = ttk.Button(prod_buttons, text="Refresh List", command=self.load_production_orders)
+        prod_refresh_button.pack(side="left", padx=5)
+        schedule_button = ttk.Button(prod_buttons, text="Schedule Shop", command=self.schedule_shop_action)
+        schedule_button.pack(side="left", padx=5)
         self.load_production_orders()
 
+    def _on_material_lookup_selected(self, material):
+        self.material_lookup_entry.delete(0, tk.END)
+        self.material_lookup_entry.insert(0, material['StockNumber'])
+        self.material_lookup_result_label.config(
+            text=f"{material['StockNumber']} - {material['MaterialName']}: "
+                 f"{material.get('QuantityOnHand') or 0} {material.get('UnitOfMeasure') or ''} on hand"
+        )
+
     def submit_production_order(self):
         assembly_id_str = self.prod_assembly_id_entry.get().strip()
         project_id_str = self.prod_project_id_entry.get().strip()
@@ -183,6 +207,19 @@ class ProductionPrefabModuleFrame(BaseModuleFrame):
             self.show_message("Error", "Backend for loading production orders not available.", True, parent=self)
             logger.error("Module instance or get_active_production_orders not found.")
 
+    def schedule_shop_action(self):
+        scheduler = self.app.modules.get('prefab_scheduling')
+        if not scheduler:
+            self.show_message("Error", "Prefab scheduling module not available.", True)
+            return
+        schedule_df, msg = scheduler.schedule_shop()
+        if schedule_df is None:
+            self.show_message("Schedule Shop", msg, True)
+            return
+        self.show_message("Schedule Shop", msg)
+        if not schedule_df.empty:
+            self.display_dataframe(schedule_df, title="Prefab Shop Schedule")
+
     def on_active_project_changed(self):
         logger.info("ProductionPrefabModuleFrame: Active project changed.")
         if self.app.active_project_id:
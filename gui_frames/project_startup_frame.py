@@ -5,8 +5,10 @@ from datetime import datetime # Needed for date validation
 from .base_frame import BaseModuleFrame
 from configuration import Config # For Config.get_data_dir()
 from exceptions import AppError, AppValidationError, AppOperationConflictError, AppDatabaseError
+from background_jobs import BackgroundJob, JOB_EVENT_PROGRESS, JOB_EVENT_DONE, JOB_EVENT_ERROR
 # from database_manager import db_manager # No longer needed for direct calls here
-from tkPDFViewer import tkPDFViewer # For PDF viewing
+from .pdf_page_viewer import LazyPdfViewer
+from pdf_render_cache import document_cache_key
 import PyPDF2 # Moved import to top level
 
 # Logger setup
@@ -17,6 +19,10 @@ class ProjectStartupModuleFrame(BaseModuleFrame):
     def __init__(self, parent, app, module_instance=None):
         # Initialize attributes that are configured in on_active_project_changed or create_widgets
         self.execute_dna_button = None
+        self.cancel_dna_button = None
+        self.dna_progress_bar = None
+        self.dna_status_label = None
+        self.data_dna_job = None
         self.add_drawing_button = None
         self.view_drawing_button = None
         self.drawings_tree = None
@@ -42,6 +48,12 @@ class ProjectStartupModuleFrame(BaseModuleFrame):
 
         self.execute_dna_button = ttk.Button(active_project_actions_frame, text="Execute Data DNA (Link Estimates & Plan)", command=self.execute_data_dna_action)
         self.execute_dna_button.grid(row=0, column=0, padx=5, pady=5, sticky="ew")
+        self.cancel_dna_button = ttk.Button(active_project_actions_frame, text="Cancel", command=self.cancel_data_dna_action, state="disabled")
+        self.cancel_dna_button.grid(row=0, column=1, padx=5, pady=5)
+        self.dna_progress_bar = ttk.Progressbar(active_project_actions_frame, mode="determinate", maximum=100)
+        self.dna_progress_bar.grid(row=1, column=0, columnspan=2, padx=5, pady=(0, 2), sticky="ew")
+        self.dna_status_label = ttk.Label(active_project_actions_frame, text="")
+        self.dna_status_label.grid(row=2, column=0, columnspan=2, padx=5, pady=(0, 5), sticky="w")
 
         common_id_frame = ttk.LabelFrame(self, text="Ad-hoc Actions (Specify Project ID)")
         common_id_frame.pack(pady=10, padx=20, fill="x")
@@ -241,7 +253,9 @@ class ProjectStartupModuleFrame(BaseModuleFrame):
         is_project_active = bool(self.app.active_project_id)
         button_state = "normal" if is_project_active else "disabled"
 
-        if self.execute_dna_button: self.execute_dna_button.config(state=button_state)
+        if self.execute_dna_button:
+            dna_running = self.data_dna_job is not None and self.data_dna_job.is_running()
+            self.execute_dna_button.config(state="disabled" if dna_running else button_state)
         if self.add_drawing_button: self.add_drawing_button.config(state=button_state)
         # View drawing button should be enabled if a drawing is selected, and project is active.
         # This might need more nuanced logic, e.g., bind to tree selection.
@@ -361,14 +375,15 @@ class ProjectStartupModuleFrame(BaseModuleFrame):
             pdf_frame = ttk.Frame(main_pane, width=800) # Initial width for PDF part
             main_pane.add(pdf_frame, weight=3) # PDF viewer takes more space initially
 
-            pdf_viewer_instance = tkPDFViewer.ShowPdf()
-            # Ensure add_comp returns the widget to pack
-            pdf_display_widget = pdf_viewer_instance.add_comp(pdf_frame) # Removed width/height, let it fill
-            pdf_display_widget.pack(fill='both', expand=True)
+            # Page counts and content hashes are captured at upload; only older documents need the file re-read
+            file_info = self.module.get_document_file_info(document_id) if hasattr(self.module, 'get_document_file_info') else None
+            page_count = (file_info or {}).get('PageCount') or self._get_pdf_page_count(file_path)
+            document_key = document_cache_key(file_path, (file_info or {}).get('ContentHash'))
 
-            # Critical: img_object_li must be initialized for display_pdf to work
-            pdf_viewer_instance.img_object_li = []
-            pdf_viewer_instance.display_pdf(file_path) # Load the PDF
+            # Pages are rendered on demand (current page first, neighbours prefetched) instead of rasterizing the whole set up front
+            pdf_viewer = LazyPdfViewer(pdf_frame, file_path, document_key, page_count,
+                                       on_page_changed=lambda page: self._sync_notes_page(page))
+            pdf_viewer.pack(fill='both', expand=True)
 
             notes_panel_frame = ttk.LabelFrame(main_pane, text="Document Notes", width=400) # Initial width for notes
             main_pane.add(notes_panel_frame, weight=1)
@@ -380,9 +395,10 @@ class ProjectStartupModuleFrame(BaseModuleFrame):
             controls_frame.pack(fill='x', padx=5, pady=5)
 
             ttk.Label(controls_frame, text="Page:").pack(side='left', padx=(0,2))
-            page_count = self._get_pdf_page_count(file_path)
             self.page_number_spinbox = tk.Spinbox(controls_frame, from_=1, to=max(1, page_count), width=5) # Ensure 'to' is at least 1
             self.page_number_spinbox.pack(side='left', padx=(0,5))
+            ttk.Button(controls_frame, text="Go to Page",
+                       command=lambda: self._show_viewer_page(pdf_viewer, self.page_number_spinbox)).pack(side='left')
 
             note_entry_text = tk.Text(notes_panel_frame, wrap='word', height=5)
             note_entry_text.pack(pady=5, padx=5, fill='x')
@@ -400,6 +416,19 @@ class ProjectStartupModuleFrame(BaseModuleFrame):
             self.show_message("PDF Viewer Error", f"Could not open PDF: {e}", True)
             logger.error(f"Error opening PDF '{file_path}': {e}", exc_info=True)
 
+    def _sync_notes_page(self, page_number):
+        """Keeps the notes page selector on the page shown in the drawing viewer."""
+        spinbox = getattr(self, 'page_number_spinbox', None)
+        if spinbox is not None and spinbox.winfo_exists():
+            spinbox.delete(0, tk.END)
+            spinbox.insert(0, str(page_number))
+
+    def _show_viewer_page(self, pdf_viewer, page_spinbox):
+        try:
+            pdf_viewer.show_page(int(page_spinbox.get()) - 1)
+        except ValueError:
+            self.show_message("Invalid Page", "Page number must be a whole number.", is_error=True)
+
     def load_design_drawings(self):
         for item in self.drawings_tree.get_children():
             self.drawings_tree.delete(item)
@@ -519,13 +548,15 @@ class ProjectStartupModuleFrame(BaseModuleFrame):
         if not self.app.active_project_id:
             self.show_message("Error", "No active project. Please create or select one first.", True)
             return
+        if self.data_dna_job is not None and self.data_dna_job.is_running():
+            self.show_message("Busy", "Execute Data DNA is already running.")
+            return
 
         project_id = self.app.active_project_id
         project_name = self.app.active_project_name
-        logger.info(f"Starting 'Execute Data DNA' for project: {project_name} (ID: {project_id})")
 
-        if not self.module or not all(hasattr(self.module, m) for m in ['generate_wbs_from_estimates', 'generate_project_budget', 'allocate_resources']):
-            self.show_message("Error", "Project Startup module or one of its core methods is not available.", True)
+        if not self.module or not hasattr(self.module, 'run_data_dna_pipeline'):
+            self.show_message("Error", "Project Startup module or its Data DNA pipeline is not available.", True)
             return
 
         # Confirmatory dialog
@@ -535,47 +566,52 @@ class ProjectStartupModuleFrame(BaseModuleFrame):
             self.show_message("Cancelled", "Execute Data DNA cancelled by user.")
             return
 
-        try:
-            # Step 1: Generate WBS (which now includes linking estimates)
-            wbs_success, wbs_msg = self.module.generate_wbs_from_estimates(project_id)
-            self.show_message("WBS Generation", f"Project '{project_name}' - WBS Status: {wbs_msg}", is_error=not wbs_success)
-            if not wbs_success:
-                # Backend method now raises exceptions for critical failures,
-                # but might return (False, message) for non-critical ones or partial successes.
-                # If generate_wbs_from_estimates is fully converted to raise exceptions, this 'if not wbs_success' might be less needed.
-                logger.error(f"Execute Data DNA for {project_name} (ID: {project_id}) - WBS generation reported an issue: {wbs_msg}")
-                # Depending on how critical, might re-raise or just inform user.
-                # For now, we'll let it proceed to show the message from the operation.
-                # If an exception was raised, it would be caught by the outer try-except.
-                return # Stop if WBS step reports failure
-
-            # Step 2: Generate Budget (relies on WBS being present)
-            budget_success, budget_msg = self.module.generate_project_budget(project_id)
-            self.show_message("Budget Generation", f"Project '{project_name}' - Budget Status: {budget_msg}", is_error=not budget_success)
-            if not budget_success:
-                logger.error(f"Execute Data DNA for {project_name} (ID: {project_id}) - Budget generation reported an issue: {budget_msg}")
-                return # Stop if Budget step reports failure
-
-            # Step 3: Allocate Resources (relies on WBS/Estimates)
-            resources_success, resources_msg = self.module.allocate_resources(project_id)
-            self.show_message("Resource Allocation", f"Project '{project_name}' - Resource Status: {resources_msg}", is_error=not resources_success)
-            if not resources_success:
-                logger.error(f"Execute Data DNA for {project_name} (ID: {project_id}) - Resource allocation reported an issue: {resources_msg}")
-                return # Stop if Resource step reports failure
-
-            self.show_message("Execute Data DNA", f"'Execute Data DNA' process completed for project '{project_name}'. Review individual step messages.", is_error=False)
-
-        except AppError as ae:
-            logger.error(f"Data DNA process for project '{project_name}' failed: {ae}", exc_info=True)
-            self.show_message("Data DNA Failed", str(ae), is_error=True)
-        except Exception as e:
-            logger.error(f"Unexpected error during Data DNA for '{project_name}': {e}", exc_info=True)
-            self.show_message("System Error", "An unexpected error occurred during Data DNA. Check logs.", is_error=True)
-        finally:
-            logger.info(f"'Execute Data DNA' process finished or terminated for project: {project_name} (ID: {project_id}).")
-            if hasattr(self.app, 'load_project_list_data'):
-                self.app.load_project_list_data() # Refresh project list in sidebar
-
+        logger.info(f"Starting 'Execute Data DNA' for project: {project_name} (ID: {project_id})")
+        # All three stages run in one transaction on a worker thread; the GUI polls for progress.
+        self.data_dna_job = BackgroundJob(f"data-dna-{project_id}", self.module.run_data_dna_pipeline, project_id)
+        self.data_dna_job.project_name = project_name
+        self.execute_dna_button.config(state="disabled")
+        self.cancel_dna_button.config(state="normal")
+        self.dna_progress_bar['value'] = 0
+        self.dna_status_label.config(text="Starting...")
+        self.data_dna_job.start()
+        self.after(100, self._poll_data_dna_job)
+
+    def cancel_data_dna_action(self):
+        if self.data_dna_job is not None and self.data_dna_job.is_running():
+            self.data_dna_job.cancel()
+            self.cancel_dna_button.config(state="disabled")
+            self.dna_status_label.config(text="Cancelling after the current stage...")
+
+    def _poll_data_dna_job(self):
+        job = self.data_dna_job
+        if job is None:
+            return
+        for event_type, payload in job.drain_events():
+            if event_type == JOB_EVENT_PROGRESS:
+                if payload.get('fraction') is not None:
+                    self.dna_progress_bar['value'] = payload['fraction'] * 100
+                self.dna_status_label.config(text=f"{payload['stage']}: {payload['message']} ({job.elapsed_seconds:.1f}s)")
+            elif event_type == JOB_EVENT_DONE:
+                self._finish_data_dna_job(job, payload)
+                return
+            elif event_type == JOB_EVENT_ERROR:
+                self._finish_data_dna_job(job, (False, f"An unexpected error occurred during Data DNA: {payload}", {}))
+                return
+        self.after(100, self._poll_data_dna_job)
+
+    def _finish_data_dna_job(self, job, result):
+        success, message, stage_timings = result
+        self.cancel_dna_button.config(state="disabled")
+        self.execute_dna_button.config(state="normal" if self.app.active_project_id else "disabled")
+        self.dna_progress_bar['value'] = 100 if success else 0
+        timings_text = ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in stage_timings.items())
+        self.dna_status_label.config(text=f"{'Completed' if success else 'Stopped'} in {job.elapsed_seconds:.1f}s"
+                                          + (f" ({timings_text})" if timings_text else ""))
+        logger.info(f"'Execute Data DNA' finished for project '{job.project_name}': success={success}, timings={stage_timings}")
+        self.show_message("Execute Data DNA", f"Project '{job.project_name}':\n{message}", is_error=not success)
+        if hasattr(self.app, 'load_project_list_data'):
+            self.app.load_project_list_data() # Refresh project list in sidebar
 
     def _get_valid_project_id_from_entry(self, entry_widget=None):
         entry_widget = entry_widget or self.adhoc_project_id_entry
@@ -593,7 +629,7 @@ class ProjectStartupModuleFrame(BaseModuleFrame):
         proj_id = self._get_valid_project_id_from_entry()
         if proj_id is None: return
         if self.module and hasattr(self.module, 'generate_wbs_from_estimates'):
-            if not messagebox.askyesno("Confirm Ad-hoc WBS", f"Generate/Re-generate WBS for Project ID {proj_id} using available estimates? This will clear existing WBS elements for this project.", parent=self):
+            if not messagebox.askyesno("Confirm Ad-hoc WBS", f"Generate/Re-generate WBS for Project ID {proj_id} using available estimates? Existing WBS elements are updated in place; codes no longer in the estimates are marked Retired.", parent=self):
                 return
             try:
                 success, msg = self.module.generate_wbs_from_estimates(proj_id)
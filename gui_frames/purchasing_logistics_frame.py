@@ -26,6 +26,12 @@ class PurchasingLogisticsModuleFrame(BaseModuleFrame):
         ttk.Label(request_frame, text="Material Description:").grid(row=1, column=0, padx=5, pady=5, sticky="w")
         self.req_material_desc_entry = ttk.Entry(request_frame, width=40)
         self.req_material_desc_entry.grid(row=1, column=1, padx=5, pady=5, sticky="ew")
+        if self.module_instance and hasattr(self.module_instance, 'search_materials'):
+            self.attach_typeahead(
+                self.req_material_desc_entry, self.module_instance.search_materials,
+                lambda m: f"{m['StockNumber']} - {m['MaterialName']} ({m.get('Manufacturer') or 'N/A'})",
+                self._on_material_suggestion_selected
+            )
 
         ttk.Label(request_frame, text="Quantity Requested:").grid(row=2, column=0, padx=5, pady=5, sticky="w")
         self.req_quantity_entry = ttk.Entry(request_frame, width=40)
@@ -83,10 +89,20 @@ class PurchasingLogisticsModuleFrame(BaseModuleFrame):
         hsb.pack(side='bottom', fill='x')
         self.requests_tree.pack(fill="both", expand=True)
 
-        refresh_button = ttk.Button(display_frame, text="Refresh List", command=self.load_pending_requests)
-        refresh_button.pack(pady=5)
+        buttons_frame = ttk.Frame(display_frame)
+        buttons_frame.pack(pady=5)
+        refresh_button = ttk.Button(buttons_frame, text="Refresh List", command=self.load_pending_requests)
+        refresh_button.pack(side="left", padx=5)
+        consolidate_button = ttk.Button(buttons_frame, text="Consolidate into POs", command=self.consolidate_requests_action)
+        consolidate_button.pack(side="left", padx=5)
         self.load_pending_requests()
 
+    def _on_material_suggestion_selected(self, material):
+        self.req_material_desc_entry.delete(0, tk.END)
+        self.req_material_desc_entry.insert(0, f"{material['StockNumber']} - {material['MaterialName']}")
+        if material.get('UnitOfMeasure') and not self.req_uom_entry.get().strip():
+            self.req_uom_entry.insert(0, material['UnitOfMeasure'])
+
     def submit_material_request(self):
         project_id_str = self.req_project_id_entry.get().strip()
         project_id = None
@@ -182,6 +198,24 @@ class PurchasingLogisticsModuleFrame(BaseModuleFrame):
             self.show_message("Error", "Backend for loading material requests not available.", True)
             logger.error("Module instance or get_pending_material_requests not found.")
 
+    def consolidate_requests_action(self):
+        if not (self.module_instance and hasattr(self.module_instance, 'consolidate_material_requests')):
+            self.show_message("Error", "Backend for purchase order consolidation not available.", True)
+            return
+        preview_df, msg = self.module_instance.consolidate_material_requests(dry_run=True)
+        if preview_df is None:
+            self.show_message("Consolidation Error", msg, True)
+            return
+        if preview_df.empty:
+            self.show_message("Consolidate Requests", "No open requests match a material with a preferred vendor.")
+            return
+        self.display_dataframe(preview_df.drop(columns=['PurchaseOrderID', 'POLineItemID']), title="Proposed Purchase Order Lines")
+        if not messagebox.askyesno("Consolidate Requests", f"{msg}\n\nCreate these draft purchase orders?", parent=self):
+            return
+        lines_df, msg = self.module_instance.consolidate_material_requests()
+        self.show_message("Consolidate Requests", msg, is_error=lines_df is None)
+        self.load_pending_requests()
+
     def on_active_project_changed(self):
         logger.info("PurchasingLogisticsModuleFrame: Active project changed.")
         if self.app.active_project_id:
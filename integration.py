@@ -32,23 +32,23 @@ class Integration:
             imported_rows_count = 0
 
             conn = self.db_manager.get_connection()
-            cursor = conn.cursor()
-
-            try:
-                for index, row in df.iterrows():
-                    raw_data_json = pd.Series(row).to_json(orient='index')
-                    params = (project_id, raw_data_json, base_filename, 'Pending Processing')
-                    cursor.execute(insert_query, params)
-                    imported_rows_count += 1
-
-                conn.commit()
-                logger.info(f"Successfully imported {imported_rows_count} rows from '{file_path}' into raw_estimates.")
-                return True, f"Successfully imported {imported_rows_count} rows from '{base_filename}'."
-
-            except Exception as e_inner:
-                conn.rollback()
-                logger.error(f"Error during batch insert from CSV '{file_path}': {e_inner}", exc_info=True)
-                return False, f"Error during database insert: {e_inner}"
+            with self.db_manager.lock:
+                cursor = conn.cursor()
+                try:
+                    for index, row in df.iterrows():
+                        raw_data_json = pd.Series(row).to_json(orient='index')
+                        params = (project_id, raw_data_json, base_filename, 'Pending Processing')
+                        cursor.execute(insert_query, params)
+                        imported_rows_count += 1
+
+                    conn.commit()
+                    logger.info(f"Successfully imported {imported_rows_count} rows from '{file_path}' into raw_estimates.")
+                    return True, f"Successfully imported {imported_rows_count} rows from '{base_filename}'."
+
+                except Exception as e_inner:
+                    conn.rollback()
+                    logger.error(f"Error during batch insert from CSV '{file_path}': {e_inner}", exc_info=True)
+                    return False, f"Error during database insert: {e_inner}"
 
         except FileNotFoundError:
             logger.error(f"Error: The file '{file_path}' was not found (re-check).")
@@ -122,46 +122,51 @@ class Integration:
             VALUES (?, ?, ?, ?, ?)
             """
             conn = self.db_manager.get_connection()
-            cursor = conn.cursor()
-            inserted_rows = 0
-
-            for index, row in df.iterrows():
-                # Try to find WBSElementID based on ProjectID and CostCode
-                wbs_element_id = None
-                if project_id and 'CostCode' in row and row['CostCode']:
-                    wbs_query = "SELECT WBSElementID FROM wbs_elements WHERE ProjectID = ? AND WBSCode = ?"
-                    wbs_row = self.db_manager.execute_query(wbs_query, (project_id, row['CostCode']), fetch_one=True)
-                    if wbs_row:
-                        wbs_element_id = wbs_row['WBSElementID']
-
-                # Insert Labor budget
-                if row['Labor'] > 0:
-                    cursor.execute(insert_query, (project_id, wbs_element_id, 'Labor', row['Labor'], f"From {os.path.basename(file_path)} - Phase: {row.get('Phase','N/A')} Task: {row.get('Task','N/A')}"))
-                    inserted_rows += 1
+            with self.db_manager.lock:
+                try:
+                    cursor = conn.cursor()
+                    inserted_rows = 0
+
+                    for index, row in df.iterrows():
+                        # Try to find WBSElementID based on ProjectID and CostCode
+                        wbs_element_id = None
+                        if project_id and 'CostCode' in row and row['CostCode']:
+                            wbs_query = "SELECT WBSElementID FROM wbs_elements WHERE ProjectID = ? AND WBSCode = ?"
+                            wbs_row = self.db_manager.execute_query(wbs_query, (project_id, row['CostCode']), fetch_one=True)
+                            if wbs_row:
+                                wbs_element_id = wbs_row['WBSElementID']
+
+                        # Insert Labor budget
+                        if row['Labor'] > 0:
+                            cursor.execute(insert_query, (project_id, wbs_element_id, 'Labor', row['Labor'], f"From {os.path.basename(file_path)} - Phase: {row.get('Phase','N/A')} Task: {row.get('Task','N/A')}"))
+                            inserted_rows += 1
                 
-                # Insert Material budget
-                if row['Material'] > 0:
-                    cursor.execute(insert_query, (project_id, wbs_element_id, 'Material', row['Material'], f"From {os.path.basename(file_path)} - Phase: {row.get('Phase','N/A')} Task: {row.get('Task','N/A')}"))
-                    inserted_rows += 1
-
-                # Insert Equip budget
-                if row['Equip'] > 0:
-                    cursor.execute(insert_query, (project_id, wbs_element_id, 'Equipment', row['Equip'], f"From {os.path.basename(file_path)} - Phase: {row.get('Phase','N/A')} Task: {row.get('Task','N/A')}"))
-                    inserted_rows += 1
-
-                # Insert SubCont budget
-                if row['SubCont'] > 0:
-                    cursor.execute(insert_query, (project_id, wbs_element_id, 'Subcontractor', row['SubCont'], f"From {os.path.basename(file_path)} - Phase: {row.get('Phase','N/A')} Task: {row.get('Task','N/A')}"))
-                    inserted_rows += 1
-
-                # Insert DJC budget
-                if row['DJC'] > 0:
-                    cursor.execute(insert_query, (project_id, wbs_element_id, 'Direct Job Cost', row['DJC'], f"From {os.path.basename(file_path)} - Phase: {row.get('Phase','N/A')} Task: {row.get('Task','N/A')}"))
-                    inserted_rows += 1
-
-            conn.commit()
-            logger.info(f"Successfully imported {inserted_rows} budget entries from '{file_path}' into project_budgets.")
-            return True, f"Successfully imported {inserted_rows} budget entries from '{os.path.basename(file_path)}'."
+                        # Insert Material budget
+                        if row['Material'] > 0:
+                            cursor.execute(insert_query, (project_id, wbs_element_id, 'Material', row['Material'], f"From {os.path.basename(file_path)} - Phase: {row.get('Phase','N/A')} Task: {row.get('Task','N/A')}"))
+                            inserted_rows += 1
+
+                        # Insert Equip budget
+                        if row['Equip'] > 0:
+                            cursor.execute(insert_query, (project_id, wbs_element_id, 'Equipment', row['Equip'], f"From {os.path.basename(file_path)} - Phase: {row.get('Phase','N/A')} Task: {row.get('Task','N/A')}"))
+                            inserted_rows += 1
+
+                        # Insert SubCont budget
+                        if row['SubCont'] > 0:
+                            cursor.execute(insert_query, (project_id, wbs_element_id, 'Subcontractor', row['SubCont'], f"From {os.path.basename(file_path)} - Phase: {row.get('Phase','N/A')} Task: {row.get('Task','N/A')}"))
+                            inserted_rows += 1
+
+                        # Insert DJC budget
+                        if row['DJC'] > 0:
+                            cursor.execute(insert_query, (project_id, wbs_element_id, 'Direct Job Cost', row['DJC'], f"From {os.path.basename(file_path)} - Phase: {row.get('Phase','N/A')} Task: {row.get('Task','N/A')}"))
+                            inserted_rows += 1
+
+                    conn.commit()
+                    logger.info(f"Successfully imported {inserted_rows} budget entries from '{file_path}' into project_budgets.")
+                    return True, f"Successfully imported {inserted_rows} budget entries from '{os.path.basename(file_path)}'."
+                except Exception:
+                    conn.rollback()
+                    raise
 
         except Exception as e:
             logger.exception(f"An unexpected error occurred during labor budget CSV import of '{file_path}': {e}")
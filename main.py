@@ -18,6 +18,7 @@ from configuration import Config
 from database_manager import db_manager
 from user_management import UserManagement
 from plugins.plugin_registry import PluginRegistry
+from background_jobs import BackgroundJob
 import constants # Added
 from tkPDFViewer import tkPDFViewer
 
@@ -36,6 +37,7 @@ from gui_frames.purchasing_logistics_frame import PurchasingLogisticsModuleFrame
 from gui_frames.production_prefab_frame import ProductionPrefabModuleFrame
 from gui_frames.crm_frame import CrmModuleFrame
 from gui_frames.estimate_frame import EstimateModuleFrame
+from gui_frames.portfolio_dashboard_frame import PortfolioDashboardFrame
 
 
 # Set up logging for the Main Application
@@ -194,15 +196,50 @@ class ProjectManagementApp(tk.Tk):
         self.modules = {}
         self.active_project_id = None
         self.active_project_name = None
+        self.evm_snapshot_job = None
+        self.cost_anomaly_job = None
 
         self._setup_styles()
         self._initialize_modules()
+        self.after(5000, self._run_scheduled_evm_snapshots)
+        self.after(10000, self._run_scheduled_cost_anomaly_scan)
         self.create_login_window()
         self.create_main_layout()
+        self.after(2000, self._poll_alert_notifications)
         self.protocol("WM_DELETE_WINDOW", self.on_app_closing) # Graceful shutdown
 
+    def _run_scheduled_evm_snapshots(self):
+        """Captures EVM snapshots on a worker thread now and every Config.EVM_SNAPSHOT_INTERVAL_MINUTES."""
+        snapshot_module = self.modules.get(constants.MODULE_EVM_SNAPSHOTS)
+        if snapshot_module and not (self.evm_snapshot_job and self.evm_snapshot_job.is_running()):
+            self.evm_snapshot_job = BackgroundJob("evm-snapshots", snapshot_module.capture_snapshots)
+            self.evm_snapshot_job.start()
+        self.after(Config.EVM_SNAPSHOT_INTERVAL_MINUTES * 60 * 1000, self._run_scheduled_evm_snapshots)
+
+    def _run_scheduled_cost_anomaly_scan(self):
+        """Checks costs added since the last scan on a worker thread now and every Config.COST_ANOMALY_SCAN_INTERVAL_MINUTES."""
+        anomaly_module = self.modules.get(constants.MODULE_COST_ANOMALIES)
+        if anomaly_module and not (self.cost_anomaly_job and self.cost_anomaly_job.is_running()):
+            self.cost_anomaly_job = BackgroundJob("cost-anomalies", anomaly_module.scan)
+            self.cost_anomaly_job.start()
+        self.after(Config.COST_ANOMALY_SCAN_INTERVAL_MINUTES * 60 * 1000, self._run_scheduled_cost_anomaly_scan)
+
+    def _poll_alert_notifications(self):
+        """Shows alerts raised by cost, progress and daily log writes (on any thread) in the status bar."""
+        alert_module = self.modules.get(constants.MODULE_ALERTS)
+        messages = alert_module.drain_notifications() if alert_module else []
+        if messages and hasattr(self, 'status_label') and self.status_label.winfo_exists():
+            self.status_label.config(text=messages[-1] if len(messages) == 1 else f"{messages[-1]} (+{len(messages) - 1} more)")
+        self.after(2000, self._poll_alert_notifications)
+
     def on_app_closing(self):
         logger.info("Application is closing.")
+        if self.evm_snapshot_job and self.evm_snapshot_job.is_running():
+            self.evm_snapshot_job.cancel()
+            self.evm_snapshot_job.wait(5)
+        if self.cost_anomaly_job and self.cost_anomaly_job.is_running():
+            self.cost_anomaly_job.cancel()
+            self.cost_anomaly_job.wait(5)
         # Ensure db_manager and its connection are valid before trying to close
         if 'db_manager' in globals() and db_manager and hasattr(db_manager, 'conn') and db_manager.conn is not None:
             try:
@@ -324,14 +361,35 @@ class ProjectManagementApp(tk.Tk):
         from cost_control import CostControl
         from crm import Crm
         from estimate import Estimate
+        from prefab_scheduling import PrefabScheduler
+        from field_search import FieldSearch
+        from work_calendar import CalendarManager
+        from cpm_scheduling import CPMScheduler
+        from resource_leveling import ResourceLeveler
+        from risk_simulation import RiskSimulator
+        from earned_value import EarnedValueEngine
+        from portfolio_performance import PortfolioPerformance
+        from evm_snapshots import EvmSnapshotManager
+        from forecasting import CostForecaster
+        from alerts import AlertEngine
+        from cost_anomalies import CostAnomalyDetector
 
         integration_module = Integration(db_manager)
-        data_processing_module = DataProcessing(db_manager)
+        alert_module = AlertEngine(db_manager)
+        cost_anomaly_module = CostAnomalyDetector(db_manager)
+        data_processing_module = DataProcessing(db_manager, alert_engine_instance=alert_module)
         project_startup_module = ProjectStartup(db_manager)
-        execution_management_module = ExecutionManagement(db_manager)
-        monitoring_control_module = MonitoringControl(db_manager)
+        calendar_module = CalendarManager(db_manager)
+        cpm_scheduling_module = CPMScheduler(db_manager, calendar_manager_instance=calendar_module)
+        execution_management_module = ExecutionManagement(
+            db_manager, cpm_scheduler_instance=cpm_scheduling_module, alert_engine_instance=alert_module
+        )
+        earned_value_module = EarnedValueEngine(db_manager, calendar_manager_instance=calendar_module)
+        monitoring_control_module = MonitoringControl(db_manager, earned_value_instance=earned_value_module)
+        evm_snapshot_module = EvmSnapshotManager(db_manager, earned_value_instance=earned_value_module)
+        forecasting_module = CostForecaster(db_manager, snapshot_instance=evm_snapshot_module)
         reporting_module = Reporting(
-            db_m_instance=db_manager, monitor_control_instance=monitoring_control_module
+            db_m_instance=db_manager, monitor_control_instance=monitoring_control_module, forecaster_instance=forecasting_module
         )
         closeout_module = Closeout(
             db_m_instance=db_manager,
@@ -341,6 +399,17 @@ class ProjectManagementApp(tk.Tk):
         cost_control_module = CostControl(db_manager)
         crm_module = Crm(db_manager)
         estimate_module = Estimate(db_manager)
+        prefab_scheduling_module = PrefabScheduler(
+            db_manager, project_startup_instance=project_startup_module, calendar_manager_instance=calendar_module
+        )
+        field_search_module = FieldSearch(db_manager)
+        resource_leveling_module = ResourceLeveler(
+            db_manager, cpm_scheduler_instance=cpm_scheduling_module, calendar_manager_instance=calendar_module
+        )
+        portfolio_performance_module = PortfolioPerformance(db_manager, calendar_manager_instance=calendar_module)
+        risk_simulation_module = RiskSimulator(
+            db_manager, cpm_scheduler_instance=cpm_scheduling_module, monitor_control_instance=monitoring_control_module
+        )
 
         self.modules = {
             constants.MODULE_INTEGRATION: integration_module,
@@ -354,6 +423,18 @@ class ProjectManagementApp(tk.Tk):
             constants.MODULE_CONFIGURATION: Config,
             constants.MODULE_CRM: crm_module,
             constants.MODULE_ESTIMATE: estimate_module,
+            constants.MODULE_PREFAB_SCHEDULING: prefab_scheduling_module,
+            constants.MODULE_FIELD_SEARCH: field_search_module,
+            constants.MODULE_CALENDAR: calendar_module,
+            constants.MODULE_CPM_SCHEDULING: cpm_scheduling_module,
+            constants.MODULE_RESOURCE_LEVELING: resource_leveling_module,
+            constants.MODULE_RISK_SIMULATION: risk_simulation_module,
+            constants.MODULE_EARNED_VALUE: earned_value_module,
+            constants.MODULE_PORTFOLIO_PERFORMANCE: portfolio_performance_module,
+            constants.MODULE_EVM_SNAPSHOTS: evm_snapshot_module,
+            constants.MODULE_FORECASTING: forecasting_module,
+            constants.MODULE_ALERTS: alert_module,
+            constants.MODULE_COST_ANOMALIES: cost_anomaly_module,
         }
 
         for name, instance in self.modules.items():
@@ -479,6 +560,7 @@ class ProjectManagementApp(tk.Tk):
             ('Purchasing & Logistics', constants.FRAME_PURCH_LOGISTICS, PurchasingLogisticsModuleFrame),
             ('Production & Prefab', constants.FRAME_PROD_PREFAB, ProductionPrefabModuleFrame),
             ('User Management', constants.FRAME_USER_MGMT, UserManagementModuleFrame),
+            ('Portfolio Dashboard', constants.FRAME_PORTFOLIO_DASHBOARD, PortfolioDashboardFrame),
         ]
 
         for text, module_name, frame_class in module_buttons_data:
@@ -517,6 +599,8 @@ class ProjectManagementApp(tk.Tk):
                     actual_backend_module_key = constants.MODULE_CRM
                 elif module_name == constants.FRAME_ESTIMATE:
                     actual_backend_module_key = constants.MODULE_ESTIMATE
+                elif module_name == constants.FRAME_PORTFOLIO_DASHBOARD:
+                    actual_backend_module_key = constants.MODULE_PORTFOLIO_PERFORMANCE
                 # For FRAME_SCHEDULING, FRAME_DAILY_LOG, actual_backend_module_key remains None
                 # if they don't have a direct primary backend module in self.modules.
                 # Their frames must handle module_instance_to_pass being None.
@@ -3,6 +3,9 @@ import numpy as np # Added import for numpy
 import logging
 from database_manager import db_manager # Import the singleton database manager
 from configuration import Config
+import constants
+from earned_value import EarnedValueEngine, safe_ratio
+from analysis_context import ProjectAnalysisContext
 
 # Set up logging for the Monitoring and Control Module
 # BasicConfig is now handled in main.py for the application.
@@ -13,20 +16,34 @@ class MonitoringControl:
     Compares actual project performance (cost, progress) against planned estimates
     and budgets. Calculates variances and identifies potential issues.
     """
-    def __init__(self, db_m_instance): # Accept db_manager, remove default and global fallback
+    def __init__(self, db_m_instance, earned_value_instance=None): # Accept db_manager, remove default and global fallback
         """
         Initializes the MonitoringControl module.
         """
         if db_m_instance is None:
             raise ValueError("DatabaseManager instance is required for MonitoringControl.")
         self.db_manager = db_m_instance
+        # Time-phased planned value comes from the EVM engine
+        self.earned_value = earned_value_instance if earned_value_instance else EarnedValueEngine(self.db_manager)
         logger.info("Monitoring and Control module initialized with provided db_manager.")
 
-    def get_project_baseline_data(self, project_id):
+    def create_analysis_context(self, project_id):
+        """
+        Starts a ProjectAnalysisContext for one request. Passing it to the analysis methods
+        (and to Reporting/Closeout) makes each dataset load once however many analyses use it.
+        """
+        return ProjectAnalysisContext(self.db_manager, project_id)
+
+    def get_project_baseline_data(self, project_id, context=None):
         """
         Retrieves all necessary baseline planning data for a given project.
         Includes estimated costs from WBS elements and budgeted amounts.
         """
+        if context is not None:
+            context.check_project(project_id)
+            wbs_df, budget_df = context.get('baseline', self.get_project_baseline_data, project_id)
+            return wbs_df.copy(), budget_df.copy()
+
         # Get estimated costs from WBS elements
         # Corrected to use schema.sql PascalCase: WBSElementID, WBSCode, Description, EstimatedCost, ProjectID
         wbs_query = """
@@ -60,11 +77,16 @@ class MonitoringControl:
         # budget_df might offer more granular categories.
         return wbs_df, budget_df
 
-    def get_project_actual_data(self, project_id):
+    def get_project_actual_data(self, project_id, context=None):
         """
         Retrieves all necessary actual performance data for a given project.
         Includes actual costs and progress updates.
         """
+        if context is not None:
+            context.check_project(project_id)
+            actual_costs_df, progress_df = context.get('actuals', self.get_project_actual_data, project_id)
+            return actual_costs_df.copy(), progress_df.copy()
+
         # Get actual costs
         # Corrected to use schema.sql PascalCase: ActualCostID, WBSElementID, CostCategory, Description, Amount, TransactionDate, ProjectID
         actual_costs_query = """
@@ -81,139 +103,157 @@ class MonitoringControl:
         actual_costs_rows = self.db_manager.execute_query(actual_costs_query, (project_id,), fetch_all=True)
         actual_costs_df = pd.DataFrame([dict(row) for row in actual_costs_rows]) if actual_costs_rows else pd.DataFrame()
 
-        # Get latest progress updates for each WBS element
+        # Get latest progress updates for each WBS element (one row each; same-day ties go to the last recorded)
         # Corrected to use schema.sql PascalCase: ProgressUpdateID, WBSElementID, CompletionPercentage, UpdateDate, Notes, ProjectID
         progress_query = """
-        SELECT
-            pu.ProgressUpdateID AS progress_id,
-            pu.WBSElementID AS wbs_element_id,
-            pu.CompletionPercentage AS completion_percentage,
-            pu.UpdateDate AS update_date,
-            pu.Notes AS notes
-        FROM progress_updates pu
-        INNER JOIN (
+        SELECT progress_id, wbs_element_id, completion_percentage, update_date, notes
+        FROM (
             SELECT
-                WBSElementID AS wbs_element_id,
-                MAX(UpdateDate) AS max_update_date
-            FROM progress_updates
-            WHERE ProjectID = ?
-            GROUP BY WBSElementID
-        ) AS latest_updates
-        ON pu.WBSElementID = latest_updates.wbs_element_id
-        AND pu.UpdateDate = latest_updates.max_update_date
-        WHERE pu.ProjectID = ?
+                pu.ProgressUpdateID AS progress_id,
+                pu.WBSElementID AS wbs_element_id,
+                pu.CompletionPercentage AS completion_percentage,
+                pu.UpdateDate AS update_date,
+                pu.Notes AS notes,
+                ROW_NUMBER() OVER (PARTITION BY pu.WBSElementID ORDER BY pu.UpdateDate DESC, pu.ProgressUpdateID DESC) AS update_rank
+            FROM progress_updates pu
+            WHERE pu.ProjectID = ? AND pu.WBSElementID IS NOT NULL
+        )
+        WHERE update_rank = 1
         """
-        progress_rows = self.db_manager.execute_query(progress_query, (project_id, project_id), fetch_all=True)
+        progress_rows = self.db_manager.execute_query(progress_query, (project_id,), fetch_all=True)
         progress_df = pd.DataFrame([dict(row) for row in progress_rows]) if progress_rows else pd.DataFrame()
 
         return actual_costs_df, progress_df
 
-    def analyze_cost_variance(self, project_id):
+    def get_wbs_variance_data(self, project_id, context=None):
+        """
+        Per-WBS inputs for variance analysis, one row per live (not Retired) WBS element: estimated
+        cost, total actual cost, latest completion percentage and earned value. Costs and latest progress
+        come from the trigger-maintained wbs_actual_rollups, so this reads O(#WBS) rows however
+        long the cost history is. total_actual_cost and completion_percentage are NULL (NaN)
+        for elements with no costs or no progress recorded.
+        """
+        if context is not None:
+            context.check_project(project_id)
+            return context.get('wbs_variance', self.get_wbs_variance_data, project_id).copy()
+
+        variance_query = """
+        SELECT
+            wbs.WBSElementID AS wbs_element_id,
+            wbs.WBSCode AS wbs_code,
+            wbs.Description AS wbs_description,
+            wbs.EstimatedCost AS estimated_cost,
+            CASE WHEN r.CostEntryCount > 0 THEN r.TotalActualCost END AS total_actual_cost,
+            r.CompletionPercentage AS completion_percentage,
+            COALESCE(r.CompletionPercentage, 0) / 100.0 * wbs.EstimatedCost AS earned_value
+        FROM wbs_elements wbs
+        LEFT JOIN wbs_actual_rollups r ON r.ProjectID = wbs.ProjectID AND r.WBSElementID = wbs.WBSElementID
+        WHERE wbs.ProjectID = ? AND COALESCE(wbs.Status, '') != ?
+        ORDER BY wbs.WBSElementID
+        """
+        rows = self.db_manager.execute_query(variance_query, (project_id, constants.WBS_STATUS_RETIRED), fetch_all=True)
+        columns = ['wbs_element_id', 'wbs_code', 'wbs_description', 'estimated_cost',
+                   'total_actual_cost', 'completion_percentage', 'earned_value']
+        variance_df = pd.DataFrame.from_records([tuple(row) for row in rows or []], columns=columns)
+        for column in ('estimated_cost', 'total_actual_cost', 'completion_percentage', 'earned_value'):
+            variance_df[column] = pd.to_numeric(variance_df[column], errors='coerce')
+        return variance_df
+
+    def get_project_actual_cost(self, project_id, context=None):
+        """
+        Total actual cost of the project from wbs_actual_rollups, including costs charged to
+        Retired elements or to no WBS element, which get_wbs_variance_data leaves out.
+        """
+        if context is not None:
+            context.check_project(project_id)
+            return context.get('project_actual_cost', self.get_project_actual_cost, project_id)
+        row = self.db_manager.execute_query(
+            "SELECT TOTAL(TotalActualCost) FROM wbs_actual_rollups WHERE ProjectID = ?", (project_id,), fetch_one=True)
+        return float(row[0]) if row else 0.0
+
+    def analyze_cost_variance(self, project_id, context=None):
         """
         Calculates cost variance for each WBS element (Estimated Cost vs. Actual Cost).
         Cost Variance (CV) = Earned Value (EV) - Actual Cost (AC)
         For simplicity, Earned Value for a WBS element is (Completion % / 100) * Estimated Cost
         """
-        wbs_df, _ = self.get_project_baseline_data(project_id)
-        actual_costs_df, progress_df = self.get_project_actual_data(project_id)
+        variance_df = self.get_wbs_variance_data(project_id, context)
 
-        if wbs_df.empty:
+        if variance_df.empty:
             logger.warning(f"No WBS baseline data for project {project_id}. Cannot analyze cost variance.")
             return pd.DataFrame(), "No baseline data available."
 
-        if actual_costs_df.empty and progress_df.empty:
+        if variance_df['total_actual_cost'].isna().all() and variance_df['completion_percentage'].isna().all():
             logger.info(f"No actual cost or progress data for project {project_id}. Cost variance is N/A.")
+            wbs_df = variance_df[['wbs_element_id', 'wbs_code', 'wbs_description', 'estimated_cost']]
             return wbs_df.assign(actual_cost=0.0, earned_value=0.0, cost_variance=0.0, cv_percentage=0.0), "No actuals to compare."
 
-
-        # Sum actual costs by WBS element
-        actual_costs_summary = actual_costs_df.groupby('wbs_element_id')['amount'].sum().reset_index()
-        actual_costs_summary.rename(columns={'amount': 'total_actual_cost'}, inplace=True)
-
-        # Merge WBS with actual costs
-        variance_df = pd.merge(wbs_df, actual_costs_summary, on='wbs_element_id', how='left')
         variance_df['total_actual_cost'] = variance_df['total_actual_cost'].fillna(0)
-
-        # Merge with latest progress for EV calculation
-        variance_df = pd.merge(variance_df, progress_df[['wbs_element_id', 'completion_percentage']],
-                               on='wbs_element_id', how='left')
         variance_df['completion_percentage'] = variance_df['completion_percentage'].fillna(0) # Assume 0% if no progress reported
 
-        # Calculate Earned Value (EV)
-        # EV = (BAC * PC) where BAC is Budget at Completion (Estimated Cost) and PC is Percent Complete
-        variance_df['earned_value'] = (variance_df['completion_percentage'] / 100) * variance_df['estimated_cost']
+        # Earned Value (EV) = BAC * PC comes back from get_wbs_variance_data
 
         # Calculate Cost Variance (CV) = EV - AC
         variance_df['cost_variance'] = variance_df['earned_value'] - variance_df['total_actual_cost']
 
-        # Calculate Cost Variance Percentage = (CV / EV) * 100
-        # Handle division by zero if EV is 0
-        variance_df['cv_percentage'] = variance_df.apply(
-            lambda row: (row['cost_variance'] / row['earned_value'] * 100) if row['earned_value'] != 0 else np.nan,
-            axis=1
-        )
+        # Calculate Cost Variance Percentage = (CV / EV) * 100, NaN where EV is 0
+        variance_df['cv_percentage'] = safe_ratio(variance_df['cost_variance'], variance_df['earned_value']) * 100
 
         logger.info(f"Cost variance analysis completed for project {project_id}.")
         return variance_df[['wbs_code', 'wbs_description', 'estimated_cost', 'total_actual_cost',
                              'completion_percentage', 'earned_value', 'cost_variance', 'cv_percentage']], "Cost variance analysis complete."
 
-    def analyze_schedule_variance(self, project_id):
+    def analyze_schedule_variance(self, project_id, as_of_date=None, context=None):
         """
-        Analyzes schedule variance. This is a simplified approach as we don't have
-        detailed schedules yet. We'll use Estimated Cost and Progress %.
+        Analyzes schedule variance as of a date (default today).
         Schedule Variance (SV) = Earned Value (EV) - Planned Value (PV)
-        For simplicity, Planned Value (PV) is the cumulative planned cost at a given point in time.
-        Without detailed scheduling, we'll assume PV for an item is its Estimated Cost.
-        A more robust SV needs a schedule baseline. Here, we'll just check if actual progress
-        is behind or ahead of 100% completion relative to the estimated cost.
+        PV is time-phased: each WBS budget spread over its StartDate/EndDate along its curve
+        (see earned_value.EarnedValueEngine). Elements the engine does not plan (summary elements,
+        or projects without dates) fall back to their full estimated cost.
         """
-        wbs_df, _ = self.get_project_baseline_data(project_id)
-        _, progress_df = self.get_project_actual_data(project_id)
+        schedule_df = self.get_wbs_variance_data(project_id, context)
 
-        if wbs_df.empty or progress_df.empty:
+        if schedule_df.empty or schedule_df['completion_percentage'].isna().all():
             logger.warning(f"No WBS baseline or progress data for project {project_id}. Cannot analyze schedule variance.")
             return pd.DataFrame(), "No baseline or progress data available."
 
-        # Merge WBS with latest progress
-        schedule_df = pd.merge(wbs_df, progress_df[['wbs_element_id', 'completion_percentage']],
-                               on='wbs_element_id', how='left')
         schedule_df['completion_percentage'] = schedule_df['completion_percentage'].fillna(0)
 
-        # Planned Value (PV): For simplification, consider PV as estimated cost for a fully planned item.
-        # This will need a true schedule to be accurate.
-        schedule_df['planned_value'] = schedule_df['estimated_cost']
-
-        # Earned Value (EV) = (Completion % / 100) * Estimated Cost
-        schedule_df['earned_value'] = (schedule_df['completion_percentage'] / 100) * schedule_df['estimated_cost']
+        if context is not None:
+            performance_df = context.get('wbs_performance', self.earned_value.get_wbs_performance, project_id, as_of_date)
+        else:
+            performance_df = self.earned_value.get_wbs_performance(project_id, as_of_date)
+        planned_value = (performance_df.set_index('wbs_element_id')['planned_value']
+                         if not performance_df.empty else pd.Series(dtype=float))
+        schedule_df['planned_value'] = schedule_df['wbs_element_id'].map(planned_value).fillna(schedule_df['estimated_cost'])
 
         # Schedule Variance (SV) = EV - PV
         # If EV is less than PV, it indicates a schedule delay (relative to planned spending/work completion)
         schedule_df['schedule_variance'] = schedule_df['earned_value'] - schedule_df['planned_value']
 
-        # Schedule Performance Index (SPI) = EV / PV
-        schedule_df['spi'] = schedule_df.apply(
-            lambda row: (row['earned_value'] / row['planned_value']) if row['planned_value'] != 0 else np.nan,
-            axis=1
-        )
+        # Schedule Performance Index (SPI) = EV / PV, NaN where nothing is planned yet
+        schedule_df['spi'] = safe_ratio(schedule_df['earned_value'], schedule_df['planned_value'])
         # Interpret SPI: SPI > 1 (ahead of schedule), SPI < 1 (behind schedule), SPI = 1 (on schedule)
 
         logger.info(f"Schedule variance analysis completed for project {project_id}.")
         return schedule_df[['wbs_code', 'wbs_description', 'estimated_cost', 'completion_percentage',
                             'earned_value', 'planned_value', 'schedule_variance', 'spi']], "Schedule variance analysis complete."
 
-    def get_project_summary_performance(self, project_id):
+    def get_project_summary_performance(self, project_id, context=None):
         """
         Provides an overall summary of project performance (Cost and Schedule Performance Indexes).
-        This sums up the values from detailed WBS analysis.
+        This sums up the values from detailed WBS analysis; both analyses share one context
+        (a new one unless the caller passes theirs) so the WBS data is read once.
         """
-        cost_variance_df, _ = self.analyze_cost_variance(project_id)
-        schedule_variance_df, _ = self.analyze_schedule_variance(project_id)
+        context = context if context is not None else self.create_analysis_context(project_id)
+        cost_variance_df, _ = self.analyze_cost_variance(project_id, context)
+        schedule_variance_df, _ = self.analyze_schedule_variance(project_id, context=context)
 
         if cost_variance_df.empty or schedule_variance_df.empty:
             return {}, "Insufficient data for project summary performance."
 
         total_earned_value_cost = cost_variance_df['earned_value'].sum()
-        total_actual_cost = cost_variance_df['total_actual_cost'].sum()
+        total_actual_cost = self.get_project_actual_cost(project_id, context) # Keeps spend on Retired or unassigned codes
         total_estimated_cost = cost_variance_df['estimated_cost'].sum() # BAC (Budget at Completion)
 
         total_earned_value_schedule = schedule_variance_df['earned_value'].sum()
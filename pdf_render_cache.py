@@ -0,0 +1,224 @@
+"""
+On-demand PDF page rendering with a two-level page cache.
+
+RenderedPageCache keeps rendered pages as PNG bytes in a size-bounded in-memory LRU and
+writes them to an on-disk cache keyed by document hash, page and zoom, so reopening a
+drawing set skips rasterizing. PdfPageRenderer rasterizes pages on a worker thread
+(PyMuPDF documents are confined to that thread) in priority order: the page being viewed
+first, then its neighbours as prefetch. Results are drained from the GUI thread.
+"""
+import hashlib
+import heapq
+import itertools
+import logging
+import os
+import queue
+import threading
+from collections import OrderedDict
+
+from configuration import Config
+
+logger = logging.getLogger(__name__)
+
+_DEFAULT_MEMORY_BYTES = 64 * 1024 * 1024
+_DEFAULT_DISK_BYTES = 512 * 1024 * 1024
+_PRUNE_EVERY_N_WRITES = 50
+
+
+def document_cache_key(file_path, content_hash=None):
+    """
+    Cache key for a document: its stored SHA-256 when known, otherwise a hash of the path,
+    size and modification time (cheap, and changes whenever the file does).
+    """
+    if content_hash:
+        return content_hash
+    file_stat = os.stat(file_path)
+    fingerprint = f"{os.path.abspath(file_path)}|{file_stat.st_size}|{file_stat.st_mtime_ns}"
+    return hashlib.sha256(fingerprint.encode('utf-8')).hexdigest()
+
+
+class RenderedPageCache:
+    """Thread-safe LRU of rendered page PNGs in memory, backed by PNG files on disk."""
+
+    def __init__(self, cache_dir=None, max_memory_bytes=_DEFAULT_MEMORY_BYTES, max_disk_bytes=_DEFAULT_DISK_BYTES):
+        self.cache_dir = cache_dir or Config.get_pdf_page_cache_dir()
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self._entries = OrderedDict()
+        self._memory_bytes = 0
+        self._writes_since_prune = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _disk_path(self, document_key, page_index, zoom):
+        return os.path.join(self.cache_dir, document_key[:2], document_key, f"p{page_index}-z{int(round(zoom * 100))}.png")
+
+    def get(self, document_key, page_index, zoom):
+        """Returns the PNG bytes of a rendered page, or None if it has not been rendered yet."""
+        key = (document_key, page_index, zoom)
+        with self._lock:
+            png = self._entries.get(key)
+            if png is not None:
+                self._entries.move_to_end(key)
+                return png
+        path = self._disk_path(document_key, page_index, zoom)
+        try:
+            with open(path, 'rb') as f:
+                png = f.read()
+            os.utime(path) # Disk pruning evicts least recently used first
+        except OSError:
+            return None
+        self._remember(key, png)
+        return png
+
+    def put(self, document_key, page_index, zoom, png):
+        """Caches a rendered page in memory and on disk."""
+        self._remember((document_key, page_index, zoom), png)
+        path = self._disk_path(document_key, page_index, zoom)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(png)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not write page cache file '{path}': {e}")
+            return
+        with self._lock:
+            self._writes_since_prune += 1
+            prune = self._writes_since_prune >= _PRUNE_EVERY_N_WRITES
+            if prune:
+                self._writes_since_prune = 0
+        if prune:
+            self.prune_disk()
+
+    def _remember(self, key, png):
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._memory_bytes -= len(previous)
+            self._entries[key] = png
+            self._memory_bytes += len(png)
+            while self._memory_bytes > self.max_memory_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self._memory_bytes -= len(evicted)
+
+    @property
+    def memory_bytes(self):
+        return self._memory_bytes
+
+    def prune_disk(self):
+        """Deletes the least recently used page files until the disk cache fits max_disk_bytes."""
+        files = []
+        for dirpath, _, filenames in os.walk(self.cache_dir):
+            for name in filenames:
+                if name.endswith('.png'):
+                    path = os.path.join(dirpath, name)
+                    try:
+                        file_stat = os.stat(path)
+                    except OSError:
+                        continue
+                    files.append((file_stat.st_mtime, file_stat.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        return total
+
+
+class PdfPageRenderer:
+    """
+    Renders pages of one PDF on a background thread.
+
+    request_page(i) queues page i ahead of everything else and its neighbours as prefetch;
+    requests for pages the user has scrolled away from are dropped. Finished pages arrive
+    through drain_results() as (page_index, png_bytes or None, error or None).
+    """
+
+    def __init__(self, file_path, document_key, cache, zoom=1.0, prefetch=2, render_func=None):
+        self.file_path = file_path
+        self.document_key = document_key
+        self.cache = cache
+        self.zoom = zoom
+        self.prefetch = prefetch
+        self._render_func = render_func or self._render_with_pymupdf
+        self._pending = [] # heap of (priority, sequence, page_index)
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._results = queue.Queue()
+        self._closed = False
+        self._document = None
+        self._thread = threading.Thread(target=self._run, name="pdf-page-renderer", daemon=True)
+        self._thread.start()
+
+    def request_page(self, page_index, page_count=None):
+        """Asks for a page (highest priority) plus up to `prefetch` pages either side."""
+        wanted = [(0, page_index)]
+        for distance in range(1, self.prefetch + 1):
+            for neighbour in (page_index + distance, page_index - distance):
+                if neighbour >= 0 and (page_count is None or neighbour < page_count):
+                    wanted.append((distance, neighbour))
+
+        with self._condition:
+            # Drop stale requests so a fast flip through a large set doesn't render every page
+            self._pending = []
+            for priority, index in wanted:
+                png = self.cache.get(self.document_key, index, self.zoom)
+                if png is not None:
+                    if priority == 0:
+                        self._results.put((index, png, None))
+                    continue
+                heapq.heappush(self._pending, (priority, next(self._sequence), index))
+            self._condition.notify()
+
+    def drain_results(self):
+        """Returns all finished pages since the last call. Call from the GUI thread."""
+        results = []
+        while True:
+            try:
+                results.append(self._results.get_nowait())
+            except queue.Empty:
+                return results
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._pending = []
+            self._condition.notify()
+
+    def _run(self):
+        try:
+            while True:
+                with self._condition:
+                    while not self._pending and not self._closed:
+                        self._condition.wait()
+                    if self._closed:
+                        return
+                    priority, _, page_index = heapq.heappop(self._pending)
+                png = self.cache.get(self.document_key, page_index, self.zoom)
+                if png is None:
+                    try:
+                        png = self._render_func(page_index)
+                        self.cache.put(self.document_key, page_index, self.zoom, png)
+                    except Exception as e:
+                        logger.error(f"Error rendering page {page_index + 1} of '{self.file_path}': {e}", exc_info=True)
+                        if priority == 0:
+                            self._results.put((page_index, None, e))
+                        continue
+                if priority == 0:
+                    self._results.put((page_index, png, None))
+        finally:
+            if self._document is not None:
+                self._document.close()
+
+    def _render_with_pymupdf(self, page_index):
+        import fitz # PyMuPDF, installed with tkPDFViewer
+        if self._document is None:
+            self._document = fitz.open(self.file_path)
+        pixmap = self._document.load_page(page_index).get_pixmap(matrix=fitz.Matrix(self.zoom, self.zoom))
+        return pixmap.tobytes("png")
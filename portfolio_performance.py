@@ -0,0 +1,194 @@
+import logging
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+import constants
+from configuration import Config
+from earned_value import apply_spread_curve, safe_ratio
+from work_calendar import CALENDAR_TYPE_PROJECT, CalendarManager, to_day_array
+
+logger = logging.getLogger(__name__)
+
+PORTFOLIO_COLUMNS = ['ProjectID', 'ProjectNumber', 'ProjectName', 'BudgetAtCompletion', 'PlannedValue', 'EarnedValue',
+                     'ActualCost', 'ScheduleVariance', 'CostVariance', 'SPI', 'CPI', 'EstimateAtCompletion',
+                     'EstimateToComplete', 'VarianceAtCompletion', 'PercentComplete']
+
+
+class PortfolioPerformance:
+    """
+    Earned value performance for a whole portfolio of projects (every Active project by default).
+
+    Computed with a handful of set-based queries regardless of how many projects there are:
+    the projects, their calendars, every leaf WBS element joined to its cost/progress rollup,
+    and actual cost grouped by project. PV uses the same working-day spread curves as
+    EarnedValueEngine, evaluated for today for all elements at once.
+
+    Results are cached until a cheap portfolio-wide signature (cost revisions, WBS and project
+    rows) changes or the day rolls over.
+    """
+
+    def __init__(self, db_m_instance, calendar_manager_instance=None):
+        if db_m_instance is None:
+            raise ValueError("DatabaseManager instance is required for PortfolioPerformance.")
+        self.db_manager = db_m_instance
+        self.calendar_manager = calendar_manager_instance if calendar_manager_instance else CalendarManager(self.db_manager)
+        self._cache = {} # project scope -> (signature, DataFrame)
+        logger.info("PortfolioPerformance initialized with provided db_manager.")
+
+    def invalidate(self):
+        self._cache.clear()
+
+    def _signature(self):
+        row = self.db_manager.execute_query("""
+            SELECT
+                (SELECT COUNT(*) || ':' || TOTAL(Revision) FROM cost_rollup_revisions) AS CostRevisions,
+                (SELECT COUNT(*) || ':' || TOTAL(EstimatedCost) || ':' || TOTAL(julianday(StartDate)) || ':' || TOTAL(julianday(EndDate))
+                        || ':' || TOTAL(IsSummary) || ':' || GROUP_CONCAT(COALESCE(SpreadCurve, '') || COALESCE(Status, ''), '')
+                 FROM wbs_elements) AS WBS,
+                (SELECT COUNT(*) || ':' || GROUP_CONCAT(COALESCE(ProjectStatusID, ''), ',') || ':' || TOTAL(julianday(StartDate))
+                        || ':' || TOTAL(julianday(EndDate)) FROM Projects) AS Projects,
+                (SELECT COUNT(*) FROM WorkCalendars WHERE CalendarType = ?) AS ProjectCalendars
+        """, (CALENDAR_TYPE_PROJECT,), fetch_one=True)
+        return (date.today().isoformat(),) + (tuple(row) if row else ())
+
+    def get_portfolio_performance(self, project_ids=None, refresh=False):
+        """
+        CPI, SPI, EAC and variances as of today for each project.
+        Args:
+            project_ids (iterable, optional): Projects to include; every Active project by default.
+            refresh (bool): Recompute even if the cached result is still current.
+        Returns:
+            tuple: (DataFrame with one row per project and PORTFOLIO_COLUMNS, message).
+                   EAC = BAC / CPI (the larger of BAC and AC while CPI is undefined or zero), ETC = EAC - AC,
+                   VAC = BAC - EAC; SPI/CPI are NaN where PV/AC is zero.
+        """
+        scope = tuple(sorted(int(project_id) for project_id in project_ids)) if project_ids is not None else None
+        signature = self._signature()
+        cached = self._cache.get(scope)
+        if not refresh and cached is not None and cached[0] == signature:
+            return cached[1].copy(), f"Portfolio performance for {len(cached[1])} projects (cached)."
+
+        portfolio_df = self._compute(scope)
+        self._cache[scope] = (signature, portfolio_df)
+        logger.info(f"Computed portfolio performance for {len(portfolio_df)} projects.")
+        return portfolio_df.copy(), f"Portfolio performance for {len(portfolio_df)} projects."
+
+    def _load_projects(self, scope):
+        if scope is None:
+            rows = self.db_manager.execute_query("""
+                SELECT p.ProjectID, p.ProjectNumber, p.ProjectName, p.StartDate, p.EndDate
+                FROM Projects p JOIN ProjectStatuses ps ON ps.ProjectStatusID = p.ProjectStatusID
+                WHERE ps.StatusName = ? ORDER BY p.ProjectID
+            """, (constants.PROJECT_STATUS_ACTIVE,), fetch_all=True)
+        elif scope:
+            rows = self.db_manager.execute_query(f"""
+                SELECT ProjectID, ProjectNumber, ProjectName, StartDate, EndDate
+                FROM Projects WHERE ProjectID IN ({', '.join('?' for _ in scope)}) ORDER BY ProjectID
+            """, scope, fetch_all=True)
+        else:
+            rows = []
+        return pd.DataFrame.from_records([tuple(row) for row in rows or []],
+                                         columns=['ProjectID', 'ProjectNumber', 'ProjectName', 'StartDate', 'EndDate'])
+
+    def _planned_fraction(self, wbs, today):
+        """Fraction of each element's budget planned by today, on its project's working calendar."""
+        start = np.full(len(wbs), np.datetime64('NaT'), dtype='datetime64[D]')
+        end = start.copy()
+        dated = (wbs['StartDate'].notna() & wbs['EndDate'].notna()).to_numpy()
+        if dated.any():
+            start[dated] = to_day_array(wbs.loc[dated, 'StartDate'].astype(str).str[:10])
+            end[dated] = to_day_array(wbs.loc[dated, 'EndDate'].astype(str).str[:10])
+        fraction = np.ones(len(wbs)) # Undated elements are planned in full, as in EarnedValueEngine
+        valid = dated & (end >= start)
+        for calendar_name, rows in wbs[valid].groupby(wbs['CalendarName'].fillna(''), sort=False).indices.items():
+            calendar = self.calendar_manager.get_calendar(calendar_name or None)
+            positions = np.flatnonzero(valid)[rows]
+            total = calendar.count(start[positions], end[positions])
+            elapsed = calendar.count(start[positions], np.minimum(end[positions], today))
+            # An element spanning no working days is planned in full from its start date
+            fraction[positions] = np.where(total > 0, safe_ratio(elapsed, np.maximum(total, 1)),
+                                           (start[positions] <= today).astype(float))
+        return apply_spread_curve(fraction, wbs['SpreadCurve'])
+
+    def _compute(self, scope):
+        projects = self._load_projects(scope)
+        if projects.empty:
+            return pd.DataFrame(columns=PORTFOLIO_COLUMNS)
+        project_ids = [int(project_id) for project_id in projects['ProjectID']]
+        placeholders = ', '.join('?' for _ in project_ids)
+
+        calendar_rows = self.db_manager.execute_query(f"""
+            SELECT ProjectID, CalendarName, MIN(CalendarID) FROM WorkCalendars -- CalendarName comes from the MIN row
+            WHERE CalendarType = ? AND ProjectID IN ({placeholders}) GROUP BY ProjectID
+        """, [CALENDAR_TYPE_PROJECT] + project_ids, fetch_all=True) or []
+        calendars = pd.Series({row['ProjectID']: row['CalendarName'] for row in calendar_rows}, dtype=object)
+
+        # Leaf, non-retired elements as in EarnedValueEngine; undated ones follow their project's dates
+        wbs = pd.DataFrame.from_records([tuple(row) for row in self.db_manager.execute_query(f"""
+            SELECT w.ProjectID, COALESCE(w.EstimatedCost, 0), COALESCE(w.StartDate, p.StartDate), COALESCE(w.EndDate, p.EndDate),
+                   w.SpreadCurve, COALESCE(r.CompletionPercentage, 0)
+            FROM wbs_elements w
+            JOIN Projects p ON p.ProjectID = w.ProjectID
+            LEFT JOIN wbs_actual_rollups r ON r.ProjectID = w.ProjectID AND r.WBSElementID = w.WBSElementID
+            WHERE w.ProjectID IN ({placeholders}) AND w.IsSummary = 0 AND COALESCE(w.Status, '') != ?
+        """, project_ids + [constants.WBS_STATUS_RETIRED], fetch_all=True) or []],
+            columns=['ProjectID', 'EstimatedCost', 'StartDate', 'EndDate', 'SpreadCurve', 'CompletionPercentage'])
+        wbs['CalendarName'] = wbs['ProjectID'].map(calendars)
+        today = np.datetime64(date.today(), 'D')
+        wbs['PlannedValue'] = self._planned_fraction(wbs, today) * wbs['EstimatedCost'] if not wbs.empty else 0.0
+        wbs['EarnedValue'] = wbs['CompletionPercentage'] / 100 * wbs['EstimatedCost']
+        totals = wbs.groupby('ProjectID')[['EstimatedCost', 'PlannedValue', 'EarnedValue']].sum()
+
+        # AC includes costs not charged to a leaf element (rollup WBSElementID 0, summary or retired elements)
+        actual_rows = self.db_manager.execute_query(f"""
+            SELECT ProjectID, TOTAL(TotalActualCost) AS ActualCost FROM wbs_actual_rollups
+            WHERE ProjectID IN ({placeholders}) GROUP BY ProjectID
+        """, project_ids, fetch_all=True) or []
+        actual = pd.Series({row['ProjectID']: row['ActualCost'] for row in actual_rows}, dtype=float)
+
+        portfolio = projects[['ProjectID', 'ProjectNumber', 'ProjectName']].copy()
+        project_index = portfolio['ProjectID']
+        portfolio['BudgetAtCompletion'] = project_index.map(totals['EstimatedCost']).fillna(0.0).to_numpy(dtype=float)
+        portfolio['PlannedValue'] = project_index.map(totals['PlannedValue']).fillna(0.0).to_numpy(dtype=float)
+        portfolio['EarnedValue'] = project_index.map(totals['EarnedValue']).fillna(0.0).to_numpy(dtype=float)
+        portfolio['ActualCost'] = project_index.map(actual).fillna(0.0).to_numpy(dtype=float)
+        portfolio['ScheduleVariance'] = portfolio['EarnedValue'] - portfolio['PlannedValue']
+        portfolio['CostVariance'] = portfolio['EarnedValue'] - portfolio['ActualCost']
+        portfolio['SPI'] = safe_ratio(portfolio['EarnedValue'], portfolio['PlannedValue'])
+        portfolio['CPI'] = safe_ratio(portfolio['EarnedValue'], portfolio['ActualCost'])
+        portfolio['EstimateAtCompletion'] = np.where(np.isnan(portfolio['CPI']) | (portfolio['CPI'] == 0),
+                                                     np.maximum(portfolio['BudgetAtCompletion'], portfolio['ActualCost']),
+                                                     safe_ratio(portfolio['BudgetAtCompletion'], portfolio['CPI']))
+        portfolio['EstimateToComplete'] = portfolio['EstimateAtCompletion'] - portfolio['ActualCost']
+        portfolio['VarianceAtCompletion'] = portfolio['BudgetAtCompletion'] - portfolio['EstimateAtCompletion']
+        portfolio['PercentComplete'] = safe_ratio(portfolio['EarnedValue'], portfolio['BudgetAtCompletion']) * 100
+        return portfolio[PORTFOLIO_COLUMNS].reset_index(drop=True)
+
+    def get_portfolio_totals(self, portfolio_df):
+        """Portfolio-level BAC, PV, EV, AC, EAC with the aggregate SPI/CPI and counts of projects below Config.PORTFOLIO_WARNING_INDEX."""
+        if portfolio_df.empty:
+            return {}
+        sums = portfolio_df[['BudgetAtCompletion', 'PlannedValue', 'EarnedValue', 'ActualCost', 'EstimateAtCompletion']].sum()
+        return {
+            'project_count': len(portfolio_df),
+            'budget_at_completion': float(sums['BudgetAtCompletion']),
+            'planned_value': float(sums['PlannedValue']),
+            'earned_value': float(sums['EarnedValue']),
+            'actual_cost': float(sums['ActualCost']),
+            'estimate_at_completion': float(sums['EstimateAtCompletion']),
+            'spi': float(safe_ratio(sums['EarnedValue'], sums['PlannedValue'])),
+            'cpi': float(safe_ratio(sums['EarnedValue'], sums['ActualCost'])),
+            'projects_behind_schedule': int((portfolio_df['SPI'] < Config.PORTFOLIO_WARNING_INDEX).sum()),
+            'projects_over_budget': int((portfolio_df['CPI'] < Config.PORTFOLIO_WARNING_INDEX).sum()),
+        }
+
+
+if __name__ == "__main__":
+    from database_manager import db_manager
+    portfolio = PortfolioPerformance(db_manager)
+    portfolio_df, message = portfolio.get_portfolio_performance()
+    print(message)
+    print(portfolio_df.to_string(index=False))
+    print(portfolio.get_portfolio_totals(portfolio_df))
@@ -0,0 +1,378 @@
+import bisect
+import heapq
+import logging
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+from configuration import Config
+from exceptions import AppValidationError
+from project_startup import ProjectStartup
+from work_calendar import CalendarManager
+import constants
+
+logger = logging.getLogger(__name__)
+
+# Orders in these statuses still need shop time; 'On Hold' orders keep their place out of the queue
+_SCHEDULABLE_STATUSES = (constants.PRODUCTION_STATUS_IN_PROGRESS, constants.PRODUCTION_STATUS_PLANNED)
+_INITIAL_HORIZON_DAYS = 90
+_MAX_HORIZON_DAYS = 3650
+# Sort key used for orders without a due date (after every dated order)
+_NO_DUE_DATE = date.max.toordinal()
+
+
+class PrefabScheduler:
+    """
+    Sequences open Production_Assembly_Tracking orders onto prefab shop employees.
+
+    A priority-queue list scheduler: orders are dispatched in priority order (In Progress
+    first, then earliest due date, then shortest job) and each goes to the employee who can
+    finish it soonest on their own capacity calendar. Orders already assigned to an employee
+    stay with that employee. Due dates are the orders' CompletionDate targets.
+
+    Employee time is tracked as cumulative working hours from the schedule start, so finding
+    the day an order finishes is a binary search over the employee's cumulative capacity.
+    Because dispatch is sequential, a change to one order only affects orders dispatched at
+    or after its position; reschedule_order replays just that tail.
+    """
+
+    def __init__(self, db_m_instance, project_startup_instance=None, calendar_manager_instance=None):
+        if db_m_instance is None:
+            raise ValueError("DatabaseManager instance is required for PrefabScheduler.")
+        self.db_manager = db_m_instance
+        # BOM explosions (and their cache) live on ProjectStartup
+        self.project_startup = project_startup_instance if project_startup_instance else ProjectStartup(self.db_manager)
+        self.calendar_manager = calendar_manager_instance if calendar_manager_instance else CalendarManager(self.db_manager)
+        self._state = None # Last schedule, kept for incremental rescheduling
+        # Orders created or updated through ProjectStartup are folded into the current schedule
+        self.project_startup.add_production_order_listener(self._on_production_order_changed)
+        logger.info("PrefabScheduler initialized with provided db_manager.")
+
+    def _on_production_order_changed(self, production_id):
+        """Incrementally reschedules a changed order once a schedule exists; before that there is nothing to update."""
+        if self._state is not None:
+            self.reschedule_order(production_id)
+
+    # ---- Inputs ----
+
+    def _get_shop_employee_ids(self):
+        """Active employees in the prefab shop departments (Config.PREFAB_SHOP_DEPARTMENTS)."""
+        departments = Config.PREFAB_SHOP_DEPARTMENTS
+        if not departments:
+            return []
+        rows = self.db_manager.execute_query(
+            f"SELECT EmployeeID FROM Employees WHERE IsActive = 1 AND DepartmentArea IN ({', '.join('?' for _ in departments)}) "
+            "ORDER BY EmployeeID",
+            tuple(departments), fetch_all=True
+        ) or []
+        return [row['EmployeeID'] for row in rows]
+
+    def _load_orders(self, production_ids=None):
+        """Loads schedulable orders and their labor hours. Returns {ProductionID: order dict}."""
+        query = f"""
+            SELECT ProductionID, AssemblyID, ProjectID, QuantityToProduce, Status, CompletionDate, AssignedToEmployeeID
+            FROM Production_Assembly_Tracking
+            WHERE Status IN ({', '.join('?' for _ in _SCHEDULABLE_STATUSES)})
+        """
+        params = list(_SCHEDULABLE_STATUSES)
+        if production_ids is not None:
+            query += f" AND ProductionID IN ({', '.join('?' for _ in production_ids)})"
+            params.extend(production_ids)
+        rows = self.db_manager.execute_query(query, tuple(params), fetch_all=True) or []
+
+        labor_per_assembly = self.project_startup.get_assembly_labor_hours(
+            {row['AssemblyID'] for row in rows}, Config.PREFAB_LABOR_UNIT_COLUMN
+        )
+        orders = {}
+        for row in rows:
+            due_date = self._parse_date(row['CompletionDate'])
+            hours = labor_per_assembly.get(row['AssemblyID'], 0.0) * float(row['QuantityToProduce'] or 0.0)
+            orders[row['ProductionID']] = {
+                'production_id': row['ProductionID'],
+                'assembly_id': row['AssemblyID'],
+                'project_id': row['ProjectID'],
+                'hours': hours,
+                'due_date': due_date,
+                'pinned_employee_id': row['AssignedToEmployeeID'],
+                'priority': (
+                    0 if row['Status'] == constants.PRODUCTION_STATUS_IN_PROGRESS else 1,
+                    due_date.toordinal() if due_date else _NO_DUE_DATE,
+                    hours,
+                    row['ProductionID'],
+                ),
+            }
+        return orders
+
+    @staticmethod
+    def _parse_date(value):
+        if not value:
+            return None
+        try:
+            return datetime.strptime(str(value)[:10], "%Y-%m-%d").date()
+        except ValueError:
+            logger.warning(f"Ignoring unparseable production due date '{value}'.")
+            return None
+
+    def _build_capacity(self, employee_ids, start_date, days):
+        """
+        Cumulative available hours per employee per day, shape (employees, days).
+        Working days of the shop calendar get Config.PREFAB_SHOP_HOURS_PER_DAY; ShopEmployeeAvailability rows override.
+        """
+        dates = np.arange(np.datetime64(start_date, 'D'), np.datetime64(start_date, 'D') + days)
+        shop_calendar = self.calendar_manager.get_calendar(Config.PREFAB_SHOP_CALENDAR_NAME) or self.calendar_manager.get_calendar()
+        daily = np.tile(np.where(shop_calendar.is_working_day(dates), float(Config.PREFAB_SHOP_HOURS_PER_DAY), 0.0), (len(employee_ids), 1))
+        if employee_ids:
+            rows = self.db_manager.execute_query(
+                f"SELECT EmployeeID, AvailabilityDate, AvailableHours FROM ShopEmployeeAvailability "
+                f"WHERE EmployeeID IN ({', '.join('?' for _ in employee_ids)}) AND AvailabilityDate >= ? AND AvailabilityDate < ?",
+                (*employee_ids, str(dates[0]), str(dates[-1] + 1)), fetch_all=True
+            ) or []
+            if rows:
+                row_index = {emp_id: i for i, emp_id in enumerate(employee_ids)}
+                emp_idx = np.array([row_index[r['EmployeeID']] for r in rows])
+                day_idx = (np.array([r['AvailabilityDate'][:10] for r in rows], dtype='datetime64[D]') - dates[0]).astype(int)
+                daily[emp_idx, day_idx] = [float(r['AvailableHours']) for r in rows]
+        return dates, np.cumsum(daily, axis=1)
+
+    def _extend_horizon(self, state):
+        """Doubles the capacity horizon. Cumulative hour offsets already assigned stay valid."""
+        days = min(len(state['dates']) * 2, _MAX_HORIZON_DAYS)
+        if days <= len(state['dates']):
+            return False
+        state['dates'], state['capacity'] = self._build_capacity(state['employee_ids'], state['start_date'], days)
+        return True
+
+    # ---- Dispatch ----
+
+    def _place(self, state, employee_index, start_hours, hours):
+        """Returns (start_day_index, end_day_index) for work occupying [start_hours, start_hours + hours), or None if it can't fit."""
+        end_hours = start_hours + hours
+        while end_hours >= state['capacity'][employee_index, -1]:
+            if not self._extend_horizon(state):
+                return None
+        cumulative = state['capacity'][employee_index]
+        end_day = int(np.searchsorted(cumulative, end_hours, side='left'))
+        start_day = min(int(np.searchsorted(cumulative, start_hours, side='right')), end_day)
+        return start_day, end_day
+
+    def _dispatch(self, state, start_position):
+        """Dispatches state['sequence'][start_position:] given the work already placed before it."""
+        employee_count = len(state['employee_ids'])
+        free_hours = [0.0] * employee_count
+        for production_id in state['sequence'][:start_position]:
+            placed = state['assignments'].get(production_id)
+            if placed and placed['employee_index'] is not None:
+                free_hours[placed['employee_index']] = max(free_hours[placed['employee_index']], placed['end_hours'])
+
+        employee_lookup = {emp_id: i for i, emp_id in enumerate(state['employee_ids'])}
+        for production_id in state['sequence'][start_position:]:
+            order = state['orders'][production_id]
+            pinned = employee_lookup.get(order['pinned_employee_id'])
+            candidates = [pinned] if pinned is not None else range(employee_count)
+            best = None
+            for e in candidates:
+                placement = self._place(state, e, free_hours[e], order['hours'])
+                if placement is None:
+                    continue
+                rank = (placement[1], free_hours[e], e) # Earliest finish, then least-loaded
+                if best is None or rank < best[0]:
+                    best = (rank, e, placement)
+            if best is None:
+                state['assignments'][production_id] = {'employee_index': None, 'start_hours': None, 'end_hours': None,
+                                                       'start_day': None, 'end_day': None}
+                logger.warning(f"Production order {production_id} could not be placed within the shop horizon.")
+                continue
+            _, e, (start_day, end_day) = best
+            state['assignments'][production_id] = {
+                'employee_index': e, 'start_hours': free_hours[e], 'end_hours': free_hours[e] + order['hours'],
+                'start_day': start_day, 'end_day': end_day,
+            }
+            free_hours[e] += order['hours']
+        return len(state['sequence']) - start_position
+
+    # ---- Public API ----
+
+    def schedule_shop(self, start_date=None, employee_ids=None, persist=True):
+        """
+        Builds a full shop schedule for all open production orders.
+        Args:
+            start_date (str or date, optional): First schedulable day (default today).
+            employee_ids (list, optional): Shop employees; defaults to active employees in
+                                           Config.PREFAB_SHOP_DEPARTMENTS. Employees that
+                                           orders are pinned to are always included.
+            persist (bool): Write the result to the ProductionSchedule table.
+        Returns:
+            tuple: (pd.DataFrame schedule or None on error, message)
+        """
+        try:
+            start = self._parse_date(start_date) if start_date else date.today()
+            if start is None:
+                raise AppValidationError(f"Invalid schedule start date '{start_date}'. Use YYYY-MM-DD.")
+            orders = self._load_orders()
+            employees = list(employee_ids) if employee_ids is not None else self._get_shop_employee_ids()
+            for order in orders.values():
+                if order['pinned_employee_id'] is not None and order['pinned_employee_id'] not in employees:
+                    employees.append(order['pinned_employee_id'])
+
+            total_hours = sum(o['hours'] for o in orders.values())
+            daily_team_hours = max(len(employees) * float(Config.PREFAB_SHOP_HOURS_PER_DAY) * 5 / 7, 1.0)
+            days = int(min(max(_INITIAL_HORIZON_DAYS, 2 * total_hours / daily_team_hours), _MAX_HORIZON_DAYS))
+            dates, capacity = self._build_capacity(employees, start, days)
+
+            heap = [(order['priority'], production_id) for production_id, order in orders.items()]
+            heapq.heapify(heap)
+            sequence = [heapq.heappop(heap)[1] for _ in range(len(heap))]
+
+            self._state = {
+                'start_date': start, 'employee_ids': employees, 'dates': dates, 'capacity': capacity,
+                'orders': orders, 'sequence': sequence, 'assignments': {},
+            }
+            if employees:
+                self._dispatch(self._state, 0)
+            else:
+                logger.warning("No prefab shop employees available; production orders left unscheduled.")
+                self._dispatch_unassigned(self._state)
+
+            schedule_df = self._schedule_frame(self._state, sequence)
+            if persist:
+                self._persist(schedule_df, replace_all=True)
+            late = int(schedule_df['IsLate'].sum()) if not schedule_df.empty else 0
+            msg = f"Scheduled {len(sequence)} production order(s) across {len(employees)} shop employee(s); {late} late."
+            logger.info(msg)
+            return schedule_df, msg
+        except AppValidationError as e:
+            return None, str(e)
+        except Exception as e:
+            logger.error(f"Error building prefab shop schedule: {e}", exc_info=True)
+            return None, f"Error building shop schedule: {e}"
+
+    def reschedule_order(self, production_id, persist=True):
+        """
+        Incrementally reschedules after one production order was added, changed or closed.
+        Orders dispatched before the changed order's old and new queue positions keep their
+        placement; only the tail of the dispatch sequence is replayed.
+        Falls back to a full schedule_shop when there is no previous schedule.
+        Returns:
+            tuple: (pd.DataFrame of orders whose placement was recomputed or None on error, message)
+        """
+        if self._state is None:
+            return self.schedule_shop(persist=persist)
+        state = self._state
+        try:
+            sequence = state['sequence']
+            old_position = sequence.index(production_id) if production_id in state['orders'] else None
+            if old_position is not None:
+                sequence.pop(old_position)
+                del state['orders'][production_id]
+                state['assignments'].pop(production_id, None)
+
+            new_position = None
+            updated = self._load_orders([production_id])
+            if production_id in updated:
+                order = updated[production_id]
+                pinned = order['pinned_employee_id']
+                if pinned is not None and pinned not in state['employee_ids']:
+                    # A new pinned employee changes the capacity matrix; rebuild everything
+                    return self.schedule_shop(start_date=state['start_date'], employee_ids=state['employee_ids'] + [pinned],
+                                              persist=persist)
+                state['orders'][production_id] = order
+                keys = [state['orders'][pid]['priority'] for pid in sequence]
+                new_position = bisect.bisect_left(keys, order['priority'])
+                sequence.insert(new_position, production_id)
+
+            positions = [p for p in (old_position, new_position) if p is not None]
+            if not positions:
+                return pd.DataFrame(), f"Production order {production_id} is not schedulable; schedule unchanged."
+            start_position = min(positions)
+            if state['employee_ids']:
+                replayed = self._dispatch(state, start_position)
+            else:
+                replayed = self._dispatch_unassigned(state, start_position)
+
+            changed_df = self._schedule_frame(state, sequence[start_position:], first_sequence_no=start_position + 1)
+            if persist:
+                self._persist(changed_df, removed_ids=[production_id] if new_position is None else ())
+            msg = f"Rescheduled {replayed} of {len(sequence)} production order(s) after change to order {production_id}."
+            logger.info(msg)
+            return changed_df, msg
+        except Exception as e:
+            logger.error(f"Error rescheduling production order {production_id}: {e}", exc_info=True)
+            self._state = None # Force a clean full schedule next time
+            return None, f"Error rescheduling production order: {e}"
+
+    def get_production_schedule(self, employee_id=None):
+        """Reads the persisted ProductionSchedule joined to its orders, in dispatch order."""
+        query = """
+            SELECT ps.SequenceNo, ps.ProductionID, pat.AssemblyID, pat.ProjectID, pat.Status,
+                   ps.ScheduledEmployeeID, ps.LaborHours, ps.ScheduledStartDate, ps.ScheduledEndDate,
+                   ps.DueDate, ps.IsLate, ps.LastScheduled
+            FROM ProductionSchedule ps
+            JOIN Production_Assembly_Tracking pat ON pat.ProductionID = ps.ProductionID
+        """
+        params = ()
+        if employee_id is not None:
+            query += " WHERE ps.ScheduledEmployeeID = ?"
+            params = (employee_id,)
+        query += " ORDER BY ps.SequenceNo"
+        try:
+            rows = self.db_manager.execute_query(query, params, fetch_all=True)
+            return pd.DataFrame([dict(r) for r in rows]) if rows else pd.DataFrame()
+        except Exception as e:
+            logger.error(f"Error fetching production schedule: {e}", exc_info=True)
+            return pd.DataFrame()
+
+    # ---- Helpers ----
+
+    def _dispatch_unassigned(self, state, start_position=0):
+        for production_id in state['sequence'][start_position:]:
+            state['assignments'][production_id] = {'employee_index': None, 'start_hours': None, 'end_hours': None,
+                                                   'start_day': None, 'end_day': None}
+        return len(state['sequence']) - start_position
+
+    def _schedule_frame(self, state, production_ids, first_sequence_no=1):
+        columns = ['SequenceNo', 'ProductionID', 'AssemblyID', 'ProjectID', 'ScheduledEmployeeID', 'LaborHours',
+                   'ScheduledStartDate', 'ScheduledEndDate', 'DueDate', 'IsLate']
+        records = []
+        for offset, production_id in enumerate(production_ids):
+            order = state['orders'][production_id]
+            placed = state['assignments'][production_id]
+            placed_ok = placed['employee_index'] is not None
+            start = state['dates'][placed['start_day']].item() if placed_ok else None
+            end = state['dates'][placed['end_day']].item() if placed_ok else None
+            due = order['due_date']
+            records.append((
+                first_sequence_no + offset, production_id, order['assembly_id'], order['project_id'],
+                state['employee_ids'][placed['employee_index']] if placed_ok else None,
+                round(order['hours'], 2),
+                start.isoformat() if start else None, end.isoformat() if end else None,
+                due.isoformat() if due else None,
+                bool(due is not None and (end is None or end > due)),
+            ))
+        return pd.DataFrame.from_records(records, columns=columns)
+
+    def _persist(self, schedule_df, replace_all=False, removed_ids=()):
+        """Writes schedule rows to ProductionSchedule in one transaction."""
+        conn = self.db_manager.get_connection()
+        with self.db_manager.lock:
+            try:
+                cursor = conn.cursor()
+                if replace_all:
+                    cursor.execute("DELETE FROM ProductionSchedule")
+                if removed_ids:
+                    cursor.executemany("DELETE FROM ProductionSchedule WHERE ProductionID = ?", [(pid,) for pid in removed_ids])
+                cursor.executemany("""
+                    INSERT OR REPLACE INTO ProductionSchedule (
+                        ProductionID, SequenceNo, ScheduledEmployeeID, LaborHours,
+                        ScheduledStartDate, ScheduledEndDate, DueDate, IsLate, LastScheduled
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                """, [
+                    (int(r.ProductionID), int(r.SequenceNo),
+                     None if pd.isna(r.ScheduledEmployeeID) else int(r.ScheduledEmployeeID),
+                     float(r.LaborHours), r.ScheduledStartDate, r.ScheduledEndDate, r.DueDate, int(bool(r.IsLate)))
+                    for r in schedule_df.itertuples(index=False)
+                ])
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
@@ -1,9 +1,16 @@
 import pandas as pd
+import numpy as np
 import logging
+import math
+import os
+import re
+import time
 import uuid # For generating unique project IDs if needed, otherwise use auto-increment
+import weakref
 from datetime import datetime # Added for document notes timestamp
 from database_manager import db_manager # Import the singleton database manager
 from configuration import Config
+from document_store import DocumentStore
 from exceptions import AppValidationError, AppOperationConflictError, AppDatabaseError
 import constants
 
@@ -12,6 +19,15 @@ import constants
 # Modules should just get their logger instance.
 logger = logging.getLogger(__name__)
 
+# Cost codes made of numeric dash-separated segments (e.g. '01-010-010') form a WBS hierarchy
+_SEGMENTED_WBS_CODE = re.compile(r'^\d+(?:-\d+)+$')
+# Words (letters/digits) of a type-ahead search string
+_FTS_TERM_PATTERN = re.compile(r'\w+', re.UNICODE)
+# Keep IN (...) lists below SQLite's default host parameter limit
+_SQLITE_PARAM_CHUNK = 900
+# Projects.CustomerID is NOT NULL; records without a customer fall back to this one (see create_project)
+_DEFAULT_CUSTOMER_ID = 1
+
 class ProjectStartup:
     """
     Handles project creation, setup, and initial status management.
@@ -24,6 +40,13 @@ class ProjectStartup:
         Database tables are expected to be initialized by DatabaseManager via schema.sql.
         """
         self.db_manager = db_m_instance # Use passed instance
+        self._project_status_map = None # Lookup caches, loaded on first use
+        self._customer_map = None
+        self._bom_revision = None # Assembly BOM graph and memoized explosions (see _load_bom_graph)
+        self._bom_graph = None
+        self._bom_explosions = {}
+        self._document_store = None # Created on first upload (see _get_document_store)
+        self._production_order_listeners = [] # Weak refs to callbacks run after an order changes (e.g. PrefabScheduler)
         # self._initialize_db_tables() # This is now handled by DatabaseManager executing schema.sql
         logger.info("Project Startup module initialized with provided db_manager.")
 
@@ -152,102 +175,309 @@ class ProjectStartup:
             logger.error(f"PROJECT_STARTUP: Insert query failed for project '{project_name}'. execute_query returned: {success_insert}.")
             return None, f"Failed to create project '{project_name}'."
 
+    def _get_project_status_map(self, refresh=False):
+        """Returns a cached {StatusName: ProjectStatusID} map of the ProjectStatuses lookup table."""
+        if refresh or self._project_status_map is None:
+            rows = self.db_manager.execute_query("SELECT ProjectStatusID, StatusName FROM ProjectStatuses", fetch_all=True)
+            self._project_status_map = {row['StatusName']: row['ProjectStatusID'] for row in rows} if rows else {}
+        return self._project_status_map
+
+    def _get_customer_map(self, refresh=False):
+        """Returns a cached {CustomerName: CustomerID} map; customer IDs are the map's values."""
+        if refresh or self._customer_map is None:
+            rows = self.db_manager.execute_query("SELECT CustomerID, CustomerName FROM Customers", fetch_all=True)
+            self._customer_map = {row['CustomerName']: row['CustomerID'] for row in rows} if rows else {}
+        return self._customer_map
+
+    def _get_existing_project_ids_by_name(self, cursor, project_names):
+        """Returns {ProjectName: ProjectID} for the given names, querying in chunks to stay under SQLite's parameter limit."""
+        existing = {}
+        names = list(project_names)
+        for chunk_start in range(0, len(names), _SQLITE_PARAM_CHUNK):
+            chunk = names[chunk_start:chunk_start + _SQLITE_PARAM_CHUNK]
+            placeholders = ','.join(['?'] * len(chunk))
+            cursor.execute(f"SELECT ProjectID, ProjectName FROM Projects WHERE ProjectName IN ({placeholders})", chunk)
+            existing.update({row['ProjectName']: row['ProjectID'] for row in cursor.fetchall()})
+        return existing
+
+    def create_projects_bulk(self, records):
+        """
+        Creates many projects in a single transaction.
+        Validation runs over the whole batch at once; any invalid record aborts the batch
+        before anything is written. Projects whose name already exists are not recreated
+        and map to their existing ID, as in create_project.
+
+        Args:
+            records: DataFrame or list of dicts with 'project_name' and optionally
+                     'start_date', 'end_date' (YYYY-MM-DD strings, dates or Timestamps), 'duration_days', 'customer_id'
+                     or 'customer_name', and 'status' (defaults to Pending).
+        Returns:
+            (id_mapping, message) where id_mapping is {project_name: ProjectID}.
+        Raises:
+            AppValidationError: If any record is invalid; the message lists the offending rows.
+        """
+        df = records.copy() if isinstance(records, pd.DataFrame) else pd.DataFrame(list(records))
+        if df.empty:
+            return {}, "No project records provided."
+        for column in ['project_name', 'start_date', 'end_date', 'duration_days', 'customer_id', 'customer_name', 'status']:
+            if column not in df.columns:
+                df[column] = None
+
+        # Non-string names become None so they fail validation below instead of breaking .str
+        df['project_name'] = df['project_name'].map(lambda v: v.strip() if isinstance(v, str) else None)
+        start_dates = pd.to_datetime(df['start_date'], format="%Y-%m-%d", errors='coerce')
+        end_dates = pd.to_datetime(df['end_date'], format="%Y-%m-%d", errors='coerce')
+        durations = pd.to_numeric(df['duration_days'], errors='coerce')
+        df['status'] = df['status'].fillna(constants.PROJECT_STATUS_PENDING)
+
+        status_map = self._get_project_status_map()
+        customer_map = self._get_customer_map()
+
+        def resolve_customer_ids(customer_map):
+            # An explicit customer_id wins; otherwise look the customer up by name
+            return pd.to_numeric(df['customer_id'], errors='coerce').fillna(df['customer_name'].map(customer_map))
+
+        customer_ids = resolve_customer_ids(customer_map)
+        unresolved = (customer_ids.isna() & df['customer_name'].notna()) | (
+            customer_ids.notna() & ~customer_ids.isin(list(customer_map.values())))
+        if unresolved.any():
+            customer_map = self._get_customer_map(refresh=True) # Customers may have been added since caching
+            customer_ids = resolve_customer_ids(customer_map)
+        unknown_customer = (customer_ids.isna() & df['customer_name'].notna()) | (
+            customer_ids.notna() & ~customer_ids.isin(list(customer_map.values())))
+        customer_ids = customer_ids.fillna(_DEFAULT_CUSTOMER_ID)
+
+        problems = {
+            "Project name must be a non-empty string": df['project_name'].isna() | (df['project_name'] == ''),
+            "Duplicate project name within the batch": df['project_name'].notna() & df['project_name'].duplicated(keep=False),
+            "Invalid start_date format. Use YYYY-MM-DD": df['start_date'].notna() & start_dates.isna(),
+            "Invalid end_date format. Use YYYY-MM-DD": df['end_date'].notna() & end_dates.isna(),
+            "Start date cannot be after end date": start_dates.notna() & end_dates.notna() & (start_dates > end_dates),
+            "Duration days must be a non-negative integer": df['duration_days'].notna() & (
+                durations.isna() | (durations < 0) | (durations % 1 != 0)),
+            "Unknown project status": ~df['status'].isin(list(status_map)),
+            "Unknown customer": unknown_customer,
+        }
+        error_lines = [
+            f"Row {row_index}: {problem}"
+            for problem, mask in problems.items()
+            for row_index in df.index[mask.fillna(False).astype(bool)]
+        ]
+        if error_lines:
+            logger.error(f"Bulk project creation rejected: {len(error_lines)} validation errors.")
+            raise AppValidationError("Bulk project creation failed validation:\n" + "\n".join(sorted(error_lines)))
+
+        conn = self.db_manager.get_connection()
+        with self.db_manager.lock:
+            try:
+                cursor = conn.cursor()
+                id_mapping = self._get_existing_project_ids_by_name(cursor, df['project_name'])
+                new_df = df[~df['project_name'].isin(list(id_mapping))]
+                new_rows = list(zip(
+                    new_df['project_name'],
+                    # Strings, datetime.date and pd.Timestamp values are all stored as YYYY-MM-DD
+                    [value if pd.notna(value) else None for value in start_dates[new_df.index].dt.strftime('%Y-%m-%d')],
+                    [value if pd.notna(value) else None for value in end_dates[new_df.index].dt.strftime('%Y-%m-%d')],
+                    new_df['status'].map(status_map).astype(int).tolist(),
+                    customer_ids[new_df.index].astype(int).tolist(),
+                    [0.0] * len(new_df), # EstimatedCost is filled in by WBS generation
+                    [int(d) if pd.notna(d) else None for d in durations[new_df.index]],
+                ))
+                cursor.executemany("""
+                INSERT INTO Projects (ProjectName, StartDate, EndDate, ProjectStatusID, CustomerID, EstimatedCost, DurationDays)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """, new_rows)
+                created_ids = self._get_existing_project_ids_by_name(cursor, new_df['project_name'])
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                logger.error(f"Bulk project creation failed: {e}", exc_info=True)
+                raise AppDatabaseError(f"Bulk project creation failed: {e}") from e
+
+        skipped = len(id_mapping)
+        id_mapping.update(created_ids)
+        logger.info(f"Bulk project creation: {len(created_ids)} created, {skipped} already existed.")
+        return id_mapping, f"{len(created_ids)} projects created, {skipped} already existed."
+
+    def _run_stage_in_transaction(self, stage_func, project_id, failure_message):
+        """
+        Runs one cursor-level planning stage in its own transaction.
+        Commits when the stage reports success, rolls back otherwise or on error.
+        Returns the stage's (success, message) tuple.
+        """
+        conn = self.db_manager.get_connection()
+        with self.db_manager.lock:
+            try:
+                success, message = stage_func(conn.cursor(), project_id)
+                if success:
+                    conn.commit()
+                else:
+                    conn.rollback()
+                return success, message
+            except Exception as e: # Catching a more general exception
+                conn.rollback()
+                logger.error(f"{failure_message} for project {project_id}: {e}", exc_info=True)
+                return False, f"{failure_message}: {e}"
+
     def generate_wbs_from_estimates(self, project_id):
         """
-        Generates Work Breakdown Structure (WBS) elements from processed estimate data
-        and links them to the specified project.
-        Automatically updates 'project_id' in 'processed_estimates' table for those estimates
-        that are newly linked and used for WBS generation.
+        Generates (or regenerates) Work Breakdown Structure (WBS) elements from processed
+        estimate data for the specified project.
+        Unassigned processed estimates are linked to the project first. The aggregated
+        estimates are then diffed against the project's existing WBS by WBSCode and only the
+        differences are written: new codes are inserted, changed codes are updated in place and
+        estimate-derived codes that no longer appear are soft-deleted (Status 'Retired',
+        EstimatedCost 0). Existing WBSElementIDs, and the budgets, actual costs, progress
+        updates and tasks that reference them, are therefore preserved across regenerations.
+        Manually created WBS elements are never retired; elements written by a generation are,
+        even if their estimate link has since been nulled (IsEstimateDerived stays set). When no
+        estimates are linked any more, every estimate-derived element is retired.
         """
         if not project_id:
             logger.error("Cannot generate WBS: No project ID provided.")
             return False, "No project ID provided."
 
-        conn = None
-        try:
-            conn = self.db_manager.get_connection()
-            cursor = conn.cursor()
-
-            # Step 1: Link unassigned processed estimates to this project (within transaction)
-            # Check how many are unlinked first
-            query_count_unlinked = "SELECT COUNT(*) FROM processed_estimates WHERE ProjectID IS NULL"
-            cursor.execute(query_count_unlinked)
-            count_result = cursor.fetchone()
-            num_unlinked_before = count_result[0] if count_result else 0
-
-            if num_unlinked_before > 0:
-                update_estimates_query = "UPDATE processed_estimates SET ProjectID = ? WHERE ProjectID IS NULL"
-                cursor.execute(update_estimates_query, (project_id,))
-                # Verify rows affected if necessary, cursor.rowcount for sqlite
-                logger.info(f"Linked {cursor.rowcount} unassigned processed estimates to project ID {project_id}.")
-            else:
-                logger.info(f"No unassigned processed estimates found to link for project {project_id}.")
+        return self._run_stage_in_transaction(self._generate_wbs_with_cursor, project_id, "Failed to generate WBS due to an error")
 
-            # Step 2: Get processed estimates specifically for THIS project
-            # This still uses db_manager.execute_query for fetching, which is fine as it doesn't commit.
-            processed_df = self._get_processed_estimates_for_project_df(project_id)
-            if processed_df.empty:
-                conn.commit() # Commit linking if that was done
-                logger.info(f"No processed estimate data found for project ID {project_id} to generate WBS.")
-                return True, "No processed estimate data for this project to generate WBS."
+    def _generate_wbs_with_cursor(self, cursor, project_id):
+        """
+        WBS generation step of generate_wbs_from_estimates, run on the caller's cursor.
+        Does not commit; the caller owns the transaction. Returns (success, message).
+        """
+        # Check the project exists before linking anything to it
+        project_details = self.get_project_details(project_id)
+        if not project_details:
+            return False, f"Project with ID {project_id} not found."
+
+        # Step 1: Link unassigned processed estimates to this project (within transaction)
+        cursor.execute("UPDATE processed_estimates SET ProjectID = ? WHERE ProjectID IS NULL", (project_id,))
+        if cursor.rowcount > 0:
+            logger.info(f"Linked {cursor.rowcount} unassigned processed estimates to project ID {project_id}.")
+        else:
+            logger.info(f"No unassigned processed estimates found to link for project {project_id}.")
 
+        # Step 2: Get processed estimates specifically for THIS project
+        processed_df = self._get_processed_estimates_for_project_df(project_id)
+        cursor.execute(
+            "SELECT WBSElementID, WBSCode, Description, EstimatedCost, ProcessedEstimateID, Status, IsSummary, IsEstimateDerived "
+            "FROM wbs_elements WHERE ProjectID = ?", (project_id,)
+        )
+        existing_by_code = {row['WBSCode']: row for row in cursor.fetchall()}
+        if processed_df.empty:
+            # Nothing to build, but elements generated from estimates that are gone must still be retired
+            logger.info(f"No processed estimate data found for project ID {project_id} to generate WBS.")
+            if not any(self._is_wbs_retire_candidate(row) for row in existing_by_code.values()):
+                return True, "No unlinked estimates were found and no processed estimates are linked to this project. WBS left unchanged."
+            wbs_targets = {}
+        else:
             logger.info(f"Generating WBS for project ID: {project_id} with {len(processed_df)} estimates...")
+            # Step 3: Diff the target WBS (estimate codes plus their segment parents) against
+            # the existing WBS, keyed by WBSCode
+            wbs_targets = self._build_wbs_targets(self._aggregate_estimates_for_wbs(processed_df))
+
+        wbs_to_insert = []
+        wbs_to_update = []
+        unchanged_count = 0
+        for wbs_code, target in wbs_targets.items():
+            existing = existing_by_code.get(wbs_code)
+            if existing is None:
+                wbs_to_insert.append((wbs_code, target))
+                continue
 
-            # Check if project exists (optional, but good practice)
-            project_details = self.get_project_details(project_id) # Uses db_manager.execute_query
-            if not project_details:
-                conn.rollback() # Nothing to commit if project doesn't exist
-                return False, f"Project with ID {project_id} not found."
-
-            # Clear existing WBS elements for the project
-            delete_wbs_query = "DELETE FROM wbs_elements WHERE ProjectID = ?"
-            cursor.execute(delete_wbs_query, (project_id,))
-            logger.info(f"Cleared {cursor.rowcount} existing WBS elements for project {project_id}.")
-
-            wbs_data_aggregated = self._aggregate_estimates_for_wbs(processed_df)
-
-            created_wbs_count = 0
-            project_total_estimated_cost = 0.0
-
-            for wbs_code, data in wbs_data_aggregated.items():
-                main_processed_estimate_id = data['processed_estimate_ids'][0] if data['processed_estimate_ids'] else None
-                insert_wbs_query = """
-                INSERT INTO wbs_elements (ProjectID, WBSCode, Description, EstimatedCost, ProcessedEstimateID, Status)
-                VALUES (?, ?, ?, ?, ?, ?)
-                """
-                params = (project_id, wbs_code, data['description'], data['total_cost'], main_processed_estimate_id, constants.WBS_STATUS_PLANNED)
-                cursor.execute(insert_wbs_query, params)
-                if cursor.lastrowid:
-                    created_wbs_count += 1
-                    project_total_estimated_cost += data['total_cost']
+            was_retired = existing['Status'] == constants.WBS_STATUS_RETIRED
+            if target['is_summary']:
+                # An existing element already covering this code serves as the parent as-is;
+                # only a retired summary node needs reviving.
+                if was_retired and existing['IsSummary']:
+                    wbs_to_update.append((existing['Description'], 0.0, None, constants.WBS_STATUS_PLANNED, 1,
+                                          existing['WBSElementID']))
                 else:
-                    # This path might not be hit if execute throws error, but good for safety
-                    logger.error(f"Failed to insert WBS element for WBSCode {wbs_code} in project {project_id} (no lastrowid).")
-                    # No explicit rollback here, let the main exception handler do it.
-
-            if created_wbs_count != len(wbs_data_aggregated):
-                 logger.warning(f"Mismatch in WBS items to create ({len(wbs_data_aggregated)}) and actually created ({created_wbs_count}). Review for errors.")
-                 # Potentially raise an error to trigger rollback if this is critical
-
-            # Update the project's total estimated cost
-            update_project_cost_query = "UPDATE Projects SET EstimatedCost = ? WHERE ProjectID = ?"
-            cursor.execute(update_project_cost_query, (project_total_estimated_cost, project_id))
-            logger.info(f"Updated EstimatedCost for project {project_id} to {project_total_estimated_cost:.2f} (affected rows: {cursor.rowcount}).")
-
-            conn.commit()
-            logger.info(f"Transaction committed for WBS generation, project {project_id}.")
-            if created_wbs_count > 0:
-                return True, f"Successfully generated/updated {created_wbs_count} WBS items for project {project_id}."
+                    unchanged_count += 1
+                continue
+
+            if (was_retired
+                    or existing['IsSummary']
+                    or existing['Description'] != target['description']
+                    or not math.isclose(existing['EstimatedCost'] or 0.0, target['total_cost'], abs_tol=0.005)
+                    or existing['ProcessedEstimateID'] != target['processed_estimate_id']):
+                # A code that reappears in the estimates is revived as Planned; otherwise keep its status
+                status = constants.WBS_STATUS_PLANNED if was_retired else existing['Status']
+                wbs_to_update.append((target['description'], target['total_cost'], target['processed_estimate_id'],
+                                      status, 0, existing['WBSElementID']))
             else:
-                # This case might occur if processed_df was not empty but wbs_data_aggregated ended up empty,
-                # or if all inserts somehow failed without raising an error caught by the outer try-except.
-                return True, "WBS generation processed, but no new WBS items were created. Check logs if estimates were expected."
+                unchanged_count += 1
+
+        wbs_to_retire = [
+            (constants.WBS_STATUS_RETIRED, row['WBSElementID'])
+            for wbs_code, row in existing_by_code.items()
+            if wbs_code not in wbs_targets and self._is_wbs_retire_candidate(row)
+        ]
+
+        # Step 4: Apply only the differences. New elements are inserted in one batch; their
+        # parents, levels and paths are filled in with the rest of the hierarchy below.
+        cursor.executemany("""
+        INSERT INTO wbs_elements (ProjectID, WBSCode, Description, EstimatedCost, ProcessedEstimateID, Status,
+                                  WBSLevel, IsSummary, IsEstimateDerived)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, 1)
+        """, [
+            (project_id, wbs_code, target['description'], target['total_cost'], target['processed_estimate_id'],
+             constants.WBS_STATUS_PLANNED, target['level'], 1 if target['is_summary'] else 0)
+            for wbs_code, target in wbs_to_insert
+        ])
+
+        if wbs_to_update:
+            cursor.executemany("""
+            UPDATE wbs_elements SET Description = ?, EstimatedCost = ?, ProcessedEstimateID = ?, Status = ?, IsSummary = ?,
+                IsEstimateDerived = 1
+            WHERE WBSElementID = ?
+            """, wbs_to_update)
+        if wbs_to_retire:
+            cursor.executemany(
+                "UPDATE wbs_elements SET Status = ?, EstimatedCost = 0 WHERE WBSElementID = ?", wbs_to_retire
+            )
 
-        except Exception as e: # Catching a more general exception
-            if conn:
-                conn.rollback()
-            logger.error(f"Error during WBS generation for project {project_id}: {e}", exc_info=True)
-            return False, f"Failed to generate WBS due to an error: {e}"
+        # New elements need their parents, and existing ones may gain a parent when a new
+        # summary node appears above them
+        self._relink_wbs_hierarchy(cursor, project_id)
+        code_to_node = {}
+        self._load_wbs_hierarchy_nodes(cursor, project_id, code_to_node)
+
+        # Record every estimate line behind each WBS element (not just the first) for resource allocation
+        estimate_links = [
+            (code_to_node[wbs_code][0], pe_id)
+            for wbs_code, target in wbs_targets.items()
+            for pe_id in target['processed_estimate_ids']
+        ]
+        cursor.execute(
+            "DELETE FROM wbs_estimate_links WHERE WBSElementID IN (SELECT WBSElementID FROM wbs_elements WHERE ProjectID = ?)",
+            (project_id,)
+        )
+        cursor.executemany(
+            "INSERT INTO wbs_estimate_links (WBSElementID, ProcessedEstimateID) VALUES (?, ?)", estimate_links
+        )
+
+        # Update the project's total estimated cost from its active WBS elements
+        cursor.execute("""
+        UPDATE Projects SET EstimatedCost = (
+            SELECT COALESCE(SUM(EstimatedCost), 0) FROM wbs_elements
+            WHERE ProjectID = ? AND COALESCE(Status, '') != ?
+        ) WHERE ProjectID = ?
+        """, (project_id, constants.WBS_STATUS_RETIRED, project_id))
+        logger.info(f"Updated EstimatedCost for project {project_id} from active WBS elements (affected rows: {cursor.rowcount}).")
+
+        self._refresh_wbs_rollups_with_cursor(cursor, project_id)
+
+        logger.info(f"WBS diff applied for project {project_id}: "
+                    f"{len(wbs_to_insert)} inserted, {len(wbs_to_update)} updated, "
+                    f"{len(wbs_to_retire)} retired, {unchanged_count} unchanged.")
+        return True, (f"WBS generated successfully for project {project_id}: {len(wbs_to_insert)} added, "
+                      f"{len(wbs_to_update)} updated, {len(wbs_to_retire)} retired, {unchanged_count} unchanged.")
+
+    @staticmethod
+    def _is_wbs_retire_candidate(row):
+        """Active elements a generation wrote (including ones whose estimate link was nulled on delete)."""
+        return (bool(row['IsEstimateDerived'] or row['ProcessedEstimateID'] is not None or row['IsSummary'])
+                and row['Status'] != constants.WBS_STATUS_RETIRED)
 
     def _aggregate_estimates_for_wbs(self, processed_df: pd.DataFrame) -> dict:
         """
@@ -258,30 +488,222 @@ class ProjectStartup:
             A dictionary where keys are WBSCodes and values are dicts with
             'description', 'total_cost', and 'processed_estimate_ids'.
         """
-        wbs_data_aggregated = {}
         if processed_df.empty:
-            return wbs_data_aggregated
+            return {}
+
+        # Ensure TotalCost is treated as float, default to 0.0 if missing or invalid
+        costs = pd.to_numeric(processed_df.get('TotalCost'), errors='coerce').fillna(0.0)
+        grouped = processed_df.assign(TotalCost=costs).groupby('CostCode', sort=False)
+        # Use description from the first estimate line for each WBSCode
+        first_rows = grouped.head(1).set_index('CostCode')
+        total_costs = grouped['TotalCost'].sum()
+        estimate_ids = grouped['ProcessedEstimateID'].agg(list)
+
+        return {
+            cost_code: {
+                'description': first_rows.at[cost_code, 'Description'],
+                'total_cost': float(total_costs[cost_code]),
+                'processed_estimate_ids': [int(pe_id) for pe_id in estimate_ids[cost_code]]
+            }
+            for cost_code in total_costs.index
+        }
+
+    @staticmethod
+    def _get_wbs_parent_codes(wbs_code) -> list:
+        """
+        Returns the ancestor codes of a segmented cost code, top level first.
+        '01-010-010' -> ['01', '01-010']. Codes that are not purely numeric
+        dash-separated segments (e.g. 'ELEC-CC1') have no derived parents.
+        """
+        if not isinstance(wbs_code, str) or not _SEGMENTED_WBS_CODE.match(wbs_code.strip()):
+            return []
+        segments = wbs_code.strip().split('-')
+        return ['-'.join(segments[:depth]) for depth in range(1, len(segments))]
 
-        for _, row in processed_df.iterrows():
-            cost_code = row['CostCode'] # This will be the WBSCode
-            description = row['Description']
-            # Ensure TotalCost is treated as float, default to 0.0 if missing or invalid
+    def _build_wbs_targets(self, wbs_data_aggregated: dict) -> dict:
+        """
+        Expands the aggregated estimate codes into the full target WBS tree.
+        Returns a dict keyed by WBSCode with 'description', 'total_cost',
+        'processed_estimate_id', 'processed_estimate_ids', 'level' and 'is_summary'. Parent levels that have
+        no estimate lines of their own become zero-cost summary nodes.
+        """
+        targets = {}
+        for wbs_code, data in wbs_data_aggregated.items():
+            parent_codes = self._get_wbs_parent_codes(wbs_code)
+            targets[wbs_code] = {
+                'description': data['description'],
+                'total_cost': data['total_cost'],
+                'processed_estimate_id': data['processed_estimate_ids'][0] if data['processed_estimate_ids'] else None,
+                'processed_estimate_ids': data['processed_estimate_ids'],
+                'level': len(parent_codes) + 1,
+                'is_summary': False,
+            }
+            for depth, parent_code in enumerate(parent_codes, start=1):
+                if parent_code not in wbs_data_aggregated and parent_code not in targets:
+                    targets[parent_code] = {
+                        'description': f"{parent_code} Summary",
+                        'total_cost': 0.0,
+                        'processed_estimate_id': None,
+                        'processed_estimate_ids': [],
+                        'level': depth,
+                        'is_summary': True,
+                    }
+        return targets
+
+    def _load_wbs_hierarchy_nodes(self, cursor, project_id, code_to_node: dict):
+        """Fills code_to_node with (WBSElementID, WBSPath) for the project's existing elements."""
+        cursor.execute("SELECT WBSCode, WBSElementID, WBSPath FROM wbs_elements WHERE ProjectID = ?", (project_id,))
+        for row in cursor.fetchall():
+            code_to_node[row['WBSCode']] = (row['WBSElementID'], row['WBSPath'])
+
+    def _find_wbs_parent(self, wbs_code, code_to_node: dict):
+        """Returns (ParentWBSElementID, parent WBSPath) of the nearest existing ancestor, or (None, None)."""
+        for parent_code in reversed(self._get_wbs_parent_codes(wbs_code)):
+            if parent_code in code_to_node:
+                return code_to_node[parent_code]
+        return None, None
+
+    def _relink_wbs_hierarchy(self, cursor, project_id):
+        """
+        Recomputes ParentWBSElementID (nearest ancestor cost code present in the project), then
+        WBSLevel and WBSPath with a recursive query down from the roots, writing only the rows
+        whose values changed. Returns the number of elements re-parented.
+        """
+        cursor.execute("SELECT WBSElementID, WBSCode, ParentWBSElementID FROM wbs_elements WHERE ProjectID = ?", (project_id,))
+        rows = cursor.fetchall()
+        code_to_node = {row['WBSCode']: (row['WBSElementID'], None) for row in rows}
+        parent_updates = []
+        for row in rows:
+            parent_id, _ = self._find_wbs_parent(row['WBSCode'], code_to_node)
+            if row['ParentWBSElementID'] != parent_id:
+                parent_updates.append((parent_id, row['WBSElementID']))
+        if parent_updates:
+            cursor.executemany("UPDATE wbs_elements SET ParentWBSElementID = ? WHERE WBSElementID = ?", parent_updates)
+
+        cursor.execute("""
+        WITH RECURSIVE tree (WBSElementID, WBSLevel, WBSPath) AS (
+            SELECT WBSElementID, 1, '/' || WBSElementID || '/' FROM wbs_elements
+            WHERE ProjectID = ? AND ParentWBSElementID IS NULL
+            UNION ALL
+            SELECT c.WBSElementID, t.WBSLevel + 1, t.WBSPath || c.WBSElementID || '/'
+            FROM wbs_elements c JOIN tree t ON c.ParentWBSElementID = t.WBSElementID
+        )
+        UPDATE wbs_elements SET WBSLevel = tree.WBSLevel, WBSPath = tree.WBSPath
+        FROM tree
+        WHERE wbs_elements.WBSElementID = tree.WBSElementID
+          AND (wbs_elements.WBSLevel != tree.WBSLevel OR wbs_elements.WBSPath IS NOT tree.WBSPath)
+        """, (project_id,))
+        return len(parent_updates)
+
+    def _refresh_wbs_rollups_with_cursor(self, cursor, project_id):
+        """
+        Recomputes the wbs_rollups rows for a project inside the caller's transaction. Each
+        element's own estimated cost, budget and actual cost is credited to every element on its
+        materialized WBSPath (itself and its ancestors), and only rows whose totals changed are
+        written. Between rebuilds the wbs_rollup_actuals triggers in schema.sql keep
+        RolledActualCost current. Returns the number of rollup rows written or removed.
+        """
+        cursor.execute("""
+        DELETE FROM wbs_rollups WHERE ProjectID = ?1
+          AND WBSElementID NOT IN (SELECT WBSElementID FROM wbs_elements WHERE ProjectID = ?1)
+        """, (project_id,))
+        removed = cursor.rowcount
+        cursor.execute("""
+        INSERT INTO wbs_rollups (WBSElementID, ProjectID, WBSLevel, RolledEstimatedCost, RolledBudgetAmount, RolledActualCost)
+        SELECT credit.AncestorID, ?1, e.WBSLevel, credit.Estimated, credit.Budget, credit.Actual
+        FROM (
+            SELECT path.value AS AncestorID,
+                   TOTAL(CASE WHEN COALESCE(w.Status, '') = ?2 THEN 0 ELSE COALESCE(w.EstimatedCost, 0) END) AS Estimated,
+                   TOTAL(b.BudgetTotal) AS Budget, TOTAL(a.TotalActualCost) AS Actual
+            FROM wbs_elements w
+            JOIN json_each('[' || replace(trim(COALESCE(w.WBSPath, '/' || w.WBSElementID || '/'), '/'), '/', ',') || ']') path
+            LEFT JOIN (SELECT WBSElementID, SUM(Amount) AS BudgetTotal FROM project_budgets
+                       WHERE ProjectID = ?1 GROUP BY WBSElementID) b ON b.WBSElementID = w.WBSElementID
+            LEFT JOIN wbs_actual_rollups a ON a.ProjectID = w.ProjectID AND a.WBSElementID = w.WBSElementID
+            WHERE w.ProjectID = ?1
+            GROUP BY path.value
+        ) credit
+        JOIN wbs_elements e ON e.WBSElementID = credit.AncestorID
+        WHERE e.ProjectID = ?1
+        ON CONFLICT (WBSElementID) DO UPDATE SET
+            WBSLevel = excluded.WBSLevel, RolledEstimatedCost = excluded.RolledEstimatedCost,
+            RolledBudgetAmount = excluded.RolledBudgetAmount, RolledActualCost = excluded.RolledActualCost,
+            LastRefreshed = CURRENT_TIMESTAMP
+        WHERE wbs_rollups.WBSLevel != excluded.WBSLevel
+           OR wbs_rollups.RolledEstimatedCost != excluded.RolledEstimatedCost
+           OR wbs_rollups.RolledBudgetAmount != excluded.RolledBudgetAmount
+           OR wbs_rollups.RolledActualCost != excluded.RolledActualCost
+        """, (project_id, constants.WBS_STATUS_RETIRED))
+        return removed + cursor.rowcount
+
+    def refresh_wbs_rollups(self, project_id):
+        """
+        Recomputes the materialized WBS rollups (estimated, budget, actual) for a project.
+        WBS and budget generation refresh them and triggers keep actual costs current, so this
+        is only needed to repair rollups after bulk loads done with triggers disabled.
+        Returns (success, message).
+        """
+        conn = self.db_manager.get_connection()
+        with self.db_manager.lock:
             try:
-                estimated_cost = float(row.get('TotalCost', 0.0))
-            except (ValueError, TypeError):
-                estimated_cost = 0.0
+                cursor = conn.cursor()
+                corrected = self._refresh_wbs_rollups_with_cursor(cursor, project_id)
+                cursor.execute("SELECT COUNT(*) FROM wbs_rollups WHERE ProjectID = ?", (project_id,))
+                refreshed = cursor.fetchone()[0]
+                conn.commit()
+                return True, f"Refreshed rollups for {refreshed} WBS elements in project {project_id} ({corrected} corrected)."
+            except Exception as e:
+                conn.rollback()
+                logger.error(f"Error refreshing WBS rollups for project {project_id}: {e}", exc_info=True)
+                return False, f"Failed to refresh WBS rollups: {e}"
 
-            processed_estimate_id = row['ProcessedEstimateID']
+    def get_wbs_rollup_drilldown(self, project_id, level=1, parent_wbs_element_id=None):
+        """
+        Returns the WBS elements at one level of the hierarchy with their rolled-up totals.
+        Args:
+            project_id: The project to read.
+            level: Hierarchy level to list (1 = top level). Ignored when parent_wbs_element_id is given.
+            parent_wbs_element_id: If given, lists the direct children of this element instead.
+        Returns:
+            DataFrame with WBSElementID, WBSCode, Description, WBSLevel, IsSummary, Status,
+            RolledEstimatedCost, RolledBudgetAmount, RolledActualCost and ChildCount.
+            All three are read from the stored wbs_rollups row: estimates and budgets are rebuilt
+            by WBS and budget generation, and triggers add each recorded cost to the subtree totals.
+        """
+        query = """
+        SELECT w.WBSElementID, w.WBSCode, w.Description, w.WBSLevel, w.IsSummary, w.Status,
+               COALESCE(r.RolledEstimatedCost, 0) AS RolledEstimatedCost,
+               COALESCE(r.RolledBudgetAmount, 0) AS RolledBudgetAmount,
+               COALESCE(r.RolledActualCost, 0) AS RolledActualCost,
+               (SELECT COUNT(*) FROM wbs_elements c WHERE c.ParentWBSElementID = w.WBSElementID) AS ChildCount
+        FROM wbs_elements w
+        LEFT JOIN wbs_rollups r ON r.WBSElementID = w.WBSElementID
+        WHERE w.ProjectID = ? AND {condition}
+        ORDER BY w.WBSCode
+        """
+        if parent_wbs_element_id is not None:
+            rows = self.db_manager.execute_query(query.format(condition="w.ParentWBSElementID = ?"),
+                                                 (project_id, parent_wbs_element_id), fetch_all=True)
+        else:
+            rows = self.db_manager.execute_query(query.format(condition="w.WBSLevel = ?"),
+                                                 (project_id, level), fetch_all=True)
+        return pd.DataFrame([dict(row) for row in rows]) if rows else pd.DataFrame()
 
-            if cost_code not in wbs_data_aggregated:
-                wbs_data_aggregated[cost_code] = {
-                    'description': description, # Use description from the first estimate line for this WBSCode
-                    'total_cost': 0.0,
-                    'processed_estimate_ids': [] # Store all linked estimate IDs
-                }
-            wbs_data_aggregated[cost_code]['total_cost'] += estimated_cost
-            wbs_data_aggregated[cost_code]['processed_estimate_ids'].append(processed_estimate_id)
-        return wbs_data_aggregated
+    def get_wbs_subtree_elements(self, wbs_element_id):
+        """
+        Returns every WBS element in the subtree rooted at wbs_element_id (root included)
+        using a WBSPath prefix match rather than a recursive query.
+        """
+        root = self.db_manager.execute_query(
+            "SELECT ProjectID, WBSPath FROM wbs_elements WHERE WBSElementID = ?", (wbs_element_id,), fetch_one=True
+        )
+        if not root or not root['WBSPath']:
+            return pd.DataFrame()
+        rows = self.db_manager.execute_query(
+            "SELECT * FROM wbs_elements WHERE ProjectID = ? AND WBSPath LIKE ? ORDER BY WBSPath",
+            (root['ProjectID'], root['WBSPath'] + '%'), fetch_all=True
+        )
+        return pd.DataFrame([dict(row) for row in rows]) if rows else pd.DataFrame()
 
     def generate_project_budget(self, project_id):
         """
@@ -292,17 +714,25 @@ class ProjectStartup:
             logger.error("Cannot generate budget: No project ID provided.")
             return False, "No project ID provided."
 
+        return self._run_stage_in_transaction(self._generate_budget_with_cursor, project_id, "Database error generating budget")
+
+    def _generate_budget_with_cursor(self, cursor, project_id):
+        """
+        Budget generation step of generate_project_budget, run on the caller's cursor.
+        Does not commit; the caller owns the transaction. Returns (success, message).
+        """
         # Clear existing budget for this project before generating new one
-        # Use schema casing: ProjectID
-        self.db_manager.execute_query(
-            "DELETE FROM project_budgets WHERE ProjectID = ?", (project_id,), commit=True
-        )
-        logger.info(f"Cleared existing budget entries for project {project_id}.")
+        cursor.execute("DELETE FROM project_budgets WHERE ProjectID = ?", (project_id,))
+        logger.info(f"Cleared {cursor.rowcount} existing budget entries for project {project_id}.")
 
         # Get WBS elements for the project
-        # Use schema casing: WBSElementID, WBSCode, Description, EstimatedCost, ProjectID
-        wbs_query = "SELECT WBSElementID, WBSCode, Description, EstimatedCost FROM wbs_elements WHERE ProjectID = ?"
-        wbs_elements = self.db_manager.execute_query(wbs_query, (project_id,), fetch_all=True)
+        # Retired (soft-deleted) WBS elements carry no budget; summary nodes are budgeted through their children
+        cursor.execute(
+            "SELECT WBSElementID, WBSCode, Description, EstimatedCost FROM wbs_elements "
+            "WHERE ProjectID = ? AND COALESCE(Status, '') != ? AND IsSummary = 0",
+            (project_id, constants.WBS_STATUS_RETIRED)
+        )
+        wbs_elements = cursor.fetchall()
 
         if not wbs_elements:
             logger.warning(f"No WBS elements found for project {project_id}. Cannot generate detailed budget.")
@@ -321,21 +751,10 @@ class ProjectStartup:
         INSERT INTO project_budgets (ProjectID, WBSElementID, BudgetType, Amount)
         VALUES (?, ?, ?, ?)
         """
-        conn = self.db_manager.get_connection()
-        if conn:
-            try:
-                cursor = conn.cursor()
-                cursor.executemany(insert_budget_query, budget_items_to_insert)
-                conn.commit()
-                logger.info(f"Successfully generated budget for project {project_id} with {len(budget_items_to_insert)} items.")
-                return True, f"Budget generated successfully for project {project_id}."
-            except Exception as e: # Catching a more general exception, assuming db_manager might raise non-sqlite specific ones
-                conn.rollback()
-                logger.error(f"Database error generating budget for project {project_id}: {e}")
-                return False, f"Database error: {e}"
-        else:
-            logger.error("Database connection not available to generate budget.")
-            return False, "Database connection error."
+        cursor.executemany(insert_budget_query, budget_items_to_insert)
+        self._refresh_wbs_rollups_with_cursor(cursor, project_id)
+        logger.info(f"Generated budget for project {project_id} with {len(budget_items_to_insert)} items.")
+        return True, f"Budget generated successfully for project {project_id}."
 
     def allocate_resources(self, project_id):
         """
@@ -346,86 +765,131 @@ class ProjectStartup:
             logger.error("Cannot allocate WBS resources: No ProjectID provided.")
             return False, "No ProjectID provided for WBS resource allocation."
 
-        # Clear existing WBSElementResources for this project to prevent duplication on re-runs
-        # Note: WBSElementResources links to wbs_elements, so deleting by ProjectID requires a join or subquery.
-        # For simplicity, we'll fetch WBSElementIDs for the project first.
-        wbs_ids_query = "SELECT WBSElementID FROM wbs_elements WHERE ProjectID = ?"
-        wbs_id_rows = self.db_manager.execute_query(wbs_ids_query, (project_id,), fetch_all=True)
-        if wbs_id_rows:
-            wbs_ids_for_project = [row['WBSElementID'] for row in wbs_id_rows]
-            placeholders = ','.join(['?'] * len(wbs_ids_for_project))
-            delete_query = f"DELETE FROM WBSElementResources WHERE WBSElementID IN ({placeholders})"
-            self.db_manager.execute_query(delete_query, tuple(wbs_ids_for_project), commit=True)
-            logger.info(f"Cleared existing WBSElementResources for project {project_id}.")
-        else:
-            logger.info(f"No existing WBS elements found for project {project_id}, so no WBSElementResources to clear.")
+        return self._run_stage_in_transaction(self._allocate_resources_with_cursor, project_id,
+                                              "Database error during WBS resource detail allocation")
 
+    def _allocate_resources_with_cursor(self, cursor, project_id):
+        """
+        Resource allocation step of allocate_resources, run on the caller's cursor.
+        Does not commit; the caller owns the transaction. Returns (success, message).
+        Every estimate line mapped to a WBS element through wbs_estimate_links becomes one
+        WBSElementResources row; units are classified into resource types in one vectorized pass.
+        """
+        # Clear existing WBSElementResources for this project to prevent duplication on re-runs
+        cursor.execute(
+            "DELETE FROM WBSElementResources WHERE WBSElementID IN (SELECT WBSElementID FROM wbs_elements WHERE ProjectID = ?)",
+            (project_id,)
+        )
+        logger.info(f"Cleared {cursor.rowcount} existing WBSElementResources for project {project_id}.")
 
-        # Fetch WBS elements and their linked ProcessedEstimateID
         query = """
-        SELECT wbs.WBSElementID, wbs.ProcessedEstimateID, pe.Description, pe.Quantity, pe.Unit, pe.UnitCost, pe.TotalCost
-        FROM wbs_elements wbs
-        JOIN processed_estimates pe ON wbs.ProcessedEstimateID = pe.ProcessedEstimateID
-        WHERE wbs.ProjectID = ? AND wbs.ProcessedEstimateID IS NOT NULL
+        SELECT link.WBSElementID, pe.ProcessedEstimateID, pe.Description, pe.Quantity, pe.Unit, pe.UnitCost, pe.TotalCost
+        FROM wbs_estimate_links link
+        JOIN wbs_elements wbs ON wbs.WBSElementID = link.WBSElementID
+        JOIN processed_estimates pe ON pe.ProcessedEstimateID = link.ProcessedEstimateID
+        WHERE wbs.ProjectID = ? AND COALESCE(wbs.Status, '') != ?
+        ORDER BY link.WBSElementID, pe.ProcessedEstimateID
         """
-        # This query assumes a WBS element is derived from a single processed estimate line.
-        # If a WBS element aggregates multiple estimates, this logic would need adjustment.
+        cursor.execute(query, (project_id, constants.WBS_STATUS_RETIRED))
+        rows = cursor.fetchall()
 
-        wbs_estimate_details = self.db_manager.execute_query(query, (project_id,), fetch_all=True)
-
-        if not wbs_estimate_details:
+        if not rows:
             logger.warning(f"No WBS elements with linked processed estimates found for project {project_id} for resource allocation.")
             return False, "No WBS elements with linked estimates for resource allocation."
 
-        resources_to_insert = []
-        for detail in wbs_estimate_details:
-            resource_description = detail['Description']
-            resource_type = constants.RESOURCE_TYPE_MATERIAL # Default type
-            unit = detail['Unit']
-            if unit and 'HR' in unit.upper():
-                resource_type = constants.RESOURCE_TYPE_LABOR
-            elif unit and 'LS' in unit.upper():
-                resource_type = constants.RESOURCE_TYPE_LUMP_SUM
-            # Consider adding constants.RESOURCE_TYPE_OTHER if no specific match
-
-            resources_to_insert.append((
-                detail['WBSElementID'],
-                resource_description,
-                resource_type,
-                detail['Quantity'],
-                unit, # UnitOfMeasure
-                detail['UnitCost'],
-                detail['TotalCost'] # TotalEstimatedCost
-            ))
-
-        if not resources_to_insert:
-            logger.info(f"No resources derived from estimates to insert for project {project_id}.")
-            return True, "No specific resources to allocate based on linked estimates."
+        resources_df = pd.DataFrame([dict(row) for row in rows])
+        resources_df['ResourceType'] = self._classify_resource_types(resources_df['Unit'])
 
         insert_query = """
         INSERT INTO WBSElementResources
             (WBSElementID, ResourceDescription, ResourceType, Quantity, UnitOfMeasure, UnitCost, TotalEstimatedCost)
         VALUES (?, ?, ?, ?, ?, ?, ?)
         """
-        conn = None
-        try:
-            conn = self.db_manager.get_connection()
-            cursor = conn.cursor()
+        insert_columns = ['WBSElementID', 'Description', 'ResourceType', 'Quantity', 'Unit', 'UnitCost', 'TotalCost']
+        resources_to_insert = list(resources_df[insert_columns].astype(object)
+                                   .where(resources_df[insert_columns].notna(), None)
+                                   .itertuples(index=False, name=None))
+        cursor.executemany(insert_query, resources_to_insert)
+        logger.info(f"Inserted {len(resources_to_insert)} resource details into WBSElementResources for project {project_id}.")
+        return True, f"Successfully allocated {len(resources_to_insert)} WBS resource details."
+
+    @staticmethod
+    def _classify_resource_types(units: pd.Series) -> pd.Series:
+        """
+        Maps estimate units of measure to resource types for a whole column at once.
+        Exact matches come from constants.RESOURCE_TYPE_BY_UNIT; otherwise units containing
+        'HR' are Labor, units containing 'LS' are Lump Sum and everything else is Material.
+        """
+        normalized = units.fillna('').astype(str).str.strip().str.upper()
+        fallback = np.select(
+            [normalized.str.contains('HR', regex=False), normalized.str.contains('LS', regex=False)],
+            [constants.RESOURCE_TYPE_LABOR, constants.RESOURCE_TYPE_LUMP_SUM],
+            default=constants.RESOURCE_TYPE_MATERIAL
+        )
+        return normalized.map(constants.RESOURCE_TYPE_BY_UNIT).fillna(pd.Series(fallback, index=units.index))
 
-            # Note: The clearing of existing resources is done above and committed separately.
-            # If that should be part of this transaction, it needs to be moved here.
-            # For now, assuming clearing is a pre-step and this focuses on insertion.
+    def run_data_dna_pipeline(self, project_id, progress_callback=None, cancel_event=None):
+        """
+        Runs the 'Execute Data DNA' planning pipeline (WBS generation, budget generation and
+        resource allocation) as a single transaction. Intended to run on a worker thread
+        (see background_jobs.BackgroundJob); nothing is committed unless every stage succeeds.
 
-            cursor.executemany(insert_query, resources_to_insert)
-            conn.commit()
-            logger.info(f"Successfully inserted {len(resources_to_insert)} resource details into WBSElementResources for project {project_id}.")
-            return True, f"Successfully allocated {len(resources_to_insert)} WBS resource details."
+        Args:
+            project_id: The project to plan.
+            progress_callback: Optional callable(stage_name, message, fraction) for progress reporting.
+            cancel_event: Optional threading.Event; when set, the pipeline stops at the next
+                          stage boundary and rolls back.
+        Returns:
+            (success, message, stage_timings) where stage_timings maps stage name to seconds.
+        """
+        stages = [
+            ("WBS Generation", self._generate_wbs_with_cursor),
+            ("Budget Generation", self._generate_budget_with_cursor),
+            ("Resource Allocation", self._allocate_resources_with_cursor),
+        ]
+        stage_timings = {}
+        stage_messages = []
+
+        def report(stage_name, message, fraction):
+            if progress_callback:
+                progress_callback(stage_name, message, fraction)
 
-        except Exception as e: # Catching a more general exception
-            if conn:
+        if not project_id:
+            return False, "No project ID provided.", stage_timings
+
+        conn = self.db_manager.get_connection()
+        with self.db_manager.lock:
+            try:
+                cursor = conn.cursor()
+                for index, (stage_name, stage_func) in enumerate(stages):
+                    if cancel_event is not None and cancel_event.is_set():
+                        conn.rollback()
+                        logger.info(f"Data DNA pipeline for project {project_id} cancelled before {stage_name}.")
+                        return False, f"Cancelled before {stage_name}. No changes were saved.", stage_timings
+
+                    report(stage_name, f"{stage_name} running...", index / len(stages))
+                    stage_started = time.perf_counter()
+                    success, message = stage_func(cursor, project_id)
+                    stage_timings[stage_name] = time.perf_counter() - stage_started
+                    stage_messages.append(f"{stage_name}: {message}")
+                    logger.info(f"Data DNA stage '{stage_name}' for project {project_id} took {stage_timings[stage_name]:.3f}s: {message}")
+
+                    if not success:
+                        conn.rollback()
+                        return False, f"{stage_name} failed: {message} No changes were saved.", stage_timings
+
+                if cancel_event is not None and cancel_event.is_set():
+                    conn.rollback()
+                    return False, "Cancelled before commit. No changes were saved.", stage_timings
+
+                conn.commit()
+                report("Complete", "All stages committed.", 1.0)
+                return True, "\n".join(stage_messages), stage_timings
+
+            except Exception as e: # Catching a more general exception
                 conn.rollback()
-            logger.error(f"Database error inserting into WBSElementResources for project {project_id}: {e}", exc_info=True)
-            return False, f"Database error during WBS resource detail allocation: {e}"
+                logger.error(f"Data DNA pipeline failed for project {project_id}: {e}", exc_info=True)
+                return False, f"Data DNA pipeline failed due to an error: {e}", stage_timings
 
     def get_project_details(self, project_id):
         """Retrieves details for a specific project using schema.sql structure."""
@@ -618,9 +1082,17 @@ class ProjectStartup:
         rows = self.db_manager.execute_query(query, (project_id,), fetch_all=True)
         return pd.DataFrame([dict(row) for row in rows]) if rows else pd.DataFrame()
 
+    def _get_document_store(self):
+        if self._document_store is None:
+            self._document_store = DocumentStore()
+        return self._document_store
+
     def add_design_drawing(self, project_id, document_name, file_path, uploaded_by_employee_id, description=None):
         """
         Adds a design drawing document record to the ProjectDocuments table.
+        A local file is copied into the content-addressed document store (identical content is
+        stored once) and its size, page count and SHA-256 are recorded with the document.
+        Paths that are not readable files (e.g. URLs) are recorded as given.
         Args:
             project_id (int): The ID of the project.
             document_name (str): The name of the document.
@@ -628,7 +1100,7 @@ class ProjectStartup:
             uploaded_by_employee_id (int): The ID of the employee uploading the document.
             description (str, optional): A description for the document.
         Returns:
-            tuple: (bool, str) indicating success and a message.
+            tuple: (int or None, str) the new ProjectDocumentID and a message.
         """
         if not all([isinstance(project_id, int) and project_id > 0,
                     document_name and isinstance(document_name, str),
@@ -641,11 +1113,17 @@ class ProjectStartup:
             logger.error(f"Invalid description type for add_design_drawing: {type(description)}")
             return None, "Description, if provided, must be a string."
 
+        stored = self._store_document_file(project_id, file_path)
+        if stored is None:
+            return None, f"Could not copy '{document_name}' into the document store. See logs for details."
+
         query = """
-        INSERT INTO ProjectDocuments (ProjectID, DocumentName, DocumentType, FilePath, UploadedByEmployeeID, Description, UploadDate)
-        VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+        INSERT INTO ProjectDocuments (ProjectID, DocumentName, DocumentType, FilePath, UploadedByEmployeeID, Description, UploadDate,
+                                      ContentHash, FileSizeBytes, PageCount, OriginalFilePath)
+        VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP, ?, ?, ?, ?)
         """
-        params = (project_id, document_name, constants.DOC_TYPE_DESIGN_DRAWING, file_path, uploaded_by_employee_id, description)
+        params = (project_id, document_name, constants.DOC_TYPE_DESIGN_DRAWING, stored['file_path'], uploaded_by_employee_id, description,
+                  stored['content_hash'], stored['size_bytes'], stored['page_count'], stored['original_path'])
 
         success = self.db_manager.execute_query(query, params, commit=True)
         if success:
@@ -656,6 +1134,79 @@ class ProjectStartup:
             logger.error(f"Failed to add design drawing '{document_name}' for project {project_id}.")
             return None, f"Failed to add design drawing '{document_name}'."
 
+    def _store_document_file(self, project_id, file_path):
+        """
+        Puts a local file into the document store and returns the metadata to record:
+        file_path, content_hash, size_bytes, page_count, original_path. Non-file paths pass
+        through with empty metadata. Returns None if a local file could not be stored.
+        """
+        if not os.path.isfile(file_path):
+            logger.warning(f"'{file_path}' is not a readable local file; recording the path without storing it.")
+            return {'file_path': file_path, 'content_hash': None, 'size_bytes': None, 'page_count': None, 'original_path': None}
+        try:
+            stored = self._get_document_store().store_file(file_path, project_id)
+        except OSError as e:
+            logger.error(f"Error storing document '{file_path}': {e}", exc_info=True)
+            return None
+
+        page_count = stored['page_count']
+        if page_count is None and stored['deduplicated']:
+            # Known content: reuse the page count captured when it was first uploaded
+            row = self.db_manager.execute_query(
+                "SELECT PageCount FROM ProjectDocuments WHERE ContentHash = ? AND PageCount IS NOT NULL LIMIT 1",
+                (stored['content_hash'],), fetch_one=True
+            )
+            page_count = row['PageCount'] if row else None
+        return {'file_path': stored['file_path'], 'content_hash': stored['content_hash'], 'size_bytes': stored['size_bytes'],
+                'page_count': page_count, 'original_path': file_path}
+
+    def get_document_file_info(self, document_id):
+        """
+        Returns the stored file details of a document (DocumentName, FilePath, ContentHash,
+        FileSizeBytes, PageCount, OriginalFilePath) as a dict, or None if not found.
+        """
+        row = self.db_manager.execute_query(
+            """SELECT ProjectDocumentID, ProjectID, DocumentName, FilePath, ContentHash, FileSizeBytes, PageCount, OriginalFilePath
+               FROM ProjectDocuments WHERE ProjectDocumentID = ?""",
+            (document_id,), fetch_one=True
+        )
+        return dict(row) if row else None
+
+    def store_existing_project_documents(self, project_id=None):
+        """
+        Moves documents recorded before the document store existed into it: every
+        ProjectDocuments row without a ContentHash whose FilePath is a readable local file.
+        Args:
+            project_id (int, optional): Limit to one project.
+        Returns:
+            tuple: (int number of documents stored, str message)
+        """
+        query = "SELECT ProjectDocumentID, ProjectID, FilePath FROM ProjectDocuments WHERE ContentHash IS NULL"
+        params = ()
+        if project_id is not None:
+            query += " AND ProjectID = ?"
+            params = (project_id,)
+        rows = self.db_manager.execute_query(query, params, fetch_all=True) or []
+
+        updates = []
+        for row in rows:
+            if not os.path.isfile(row['FilePath']):
+                continue
+            stored = self._store_document_file(row['ProjectID'], row['FilePath'])
+            if stored:
+                updates.append((stored['file_path'], stored['content_hash'], stored['size_bytes'], stored['page_count'],
+                                stored['original_path'], row['ProjectDocumentID']))
+        if updates:
+            self.db_manager.execute_many_query("""
+                UPDATE ProjectDocuments
+                SET FilePath = ?, ContentHash = ?, FileSizeBytes = ?, PageCount = ?, OriginalFilePath = ?,
+                    LastModifiedDate = CURRENT_TIMESTAMP
+                WHERE ProjectDocumentID = ?
+            """, updates, commit=True)
+        msg = f"Stored {len(updates)} of {len(rows)} document(s) without content metadata."
+        logger.info(msg)
+        return len(updates), msg
+
     def get_design_drawings_for_project(self, project_id):
         """
         Retrieves all design drawing documents for a specific project.
@@ -666,7 +1217,7 @@ class ProjectStartup:
                   Returns an empty list if no drawings are found or an error occurs.
         """
         query = """
-        SELECT ProjectDocumentID, DocumentName, FilePath, UploadDate, Description
+        SELECT ProjectDocumentID, DocumentName, FilePath, UploadDate, Description, ContentHash, FileSizeBytes, PageCount
         FROM ProjectDocuments
         WHERE ProjectID = ? AND DocumentType = ?
         ORDER BY UploadDate DESC
@@ -822,21 +1373,24 @@ class ProjectStartup:
             )
             action = "created"
 
-        try:
-            cursor = self.db_manager.get_connection().cursor()
-            cursor.execute(sql, params)
-            self.db_manager.get_connection().commit()
-            last_row_id = cursor.lastrowid if not material_system_id else material_system_id
-
-            if last_row_id:
-                logger.info(f"Material '{details_dict.get('StockNumber')}' (ID: {last_row_id}) {action} successfully.")
-                return last_row_id, f"Material '{details_dict.get('StockNumber')}' {action} successfully. ID: {last_row_id}"
-            else:
-                logger.error(f"Failed to {action} material '{details_dict.get('StockNumber')}'. No ID returned or error in execution.")
-                return None, f"Failed to {action} material '{details_dict.get('StockNumber')}'."
-        except Exception as e:
-            logger.error(f"Database error during material {action} for '{details_dict.get('StockNumber')}': {e}", exc_info=True)
-            return None, f"Database error: Could not {action} material. Check logs."
+        conn = self.db_manager.get_connection()
+        with self.db_manager.lock:
+            try:
+                cursor = conn.cursor()
+                cursor.execute(sql, params)
+                conn.commit()
+                last_row_id = cursor.lastrowid if not material_system_id else material_system_id
+
+                if last_row_id:
+                    logger.info(f"Material '{details_dict.get('StockNumber')}' (ID: {last_row_id}) {action} successfully.")
+                    return last_row_id, f"Material '{details_dict.get('StockNumber')}' {action} successfully. ID: {last_row_id}"
+                else:
+                    logger.error(f"Failed to {action} material '{details_dict.get('StockNumber')}'. No ID returned or error in execution.")
+                    return None, f"Failed to {action} material '{details_dict.get('StockNumber')}'."
+            except Exception as e:
+                conn.rollback()
+                logger.error(f"Database error during material {action} for '{details_dict.get('StockNumber')}': {e}", exc_info=True)
+                return None, f"Database error: Could not {action} material. Check logs."
 
     def get_material_details_by_stock_number(self, stock_number):
         """
@@ -853,11 +1407,333 @@ class ProjectStartup:
             logger.error(f"Error fetching material details for StockNumber {stock_number}: {e}", exc_info=True)
             return None
 
+    @staticmethod
+    def _build_fts_prefix_query(search_text):
+        """
+        Turns free text into an FTS5 MATCH expression where every word must match as a prefix,
+        e.g. 'emt 3/4' -> '"emt"* AND "3"* AND "4"*'. Returns None if there is nothing to search.
+        """
+        terms = _FTS_TERM_PATTERN.findall(search_text or '')
+        if not terms:
+            return None
+        return ' AND '.join(f'"{term}"*' for term in terms)
+
+    def search_materials(self, search_text, limit=15):
+        """
+        Ranked material search for type-ahead fields.
+        Matches every word of search_text as a prefix against stock number, name, extended
+        description, manufacturer and part numbers via the materials_fts index, ordered by
+        BM25 with stock and part numbers weighted above descriptive text.
+        Falls back to a LIKE search if the full-text index is unavailable.
+        Returns a list of dicts (MaterialSystemID, StockNumber, MaterialName, Manufacturer,
+        ManufacturerPartNumber, PartNumber, UnitOfMeasure, QuantityOnHand, DefaultCost).
+        """
+        match_query = self._build_fts_prefix_query(search_text)
+        if not match_query:
+            return []
+        select_columns = """m.MaterialSystemID, m.StockNumber, m.MaterialName, m.Manufacturer, m.ManufacturerPartNumber,
+               m.PartNumber, m.UnitOfMeasure, m.QuantityOnHand, m.DefaultCost"""
+        # bm25 column weights follow the materials_fts column order
+        fts_query = f"""
+        SELECT {select_columns}
+        FROM materials_fts
+        JOIN Materials m ON m.MaterialSystemID = materials_fts.rowid
+        WHERE materials_fts MATCH ?
+        ORDER BY bm25(materials_fts, 10.0, 6.0, 1.0, 2.0, 8.0, 8.0)
+        LIMIT ?
+        """
+        try:
+            with self.db_manager.lock:
+                rows = self.db_manager.get_connection().execute(fts_query, (match_query, limit)).fetchall()
+            return [dict(row) for row in rows]
+        except Exception as e:
+            logger.warning(f"Full-text material search unavailable ({e}); falling back to LIKE search.")
+
+        like_term = f"%{search_text.strip()}%"
+        rows = self.db_manager.execute_query(f"""
+        SELECT {select_columns} FROM Materials m
+        WHERE m.StockNumber LIKE ? OR m.MaterialName LIKE ? OR m.ManufacturerPartNumber LIKE ? OR m.PartNumber LIKE ?
+        ORDER BY m.MaterialName LIMIT ?
+        """, (like_term, like_term, like_term, like_term, limit), fetch_all=True)
+        return [dict(row) for row in rows] if rows else []
+
+    def _get_bom_revision(self):
+        """Returns the trigger-maintained AssemblyBOMRevision counter, or None if unavailable."""
+        try:
+            row = self.db_manager.execute_query(
+                "SELECT Revision FROM AssemblyBOMRevision WHERE RevisionID = 1", fetch_one=True
+            )
+            return row['Revision'] if row else None
+        except Exception as e:
+            logger.warning(f"Could not read AssemblyBOMRevision; BOM explosions will not be cached: {e}")
+            return None
+
+    def invalidate_bom_cache(self):
+        """Drops the cached component graph and all memoized assembly explosions."""
+        self._bom_revision = None
+        self._bom_graph = None
+        self._bom_explosions = {}
+
+    def _load_bom_graph(self):
+        """
+        Loads every AssemblyComponents row in one query. A component with a ChildAssemblyID
+        is a nested sub-assembly, listed under that assembly's AssemblyItemNumber.
+        The graph (and the memoized explosions built on it) is reused until the
+        AssemblyBOMRevision counter moves, i.e. until AssemblyComponents or Assemblies change.
+        Returns:
+            tuple: ({AssemblyID: [(stock_number, qty, child_assembly_id or None), ...]},
+                    {stock_number: (MaterialName, UnitOfMeasure)})
+        """
+        revision = self._get_bom_revision()
+        if self._bom_graph is not None and revision is not None and revision == self._bom_revision:
+            return self._bom_graph
+
+        rows = self.db_manager.execute_query("""
+            SELECT ac.AssemblyID, COALESCE(ac.MaterialStockNumber, sub.AssemblyItemNumber) AS MaterialStockNumber,
+                   ac.QuantityInAssembly, ac.UnitOfMeasure, ac.ChildAssemblyID, m.MaterialName, m.UnitOfMeasure AS MaterialUnit
+            FROM AssemblyComponents ac
+            LEFT JOIN Assemblies sub ON sub.AssemblyID = ac.ChildAssemblyID
+            LEFT JOIN Materials m ON m.StockNumber = ac.MaterialStockNumber
+            ORDER BY ac.AssemblyID, ac.AssemblyComponentID
+        """, fetch_all=True) or []
+
+        graph = {}
+        material_info = {}
+        for row in rows:
+            child_id = row['ChildAssemblyID']
+            graph.setdefault(row['AssemblyID'], []).append(
+                (row['MaterialStockNumber'], float(row['QuantityInAssembly'] or 0.0), child_id)
+            )
+            if child_id is None and row['MaterialStockNumber'] not in material_info:
+                material_info[row['MaterialStockNumber']] = (
+                    row['MaterialName'], row['UnitOfMeasure'] or row['MaterialUnit']
+                )
+
+        self._bom_graph = (graph, material_info)
+        self._bom_explosions = {}
+        self._bom_revision = revision
+        return self._bom_graph
+
+    def _explode_assembly(self, assembly_id, graph, visiting=()):
+        """
+        Returns {stock_number: quantity per one assembly} over leaf materials, recursing
+        through sub-assemblies. Results are memoized per AssemblyID for the current graph.
+        Raises:
+            AppValidationError: If the assembly (directly or indirectly) contains itself.
+        """
+        cached = self._bom_explosions.get(assembly_id)
+        if cached is not None:
+            return cached
+        if assembly_id in visiting:
+            path = " -> ".join(str(a) for a in visiting + (assembly_id,))
+            raise AppValidationError(f"Assembly BOM contains a cycle (AssemblyIDs {path}).")
+
+        totals = {}
+        for stock_number, qty, child_id in graph.get(assembly_id, ()):
+            if child_id is None:
+                totals[stock_number] = totals.get(stock_number, 0.0) + qty
+            else:
+                for leaf, leaf_qty in self._explode_assembly(child_id, graph, visiting + (assembly_id,)).items():
+                    totals[leaf] = totals.get(leaf, 0.0) + qty * leaf_qty
+        self._bom_explosions[assembly_id] = totals
+        return totals
+
+    @staticmethod
+    def _bom_reaches(start_assembly_id, target_assembly_id, graph):
+        """True if target_assembly_id is start_assembly_id or one of its nested sub-assemblies."""
+        stack, seen = [start_assembly_id], set()
+        while stack:
+            current = stack.pop()
+            if current == target_assembly_id:
+                return True
+            if current in seen:
+                continue
+            seen.add(current)
+            stack.extend(child for _, _, child in graph.get(current, ()) if child is not None)
+        return False
+
+    def explode_assembly_bom(self, assembly_id, quantity=1.0):
+        """
+        Explodes an assembly, including nested sub-assemblies, into total material requirements.
+        Args:
+            assembly_id (int): The AssemblyID to explode.
+            quantity (float): Number of assemblies being built.
+        Returns:
+            tuple: (list of dicts with MaterialStockNumber, MaterialName, UnitOfMeasure, TotalQuantity
+                    or None on error, message)
+        """
+        try:
+            if not self.db_manager.execute_query(
+                "SELECT 1 FROM Assemblies WHERE AssemblyID = ?", (assembly_id,), fetch_one=True
+            ):
+                return None, f"Assembly with ID {assembly_id} not found."
+            graph, material_info = self._load_bom_graph()
+            per_unit = self._explode_assembly(assembly_id, graph)
+        except AppValidationError as e:
+            logger.error(f"Cannot explode BOM for AssemblyID {assembly_id}: {e}")
+            return None, str(e)
+        except Exception as e:
+            logger.error(f"Error exploding BOM for AssemblyID {assembly_id}: {e}", exc_info=True)
+            return None, f"Error exploding assembly BOM: {e}"
+
+        requirements = [
+            {
+                'MaterialStockNumber': stock_number,
+                'MaterialName': material_info.get(stock_number, (None, None))[0],
+                'UnitOfMeasure': material_info.get(stock_number, (None, None))[1],
+                'TotalQuantity': qty * quantity,
+            }
+            for stock_number, qty in sorted(per_unit.items())
+        ]
+        return requirements, f"Assembly {assembly_id} explodes into {len(requirements)} material(s)."
+
+    def explode_production_order(self, production_id):
+        """
+        Explodes a Production_Assembly_Tracking order into the materials needed to build it.
+        Returns:
+            tuple: (list of requirement dicts or None on error, message). See explode_assembly_bom.
+        """
+        order = self.db_manager.execute_query(
+            "SELECT AssemblyID, QuantityToProduce FROM Production_Assembly_Tracking WHERE ProductionID = ?",
+            (production_id,), fetch_one=True
+        )
+        if not order:
+            return None, f"Production order with ID {production_id} not found."
+        return self.explode_assembly_bom(order['AssemblyID'], order['QuantityToProduce'])
+
+    def get_project_material_requirements(self, project_id=None):
+        """
+        Total material requirements of all open production orders (not Completed, Shipped or
+        Cancelled), per project. Orders are fetched in a single grouped query and multiplied
+        against the memoized per-assembly explosions.
+        Args:
+            project_id (int, optional): Restrict to one project. Orders without a project
+                                        are reported with a ProjectID of None.
+        Returns:
+            pd.DataFrame: ProjectID, MaterialStockNumber, MaterialName, UnitOfMeasure,
+                          RequiredQuantity. Empty on error or when there are no open orders.
+        """
+        columns = ['ProjectID', 'MaterialStockNumber', 'MaterialName', 'UnitOfMeasure', 'RequiredQuantity']
+        query = """
+            SELECT ProjectID, AssemblyID, SUM(QuantityToProduce) AS QuantityToProduce
+            FROM Production_Assembly_Tracking
+            WHERE Status NOT IN (?, ?, ?)
+        """
+        params = [constants.PRODUCTION_STATUS_COMPLETED, constants.PRODUCTION_STATUS_SHIPPED,
+                  constants.PRODUCTION_STATUS_CANCELLED]
+        if project_id is not None:
+            query += " AND ProjectID = ?"
+            params.append(project_id)
+        query += " GROUP BY ProjectID, AssemblyID"
+
+        try:
+            rows = self.db_manager.execute_query(query, tuple(params), fetch_all=True)
+            if not rows:
+                return pd.DataFrame(columns=columns)
+            orders_df = pd.DataFrame([dict(r) for r in rows])
+
+            graph, material_info = self._load_bom_graph()
+            exploded = [
+                (assembly_id, stock_number, qty)
+                for assembly_id in orders_df['AssemblyID'].unique().tolist()
+                for stock_number, qty in self._explode_assembly(assembly_id, graph).items()
+            ]
+            if not exploded:
+                return pd.DataFrame(columns=columns)
+            bom_df = pd.DataFrame(exploded, columns=['AssemblyID', 'MaterialStockNumber', 'QuantityPerAssembly'])
+
+            merged = orders_df.merge(bom_df, on='AssemblyID', how='inner')
+            merged['RequiredQuantity'] = merged['QuantityPerAssembly'] * merged['QuantityToProduce']
+            result = (merged.groupby(['ProjectID', 'MaterialStockNumber'], dropna=False, as_index=False)
+                      ['RequiredQuantity'].sum())
+            result['MaterialName'] = [material_info.get(s, (None, None))[0] for s in result['MaterialStockNumber']]
+            result['UnitOfMeasure'] = [material_info.get(s, (None, None))[1] for s in result['MaterialStockNumber']]
+            result['ProjectID'] = [None if pd.isna(p) else int(p) for p in result['ProjectID']]
+            return result[columns].sort_values(['ProjectID', 'MaterialStockNumber'], na_position='last').reset_index(drop=True)
+        except AppValidationError as e:
+            logger.error(f"Cannot compute project material requirements: {e}")
+            return pd.DataFrame(columns=columns)
+        except Exception as e:
+            logger.error(f"Error computing project material requirements: {e}", exc_info=True)
+            return pd.DataFrame(columns=columns)
+
+    def get_assembly_labor_hours(self, assembly_ids, labor_column='Labor1'):
+        """
+        Shop labor hours to build one of each assembly: exploded leaf quantities times the
+        materials' labor units (Materials.Labor1..3, hours per unit). Assemblies whose BOM
+        carries no labor units fall back to Assemblies.TotalEstLaborHours.
+        Args:
+            assembly_ids (iterable): AssemblyIDs to price.
+            labor_column (str): 'Labor1', 'Labor2' or 'Labor3' (installation difficulty column).
+        Returns:
+            dict: {AssemblyID: hours per assembly}. Assemblies in a BOM cycle are omitted.
+        """
+        if labor_column not in ('Labor1', 'Labor2', 'Labor3'):
+            raise AppValidationError(f"Invalid labor column '{labor_column}'.")
+        assembly_ids = list(dict.fromkeys(assembly_ids))
+        graph, _ = self._load_bom_graph()
+        explosions = {}
+        for assembly_id in assembly_ids:
+            try:
+                explosions[assembly_id] = self._explode_assembly(assembly_id, graph)
+            except AppValidationError as e:
+                logger.error(f"Skipping labor for AssemblyID {assembly_id}: {e}")
+
+        stock_numbers = list({s for totals in explosions.values() for s in totals})
+        labor_units = {}
+        for start in range(0, len(stock_numbers), _SQLITE_PARAM_CHUNK):
+            chunk = stock_numbers[start:start + _SQLITE_PARAM_CHUNK]
+            rows = self.db_manager.execute_query(
+                f"SELECT StockNumber, {labor_column} AS LaborUnit FROM Materials "
+                f"WHERE StockNumber IN ({', '.join('?' for _ in chunk)})",
+                tuple(chunk), fetch_all=True
+            ) or []
+            labor_units.update({row['StockNumber']: row['LaborUnit'] or 0.0 for row in rows})
+
+        fallback = {}
+        for start in range(0, len(assembly_ids), _SQLITE_PARAM_CHUNK):
+            chunk = assembly_ids[start:start + _SQLITE_PARAM_CHUNK]
+            rows = self.db_manager.execute_query(
+                f"SELECT AssemblyID, TotalEstLaborHours FROM Assemblies WHERE AssemblyID IN ({', '.join('?' for _ in chunk)})",
+                tuple(chunk), fetch_all=True
+            ) or []
+            fallback.update({row['AssemblyID']: row['TotalEstLaborHours'] or 0.0 for row in rows})
+
+        hours = {}
+        for assembly_id, totals in explosions.items():
+            bom_hours = sum(qty * labor_units.get(stock_number, 0.0) for stock_number, qty in totals.items())
+            hours[assembly_id] = float(bom_hours if bom_hours > 0 else fallback.get(assembly_id, 0.0))
+        return hours
+
+    def _resolve_component_codes(self, stock_numbers):
+        """
+        Looks up component codes in one batched query per chunk.
+        Returns {code: AssemblyID} for codes that are assemblies and {code: None} for plain
+        materials; codes found in neither table are absent. An assembly wins over a material
+        that shares its code, so that component is stored by its ChildAssemblyID.
+        """
+        codes = list(dict.fromkeys(stock_numbers))
+        resolved = {}
+        for start in range(0, len(codes), _SQLITE_PARAM_CHUNK):
+            chunk = codes[start:start + _SQLITE_PARAM_CHUNK]
+            placeholders = ", ".join("?" for _ in chunk)
+            rows = self.db_manager.execute_query(f"""
+                SELECT StockNumber AS Code, NULL AS AssemblyID FROM Materials WHERE StockNumber IN ({placeholders})
+                UNION ALL
+                SELECT AssemblyItemNumber AS Code, AssemblyID FROM Assemblies WHERE AssemblyItemNumber IN ({placeholders})
+            """, tuple(chunk) * 2, fetch_all=True) or []
+            for row in rows:
+                if row['AssemblyID'] is not None or row['Code'] not in resolved:
+                    resolved[row['Code']] = row['AssemblyID']
+        return resolved
+
     def manage_assembly(self, assembly_details, components_list, assembly_id=None):
         """
         Creates a new assembly or updates an existing one, including its components.
         'assembly_details' is a dict with AssemblyItemNumber, AssemblyName, Description, Phase.
         'components_list' is a list of dicts, each with MaterialStockNumber, QuantityInAssembly, UnitOfMeasure.
+        A MaterialStockNumber may also be another assembly's AssemblyItemNumber; such a nested
+        sub-assembly is stored by its ChildAssemblyID.
         If 'assembly_id' is provided, it's an update.
         Returns (new_or_updated_assembly_id, message).
         """
@@ -867,84 +1743,66 @@ class ProjectStartup:
         if not validation_passed:
             return None, validation_msg
 
-        conn = None
-        try:
-            conn = db_manager.get_connection()
-            cursor = conn.cursor()
-
-            if assembly_id: # Update
-                # Check if assembly_id exists
-                cursor.execute("SELECT AssemblyID FROM Assemblies WHERE AssemblyID = ?", (assembly_id,))
-                if not cursor.fetchone():
-                    return None, f"Assembly with ID {assembly_id} not found for update."
-
-                cursor.execute("""
-                    UPDATE Assemblies SET AssemblyItemNumber = ?, AssemblyName = ?, Description = ?, Phase = ?, UpdatedAt = CURRENT_TIMESTAMP
-                    WHERE AssemblyID = ?;
-                """, (
-                    assembly_details.get('AssemblyItemNumber'), assembly_details.get('AssemblyName'),
-                    assembly_details.get('Description'), assembly_details.get('Phase'), assembly_id
-                ))
-                action = "updated"
-                current_assembly_id = assembly_id
+        conn = self.db_manager.get_connection()
+        with self.db_manager.lock:
+            try:
+                cursor = conn.cursor()
 
-                # Delete existing components for this assembly before re-adding
-                cursor.execute("DELETE FROM AssemblyComponents WHERE AssemblyID = ?", (assembly_id,))
-                logger.info(f"Deleted existing components for AssemblyID {assembly_id} before update.")
+                if assembly_id: # Update
+                    # Check if assembly_id exists
+                    cursor.execute("SELECT AssemblyID FROM Assemblies WHERE AssemblyID = ?", (assembly_id,))
+                    if not cursor.fetchone():
+                        return None, f"Assembly with ID {assembly_id} not found for update."
+
+                    cursor.execute("""
+                        UPDATE Assemblies SET AssemblyItemNumber = ?, AssemblyName = ?, Description = ?, Phase = ?, LastModifiedDate = CURRENT_TIMESTAMP
+                        WHERE AssemblyID = ?;
+                    """, (
+                        assembly_details.get('AssemblyItemNumber'), assembly_details.get('AssemblyName'),
+                        assembly_details.get('Description'), assembly_details.get('Phase'), assembly_id
+                    ))
+                    action = "updated"
+                    current_assembly_id = assembly_id
+
+                    # Delete existing components for this assembly before re-adding
+                    cursor.execute("DELETE FROM AssemblyComponents WHERE AssemblyID = ?", (assembly_id,))
+                    logger.info(f"Deleted existing components for AssemblyID {assembly_id} before update.")
+
+                else: # Insert new assembly
+                    cursor.execute("""
+                        INSERT INTO Assemblies (AssemblyItemNumber, AssemblyName, Description, Phase)
+                        VALUES (?, ?, ?, ?);
+                    """, (
+                        assembly_details.get('AssemblyItemNumber'), assembly_details.get('AssemblyName'),
+                        assembly_details.get('Description'), assembly_details.get('Phase')
+                    ))
+                    current_assembly_id = cursor.lastrowid
+                    if not current_assembly_id: # Should not happen with autoincrement PK
+                        conn.rollback()
+                        logger.error("Failed to get lastrowid for new assembly.")
+                        return None, "Failed to create new assembly (no ID returned)."
+                    action = "created"
+
+                # Component codes were batch-resolved to materials or sub-assemblies by _validate_assembly_inputs
+                cursor.executemany("""
+                    INSERT INTO AssemblyComponents (AssemblyID, MaterialStockNumber, ChildAssemblyID, QuantityInAssembly, UnitOfMeasure)
+                    VALUES (?, ?, ?, ?, ?);
+                """, [
+                    (current_assembly_id,
+                     comp['MaterialStockNumber'] if comp['ChildAssemblyID'] is None else None,
+                     comp['ChildAssemblyID'], comp['QuantityInAssembly'], comp.get('UnitOfMeasure'))
+                    for comp in components_list
+                ])
 
-            else: # Insert new assembly
-                cursor.execute("""
-                    INSERT INTO Assemblies (AssemblyItemNumber, AssemblyName, Description, Phase)
-                    VALUES (?, ?, ?, ?);
-                """, (
-                    assembly_details.get('AssemblyItemNumber'), assembly_details.get('AssemblyName'),
-                    assembly_details.get('Description'), assembly_details.get('Phase')
-                ))
-                current_assembly_id = cursor.lastrowid
-                if not current_assembly_id: # Should not happen with autoincrement PK
-                    conn.rollback()
-                    logger.error("Failed to get lastrowid for new assembly.")
-                    return None, "Failed to create new assembly (no ID returned)."
-                action = "created"
-
-            # Add/Update components
-            # First, ensure all referenced MaterialStockNumbers exist.
-            for comp in components_list:
-                cursor.execute("SELECT MaterialSystemID FROM Materials WHERE StockNumber = ?", (comp['MaterialStockNumber'],))
-                material_exists = cursor.fetchone()
-                if not material_exists:
-                    conn.rollback()
-                    return None, f"Material with Stock Number '{comp['MaterialStockNumber']}' not found. Cannot add to assembly."
-
-            # Now insert the components
-            for comp in components_list:
-                cursor.execute("""
-                    INSERT INTO AssemblyComponents (AssemblyID, MaterialStockNumber, QuantityInAssembly, UnitOfMeasure)
-                    VALUES (?, ?, ?, ?);
-                """, (
-                    current_assembly_id, comp['MaterialStockNumber'],
-                    comp['QuantityInAssembly'], comp.get('UnitOfMeasure')
-                ))
-
-            conn.commit()
-            logger.info(f"Assembly '{assembly_details.get('AssemblyName')}' (ID: {current_assembly_id}) and its components {action} successfully.")
-            return current_assembly_id, f"Assembly '{assembly_details.get('AssemblyName')}' and its {len(components_list)} component types {action} successfully. ID: {current_assembly_id}"
+                conn.commit()
+                # AssemblyComponents triggers bump AssemblyBOMRevision, which invalidates cached explosions
+                logger.info(f"Assembly '{assembly_details.get('AssemblyName')}' (ID: {current_assembly_id}) and its components {action} successfully.")
+                return current_assembly_id, f"Assembly '{assembly_details.get('AssemblyName')}' and its {len(components_list)} component types {action} successfully. ID: {current_assembly_id}"
 
-        except Exception as e:
-            if conn:
+            except Exception as e:
                 conn.rollback()
-            logger.error(f"Database error during assembly management for '{assembly_details.get('AssemblyName')}': {e}", exc_info=True)
-            return None, f"Database error: Could not manage assembly. Details: {e}"
-        finally:
-            # Note: The db_manager in the provided snippet doesn't have release_connection.
-            # The existing db_manager.close_connection() closes the global connection.
-            # For explicit transaction control with get_connection(), we usually pair it with releasing/closing
-            # that specific connection instance if get_connection() were to provide new ones.
-            # However, this db_manager uses a single shared connection.
-            # So, we don't call db_manager.release_connection(conn) or conn.close() here,
-            # as it might affect other parts of the application using the shared conn.
-            # The commit/rollback is sufficient for transaction management on the shared connection.
-            pass
+                logger.error(f"Database error during assembly management for '{assembly_details.get('AssemblyName')}': {e}", exc_info=True)
+                return None, f"Database error: Could not manage assembly. Details: {e}"
 
     def _validate_assembly_inputs(self, assembly_details, components_list, assembly_id=None):
         """Helper to validate inputs for manage_assembly."""
@@ -976,44 +1834,62 @@ class ProjectStartup:
             if comp.get('UnitOfMeasure') is not None and not isinstance(comp.get('UnitOfMeasure'), str):
                  return False, f"Component {i}: UnitOfMeasure, if provided, must be a string."
 
-
-        # Check for unique AssemblyItemNumber if creating new or changing it
-        # This check needs db_manager, so it's part of the main method's transaction or pre-check.
-        # For simplicity, keeping it in the main method before transaction starts.
-        # However, if we want this helper to be fully comprehensive for *all* input validation:
-        if assembly_details.get('AssemblyItemNumber'):
-            check_item_num_query = "SELECT AssemblyID FROM Assemblies WHERE AssemblyItemNumber = ? AND (? IS NULL OR AssemblyID != ?)"
-            existing_assembly_item_num = db_manager.execute_query(
-                check_item_num_query,
-                (assembly_details['AssemblyItemNumber'], assembly_id, assembly_id),
-                fetch_one=True
-            )
-            if existing_assembly_item_num:
-                return False, f"Assembly Item Number '{assembly_details['AssemblyItemNumber']}' already exists."
+        item_number = assembly_details['AssemblyItemNumber']
+        check_item_num_query = "SELECT AssemblyID FROM Assemblies WHERE AssemblyItemNumber = ? AND (? IS NULL OR AssemblyID != ?)"
+        existing_assembly_item_num = self.db_manager.execute_query(
+            check_item_num_query, (item_number, assembly_id, assembly_id), fetch_one=True
+        )
+        if existing_assembly_item_num:
+            return False, f"Assembly Item Number '{item_number}' already exists."
+
+        # All component codes are checked in one batched lookup (materials or sub-assemblies)
+        stock_numbers = [comp['MaterialStockNumber'] for comp in components_list]
+        if item_number in stock_numbers:
+            return False, f"Assembly '{item_number}' cannot contain itself."
+        resolved = self._resolve_component_codes(stock_numbers)
+        missing = [s for s in dict.fromkeys(stock_numbers) if s not in resolved]
+        if missing:
+            return False, f"Material or assembly with Stock Number(s) {', '.join(repr(s) for s in missing)} not found. Cannot add to assembly."
+        for comp in components_list:
+            comp['ChildAssemblyID'] = resolved[comp['MaterialStockNumber']]
+
+        # On update, a sub-assembly that already contains this assembly would close a cycle
+        sub_assembly_ids = {a_id for a_id in resolved.values() if a_id is not None}
+        if assembly_id and sub_assembly_ids:
+            graph, _ = self._load_bom_graph()
+            for sub_id in sub_assembly_ids:
+                if self._bom_reaches(sub_id, assembly_id, graph):
+                    return False, f"Sub-assembly ID {sub_id} already contains assembly ID {assembly_id}; adding it would create a cycle."
 
         return True, "Validation successful."
 
     def get_assembly_details_by_item_number(self, assembly_item_number):
         """
-        Retrieves assembly details and its components by AssemblyItemNumber.
+        Retrieves assembly details and its direct components by AssemblyItemNumber.
+        Nested sub-assemblies are listed with IsSubAssembly set; use explode_assembly_bom for leaf totals.
         Returns (assembly_data_dict, components_list_of_dicts) or (None, None).
         """
         assembly_query = "SELECT * FROM Assemblies WHERE AssemblyItemNumber = ?;"
         components_query = """
-            SELECT ac.MaterialStockNumber, m.MaterialName, ac.QuantityInAssembly, ac.UnitOfMeasure
+            SELECT COALESCE(ac.MaterialStockNumber, sub.AssemblyItemNumber) AS MaterialStockNumber,
+                   COALESCE(sub.AssemblyName, m.MaterialName) AS MaterialName,
+                   ac.QuantityInAssembly, ac.UnitOfMeasure,
+                   CASE WHEN ac.ChildAssemblyID IS NULL THEN 0 ELSE 1 END AS IsSubAssembly
             FROM AssemblyComponents ac
-            JOIN Materials m ON ac.MaterialStockNumber = m.StockNumber
-            WHERE ac.AssemblyID = ?;
+            LEFT JOIN Assemblies sub ON sub.AssemblyID = ac.ChildAssemblyID
+            LEFT JOIN Materials m ON ac.MaterialStockNumber = m.StockNumber
+            WHERE ac.AssemblyID = ?
+            ORDER BY ac.AssemblyComponentID;
         """
         try:
-            assembly_data = db_manager.execute_query(assembly_query, (assembly_item_number,), fetch_one=True)
+            assembly_data = self.db_manager.execute_query(assembly_query, (assembly_item_number,), fetch_one=True)
             if not assembly_data:
                 return None, None
 
             assembly_dict = dict(assembly_data)
             assembly_id = assembly_dict['AssemblyID']
 
-            components_data = db_manager.execute_query(components_query, (assembly_id,), fetch_all=True)
+            components_data = self.db_manager.execute_query(components_query, (assembly_id,), fetch_all=True)
             components_list = [dict(comp) for comp in components_data] if components_data else []
 
             return assembly_dict, components_list
@@ -1046,22 +1922,24 @@ class ProjectStartup:
             unit_of_measure, urgency_level, required_by_date, notes, constants.PURCHASE_STATUS_REQUESTED
         )
 
-        try:
-            conn = self.db_manager.get_connection()
-            cursor = conn.cursor()
-            cursor.execute(query, params)
-            last_row_id = cursor.lastrowid
-            conn.commit()
-
-            if last_row_id:
-                logger.info(f"Material request logged successfully. InternalLogID: {last_row_id}")
-                return True, "Material request logged successfully.", last_row_id
-            else:
-                logger.error("Failed to log material request (no ID returned), though query might have succeeded.")
-                return False, "Failed to log material request (no ID returned).", None
-        except Exception as e:
-            logger.error(f"Database error adding material request: {e}", exc_info=True)
-            return False, f"Database error adding material request: {e}", None
+        conn = self.db_manager.get_connection()
+        with self.db_manager.lock:
+            try:
+                cursor = conn.cursor()
+                cursor.execute(query, params)
+                last_row_id = cursor.lastrowid
+                conn.commit()
+
+                if last_row_id:
+                    logger.info(f"Material request logged successfully. InternalLogID: {last_row_id}")
+                    return True, "Material request logged successfully.", last_row_id
+                else:
+                    logger.error("Failed to log material request (no ID returned), though query might have succeeded.")
+                    return False, "Failed to log material request (no ID returned).", None
+            except Exception as e:
+                conn.rollback()
+                logger.error(f"Database error adding material request: {e}", exc_info=True)
+                return False, f"Database error adding material request: {e}", None
 
     def create_production_assembly_order(self, assembly_id: int, project_id: int, quantity_to_produce: float,
                                          assigned_to_employee_id: int = None, start_date: str = None,
@@ -1092,22 +1970,77 @@ class ProjectStartup:
             start_date, completion_date, notes, constants.PRODUCTION_STATUS_PLANNED
         )
 
-        try:
-            conn = self.db_manager.get_connection()
-            cursor = conn.cursor()
-            cursor.execute(query, params)
-            last_row_id = cursor.lastrowid
-            conn.commit()
-
-            if last_row_id:
-                logger.info(f"Production order created successfully. ProductionID: {last_row_id}")
-                return True, "Production order created successfully.", last_row_id
-            else:
-                logger.error("Failed to create production order (no ID returned).")
-                return False, "Failed to create production order (no ID returned).", None
-        except Exception as e:
-            logger.error(f"Database error creating production order: {e}", exc_info=True)
-            return False, f"Database error creating production order: {e}", None
+        conn = self.db_manager.get_connection()
+        with self.db_manager.lock:
+            try:
+                cursor = conn.cursor()
+                cursor.execute(query, params)
+                last_row_id = cursor.lastrowid
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                logger.error(f"Database error creating production order: {e}", exc_info=True)
+                return False, f"Database error creating production order: {e}", None
+
+        if not last_row_id:
+            logger.error("Failed to create production order (no ID returned).")
+            return False, "Failed to create production order (no ID returned).", None
+        logger.info(f"Production order created successfully. ProductionID: {last_row_id}")
+        self._notify_production_order_changed(last_row_id)
+        return True, "Production order created successfully.", last_row_id
+
+    def update_production_order(self, production_id, status=None, quantity_to_produce=None):
+        """
+        Updates the status and/or quantity of a production order.
+        Returns:
+            tuple: (bool, str) indicating success and a message.
+        """
+        updates = {}
+        if status is not None:
+            if not isinstance(status, str) or not status.strip():
+                return False, "Production status must be a non-empty string."
+            updates['Status'] = status # Allowed values are enforced by the table's CHECK constraint
+        if quantity_to_produce is not None:
+            if quantity_to_produce <= 0:
+                return False, "Quantity to produce must be positive."
+            updates['QuantityToProduce'] = quantity_to_produce
+        if not updates:
+            return False, "No production order changes provided."
+
+        set_clause = ", ".join(f"{column} = ?" for column in updates)
+        cursor = self.db_manager.execute_query(
+            f"UPDATE Production_Assembly_Tracking SET {set_clause}, LastModifiedDate = CURRENT_TIMESTAMP WHERE ProductionID = ?",
+            tuple(updates.values()) + (production_id,), commit=True
+        )
+        if not cursor:
+            return False, f"Database error updating production order {production_id}."
+        if cursor.rowcount == 0:
+            return False, f"Production order {production_id} not found."
+        logger.info(f"Production order {production_id} updated: {updates}")
+        self._notify_production_order_changed(production_id)
+        return True, f"Production order {production_id} updated."
+
+    def add_production_order_listener(self, callback):
+        """
+        Registers callback(production_id), run after a production order is created or updated
+        through this module. Held by weak reference, so a discarded listener drops out.
+        """
+        ref = weakref.WeakMethod(callback) if hasattr(callback, '__self__') else weakref.ref(callback)
+        self._production_order_listeners.append(ref)
+
+    def _notify_production_order_changed(self, production_id):
+        """Runs the production order listeners; a failing listener never fails the write itself."""
+        live = []
+        for ref in self._production_order_listeners:
+            callback = ref()
+            if callback is None:
+                continue
+            live.append(ref)
+            try:
+                callback(production_id)
+            except Exception as e:
+                logger.error(f"Production order listener failed for order {production_id}: {e}", exc_info=True)
+        self._production_order_listeners = live
 
     def add_document_note(self, document_id, page_number, employee_id, note_text):
         """Adds a note to a document page."""
@@ -1176,6 +2109,166 @@ class ProjectStartup:
             logger.error(f"Error fetching pending material requests: {e}", exc_info=True)
             return []
 
+    def consolidate_material_requests(self, window_days=7, anchor_date=None, dry_run=False):
+        """
+        Consolidates open material requests into draft purchase orders.
+
+        Open requests (Requested / Approved by PM, not yet linked to a PO line) are matched to
+        Materials by stock number (the description as entered, or its 'STOCK - Name' prefix from
+        the material type-ahead). They are grouped into one PO per preferred vendor and
+        required-by window, with one line per material and unit. Every step is a set-based
+        INSERT/UPDATE ... SELECT in a single transaction, and each request is linked back
+        through AssociatedPOLineItemID and moved to 'PO Issued'.
+        Requests that match no material, or whose material has no PreferredVendorID, are left open.
+        Args:
+            window_days (int): Width of the RequiredByDate buckets. Overdue requests fall in the
+                               first bucket; requests without a date get their own PO per vendor.
+            anchor_date (str, optional): Start of the first bucket (YYYY-MM-DD, default today).
+            dry_run (bool): Only return the proposed lines; nothing is written.
+        Returns:
+            tuple: (pd.DataFrame of PO lines or None on error, message)
+        """
+        if not isinstance(window_days, int) or window_days <= 0:
+            return None, "Consolidation window must be a positive number of days."
+        anchor = anchor_date or datetime.now().strftime("%Y-%m-%d")
+        batch_tag = f"PO-{datetime.now().strftime('%Y%m%d')}-{uuid.uuid4().hex[:6].upper()}"
+        line_columns = ['PONumber', 'PurchaseOrderID', 'VendorID', 'LineNumber', 'POLineItemID', 'MaterialID',
+                        'StockNumber', 'Description', 'QuantityOrdered', 'UnitOfMeasure', 'UnitPrice', 'LineTotal',
+                        'RequestCount', 'ExpectedDeliveryDate']
+        drop_temp_tables = ("DROP TABLE IF EXISTS temp.po_consolidation_requests",
+                            "DROP TABLE IF EXISTS temp.po_consolidation_groups")
+        draft_status_id = None
+        if not dry_run:
+            draft_status = self.db_manager.execute_query(
+                "SELECT OrderStatusID FROM OrderStatuses WHERE StatusName = ?", (constants.ORDER_STATUS_DRAFT,), fetch_one=True)
+            if not draft_status:
+                logger.error(f"Order status '{constants.ORDER_STATUS_DRAFT}' not found; cannot consolidate material requests.")
+                return None, f"Order status '{constants.ORDER_STATUS_DRAFT}' is missing from OrderStatuses; no purchase orders were created."
+            draft_status_id = draft_status['OrderStatusID']
+
+        conn = self.db_manager.get_connection()
+        with self.db_manager.lock:
+            try:
+                cursor = conn.cursor()
+                for statement in drop_temp_tables:
+                    cursor.execute(statement)
+                # 1. Candidate requests with their material, vendor and window bucket
+                cursor.execute("""
+                    CREATE TEMP TABLE po_consolidation_requests AS
+                    SELECT pl.InternalLogID, pl.ProjectID, pl.QuantityRequested, pl.RequiredByDate,
+                           m.MaterialSystemID, m.StockNumber, m.MaterialName, m.PreferredVendorID AS VendorID,
+                           COALESCE(NULLIF(TRIM(pl.UnitOfMeasure), ''), m.UnitOfMeasure) AS UnitOfMeasure, -- Materials UOM is NOT NULL
+                           COALESCE(m.DefaultCost, 0) AS UnitPrice,
+                           CASE WHEN pl.RequiredByDate IS NULL THEN -1
+                                ELSE MAX(0, CAST((julianday(pl.RequiredByDate) - julianday(?)) / ? AS INTEGER))
+                           END AS WindowNo
+                    FROM Purchasing_Log pl
+                    JOIN Materials m ON m.StockNumber = CASE
+                        WHEN instr(pl.MaterialDescription, ' - ') > 0
+                            THEN TRIM(substr(pl.MaterialDescription, 1, instr(pl.MaterialDescription, ' - ') - 1))
+                        ELSE TRIM(pl.MaterialDescription) END
+                    WHERE pl.Status IN (?, ?) AND pl.AssociatedPOLineItemID IS NULL
+                      AND m.PreferredVendorID IS NOT NULL
+                """, (anchor, window_days, constants.PURCHASE_STATUS_REQUESTED, constants.PURCHASE_STATUS_APPROVED_BY_PM))
+
+                # 2. One PO per vendor and window
+                cursor.execute("""
+                    CREATE TEMP TABLE po_consolidation_groups AS
+                    SELECT VendorID, WindowNo,
+                           ? || '-' || printf('%03d', ROW_NUMBER() OVER (ORDER BY VendorID, WindowNo)) AS PONumber,
+                           CASE WHEN COUNT(DISTINCT ProjectID) = 1 AND COUNT(ProjectID) = COUNT(*) THEN MIN(ProjectID) END AS ProjectID,
+                           MIN(RequiredByDate) AS RequiredByDate,
+                           SUM(QuantityRequested * UnitPrice) AS Subtotal,
+                           COUNT(*) AS RequestCount
+                    FROM po_consolidation_requests
+                    GROUP BY VendorID, WindowNo
+                """, (batch_tag,))
+
+                lines_query = """
+                    SELECT g.PONumber, po.PurchaseOrderID, r.VendorID,
+                           ROW_NUMBER() OVER (PARTITION BY g.PONumber ORDER BY r.StockNumber, r.UnitOfMeasure) AS LineNumber,
+                           NULL AS POLineItemID, r.MaterialSystemID AS MaterialID, r.StockNumber,
+                           r.StockNumber || ' - ' || r.MaterialName AS Description, SUM(r.QuantityRequested) AS QuantityOrdered,
+                           r.UnitOfMeasure, r.UnitPrice, ROUND(SUM(r.QuantityRequested) * r.UnitPrice, 2) AS LineTotal,
+                           COUNT(*) AS RequestCount, g.RequiredByDate AS ExpectedDeliveryDate
+                    FROM po_consolidation_requests r
+                    JOIN po_consolidation_groups g ON g.VendorID = r.VendorID AND g.WindowNo = r.WindowNo
+                    LEFT JOIN PurchaseOrders po ON po.PONumber = g.PONumber
+                    GROUP BY g.PONumber, r.MaterialSystemID, r.UnitOfMeasure
+                    ORDER BY g.PONumber, LineNumber
+                """
+                if dry_run:
+                    cursor.execute(lines_query)
+                    lines_df = pd.DataFrame([dict(row) for row in cursor.fetchall()], columns=line_columns)
+                    conn.rollback()
+                    return lines_df, f"{len(lines_df)} PO line(s) would be created for {lines_df['PONumber'].nunique()} purchase order(s)."
+
+                cursor.execute("""
+                    INSERT INTO PurchaseOrders (VendorID, ProjectID, PONumber, OrderDate, ExpectedDeliveryDate,
+                                                OrderStatusID, Subtotal, TotalAmount, Notes)
+                    SELECT g.VendorID, g.ProjectID, g.PONumber, date('now'), g.RequiredByDate, ?,
+                           ROUND(g.Subtotal, 2), ROUND(g.Subtotal, 2),
+                           'Consolidated from ' || g.RequestCount || ' material request(s).'
+                    FROM po_consolidation_groups g
+                    ORDER BY g.PONumber
+                """, (draft_status_id,))
+                po_count = cursor.rowcount
+
+                # 3. One line per material/unit on each PO
+                cursor.execute(f"""
+                    INSERT INTO PurchaseOrderLineItems (PurchaseOrderID, LineNumber, MaterialID, Description,
+                                                        QuantityOrdered, UnitOfMeasure, UnitPrice, LineTotal, Notes)
+                    SELECT PurchaseOrderID, LineNumber, MaterialID, Description,
+                           QuantityOrdered, UnitOfMeasure, UnitPrice, LineTotal,
+                           RequestCount || ' request(s)'
+                    FROM ({lines_query})
+                """)
+
+                # 4. Link every request back to its PO line
+                cursor.execute("""
+                    UPDATE Purchasing_Log
+                    SET AssociatedPOLineItemID = link.POLineItemID, Status = ?, LastModifiedDate = CURRENT_TIMESTAMP
+                    FROM (
+                        SELECT r.InternalLogID, li.POLineItemID
+                        FROM po_consolidation_requests r
+                        JOIN po_consolidation_groups g ON g.VendorID = r.VendorID AND g.WindowNo = r.WindowNo
+                        JOIN PurchaseOrders po ON po.PONumber = g.PONumber
+                        JOIN PurchaseOrderLineItems li ON li.PurchaseOrderID = po.PurchaseOrderID
+                             AND li.MaterialID = r.MaterialSystemID
+                             AND li.UnitOfMeasure = r.UnitOfMeasure
+                    ) AS link
+                    WHERE Purchasing_Log.InternalLogID = link.InternalLogID
+                """, (constants.PURCHASE_STATUS_PO_ISSUED,))
+                linked_count = cursor.rowcount
+
+                cursor.execute("""
+                    SELECT po.PONumber, po.PurchaseOrderID, po.VendorID, li.LineNumber, li.POLineItemID, li.MaterialID,
+                           m.StockNumber, li.Description, li.QuantityOrdered, li.UnitOfMeasure, li.UnitPrice, li.LineTotal,
+                           (SELECT COUNT(*) FROM Purchasing_Log pl WHERE pl.AssociatedPOLineItemID = li.POLineItemID) AS RequestCount,
+                           po.ExpectedDeliveryDate
+                    FROM PurchaseOrders po
+                    JOIN PurchaseOrderLineItems li ON li.PurchaseOrderID = po.PurchaseOrderID
+                    LEFT JOIN Materials m ON m.MaterialSystemID = li.MaterialID
+                    WHERE po.PONumber LIKE ? || '-%'
+                    ORDER BY po.PONumber, li.LineNumber
+                """, (batch_tag,))
+                lines_df = pd.DataFrame([dict(row) for row in cursor.fetchall()], columns=line_columns)
+                conn.commit()
+                msg = (f"Created {po_count} purchase order(s) with {len(lines_df)} line(s) "
+                       f"from {linked_count} material request(s).")
+                logger.info(msg)
+                return lines_df, msg
+            except Exception as e:
+                conn.rollback()
+                logger.error(f"Error consolidating material requests: {e}", exc_info=True)
+                return None, f"Database error consolidating material requests: {e}"
+            finally:
+                try:
+                    for statement in drop_temp_tables:
+                        conn.execute(statement)
+                except Exception as e:
+                    logger.warning(f"Could not drop consolidation temp tables: {e}")
+
     def get_active_production_orders(self):
         """Retrieves active production orders from Production_Assembly_Tracking."""
         query = """
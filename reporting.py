@@ -4,22 +4,32 @@ import os
 from database_manager import db_manager
 from configuration import Config
 from monitoring_control import MonitoringControl # To get performance analysis data
+from evm_snapshots import EvmSnapshotManager
+from forecasting import CostForecaster
 import numpy as np # Was missing, needed by MonitoringControl, good to have here too if pandas NaN is used
 import constants # Added
 
 logger = logging.getLogger(__name__)
 
 class Reporting:
-    def __init__(self, db_m_instance, monitor_control_instance=None): # db_m_instance is now required
+    def __init__(self, db_m_instance, monitor_control_instance=None, forecaster_instance=None): # db_m_instance is now required
         if db_m_instance is None:
             raise ValueError("DatabaseManager instance is required for Reporting.")
         self.db_manager = db_m_instance
         # If monitor_control_instance is not provided, instantiate it using the provided db_m_instance
         self.monitor_control = monitor_control_instance if monitor_control_instance else MonitoringControl(db_m_instance=self.db_manager)
+        self.forecaster = forecaster_instance if forecaster_instance else CostForecaster(
+            self.db_manager, snapshot_instance=EvmSnapshotManager(self.db_manager, earned_value_instance=self.monitor_control.earned_value))
         os.makedirs(Config.get_reports_dir(), exist_ok=True)
         logger.info("Reporting module initialized with provided db_manager.")
 
-    def _get_project_data_for_report(self, project_id):
+    def _get_project_data_for_report(self, project_id, context=None):
+        if context is not None:
+            # One load per analysis request; each report gets its own copies
+            context.check_project(project_id)
+            project_details, *frames = context.get('report_data', self._get_project_data_for_report, project_id)
+            return (dict(project_details) if project_details is not None else None, *(df.copy() for df in frames))
+
         project_details_row = self.db_manager.execute_query(
             "SELECT *, ProjectName AS project_name, EstimatedCost AS total_estimated_cost FROM Projects WHERE ProjectID = ?", (project_id,), fetch_one=True
         )
@@ -36,16 +46,17 @@ class Reporting:
         budget_rows = self.db_manager.execute_query(budget_query, (project_id,), fetch_all=True)
         budget_df = pd.DataFrame([dict(row) for row in budget_rows]) if budget_rows else pd.DataFrame()
 
-        actual_costs_query = "SELECT ActualCostID AS actual_cost_id, WBSElementID AS wbs_element_id, CostCategory AS cost_category, Description AS cost_description, Amount AS amount, TransactionDate AS transaction_date FROM actual_costs WHERE ProjectID = ?"
+        # Actual costs per WBS element from the trigger-maintained rollups (WBSElementID 0 = not charged to an element)
+        actual_costs_query = "SELECT NULLIF(WBSElementID, 0) AS wbs_element_id, TotalActualCost AS amount FROM wbs_actual_rollups WHERE ProjectID = ? AND CostEntryCount > 0"
         actual_costs_rows = self.db_manager.execute_query(actual_costs_query, (project_id,), fetch_all=True)
         actual_costs_df = pd.DataFrame([dict(row) for row in actual_costs_rows]) if actual_costs_rows else pd.DataFrame()
 
         _, progress_df = self.monitor_control.get_project_actual_data(project_id)
         return project_details_dict, wbs_df, budget_df, actual_costs_df, progress_df
 
-    def generate_estimate_vs_actual_report(self, project_id):
+    def generate_estimate_vs_actual_report(self, project_id, context=None):
         logger.info(f"Generating Estimate vs. Actual report for Project ID: {project_id}")
-        project_details, wbs_df, _, actual_costs_df, _ = self._get_project_data_for_report(project_id)
+        project_details, wbs_df, _, actual_costs_df, _ = self._get_project_data_for_report(project_id, context)
 
         if project_details is None:
             return pd.DataFrame(), False, "Project data not found for report generation."
@@ -119,11 +130,13 @@ class Reporting:
         logger.info(f"Estimate vs. Actual report generated for Project ID: {project_id}.")
         return formatted_df, True, "Estimate vs. Actual report generated successfully."
 
-    def generate_performance_report(self, project_id):
+    def generate_performance_report(self, project_id, context=None):
         logger.info(f"Generating Performance report for Project ID: {project_id}")
-        cost_df, cv_msg = self.monitor_control.analyze_cost_variance(project_id)
-        schedule_df, sv_msg = self.monitor_control.analyze_schedule_variance(project_id)
-        summary, summary_msg = self.monitor_control.get_project_summary_performance(project_id)
+        # The detail tables and the summary all come from one set of fetches
+        context = context if context is not None else self.monitor_control.create_analysis_context(project_id)
+        cost_df, cv_msg = self.monitor_control.analyze_cost_variance(project_id, context)
+        schedule_df, sv_msg = self.monitor_control.analyze_schedule_variance(project_id, context=context)
+        summary, summary_msg = self.monitor_control.get_project_summary_performance(project_id, context)
 
         if not isinstance(summary, dict):
             logger.error(f"Failed to get performance summary for project {project_id}: {summary_msg}")
@@ -142,6 +155,7 @@ class Reporting:
         report_content.append("\nPerformance Suggestions:\n")
         for suggestion in summary.get('suggestions', []):
             report_content.append(f"- {suggestion}\n")
+        report_content.extend(self._forecast_report_lines(project_id))
         report_content.append("\n--------------------------------------------------\n")
         report_content.append("Detailed Cost Variance (by WBS):\n")
         report_content.append(cost_df.to_string(index=False) + "\n\n")
@@ -152,6 +166,23 @@ class Reporting:
         logger.info(f"Performance report generated for Project ID: {project_id}.")
         return full_report_text, True, "Performance report generated successfully."
 
+    def _forecast_report_lines(self, project_id):
+        """Forecast-at-completion section of the performance report: project EAC by method and flagged elements."""
+        # Snapshots are captured on their own schedule; generating a report only reads them
+        forecast_df, _ = self.forecaster.forecast([project_id], capture=False)
+        if forecast_df.empty:
+            return []
+        total = forecast_df[forecast_df['WBSElementID'] == 0].iloc[0]
+        lines = ["\nForecast at Completion:\n"]
+        for label, column in (("CPI method", 'EAC_CPI'), ("CPI x SPI method", 'EAC_CPI_SPI'), ("Cost-curve regression", 'EAC_Regression')):
+            lines.append(f"- EAC ({label}): " + (f"${total[column]:,.2f}\n" if pd.notnull(total[column]) else "N/A\n"))
+        lines.append(f"- Estimate to Complete: ${total['EstimateToComplete']:,.2f}; Variance at Completion: ${total['VarianceAtCompletion']:,.2f}\n")
+        for _, row in self.forecaster.get_flagged(forecast_df).iterrows():
+            lines.append(f"- {row['OverrunFlag'].upper()}: {row['WBSCode']} {row['WBSDescription'] if pd.notnull(row['WBSDescription']) else ''} forecast "
+                         f"${row['EstimateAtCompletion']:,.2f} against budget ${row['BudgetAtCompletion']:,.2f} "
+                         f"({row['OverrunPercent']:.1f}% over)\n")
+        return lines
+
     def export_report(self, report_data, report_type, project_id, format='excel'):
         report_filename_base = f"project_{project_id}_{report_type.replace(' ', '_').lower()}_report"
 
@@ -0,0 +1,351 @@
+import heapq
+import logging
+
+import numpy as np
+import pandas as pd
+
+import constants
+from cpm_scheduling import CPMScheduler
+from exceptions import AppValidationError
+from work_calendar import CalendarManager
+
+logger = logging.getLogger(__name__)
+
+RESOURCE_EMPLOYEE = 'Employee'
+RESOURCE_VEHICLE = 'Vehicle'
+
+
+class ResourceLeveler:
+    """
+    Resource histograms, overallocation detection and leveling across projects.
+
+    ResourceAssignments book employees (and optionally a vehicle) onto tasks. Every booking
+    is an interval of working days on the company calendar, so a resource's daily load is an
+    interval sum: +1 where a booking starts and -1 the day after it ends, accumulated along
+    the days of one (resources x days) matrix. A resource is overallocated on days where its
+    load exceeds the capacity (one task at a time by default).
+
+    Leveling is a serial, priority-based heuristic over the CPM schedules of all the
+    projects at once: tasks are placed in dependency order, lowest total float first, each
+    at the earliest start within its float where none of its resources is already full
+    (or, failing that, where they clash on the fewest days).
+    Shifts never push a task past its late start, so project finish dates hold; conflicts
+    that cannot be resolved within float are reported rather than forced.
+    """
+
+    def __init__(self, db_m_instance, cpm_scheduler_instance=None, calendar_manager_instance=None):
+        if db_m_instance is None:
+            raise ValueError("DatabaseManager instance is required for ResourceLeveler.")
+        self.db_manager = db_m_instance
+        self.calendar_manager = calendar_manager_instance if calendar_manager_instance else CalendarManager(self.db_manager)
+        self.cpm_scheduler = cpm_scheduler_instance if cpm_scheduler_instance else CPMScheduler(
+            self.db_manager, calendar_manager_instance=self.calendar_manager
+        )
+        logger.info("ResourceLeveler initialized with provided db_manager.")
+
+    def _resolve_project_ids(self, project_ids):
+        """The given projects, or every Active project."""
+        if project_ids is not None:
+            return [int(project_id) for project_id in project_ids]
+        rows = self.db_manager.execute_query("""
+            SELECT p.ProjectID FROM Projects p JOIN ProjectStatuses ps ON ps.ProjectStatusID = p.ProjectStatusID
+            WHERE ps.StatusName = ? ORDER BY p.ProjectID
+        """, (constants.PROJECT_STATUS_ACTIVE,), fetch_all=True)
+        return [row['ProjectID'] for row in rows] if rows else []
+
+    def _load_assignments(self, project_ids):
+        """One row per booked resource: an employee row for every assignment plus a vehicle row where one is booked."""
+        columns = ['AssignmentID', 'TaskID', 'ProjectID', 'EmployeeID', 'VehicleID', 'AssignmentStartDate', 'AssignmentEndDate',
+                   'ScheduledStartDate', 'ScheduledEndDate']
+        if not project_ids:
+            return pd.DataFrame(columns=columns + ['ResourceType', 'ResourceID'])
+        placeholders = ', '.join('?' for _ in project_ids)
+        rows = self.db_manager.execute_query(f"""
+            SELECT ra.AssignmentID, ra.TaskID, t.ProjectID, ra.EmployeeID, ra.VehicleID, ra.AssignmentStartDate,
+                   ra.AssignmentEndDate, COALESCE(r.EarlyStart, t.ScheduledStartDate), COALESCE(r.EarlyFinish, t.ScheduledEndDate)
+            FROM ResourceAssignments ra JOIN Tasks t ON t.TaskID = ra.TaskID
+            LEFT JOIN TaskCPMResults r ON r.TaskID = t.TaskID
+            WHERE t.ProjectID IN ({placeholders}) AND t.ActualEndDate IS NULL
+        """, project_ids, fetch_all=True) or []
+        assignments = pd.DataFrame.from_records([tuple(row) for row in rows], columns=columns)
+        employees = assignments.assign(ResourceType=RESOURCE_EMPLOYEE, ResourceID=assignments['EmployeeID'])
+        vehicles = assignments[assignments['VehicleID'].notna()]
+        vehicles = vehicles.assign(ResourceType=RESOURCE_VEHICLE, ResourceID=vehicles['VehicleID'])
+        booked = pd.concat([employees, vehicles], ignore_index=True)
+        booked['ResourceID'] = booked['ResourceID'].astype(np.int64)
+        return booked
+
+    @staticmethod
+    def _day_index(calendar, origin, dates, roll='forward'):
+        """Working-day offsets of date strings from origin on the calendar."""
+        return calendar.days_between(np.full(len(dates), origin), calendar.offset(np.asarray(dates, dtype=str), 0, roll=roll))
+
+    @staticmethod
+    def _interval_load(resource_index, starts, ends, resource_count, day_count):
+        """(resources x days) booking counts for half-open day intervals [start, end), by cumulative sums of +1/-1 steps."""
+        steps = np.zeros((resource_count, day_count + 1), dtype=np.int32)
+        keep = ends > starts
+        np.add.at(steps, (resource_index[keep], starts[keep]), 1)
+        np.add.at(steps, (resource_index[keep], ends[keep]), -1)
+        return np.cumsum(steps[:, :-1], axis=1)
+
+    def get_resource_histogram(self, project_ids=None, start_date=None, end_date=None):
+        """
+        Daily load of every booked resource on the company calendar's working days.
+        Bookings use the assignment's dates, or when it has none the task's CPM early dates
+        (TaskCPMResults), falling back to its scheduled dates before the first CPM run.
+        Args:
+            project_ids (iterable of int, optional): Projects to include; every Active project by default.
+            start_date, end_date (str, optional): Limit the histogram to this YYYY-MM-DD range.
+        Returns:
+            DataFrame: Indexed by (ResourceType, ResourceID), one column per working day, values
+                       the number of tasks booked that day. Empty if nothing is booked.
+        """
+        booked = self._load_assignments(self._resolve_project_ids(project_ids))
+        starts = booked['AssignmentStartDate'].fillna(booked['ScheduledStartDate'])
+        ends = booked['AssignmentEndDate'].fillna(booked['ScheduledEndDate'])
+        dated = starts.notna() & ends.notna()
+        booked, starts, ends = booked[dated], starts[dated].astype(str).str[:10], ends[dated].astype(str).str[:10]
+        if booked.empty:
+            return pd.DataFrame()
+
+        calendar = self.calendar_manager.get_calendar()
+        first = calendar.offset(start_date or starts.min(), 0)[0]
+        last = calendar.offset(end_date or ends.max(), 0, roll='backward')[0]
+        if last < first:
+            raise AppValidationError("End date cannot be before start date.")
+        day_count = int(calendar.days_between(first, last)[0]) + 1
+        start_index = np.clip(self._day_index(calendar, first, starts.to_numpy()), 0, day_count)
+        end_index = np.clip(self._day_index(calendar, first, ends.to_numpy(), roll='backward') + 1, 0, day_count)
+
+        resources = pd.MultiIndex.from_frame(booked[['ResourceType', 'ResourceID']]).drop_duplicates().sort_values()
+        load = self._interval_load(resources.get_indexer(pd.MultiIndex.from_frame(booked[['ResourceType', 'ResourceID']])),
+                                   start_index, end_index, len(resources), day_count)
+        days = calendar.offset(np.full(day_count, first), np.arange(day_count)).astype(str)
+        return pd.DataFrame(load, index=resources, columns=days)
+
+    def find_overallocations(self, project_ids=None, capacity=1, start_date=None, end_date=None):
+        """
+        Runs of consecutive working days on which a resource is booked beyond capacity.
+        Returns:
+            DataFrame: ResourceType, ResourceID, StartDate, EndDate, Days and PeakLoad per run.
+        """
+        histogram = self.get_resource_histogram(project_ids, start_date, end_date)
+        columns = ['ResourceType', 'ResourceID', 'StartDate', 'EndDate', 'Days', 'PeakLoad']
+        if histogram.empty:
+            return pd.DataFrame(columns=columns)
+        load = histogram.to_numpy()
+        over = load > capacity
+        # Runs start where a day is over and the day before is not; padding closes runs at the edges
+        padded = np.pad(over, ((0, 0), (1, 1))).astype(np.int8)
+        edges = np.diff(padded, axis=1)
+        run_rows, run_starts = np.nonzero(edges == 1)
+        _, run_ends = np.nonzero(edges == -1) # Same row-major order, so runs pair up
+        if not len(run_rows):
+            return pd.DataFrame(columns=columns)
+        peak = np.maximum.reduceat(np.where(over, load, 0).ravel(), run_rows * load.shape[1] + run_starts)
+        days = histogram.columns.to_numpy()
+        resources = histogram.index
+        return pd.DataFrame({
+            'ResourceType': resources.get_level_values(0)[run_rows],
+            'ResourceID': resources.get_level_values(1)[run_rows],
+            'StartDate': days[run_starts],
+            'EndDate': days[run_ends - 1],
+            'Days': run_ends - run_starts,
+            'PeakLoad': peak,
+        }, columns=columns)
+
+    def _build_tasks(self, project_ids):
+        """
+        CPM early/late dates of every task in the projects as company-calendar day offsets,
+        plus dependency lists between them. Returns None if there are no tasks.
+        """
+        schedules, links = [], []
+        for project_id in project_ids:
+            results, _ = self.cpm_scheduler.calculate_schedule(project_id, persist=False)
+            if results.empty:
+                continue
+            schedules.append(results.assign(ProjectID=project_id))
+            links.extend(self.cpm_scheduler.get_task_dependencies(project_id))
+        if not schedules:
+            return None
+        tasks = pd.concat(schedules, ignore_index=True)
+        placeholders = ', '.join('?' for _ in project_ids)
+        started = {row['TaskID'] for row in self.db_manager.execute_query(
+            f"SELECT TaskID FROM Tasks WHERE ProjectID IN ({placeholders}) AND ActualStartDate IS NOT NULL",
+            project_ids, fetch_all=True) or []}
+
+        calendar = self.calendar_manager.get_calendar()
+        origin = calendar.offset(tasks['EarlyStart'].min(), 0)[0]
+        es = self._day_index(calendar, origin, tasks['EarlyStart'].to_numpy())
+        # Durations are re-measured on the company calendar so every project shares one day axis
+        duration = np.where(tasks['DurationDays'].to_numpy() > 0,
+                            calendar.count(tasks['EarlyStart'].to_numpy(), tasks['EarlyFinish'].to_numpy()), 0)
+        ls = np.maximum(self._day_index(calendar, origin, tasks['LateStart'].to_numpy()), es)
+
+        index = {int(task_id): i for i, task_id in enumerate(tasks['TaskID'])}
+        preds, succs = [[] for _ in range(len(tasks))], [[] for _ in range(len(tasks))]
+        for link in links:
+            p, s = index[link['PredecessorTaskID']], index[link['SuccessorTaskID']]
+            preds[s].append((p, link['DependencyType'], int(link['LagDays'] or 0)))
+            succs[p].append(s)
+        return {
+            'frame': tasks, 'calendar': calendar, 'origin': origin, 'index': index,
+            'es': es, 'ls': ls, 'duration': duration, 'total_float': tasks['TotalFloat'].to_numpy(),
+            'fixed': tasks['TaskID'].isin(started).to_numpy(), 'preds': preds, 'succs': succs,
+        }
+
+    @staticmethod
+    def _earliest_start(tasks, i, start):
+        """Earliest start of task i given where its predecessors were placed."""
+        earliest, duration = int(tasks['es'][i]), tasks['duration']
+        for p, dependency_type, lag in tasks['preds'][i]:
+            if dependency_type == 'SS':
+                required = start[p] + lag
+            elif dependency_type == 'FF':
+                required = start[p] + duration[p] + lag - duration[i]
+            else:
+                required = start[p] + duration[p] + lag
+            earliest = max(earliest, required)
+        return earliest
+
+    def level_resources(self, project_ids=None, capacity=1, apply=False):
+        """
+        Proposes task start dates that remove overallocation within each task's total float.
+        Args:
+            project_ids (iterable of int, optional): Projects to level together; every Active project by default.
+            capacity (int): Tasks a resource can work on the same day.
+            apply (bool): Also record the shifts as StartNoEarlierThan constraints, move dated
+                          assignments with their tasks and recalculate the affected schedules.
+        Returns:
+            tuple: (DataFrame of shifted tasks with TaskID, ProjectID, EarlyStart, LeveledStart,
+                   LeveledFinish, ShiftDays and TotalFloat; message).
+        """
+        project_ids = self._resolve_project_ids(project_ids)
+        columns = ['TaskID', 'ProjectID', 'EarlyStart', 'LeveledStart', 'LeveledFinish', 'ShiftDays', 'TotalFloat']
+        tasks = self._build_tasks(project_ids)
+        if tasks is None:
+            return pd.DataFrame(columns=columns), "No tasks to level."
+        booked = self._load_assignments(project_ids)
+        booked = booked[booked['TaskID'].isin(tasks['index'].keys())]
+        calendar, origin, duration = tasks['calendar'], tasks['origin'], tasks['duration']
+        n = len(duration)
+
+        # Bookings relative to their task's start: assignments with their own dates keep their offset into the task
+        task_rows = booked['TaskID'].map(tasks['index']).to_numpy(dtype=np.int64)
+        offset = np.zeros(len(booked), dtype=np.int64)
+        length = duration[task_rows].copy()
+        dated = (booked['AssignmentStartDate'].notna() & booked['AssignmentEndDate'].notna()).to_numpy()
+        if dated.any():
+            a_start = self._day_index(calendar, origin, booked['AssignmentStartDate'][dated].astype(str).str[:10].to_numpy())
+            a_end = self._day_index(calendar, origin, booked['AssignmentEndDate'][dated].astype(str).str[:10].to_numpy(), roll='backward') + 1
+            offset[dated] = np.clip(a_start - tasks['es'][task_rows[dated]], 0, duration[task_rows[dated]])
+            length[dated] = np.clip(a_end - tasks['es'][task_rows[dated]], offset[dated], duration[task_rows[dated]]) - offset[dated]
+        resources = pd.MultiIndex.from_frame(booked[['ResourceType', 'ResourceID']])
+        resource_row = resources.drop_duplicates().get_indexer(resources) if len(booked) else np.array([], dtype=np.int64)
+        bookings_by_task = {}
+        for k, i in enumerate(task_rows):
+            bookings_by_task.setdefault(int(i), []).append(k)
+
+        horizon = int((np.maximum(tasks['ls'], tasks['es']) + duration).max()) + 1
+        load = np.zeros((int(resource_row.max()) + 1 if len(resource_row) else 0, horizon + 1), dtype=np.int32)
+        task_ids = tasks['frame']['TaskID'].astype(int).tolist()
+        start = [0] * n
+        unresolved = []
+
+        # Started tasks stay put and are booked first
+        for i in np.flatnonzero(tasks['fixed']):
+            start[i] = int(tasks['es'][i])
+            for k in bookings_by_task.get(int(i), []):
+                load[resource_row[k], start[i] + offset[k]:start[i] + offset[k] + length[k]] += 1
+
+        waiting = [len(p) for p in tasks['preds']]
+        ready = [(int(tasks['es'][i]), int(tasks['total_float'][i]), i) for i in range(n) if waiting[i] == 0]
+        heapq.heapify(ready)
+        while ready:
+            _, _, i = heapq.heappop(ready)
+            if not tasks['fixed'][i]:
+                earliest = start[i] = self._earliest_start(tasks, i, start)
+                bookings = bookings_by_task.get(i, [])
+                if bookings:
+                    latest = max(int(tasks['ls'][i]), earliest)
+                    candidates = np.arange(earliest, latest + 1)
+                    conflicts = np.zeros(len(candidates), dtype=np.int64)
+                    for k in bookings:
+                        if length[k] <= 0:
+                            continue
+                        # Full days prefix-summed, so each candidate window's clashes are one subtraction
+                        full = np.concatenate(([0], np.cumsum(load[resource_row[k]] >= capacity)))
+                        window_start = np.minimum(candidates + offset[k], horizon)
+                        window_end = np.minimum(window_start + length[k], horizon)
+                        conflicts += full[window_end] - full[window_start]
+                    best = int(np.argmin(conflicts))
+                    start[i] = int(candidates[best])
+                    if conflicts[best]:
+                        unresolved.append(task_ids[i]) # Fewest clashes within float; leave the rest to the planner
+                    for k in bookings:
+                        load[resource_row[k], start[i] + offset[k]:start[i] + offset[k] + length[k]] += 1
+            for s in tasks['succs'][i]:
+                waiting[s] -= 1
+                if waiting[s] == 0:
+                    heapq.heappush(ready, (int(tasks['es'][s]), int(tasks['total_float'][s]), s))
+
+        start = np.asarray(start, dtype=np.int64)
+        shifted = np.flatnonzero(start != tasks['es'])
+        frame = tasks['frame']
+        proposals = pd.DataFrame({
+            'TaskID': frame['TaskID'].to_numpy()[shifted],
+            'ProjectID': frame['ProjectID'].to_numpy()[shifted],
+            'EarlyStart': frame['EarlyStart'].to_numpy()[shifted],
+            'LeveledStart': calendar.offset(np.full(len(shifted), origin), start[shifted]).astype(str),
+            'LeveledFinish': calendar.offset(np.full(len(shifted), origin), start[shifted] + np.maximum(duration[shifted] - 1, 0)).astype(str),
+            'ShiftDays': start[shifted] - tasks['es'][shifted],
+            'TotalFloat': tasks['total_float'][shifted],
+        }, columns=columns)
+        message = f"Leveled {len(project_ids)} projects: {len(proposals)} tasks shifted"
+        if unresolved:
+            message += f", {len(unresolved)} tasks still overallocated within their float (e.g. {unresolved[:5]})"
+        if apply and not proposals.empty:
+            self._apply_leveling(proposals, booked, calendar)
+            message += "; schedules updated"
+        logger.info(message)
+        return proposals, message + "."
+
+    def _apply_leveling(self, proposals, booked, calendar):
+        shifts = dict(zip(proposals['TaskID'].astype(int), proposals['ShiftDays'].astype(int)))
+        moved = booked[booked['TaskID'].isin(shifts.keys()) & booked['AssignmentStartDate'].notna()
+                       & booked['AssignmentEndDate'].notna()].drop_duplicates('AssignmentID')
+        moved_shift = moved['TaskID'].map(shifts).to_numpy(dtype=np.int64)
+        assignment_rows = list(zip(
+            calendar.offset(moved['AssignmentStartDate'].astype(str).str[:10].to_numpy(), moved_shift).astype(str).tolist(),
+            calendar.offset(moved['AssignmentEndDate'].astype(str).str[:10].to_numpy(), moved_shift, roll='backward').astype(str).tolist(),
+            moved['AssignmentID'].astype(int).tolist()
+        ))
+        conn = self.db_manager.get_connection()
+        with self.db_manager.lock:
+            try:
+                cursor = conn.cursor()
+                cursor.executemany(
+                    "UPDATE Tasks SET StartNoEarlierThan = ?, LastModifiedDate = CURRENT_TIMESTAMP WHERE TaskID = ?",
+                    list(zip(proposals['LeveledStart'].tolist(), proposals['TaskID'].astype(int).tolist()))
+                )
+                cursor.executemany(
+                    "UPDATE ResourceAssignments SET AssignmentStartDate = ?, AssignmentEndDate = ?, LastModifiedDate = CURRENT_TIMESTAMP "
+                    "WHERE AssignmentID = ?", assignment_rows
+                )
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                logger.error(f"Error applying resource leveling: {e}", exc_info=True)
+                raise
+        for project_id in proposals['ProjectID'].unique():
+            self.cpm_scheduler.calculate_schedule(int(project_id))
+
+
+if __name__ == "__main__":
+    from database_manager import db_manager
+    leveler = ResourceLeveler(db_manager)
+    print(leveler.find_overallocations().to_string())
+    proposals, msg = leveler.level_resources()
+    print(msg)
+    print(proposals.to_string())
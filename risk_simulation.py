@@ -0,0 +1,299 @@
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from configuration import Config
+from cpm_scheduling import CPMScheduler
+from exceptions import AppValidationError
+from monitoring_control import MonitoringControl
+
+logger = logging.getLogger(__name__)
+
+_SS, _FF = 1, 2 # CPMScheduler.get_network_model dependency type codes (FS is 0)
+# Duration matrices are (tasks x iterations); large networks get smaller batches to bound memory
+_MAX_BATCH_CELLS = 5_000_000
+
+
+def _sample_pert(rng, low, mode, high, size):
+    """(len(low) x size) samples of PERT (scaled beta) distributions; rows with low == high are constant."""
+    samples = np.repeat(low[:, None], size, axis=1)
+    span = high - low
+    varying = span > 0
+    if varying.any():
+        alpha = 1 + 4 * (mode[varying] - low[varying]) / span[varying]
+        beta = 1 + 4 * (high[varying] - mode[varying]) / span[varying]
+        samples[varying] += span[varying, None] * rng.beta(alpha[:, None], beta[:, None], size=(int(varying.sum()), size))
+    return samples
+
+
+def _simulate_batch(model, seed_sequence, size):
+    """
+    Runs `size` iterations of the forward pass at once. Module-level so process pools can pickle it.
+    Returns (project finish in working days, EAC) arrays of length size.
+    """
+    rng = np.random.default_rng(seed_sequence)
+    duration = _sample_pert(rng, model['duration_low'], model['duration_mode'], model['duration_high'], size)
+    floor = model['floor'].astype(float)[:, None]
+    start = np.repeat(floor, size, axis=1)
+    finish = start + duration
+    # Tasks of one level depend only on earlier levels, so each level is a handful of array operations
+    for targets, src, dst, code, lag, group_starts in model['levels']:
+        required = np.where((code == _SS)[:, None], start[src], finish[src]) + lag[:, None]
+        is_ff = code == _FF
+        if is_ff.any():
+            required[is_ff] -= duration[dst[is_ff]]
+        earliest = np.maximum(floor[targets], np.maximum.reduceat(required, group_starts, axis=0))
+        start[targets] = np.where(model['fixed'][targets][:, None], floor[targets], earliest)
+        finish[targets] = start[targets] + duration[targets]
+    project_finish = finish.max(axis=0)
+
+    if len(model['cost_mode']):
+        cost = _sample_pert(rng, model['cost_low'], model['cost_mode'], model['cost_high'], size)
+        eac = model['actual_cost'] + (model['remaining_fraction'][:, None] * cost).sum(axis=0)
+    else:
+        eac = np.full(size, model['actual_cost'])
+    return project_finish, eac
+
+
+class RiskSimulator:
+    """
+    Monte Carlo schedule and cost risk for a project.
+
+    Task durations are drawn from PERT distributions over three-point estimates
+    (TaskDurationEstimates, else the CPM duration scaled by the Config.RISK_DURATION_* factors)
+    and pushed through the project's dependency network in one batched forward pass: every
+    iteration is a column of a (tasks x iterations) matrix, and tasks are processed a
+    topological level at a time. WBS costs at completion are drawn the same way
+    (WBSCostEstimates, else EstimatedCost and the Config.RISK_COST_* factors) and give an EAC
+    per iteration of actual cost to date plus the unfinished share of the sampled cost.
+
+    Iterations are split into batches with independent seed streams spawned from one seed,
+    so a run is reproducible from its seed whether the batches run in one process or many.
+    """
+
+    def __init__(self, db_m_instance, cpm_scheduler_instance=None, monitor_control_instance=None):
+        if db_m_instance is None:
+            raise ValueError("DatabaseManager instance is required for RiskSimulator.")
+        self.db_manager = db_m_instance
+        self.cpm_scheduler = cpm_scheduler_instance if cpm_scheduler_instance else CPMScheduler(self.db_manager)
+        self.monitor_control = monitor_control_instance if monitor_control_instance else MonitoringControl(self.db_manager)
+        logger.info("RiskSimulator initialized with provided db_manager.")
+
+    @staticmethod
+    def _validate_three_point(optimistic, most_likely, pessimistic, label):
+        try:
+            values = [float(optimistic), float(most_likely), float(pessimistic)]
+        except (TypeError, ValueError):
+            raise AppValidationError(f"{label} estimates must be numbers.")
+        if not 0 <= values[0] <= values[1] <= values[2]:
+            raise AppValidationError(f"{label} estimates must satisfy 0 <= optimistic <= most likely <= pessimistic.")
+        return values
+
+    def set_task_duration_estimate(self, task_id, optimistic_days, most_likely_days, pessimistic_days):
+        """Saves a task's three-point duration estimate in working days."""
+        values = self._validate_three_point(optimistic_days, most_likely_days, pessimistic_days, "Duration")
+        saved = self.db_manager.execute_query("""
+            INSERT INTO TaskDurationEstimates (TaskID, OptimisticDays, MostLikelyDays, PessimisticDays) VALUES (?, ?, ?, ?)
+            ON CONFLICT (TaskID) DO UPDATE SET OptimisticDays = excluded.OptimisticDays, MostLikelyDays = excluded.MostLikelyDays,
+                PessimisticDays = excluded.PessimisticDays, LastModifiedDate = CURRENT_TIMESTAMP
+        """, (task_id, *values), commit=True)
+        if not saved:
+            return False, f"Failed to save the duration estimate for task {task_id} (database error)."
+        return True, f"Duration estimate saved for task {task_id}."
+
+    def set_wbs_cost_estimate(self, wbs_element_id, optimistic_cost, most_likely_cost, pessimistic_cost):
+        """Saves a WBS element's three-point estimate of its total cost at completion."""
+        values = self._validate_three_point(optimistic_cost, most_likely_cost, pessimistic_cost, "Cost")
+        saved = self.db_manager.execute_query("""
+            INSERT INTO WBSCostEstimates (WBSElementID, OptimisticCost, MostLikelyCost, PessimisticCost) VALUES (?, ?, ?, ?)
+            ON CONFLICT (WBSElementID) DO UPDATE SET OptimisticCost = excluded.OptimisticCost, MostLikelyCost = excluded.MostLikelyCost,
+                PessimisticCost = excluded.PessimisticCost, LastModifiedDate = CURRENT_TIMESTAMP
+        """, (wbs_element_id, *values), commit=True)
+        if not saved:
+            return False, f"Failed to save the cost estimate for WBS element {wbs_element_id} (database error)."
+        return True, f"Cost estimate saved for WBS element {wbs_element_id}."
+
+    @staticmethod
+    def _group_levels(network):
+        """
+        Dependency edges grouped by the topological level of their target, each group sorted by
+        target: (targets, sources, target per edge, type codes, lags, first edge of each target).
+        """
+        src, dst, code, lag = network['edges']
+        n = len(network['task_ids'])
+        if not len(src):
+            return []
+        position = np.empty(n, dtype=np.int64)
+        position[network['order']] = np.arange(n)
+        # Edges in topological order of their targets, so a source's level is final before it is used
+        topological = np.argsort(position[dst], kind='stable')
+        level = [0] * n
+        for s, d in zip(src[topological].tolist(), dst[topological].tolist()):
+            if level[s] + 1 > level[d]:
+                level[d] = level[s] + 1
+        level = np.array(level, dtype=np.int64)
+        by_level = np.lexsort((dst, level[dst]))
+        src, dst, code, lag = src[by_level], dst[by_level], code[by_level], lag[by_level]
+        edge_level = level[dst]
+        groups = []
+        for edges in np.split(np.arange(len(dst)), np.flatnonzero(np.diff(edge_level)) + 1):
+            first = np.concatenate(([True], dst[edges][1:] != dst[edges][:-1]))
+            group_starts = np.flatnonzero(first)
+            groups.append((dst[edges][group_starts], src[edges], dst[edges], code[edges], lag[edges].astype(float), group_starts))
+        return groups
+
+    def _build_model(self, project_id):
+        """Arrays the batch simulation needs (see _simulate_batch), or None if the project has no tasks."""
+        network = self.cpm_scheduler.get_network_model(project_id)
+        if network is None:
+            return None
+        index = {task_id: i for i, task_id in enumerate(network['task_ids'])}
+        mode = network['duration'].astype(float)
+        low = mode * Config.RISK_DURATION_OPTIMISTIC_FACTOR
+        high = mode * Config.RISK_DURATION_PESSIMISTIC_FACTOR
+        estimates = self.db_manager.execute_query("""
+            SELECT e.TaskID, e.OptimisticDays, e.MostLikelyDays, e.PessimisticDays, t.ActualEndDate
+            FROM Tasks t LEFT JOIN TaskDurationEstimates e ON e.TaskID = t.TaskID
+            WHERE t.ProjectID = ? AND (e.TaskID IS NOT NULL OR t.ActualEndDate IS NOT NULL)
+        """, (project_id,), fetch_all=True) or []
+        for row in estimates:
+            if row['TaskID'] is not None and row['ActualEndDate'] is None:
+                i = index[row['TaskID']]
+                low[i], mode[i], high[i] = row['OptimisticDays'], row['MostLikelyDays'], row['PessimisticDays']
+        # Finished tasks took what they took
+        finished = [index[row['TaskID']] for row in self.db_manager.execute_query(
+            "SELECT TaskID FROM Tasks WHERE ProjectID = ? AND ActualEndDate IS NOT NULL", (project_id,), fetch_all=True) or []]
+        low[finished] = high[finished] = mode[finished]
+
+        model = {
+            'duration_low': low, 'duration_mode': mode, 'duration_high': high,
+            'floor': network['floor'], 'fixed': network['fixed'], 'levels': self._group_levels(network),
+            'deterministic_finish': network['finish'], 'calendar': network['calendar'], 'anchor': network['anchor'],
+        }
+        model.update(self._cost_model(project_id))
+        return model
+
+    def _cost_model(self, project_id):
+        wbs_df = self.monitor_control.get_wbs_variance_data(project_id)
+        total_actual = self.monitor_control.get_project_actual_cost(project_id)
+        if wbs_df.empty:
+            return {'cost_low': np.array([]), 'cost_mode': np.array([]), 'cost_high': np.array([]),
+                    'remaining_fraction': np.array([]), 'actual_cost': total_actual, 'budget_at_completion': None}
+
+        wbs_ids = wbs_df['wbs_element_id'].to_numpy()
+        mode = pd.to_numeric(wbs_df['estimated_cost'], errors='coerce').fillna(0).to_numpy(dtype=float, copy=True)
+        budget_at_completion = float(mode.sum())
+        low, high = mode * Config.RISK_COST_OPTIMISTIC_FACTOR, mode * Config.RISK_COST_PESSIMISTIC_FACTOR
+        placeholders = ', '.join('?' for _ in wbs_ids)
+        estimates = pd.DataFrame.from_records([tuple(row) for row in self.db_manager.execute_query(
+            f"SELECT WBSElementID, OptimisticCost, MostLikelyCost, PessimisticCost FROM WBSCostEstimates WHERE WBSElementID IN ({placeholders})",
+            [int(wbs_id) for wbs_id in wbs_ids], fetch_all=True) or []],
+            columns=['wbs_element_id', 'low', 'mode', 'high'])
+        if not estimates.empty:
+            rows = pd.Index(wbs_ids).get_indexer(estimates['wbs_element_id'])
+            low[rows], mode[rows], high[rows] = estimates['low'], estimates['mode'], estimates['high']
+
+        complete = (wbs_df['completion_percentage'].fillna(0) / 100).clip(0, 1).to_numpy(dtype=float)
+        return {'cost_low': low, 'cost_mode': mode, 'cost_high': high, 'remaining_fraction': 1 - complete,
+                'actual_cost': total_actual, 'budget_at_completion': budget_at_completion}
+
+    def simulate(self, project_id, iterations=None, seed=None, workers=1, progress_callback=None, cancel_event=None):
+        """
+        Runs the Monte Carlo simulation for a project. Can run as a BackgroundJob target.
+        Args:
+            project_id (int): Project to simulate.
+            iterations (int, optional): Defaults to Config.RISK_DEFAULT_ITERATIONS.
+            seed (int, optional): Seed for a reproducible run; the summary reports the seed used.
+            workers (int): Processes to spread the batches over; results do not depend on it.
+        Returns:
+            tuple: (summary dict, message). The summary holds the P50/P80 finish dates, the
+                   probability of finishing by the project EndDate, P50/P80/mean EAC, the
+                   probability of finishing within budget (the WBS estimated cost), and the
+                   per-iteration 'finish_days' and 'eac' arrays. Empty if cancelled or the
+                   project has no tasks.
+        Raises:
+            AppValidationError: For a non-positive iteration count or a dependency cycle.
+        """
+        iterations = int(iterations or Config.RISK_DEFAULT_ITERATIONS)
+        if iterations < 1:
+            raise AppValidationError("Iterations must be a positive number.")
+        model = self._build_model(project_id)
+        if model is None:
+            return {}, f"Project {project_id} has no tasks to simulate."
+
+        task_count = len(model['floor'])
+        batch_size = max(1, min(Config.RISK_BATCH_SIZE, _MAX_BATCH_CELLS // task_count))
+        sizes = [batch_size] * (iterations // batch_size) + ([iterations % batch_size] if iterations % batch_size else [])
+        seed_sequence = np.random.SeedSequence(seed)
+        batch_seeds = seed_sequence.spawn(len(sizes))
+        worker_model = {key: value for key, value in model.items() if key not in ('calendar', 'anchor')}
+
+        results = [None] * len(sizes)
+        def report(done):
+            if progress_callback:
+                progress_callback("Simulating", f"{sum(sizes[:done])} of {iterations} iterations", done / len(sizes))
+        if workers > 1 and len(sizes) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(_simulate_batch, worker_model, batch_seed, size) for batch_seed, size in zip(batch_seeds, sizes)]
+                for b, future in enumerate(futures):
+                    if cancel_event is not None and cancel_event.is_set():
+                        for pending in futures:
+                            pending.cancel()
+                        return {}, "Simulation cancelled."
+                    results[b] = future.result()
+                    report(b + 1)
+        else:
+            for b, (batch_seed, size) in enumerate(zip(batch_seeds, sizes)):
+                if cancel_event is not None and cancel_event.is_set():
+                    return {}, "Simulation cancelled."
+                results[b] = _simulate_batch(worker_model, batch_seed, size)
+                report(b + 1)
+
+        # A finish of f working days occupies through day ceil(f); offsets count from the anchor
+        finish_days = np.ceil(np.concatenate([finish for finish, _ in results]) - 1e-9).astype(np.int64)
+        eac = np.concatenate([cost for _, cost in results])
+        calendar, anchor = model['calendar'], model['anchor']
+        def finish_date(days):
+            return str(calendar.offset(anchor, max(int(days) - 1, 0))[0])
+
+        p50_days, p80_days = np.quantile(finish_days, [0.5, 0.8], method='inverted_cdf')
+        project = self.db_manager.execute_query("SELECT EndDate FROM Projects WHERE ProjectID = ?", (project_id,), fetch_one=True)
+        contract_finish = project['EndDate'][:10] if project and project['EndDate'] else None
+        on_time_probability = None
+        if contract_finish:
+            contract_days = int(calendar.days_between(anchor, calendar.offset(contract_finish, 0, roll='backward'))[0]) + 1
+            on_time_probability = float((finish_days <= contract_days).mean())
+        budget = model['budget_at_completion']
+        p50_eac, p80_eac = np.quantile(eac, [0.5, 0.8])
+
+        summary = {
+            'project_id': project_id,
+            'iterations': iterations,
+            'seed': seed_sequence.entropy,
+            'deterministic_finish_date': finish_date(model['deterministic_finish']),
+            'p50_finish_date': finish_date(p50_days),
+            'p80_finish_date': finish_date(p80_days),
+            'contract_finish_date': contract_finish,
+            'on_time_probability': on_time_probability,
+            'budget_at_completion': budget,
+            'p50_eac': float(p50_eac),
+            'p80_eac': float(p80_eac),
+            'mean_eac': float(eac.mean()),
+            'on_budget_probability': float((eac <= budget).mean()) if budget is not None else None,
+            'finish_days': finish_days,
+            'eac': eac,
+        }
+        logger.info(f"Risk simulation for project {project_id}: {iterations} iterations, P80 finish {summary['p80_finish_date']}.")
+        return summary, f"Simulated {iterations} iterations; P50 finish {summary['p50_finish_date']}, P80 finish {summary['p80_finish_date']}."
+
+
+if __name__ == "__main__":
+    from database_manager import db_manager
+    simulator = RiskSimulator(db_manager)
+    summary, msg = simulator.simulate(1, seed=42)
+    print(msg)
+    for key, value in summary.items():
+        if key not in ('finish_days', 'eac'):
+            print(f"  {key}: {value}")
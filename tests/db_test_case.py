@@ -0,0 +1,172 @@
+import unittest
+import os
+import sys
+import sqlite3
+
+# Add the parent directory (project_management_system) to sys.path
+# to allow imports of modules like project_startup, database_manager, etc.
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from project_startup import ProjectStartup
+from database_manager import DatabaseManager
+from configuration import Config
+
+class DatabaseTestCase(unittest.TestCase):
+    """
+    Base class for tests that need a database: every subclass gets a fresh
+    test_project_data.db built from schema.sql, a ProjectStartup on it, and empty
+    Projects, wbs_elements and processed_estimates tables before each test.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        """
+        Set up for all tests in the subclass.
+        Use a dedicated test database.
+        """
+        cls.test_db_path = os.path.join(parent_dir, 'test_project_data.db')
+        Config.DATABASE_PATH = cls.test_db_path # Override config for DB path
+
+        # Ensure any existing test DB is removed for a clean start
+        if os.path.exists(cls.test_db_path):
+            os.remove(cls.test_db_path)
+
+        # Reset the global db_manager instance to use the new test_db_path
+        # This is a bit of a hack for singletons; cleaner ways might involve dependency injection
+        # or a configurable db_path in DatabaseManager itself.
+        DatabaseManager._instance = None
+        cls.db_manager = DatabaseManager() # This will initialize and apply schema to test_project_data.db
+
+        # ---- DEBUG code removed ----
+
+        cls.project_startup = ProjectStartup(cls.db_manager) # Pass the test-specific db_manager
+
+        # Pre-populate necessary lookup data if not handled by schema or if specific IDs are needed
+        # Example: Ensure 'Pending' status and a default customer exist.
+        # The schema.sql should already insert 'Pending' status.
+        # We need a customer for project creation due to NOT NULL constraint.
+        try:
+            cls.db_manager.execute_query(
+                "INSERT OR IGNORE INTO CustomerTypes (TypeName) VALUES ('TestType')", commit=True
+            )
+            cls.db_manager.execute_query(
+                "INSERT OR IGNORE INTO Customers (CustomerID, CustomerName, CustomerTypeID) VALUES (1, 'Test Customer', (SELECT CustomerTypeID FROM CustomerTypes WHERE TypeName = 'TestType'))",
+                commit=True
+            )
+            # Ensure 'Pending' status exists and get its ID
+            pending_status_row = cls.db_manager.execute_query("SELECT ProjectStatusID FROM ProjectStatuses WHERE StatusName = 'Pending'", fetch_one=True)
+            if not pending_status_row:
+                # This should not happen if schema.sql is correct and ran
+                raise Exception("Critical: 'Pending' status not found in test database after schema application.")
+            cls.pending_status_id = pending_status_row['ProjectStatusID']
+
+        except sqlite3.Error as e:
+            print(f"SQLite error during test setup: {e}")
+            # This might indicate schema.sql issues or other DB problems
+            # Depending on the error, you might want to fail the test suite here
+            raise
+        except Exception as e:
+            print(f"General error during test setup: {e}")
+            raise
+
+
+    @classmethod
+    def tearDownClass(cls):
+        """
+        Clean up after all tests in the subclass.
+        """
+        cls.db_manager.close_connection()
+        if os.path.exists(cls.test_db_path):
+            os.remove(cls.test_db_path)
+        # Restore original db_manager if necessary, though for isolated test runs it might not matter
+        DatabaseManager._instance = None
+        Config.DATABASE_PATH = os.path.join(parent_dir, 'project_data.db') # Restore original path
+        _ = DatabaseManager() # Re-initialize global one with original path
+
+    def setUp(self):
+        """
+        Set up before each test method.
+        Could be used to clean specific tables or reset state if needed between tests.
+        For now, assuming tearDownClass handles the main DB cleanup.
+        """
+        # logger is not defined in this scope, so commenting out direct logger calls for now.
+        # Will rely on print for debug or pass logger instance if needed.
+        # print(f"TEST_DEBUG: setUp: self.db_manager instance: {id(self.db_manager)}")
+        # print(f"TEST_DEBUG: setUp: self.project_startup.db_manager instance: {id(self.project_startup.db_manager)}")
+        self.assertIs(self.db_manager, self.project_startup.db_manager, "Test's db_manager and ProjectStartup's db_manager are not the same instance!")
+
+        # print("TEST_DEBUG: setUp: Attempting to clear Projects, wbs_elements, and processed_estimates before test.")
+        delete_projects_success = self.db_manager.execute_query("DELETE FROM Projects", commit=True)
+        delete_wbs_success = self.db_manager.execute_query("DELETE FROM wbs_elements", commit=True)
+        delete_processed_estimates_success = self.db_manager.execute_query("DELETE FROM processed_estimates", commit=True)
+
+        # print(f"TEST_DEBUG: setUp: DELETE FROM Projects result: {delete_projects_success}")
+        # print(f"TEST_DEBUG: setUp: DELETE FROM wbs_elements result: {delete_wbs_success}")
+        # print(f"TEST_DEBUG: setUp: DELETE FROM processed_estimates result: {delete_processed_estimates_success}")
+
+        self.assertTrue(delete_projects_success, "Failed to delete projects in setUp.")
+        self.assertTrue(delete_wbs_success, "Failed to delete WBS elements in setUp.")
+        self.assertTrue(delete_processed_estimates_success, "Failed to delete processed_estimates in setUp.")
+
+        project_count = self.db_manager.execute_query("SELECT COUNT(*) FROM Projects", fetch_one=True)[0]
+        # print(f"TEST_DEBUG: setUp: Project count after delete: {project_count}")
+        self.assertEqual(project_count, 0, "Projects table should be empty at start of test after setUp delete.")
+
+        wbs_count = self.db_manager.execute_query("SELECT COUNT(*) FROM wbs_elements", fetch_one=True)[0]
+        # print(f"TEST_DEBUG: setUp: WBS count after delete: {wbs_count}")
+        self.assertEqual(wbs_count, 0, "WBS elements table should be empty at start of test after setUp delete.")
+
+        processed_estimates_count = self.db_manager.execute_query("SELECT COUNT(*) FROM processed_estimates", fetch_one=True)[0]
+        # print(f"TEST_DEBUG: setUp: Processed Estimates count after delete: {processed_estimates_count}")
+        self.assertEqual(processed_estimates_count, 0, "Processed Estimates table should be empty at start of test after setUp delete.")
+
+    def tearDown(self):
+        """
+        Clean up after each test method.
+        Primary cleanup moved to setUp. This can be used for other specific post-test cleanup if needed.
+        """
+        pass
+
+    def _create_dummy_project(self, name="Dummy Project for WBS"):
+        """Helper to create a project and return its ID."""
+        from utils import calculate_end_date as calc_end_date_util
+        start_date = "2023-01-01"
+        duration_days = 10
+        end_date = calc_end_date_util(start_date, duration_days)
+        project_id, _ = self.project_startup.create_project(name, start_date, end_date, duration_days)
+        self.assertIsNotNone(project_id)
+        return project_id
+
+    def _create_dummy_wbs_element(self, project_id, wbs_code="WBS-001", description="Dummy WBS Item", estimated_cost=100.0, status="Planned"):
+        """Helper to insert a WBS element directly and return its ID."""
+        query = """
+        INSERT INTO wbs_elements (ProjectID, WBSCode, Description, EstimatedCost, Status)
+        VALUES (?, ?, ?, ?, ?)
+        """
+        success = self.db_manager.execute_query(query, (project_id, wbs_code, description, estimated_cost, status), commit=True)
+        self.assertTrue(success, "Failed to create dummy WBS element for test.")
+        wbs_id = self.db_manager.execute_query("SELECT last_insert_rowid()", fetch_one=True)[0]
+        self.assertIsNotNone(wbs_id)
+        return wbs_id
+
+    def _insert_dummy_processed_estimate(self, project_id=None, cost_code="CC1", description="Desc1", total_cost=100.0, raw_estimate_id=1):
+        """Helper to insert a processed estimate and return its ProcessedEstimateID."""
+        # Note: schema_sql for processed_estimates uses PascalCase for column names.
+        query = """
+        INSERT INTO processed_estimates (ProjectID, CostCode, Description, Quantity, Unit, UnitCost, TotalCost, Phase, RawEstimateID)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """
+        # Make Quantity and UnitCost consistent with TotalCost for this dummy data
+        quantity = 1.0
+        unit_cost = total_cost
+        unit = "LS"
+        phase = "TestPhase"
+
+        success = self.db_manager.execute_query(query, (project_id, cost_code, description, quantity, unit, unit_cost, total_cost, phase, raw_estimate_id), commit=True)
+        self.assertTrue(success, "Failed to insert dummy processed estimate.")
+        # Fetch ProcessedEstimateID (assuming it's an alias for rowid or an auto-incrementing PK)
+        # The actual PK name in schema.sql is ProcessedEstimateID
+        last_id = self.db_manager.execute_query("SELECT last_insert_rowid()", fetch_one=True)[0]
+        return last_id
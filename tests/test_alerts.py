@@ -0,0 +1,99 @@
+import unittest
+import os
+import sys
+
+# Add the parent directory (project_management_system) to sys.path
+# to allow imports of modules like project_startup, database_manager, etc.
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from tests.db_test_case import DatabaseTestCase
+from configuration import Config
+
+class TestAlerts(DatabaseTestCase):
+
+    def test_alerts_raised_deduplicated_and_resolved_on_writes(self):
+        from datetime import date, timedelta
+        from alerts import AlertEngine, RULE_CPI_LOW, RULE_WBS_OVER_BUDGET, RULE_CERTIFICATION_EXPIRING
+        from execution_management import ExecutionManagement
+        project_id, _ = self.project_startup.create_project("Alert Project", "2024-01-01", "2024-06-28", 5000)
+        wbs_id = self._create_dummy_wbs_element(project_id, wbs_code="AL-1", estimated_cost=2000.0)
+        engine = AlertEngine(self.db_manager)
+        execution = ExecutionManagement(self.db_manager, alert_engine_instance=engine)
+        today = date.today().isoformat()
+
+        execution.record_actual_cost(project_id, wbs_id, 'Labor', 'Crew', 2500, today)
+        alerts_df = engine.get_alerts(project_id).set_index('RuleName')
+        self.assertEqual(set(alerts_df.index), {RULE_CPI_LOW, RULE_WBS_OVER_BUDGET})
+        self.assertAlmostEqual(alerts_df.at[RULE_WBS_OVER_BUDGET, 'MetricValue'], 25.0)
+        self.assertEqual(len(engine.drain_notifications()), 2)
+
+        # A repeat updates the open alerts without announcing them again
+        execution.record_actual_cost(project_id, wbs_id, 'Labor', 'Crew', 100, today)
+        alerts_df = engine.get_alerts(project_id).set_index('RuleName')
+        self.assertEqual(len(alerts_df), 2)
+        self.assertEqual(alerts_df.at[RULE_WBS_OVER_BUDGET, 'OccurrenceCount'], 2)
+        self.assertEqual(engine.drain_notifications(), [])
+
+        # Finishing a second element earns its budget: CPI recovers past the threshold and the alert resolves
+        finished_id = self._create_dummy_wbs_element(project_id, wbs_code="AL-2", estimated_cost=3000.0)
+        success, _ = execution.record_progress_update(project_id, wbs_id, 100, today)
+        self.assertTrue(success)
+        self.assertIn(RULE_CPI_LOW, engine.get_alerts(project_id)['RuleName'].tolist())
+        execution.record_progress_update(project_id, finished_id, 100, today)
+        self.assertEqual(engine.get_alerts(project_id)['RuleName'].tolist(), [RULE_WBS_OVER_BUDGET])
+        resolved = engine.get_alerts(project_id, include_resolved=True).set_index('RuleName')
+        self.assertEqual(resolved.at[RULE_CPI_LOW, 'Status'], 'Resolved')
+
+        engine.drain_notifications()
+
+        cursor = self.db_manager.execute_query(
+            "INSERT INTO Employees (FirstName, LastName) VALUES ('Alert', 'Tester')", commit=True)
+        employee_id = cursor.lastrowid
+        self.db_manager.execute_query(
+            "INSERT INTO EmployeeCertifications (EmployeeID, CertificationTypeID, ExpiryDate) "
+            "VALUES (?, (SELECT CertificationTypeID FROM CertificationTypes WHERE Name = 'OSHA 30'), ?)",
+            (employee_id, (date.today() + timedelta(days=10)).isoformat()), commit=True)
+        notified = engine.evaluate_daily_log(project_id, employee_id)
+        self.assertEqual([alert['RuleName'] for alert in notified], [RULE_CERTIFICATION_EXPIRING])
+        self.assertIn("OSHA 30", engine.drain_notifications()[0])
+
+        # Past the per-minute limit, notifications are held back and counted into the next one
+        original_limit = Config.ALERT_MAX_NOTIFICATIONS_PER_MINUTE
+        Config.ALERT_MAX_NOTIFICATIONS_PER_MINUTE = 2
+        try:
+            limited = AlertEngine(self.db_manager)
+            for alert_id in range(4):
+                limited._notify({'Severity': 'warning', 'Message': f"Alert {alert_id}"})
+            self.assertEqual(limited.drain_notifications(), ["[WARNING] Alert 0", "[WARNING] Alert 1"])
+            limited._recent_notifications.clear()
+            limited._notify({'Severity': 'warning', 'Message': "Alert 4"})
+            self.assertEqual(limited.drain_notifications(), ["[WARNING] Alert 4 (+2 more alerts)"])
+        finally:
+            Config.ALERT_MAX_NOTIFICATIONS_PER_MINUTE = original_limit
+
+    def test_cpi_alert_counts_spend_on_retired_elements(self):
+        from datetime import date
+        from alerts import AlertEngine, RULE_CPI_LOW
+        from execution_management import ExecutionManagement
+        project_id, _ = self.project_startup.create_project("Retired Alert Project", "2024-01-01", "2024-06-28", 2000)
+        live_id = self._create_dummy_wbs_element(project_id, wbs_code="AR-1", estimated_cost=2000.0)
+        retired_id = self._create_dummy_wbs_element(project_id, wbs_code="AR-2", estimated_cost=10000.0)
+        engine = AlertEngine(self.db_manager)
+        execution = ExecutionManagement(self.db_manager, alert_engine_instance=engine)
+        today = date.today().isoformat()
+        execution.record_progress_update(project_id, live_id, 100, today)
+        execution.record_progress_update(project_id, retired_id, 100, today)
+        self.db_manager.execute_query("UPDATE wbs_elements SET Status = 'Retired' WHERE WBSElementID = ?", (retired_id,), commit=True)
+
+        # A Retired element earns nothing, but what was spent on it stays in the project's actual cost:
+        # EV 2,000 over AC 3,000 puts CPI at 0.67
+        self.assertTrue(execution.record_actual_cost(project_id, retired_id, 'Labor', 'Crew', 3000, today)[0])
+        alerts_df = engine.get_alerts(project_id).set_index('RuleName')
+        self.assertEqual(list(alerts_df.index), [RULE_CPI_LOW])
+        self.assertAlmostEqual(alerts_df.at[RULE_CPI_LOW, 'MetricValue'], 2000 / 3000)
+
+
+if __name__ == '__main__':
+    unittest.main()
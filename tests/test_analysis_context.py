@@ -0,0 +1,57 @@
+import unittest
+import os
+import sys
+
+# Add the parent directory (project_management_system) to sys.path
+# to allow imports of modules like project_startup, database_manager, etc.
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from tests.db_test_case import DatabaseTestCase
+
+class TestAnalysisContext(DatabaseTestCase):
+
+    def test_analysis_context_fetches_each_dataset_once_per_report(self):
+        from unittest import mock
+        from reporting import Reporting
+        from datetime import date, timedelta
+        start, end = (date.today() - timedelta(days=10)).isoformat(), (date.today() + timedelta(days=10)).isoformat()
+        project_id, _ = self.project_startup.create_project("Context Project", start, end, 2000)
+        wbs_id = self._create_dummy_wbs_element(project_id, wbs_code="CTX-1", estimated_cost=2000.0)
+        self.db_manager.execute_query(
+            "INSERT INTO actual_costs (ProjectID, WBSElementID, CostCategory, Description, Amount, TransactionDate) VALUES (?, ?, 'Labor', 'Crew', 600, ?)",
+            (project_id, wbs_id, start), commit=True
+        )
+        self.db_manager.execute_query(
+            "INSERT INTO progress_updates (ProjectID, WBSElementID, CompletionPercentage, UpdateDate) VALUES (?, ?, 25, ?)",
+            (project_id, wbs_id, start), commit=True
+        )
+        reporting = Reporting(self.db_manager)
+        monitor = reporting.monitor_control
+        uncached_summary, _ = monitor.get_project_summary_performance(project_id, monitor.create_analysis_context(project_id))
+
+        queries = []
+        original_execute = self.db_manager.execute_query
+        def counting_execute(query, *args, **kwargs):
+            queries.append(query)
+            return original_execute(query, *args, **kwargs)
+        with mock.patch.object(self.db_manager, 'execute_query', side_effect=counting_execute):
+            report_text, success, _ = reporting.generate_performance_report(project_id)
+        self.assertTrue(success)
+        self.assertEqual(sum('LEFT JOIN wbs_actual_rollups' in query for query in queries), 1)
+        self.assertIn("Cost Performance Index Cpi: 0.83", report_text)
+
+        context = monitor.create_analysis_context(project_id)
+        summary, _ = monitor.get_project_summary_performance(project_id, context)
+        self.assertEqual(summary['total_earned_value'], uncached_summary['total_earned_value'])
+        self.db_manager.execute_query("UPDATE progress_updates SET CompletionPercentage = 50 WHERE ProjectID = ?", (project_id,), commit=True)
+        self.assertEqual(monitor.get_project_summary_performance(project_id, context)[0]['total_earned_value'], 500.0)
+        self.assertTrue(context.refresh())
+        self.assertEqual(monitor.get_project_summary_performance(project_id, context)[0]['total_earned_value'], 1000.0)
+        with self.assertRaises(ValueError):
+            monitor.analyze_cost_variance(project_id + 1, context)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+import os
+import sys
+
+# Add the parent directory (project_management_system) to sys.path
+# to allow imports of modules like project_startup, database_manager, etc.
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from tests.db_test_case import DatabaseTestCase
+
+class TestCostAnomalies(DatabaseTestCase):
+
+    def test_cost_anomalies_flag_outliers_and_duplicates_incrementally(self):
+        from cost_anomalies import CostAnomalyDetector, ANOMALY_OUTLIER, ANOMALY_DUPLICATE, REVIEW_DISMISSED
+        from execution_management import ExecutionManagement
+        project_id, _ = self.project_startup.create_project("Anomaly Project", "2024-01-01", "2024-06-28", 50000)
+        wbs_id = self._create_dummy_wbs_element(project_id, wbs_code="AN-1", estimated_cost=40000.0)
+        vendor_id = self.db_manager.execute_query("INSERT INTO Vendors (VendorName) VALUES ('Anomaly Supply')", commit=True).lastrowid
+        execution = ExecutionManagement(self.db_manager)
+        for day, amount in enumerate((100, 110, 120, 105, 115, 130, 95, 125, 100, 118), start=1):
+            execution.record_actual_cost(project_id, wbs_id, 'Anomaly Material', 'Wire', amount, f"2024-02-{day:02d}", vendor_id)
+        execution.record_actual_cost(project_id, wbs_id, 'Anomaly Material', 'Wire (typo)', 11500, "2024-02-11", vendor_id)
+        execution.record_actual_cost(project_id, wbs_id, 'Anomaly Material', 'Conduit', 112.40, "2024-02-12", vendor_id)
+        execution.record_actual_cost(project_id, wbs_id, 'Anomaly Material', 'Conduit (re-sent invoice)', 112.40, "2024-02-15", vendor_id)
+        execution.record_actual_cost(project_id, wbs_id, 'Anomaly Material', 'Conduit', 112.40, "2024-03-20", vendor_id)
+        detector = CostAnomalyDetector(self.db_manager)
+
+        result, _ = detector.scan(incremental=False)
+        queue_df = detector.get_review_queue(project_id)
+        self.assertEqual(queue_df['AnomalyType'].tolist(), [ANOMALY_DUPLICATE, ANOMALY_OUTLIER])
+        duplicate, outlier = queue_df.iloc[0], queue_df.iloc[1]
+        self.assertEqual((duplicate['Description'], duplicate['TransactionDate'], duplicate['Score']), ('Conduit (re-sent invoice)', '2024-02-15', 3.0))
+        self.assertEqual(duplicate['VendorName'], 'Anomaly Supply')
+        self.assertEqual(outlier['Amount'], 11500)
+        self.assertGreater(outlier['Score'], 3.5)
+
+        result, message = detector.scan()
+        self.assertEqual((result['new'], message), (0, "No new costs to scan."))
+        # Incremental: only the new posting is flagged; reviewed flags stay as reviewed
+        self.assertTrue(detector.review_anomaly(int(outlier['AnomalyID']), REVIEW_DISMISSED, 'pm', 'Bulk order')[0])
+        execution.record_actual_cost(project_id, wbs_id, 'Anomaly Material', 'Wire', 118, "2024-02-17", vendor_id)
+        result, _ = detector.scan()
+        self.assertEqual((result['new'], result['duplicates'], result['outliers']), (1, 1, 0))
+        queue_df = detector.get_review_queue(project_id)
+        self.assertEqual(len(queue_df), 2)
+        self.assertEqual(queue_df['TransactionDate'].tolist(), ['2024-02-17', '2024-02-15']) # Larger amounts first
+        detector.scan(incremental=False)
+        reviewed = detector.get_review_queue(project_id, include_reviewed=True).set_index('AnomalyID')
+        self.assertEqual(reviewed.at[int(outlier['AnomalyID']), 'ReviewStatus'], REVIEW_DISMISSED)
+        self.assertFalse(detector.review_anomaly(int(outlier['AnomalyID']), 'Ignored')[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
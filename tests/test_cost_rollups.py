@@ -0,0 +1,68 @@
+import unittest
+import os
+import sys
+
+# Add the parent directory (project_management_system) to sys.path
+# to allow imports of modules like project_startup, database_manager, etc.
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from tests.db_test_case import DatabaseTestCase
+
+class TestCostRollups(DatabaseTestCase):
+
+    def test_cost_rollups_follow_source_changes_and_rebuild(self):
+        from cost_rollups import CostRollupManager
+        project_id, _ = self.project_startup.create_project("Rollup Project", "2025-03-03", "2025-03-14", 3000)
+        first = self._create_dummy_wbs_element(project_id, wbs_code="C-1", estimated_cost=1000.0)
+        second = self._create_dummy_wbs_element(project_id, wbs_code="C-2", estimated_cost=2000.0)
+        def add_cost(wbs_id, amount, day='2025-03-05'):
+            return self.db_manager.execute_query(
+                "INSERT INTO actual_costs (ProjectID, WBSElementID, CostCategory, Description, Amount, TransactionDate) VALUES (?, ?, 'Labor', 'Crew', ?, ?)",
+                (project_id, wbs_id, amount, day), commit=True
+            ).lastrowid
+        def add_progress(wbs_id, completion, day):
+            return self.db_manager.execute_query(
+                "INSERT INTO progress_updates (ProjectID, WBSElementID, CompletionPercentage, UpdateDate) VALUES (?, ?, ?, ?)",
+                (project_id, wbs_id, completion, day), commit=True
+            ).lastrowid
+        def wbs_rollup(wbs_id):
+            return self.db_manager.execute_query(
+                "SELECT TotalActualCost, CostEntryCount, CompletionPercentage FROM wbs_actual_rollups WHERE ProjectID = ? AND WBSElementID = ?",
+                (project_id, wbs_id), fetch_one=True
+            )
+        moved = add_cost(first, 300)
+        add_cost(first, 200)
+        add_cost(None, 75)
+        add_progress(first, 30, '2025-03-04')
+        latest = add_progress(first, 60, '2025-03-06')
+        add_progress(first, 50, '2025-03-05')  # Recorded late for an earlier day; not the latest
+        self.assertEqual(tuple(wbs_rollup(first)), (500.0, 2, 60.0))
+        self.assertEqual(tuple(wbs_rollup(0)), (75.0, 1, None))
+        daily = self.db_manager.execute_query(
+            "SELECT TotalAmount, EntryCount FROM cost_daily_rollups WHERE ProjectID = ? AND WBSElementID = ?", (project_id, first), fetch_all=True)
+        self.assertEqual([tuple(row) for row in daily], [(500.0, 2)])
+
+        self.db_manager.execute_query("UPDATE actual_costs SET WBSElementID = ?, Amount = 350 WHERE ActualCostID = ?", (second, moved), commit=True)
+        self.db_manager.execute_query("DELETE FROM progress_updates WHERE ProgressUpdateID = ?", (latest,), commit=True)
+        self.assertEqual(tuple(wbs_rollup(first)), (200.0, 1, 50.0))
+        self.assertEqual(tuple(wbs_rollup(second)), (350.0, 1, None))
+        self.db_manager.execute_query("DELETE FROM actual_costs WHERE ActualCostID = ?", (moved,), commit=True)
+        self.assertIsNone(wbs_rollup(second))
+
+        manager = CostRollupManager(self.db_manager)
+        mismatches, _ = manager.verify_rollups(project_id)
+        self.assertTrue(mismatches.empty)
+        self.db_manager.execute_query("UPDATE wbs_actual_rollups SET TotalActualCost = 999 WHERE ProjectID = ? AND WBSElementID = ?",
+                                      (project_id, first), commit=True)
+        mismatches, _ = manager.verify_rollups(project_id)
+        self.assertEqual(sorted(mismatches['Side']), ['expected', 'stored'])
+        success, _ = manager.rebuild_rollups(project_id)
+        self.assertTrue(success)
+        self.assertTrue(manager.verify_rollups(project_id)[0].empty)
+        self.assertEqual(tuple(wbs_rollup(first)), (200.0, 1, 50.0))
+
+
+if __name__ == '__main__':
+    unittest.main()
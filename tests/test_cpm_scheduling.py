@@ -0,0 +1,83 @@
+import unittest
+import os
+import sys
+
+# Add the parent directory (project_management_system) to sys.path
+# to allow imports of modules like project_startup, database_manager, etc.
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from tests.db_test_case import DatabaseTestCase
+
+class TestCPMScheduling(DatabaseTestCase):
+
+    def test_cpm_schedule_float_critical_path_and_incremental_update(self):
+        from cpm_scheduling import CPMScheduler
+        from execution_management import ExecutionManagement
+        from exceptions import AppValidationError
+        project_id, _ = self.project_startup.create_project("CPM Project", "2025-03-03", "2025-03-31", 20)
+        cpm = CPMScheduler(self.db_manager)
+
+        def add_task(name, hours, predecessor_id=None):
+            return self.db_manager.execute_query(
+                "INSERT INTO Tasks (ProjectID, TaskName, TaskType, Description, EstimatedHours, PredecessorTaskID) "
+                "VALUES (?, ?, 'Work', ?, ?, ?)", (project_id, name, name, hours, predecessor_id), commit=True
+            ).lastrowid
+        a = add_task("A", 16)
+        b = add_task("B", 24, predecessor_id=a) # PredecessorTaskID becomes an FS dependency
+        c = add_task("C", 8)
+        d = add_task("D", 16)
+        # Planner-entered dates: one day, wherever A lets it start; a task with float keeps them
+        e = self.db_manager.execute_query(
+            "INSERT INTO Tasks (ProjectID, TaskName, TaskType, Description, ScheduledStartDate, ScheduledEndDate, PredecessorTaskID) "
+            "VALUES (?, 'E', 'Work', 'E', '2025-03-12', '2025-03-12', ?)", (project_id, a), commit=True
+        ).lastrowid
+        self.assertEqual([(r['PredecessorTaskID'], r['SuccessorTaskID'], r['DependencyType']) for r in cpm.get_task_dependencies(project_id)],
+                         [(a, b, 'FS'), (a, e, 'FS')])
+        dependency_id, _ = cpm.add_dependency(a, c, 'SS', lag_days=2)
+        # Re-linking updates the existing row and reports its ID
+        self.assertEqual(cpm.add_dependency(a, c, 'SS', lag_days=1)[0], dependency_id)
+        cpm.add_dependency(b, d, 'FF')
+        cpm.add_dependency(c, d)
+
+        results, _ = cpm.calculate_schedule(project_id)
+        by_task = results.set_index('TaskID')
+        self.assertEqual(list(by_task.loc[[a, b, c, d], 'EarlyStart']), ['2025-03-03', '2025-03-05', '2025-03-04', '2025-03-06'])
+        self.assertEqual(list(by_task.loc[[a, b, c, d], 'EarlyFinish']), ['2025-03-04', '2025-03-07', '2025-03-04', '2025-03-07'])
+        self.assertEqual(list(by_task.loc[[a, b, c, d], 'TotalFloat']), [0, 0, 1, 0])
+        self.assertEqual((by_task.at[e, 'EarlyStart'], by_task.at[e, 'TotalFloat']), ('2025-03-05', 2))
+        self.assertEqual(cpm.get_critical_path(project_id), [a, b, d])
+        row = self.db_manager.execute_query("SELECT ScheduledStartDate, ScheduledEndDate FROM Tasks WHERE TaskID = ?", (e,), fetch_one=True)
+        self.assertEqual((row['ScheduledStartDate'], row['ScheduledEndDate']), ('2025-03-12', '2025-03-12'))
+        with self.assertRaises(AppValidationError):
+            cpm.add_dependency(d, a)
+
+        # Stretching C through the execution module pushes D over the weekend and makes C critical
+        success, _ = ExecutionManagement(self.db_manager, cpm_scheduler_instance=cpm).update_task_schedule(c, new_end_date='2025-03-06')
+        self.assertTrue(success)
+        incremental, _ = cpm.calculate_schedule(project_id, persist=False)
+        self.assertTrue(incremental.equals(CPMScheduler(self.db_manager).calculate_schedule(project_id, persist=False)[0]))
+        self.assertEqual(cpm.get_critical_path(project_id), [a, c, d])
+        # CPM dates go to TaskCPMResults; only the task that was changed gets new scheduled dates
+        row = self.db_manager.execute_query("SELECT EarlyStart, EarlyFinish FROM TaskCPMResults WHERE TaskID = ?", (d,), fetch_one=True)
+        self.assertEqual((row['EarlyStart'], row['EarlyFinish']), ('2025-03-07', '2025-03-10'))
+        rows = self.db_manager.execute_query(
+            "SELECT TaskID, ScheduledStartDate, ScheduledEndDate FROM Tasks WHERE TaskID IN (?, ?) ORDER BY TaskID", (c, d), fetch_all=True)
+        self.assertEqual([tuple(row) for row in rows], [(c, '2025-03-04', '2025-03-06'), (d, None, None)])
+
+        # A milestone given a finish on its start day stays a zero-day milestone
+        milestone = self.db_manager.execute_query(
+            "INSERT INTO Tasks (ProjectID, TaskName, TaskType, Description, EstimatedHours, PredecessorTaskID) "
+            "VALUES (?, 'Handover', 'Milestone', 'Handover', 0, ?)", (project_id, d), commit=True
+        ).lastrowid
+        results, _ = cpm.calculate_schedule(project_id)
+        handover = results.set_index('TaskID').loc[milestone]
+        self.assertEqual((handover['EarlyStart'], handover['DurationDays']), ('2025-03-11', 0))
+        cpm.update_task_dates(milestone, end_date='2025-03-11')
+        results, _ = CPMScheduler(self.db_manager).calculate_schedule(project_id, persist=False)
+        self.assertEqual(results.set_index('TaskID').at[milestone, 'DurationDays'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+import os
+import sys
+
+# Add the parent directory (project_management_system) to sys.path
+# to allow imports of modules like project_startup, database_manager, etc.
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from tests.db_test_case import DatabaseTestCase
+
+class TestEarnedValue(DatabaseTestCase):
+
+    def test_earned_value_time_phased_planned_value_and_cache(self):
+        from earned_value import EarnedValueEngine
+        from monitoring_control import MonitoringControl
+        project_id, _ = self.project_startup.create_project("EVM Project", "2025-03-03", "2025-03-14", 3500)
+        def add_wbs(code, cost, start=None, end=None, curve=None):
+            return self.db_manager.execute_query(
+                "INSERT INTO wbs_elements (ProjectID, WBSCode, Description, EstimatedCost, StartDate, EndDate, SpreadCurve) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (project_id, code, code, cost, start, end, curve), commit=True
+            ).lastrowid
+        first = add_wbs("E-1", 1000, "2025-03-03", "2025-03-07")
+        add_wbs("E-2", 2000, "2025-03-10", "2025-03-14", "back")
+        add_wbs("E-3", 500)  # Undated: spread over the project dates
+        self.db_manager.execute_query(
+            "INSERT INTO actual_costs (ProjectID, WBSElementID, CostCategory, Description, Amount, TransactionDate) VALUES (?, ?, 'Labor', 'Crew', 700, '2025-03-05')",
+            (project_id, first), commit=True
+        )
+        for update_date, completion in (('2025-03-04', 20), ('2025-03-06', 50), ('2025-03-06', 60)):
+            self.db_manager.execute_query(
+                "INSERT INTO progress_updates (ProjectID, WBSElementID, CompletionPercentage, UpdateDate) VALUES (?, ?, ?, ?)",
+                (project_id, first, completion, update_date), commit=True
+            )
+        engine = EarnedValueEngine(self.db_manager)
+
+        wbs = engine.get_wbs_performance(project_id, '2025-03-06').set_index('wbs_code')
+        self.assertEqual(list(wbs['planned_value']), [800.0, 0.0, 200.0])
+        self.assertEqual((wbs.at['E-1', 'earned_value'], wbs.at['E-1', 'actual_cost']), (600.0, 700.0))
+        self.assertAlmostEqual(wbs.at['E-1', 'spi'], 0.75)
+        # Back-loaded: 3 of 5 working days planned = (3/5)^2 of the budget
+        project = engine.get_project_performance(project_id, '2025-03-12')
+        self.assertEqual((project['planned_value'], project['earned_value']), (1000 + 720 + 400, 600.0))
+        self.assertEqual(engine.get_project_performance(project_id, '2025-02-28')['planned_value'], 0.0)
+
+        # Unassigned cost lands in project AC once the cache notices the change
+        self.db_manager.execute_query(
+            "INSERT INTO actual_costs (ProjectID, WBSElementID, CostCategory, Description, Amount, TransactionDate) VALUES (?, NULL, 'Other', 'Permit', 50, '2025-03-06')",
+            (project_id,), commit=True
+        )
+        self.assertEqual(engine.get_project_performance(project_id, '2025-03-12')['actual_cost'], 750.0)
+        weekly = engine.get_time_series(project_id, frequency='W')
+        self.assertEqual(list(weekly['planned_value']), [1250.0, 3500.0])
+
+        schedule_df, _ = MonitoringControl(self.db_manager, earned_value_instance=engine).analyze_schedule_variance(project_id, '2025-03-06')
+        self.assertEqual(schedule_df.set_index('wbs_code').at['E-1', 'planned_value'], 800.0)
+
+        # Cached cubes are bounded; the least recently used project is dropped first
+        from earned_value import _MAX_CACHED_CUBES
+        others = [self.project_startup.create_project(f"EVM Cache {i}", "2025-03-03", "2025-03-14")[0]
+                  for i in range(_MAX_CACHED_CUBES)]
+        for other in others:
+            engine.get_project_performance(other, '2025-03-06')
+        self.assertEqual(list(engine._cubes), others)
+        engine.get_project_performance(others[0], '2025-03-06')
+        engine.get_project_performance(project_id, '2025-03-06')
+        self.assertEqual(list(engine._cubes), others[2:] + [others[0], project_id])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+import os
+import sys
+import pandas as pd
+
+# Add the parent directory (project_management_system) to sys.path
+# to allow imports of modules like project_startup, database_manager, etc.
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from tests.db_test_case import DatabaseTestCase
+
+class TestEvmSnapshots(DatabaseTestCase):
+
+    def test_evm_snapshots_capture_incrementally_and_serve_trends(self):
+        from earned_value import EarnedValueEngine
+        from evm_snapshots import EvmSnapshotManager
+        project_id, _ = self.project_startup.create_project("Snapshot Project", "2024-01-01", "2024-03-29", 1000)
+        wbs_id = self._create_dummy_wbs_element(project_id, wbs_code="SN-1", estimated_cost=1000.0)
+        self.db_manager.execute_query(
+            "INSERT INTO actual_costs (ProjectID, WBSElementID, CostCategory, Description, Amount, TransactionDate) VALUES (?, ?, 'Labor', 'Crew', 150, '2024-01-10')",
+            (project_id, wbs_id), commit=True
+        )
+        self.db_manager.execute_query(
+            "INSERT INTO progress_updates (ProjectID, WBSElementID, CompletionPercentage, UpdateDate) VALUES (?, ?, 20, '2024-01-24')",
+            (project_id, wbs_id), commit=True
+        )
+        engine = EarnedValueEngine(self.db_manager)
+        snapshots = EvmSnapshotManager(self.db_manager, earned_value_instance=engine)
+
+        result, _ = snapshots.capture_snapshots([project_id], as_of_date="2024-02-14")
+        self.assertEqual(result['captured'], 1)
+        trend = snapshots.get_trend(project_id)
+        # Weeks ending Sunday from the project's first day through the current week (measured as of the 14th)
+        self.assertEqual([d.strftime('%m-%d') for d in trend.index], ['01-07', '01-14', '01-21', '01-28', '02-04', '02-11', '02-18'])
+        expected = engine.get_project_performance(project_id, "2024-01-28")
+        self.assertAlmostEqual(trend.at[pd.Timestamp("2024-01-28"), 'planned_value'], expected['planned_value'])
+        self.assertEqual(trend.loc["2024-01-28", ['earned_value', 'actual_cost']].tolist(), [200.0, 150.0])
+        self.assertAlmostEqual(trend['cpi'].iloc[-1], 200.0 / 150.0)
+        self.assertAlmostEqual(trend['planned_value'].iloc[-1], engine.get_project_performance(project_id, "2024-02-14")['planned_value'])
+        self.assertEqual(len(snapshots.get_trend(project_id, wbs_element_id=wbs_id, periods=3)), 3)
+
+        result, _ = snapshots.capture_snapshots([project_id], as_of_date="2024-02-14")
+        self.assertEqual((result['captured'], result['skipped']), (0, 1))
+        self.db_manager.execute_query(
+            "INSERT INTO actual_costs (ProjectID, WBSElementID, CostCategory, Description, Amount, TransactionDate) VALUES (?, ?, 'Labor', 'Crew', 50, '2024-01-03')",
+            (project_id, wbs_id), commit=True
+        )
+        # Next week: the last captured week is finalized, older weeks keep what was known when they were captured
+        result, _ = snapshots.capture_snapshots([project_id], as_of_date="2024-02-21")
+        self.assertEqual(result['captured'], 1)
+        trend = snapshots.get_trend(project_id)
+        self.assertEqual(trend.index[-1], pd.Timestamp("2024-02-25"))
+        self.assertEqual(trend.loc["2024-01-28", 'actual_cost'], 150.0)
+        self.assertEqual(trend.loc["2024-02-18", 'actual_cost'], 200.0)
+        self.assertAlmostEqual(trend.loc["2024-02-18", 'planned_value'], engine.get_project_performance(project_id, "2024-02-18")['planned_value'])
+        portfolio_trend = snapshots.get_portfolio_trend([project_id], periods=2)
+        self.assertEqual(portfolio_trend['actual_cost'].tolist(), [200.0, 200.0])
+
+
+if __name__ == '__main__':
+    unittest.main()
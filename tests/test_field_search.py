@@ -0,0 +1,76 @@
+import unittest
+import os
+import sys
+
+# Add the parent directory (project_management_system) to sys.path
+# to allow imports of modules like project_startup, database_manager, etc.
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from tests.db_test_case import DatabaseTestCase
+
+class TestFieldSearch(DatabaseTestCase):
+
+    def test_field_search_across_sources_with_filters_and_paging(self):
+        from field_search import FieldSearch
+        search = FieldSearch(self.db_manager)
+        project_a = self._create_dummy_project("Search Project A")
+        project_b = self._create_dummy_project("Search Project B")
+        employee_id = self.db_manager.execute_query(
+            "INSERT INTO Employees (FirstName, LastName) VALUES ('Field', 'Search')", commit=True
+        ).lastrowid
+        log_id = self.db_manager.execute_query(
+            "INSERT INTO DailyLogs (EmployeeID, ProjectID, LogDate, Notes) VALUES (?, ?, '2025-04-02', 'Water in the east trench again')",
+            (employee_id, project_a), commit=True
+        ).lastrowid
+        self.db_manager.execute_query(
+            "INSERT INTO DailyLogTasks (DailyLogID, TaskDescription) VALUES (?, 'Pumped trench and pulled feeder')", (log_id,), commit=True
+        )
+        self.db_manager.execute_query(
+            "INSERT INTO LLM_Parsed_Data_Log (SourceModule, SourceRecordID, OriginalInput, ParsedJSON) "
+            "VALUES ('DailyLog_IssuesBlockers', ?, 'Trench shoring inspection failed', '{}')", (log_id,), commit=True
+        )
+        document_id = self.db_manager.execute_query(
+            "INSERT INTO ProjectDocuments (ProjectID, DocumentName, FilePath) VALUES (?, 'E-201', 'e201.pdf')", (project_b,), commit=True
+        ).lastrowid
+        self.db_manager.execute_query(
+            "INSERT INTO document_notes (document_id, page_number, note_text, created_at) VALUES (?, 3, 'Trench detail conflicts with civil', '2025-05-10 08:00:00')",
+            (document_id,), commit=True
+        )
+
+        results, next_cursor = search.search("trench")
+        self.assertIsNone(next_cursor)
+        self.assertEqual({(r['SourceType'], r['ProjectID']) for r in results},
+                         {('DailyLog', project_a), ('DailyLogTask', project_a), ('LLMParse', project_a), ('DocumentNote', project_b)})
+        note = next(r for r in results if r['SourceType'] == 'DocumentNote')
+        self.assertEqual((note['Title'], note['EntryDate']), ('E-201 p. 3', '2025-05-10'))
+        self.assertIn('[Trench]', note['Snippet'])
+
+        # Project and date filters, prefixes and phrases
+        self.assertEqual(len(search.search("trench", project_id=project_a)[0]), 3)
+        self.assertEqual([r['SourceType'] for r in search.search("trench", start_date='2025-05-01')[0]], ['DocumentNote'])
+        self.assertEqual([r['SourceType'] for r in search.search('"pulled feed"')[0]], [])
+        self.assertEqual([r['SourceType'] for r in search.search('pump "pulled feeder"')[0]], ['DailyLogTask'])
+
+        # Cursor paging returns every match exactly once, best first
+        pages, cursor = [], None
+        while True:
+            page, cursor = search.search("trench", page_size=1, cursor=cursor)
+            pages.extend(page)
+            if not cursor:
+                break
+        self.assertEqual([r['EntryID'] for r in pages], [r['EntryID'] for r in results])
+        self.assertEqual([r['Rank'] for r in pages], sorted(r['Rank'] for r in pages))
+
+        # Edits and deletes flow through the triggers; moving a log moves its tasks and parses too
+        self.db_manager.execute_query("UPDATE DailyLogs SET ProjectID = ?, Notes = 'Dry today' WHERE DailyLogID = ?",
+                                      (project_b, log_id), commit=True)
+        self.assertEqual({r['SourceType'] for r in search.search("trench", project_id=project_b)[0]},
+                         {'DailyLogTask', 'LLMParse', 'DocumentNote'})
+        self.db_manager.execute_query("DELETE FROM document_notes WHERE document_id = ?", (document_id,), commit=True)
+        self.assertEqual(len(search.search("trench")[0]), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
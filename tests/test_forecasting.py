@@ -0,0 +1,66 @@
+import unittest
+import os
+import sys
+
+# Add the parent directory (project_management_system) to sys.path
+# to allow imports of modules like project_startup, database_manager, etc.
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from tests.db_test_case import DatabaseTestCase
+
+class TestForecasting(DatabaseTestCase):
+
+    def test_forecast_eac_methods_and_overrun_flags_from_snapshots(self):
+        from forecasting import CostForecaster
+        project_id, _ = self.project_startup.create_project("Forecast Project", "2024-01-01", "2024-06-28", 30000)
+        over = self._create_dummy_wbs_element(project_id, wbs_code="FC-1", estimated_cost=10000.0)
+        on_budget = self._create_dummy_wbs_element(project_id, wbs_code="FC-2", estimated_cost=20000.0)
+        for week, day in enumerate(("2024-01-05", "2024-01-12", "2024-01-19", "2024-01-26"), start=1):
+            self.db_manager.execute_query(
+                "INSERT INTO actual_costs (ProjectID, WBSElementID, CostCategory, Description, Amount, TransactionDate) VALUES (?, ?, 'Labor', 'Crew', 1500, ?)",
+                (project_id, over, day), commit=True
+            )
+            self.db_manager.execute_query(
+                "INSERT INTO progress_updates (ProjectID, WBSElementID, CompletionPercentage, UpdateDate) VALUES (?, ?, ?, ?)",
+                (project_id, over, week * 10, day), commit=True
+            )
+        self.db_manager.execute_query(
+            "INSERT INTO actual_costs (ProjectID, WBSElementID, CostCategory, Description, Amount, TransactionDate) VALUES (?, ?, 'Labor', 'Crew', 10000, '2024-01-26')",
+            (project_id, on_budget), commit=True
+        )
+        self.db_manager.execute_query(
+            "INSERT INTO progress_updates (ProjectID, WBSElementID, CompletionPercentage, UpdateDate) VALUES (?, ?, 50, '2024-01-26')",
+            (project_id, on_budget), commit=True
+        )
+        forecaster = CostForecaster(self.db_manager)
+        forecaster.snapshots.capture_snapshots([project_id], as_of_date="2024-01-28")
+
+        forecast_df, _ = forecaster.forecast([project_id], capture=False)
+        rows = forecast_df.set_index('WBSElementID')
+        # Cost has run at 1.5x earned value every week: every method forecasts 1.5x the budget
+        self.assertAlmostEqual(rows.at[over, 'EAC_CPI'], 15000.0)
+        self.assertAlmostEqual(rows.at[over, 'EAC_Regression'], 15000.0)
+        self.assertAlmostEqual(rows.at[over, 'EstimateToComplete'], 9000.0)
+        self.assertEqual(rows.at[over, 'OverrunFlag'], 'critical')
+        self.assertAlmostEqual(rows.at[on_budget, 'EstimateAtCompletion'], 20000.0)
+        self.assertEqual(rows.at[on_budget, 'OverrunFlag'], '')
+        total = rows.loc[0]
+        self.assertEqual(total['WBSCode'], 'PROJECT_TOTAL')
+        self.assertAlmostEqual(total['EAC_CPI'], 30000 * 16000 / 14000)
+        self.assertAlmostEqual(total['EAC_CPI_SPI'], 16000 + 16000 / (total['CPI'] * total['SPI']))
+        self.assertEqual(forecaster.get_flagged(forecast_df)['WBSElementID'].tolist(), [over, 0])
+
+        # An element retired before the next capture has no current-period row and drops out of the forecast
+        self.db_manager.execute_query("UPDATE wbs_elements SET Status = 'Retired' WHERE WBSElementID = ?", (on_budget,), commit=True)
+        forecaster.snapshots.capture_snapshots([project_id], as_of_date="2024-02-04")
+        forecast_df, _ = forecaster.forecast([project_id], capture=False)
+        self.assertEqual(sorted(forecast_df['WBSElementID'].tolist()), [0, over])
+        rows = forecast_df.set_index('WBSElementID')
+        self.assertAlmostEqual(rows.at[over, 'OverrunPercent'],
+                               -100 * rows.at[over, 'VarianceAtCompletion'] / rows.at[over, 'BudgetAtCompletion'])
+
+
+if __name__ == '__main__':
+    unittest.main()
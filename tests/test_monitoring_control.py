@@ -0,0 +1,80 @@
+import unittest
+import os
+import sys
+import pandas as pd
+
+# Add the parent directory (project_management_system) to sys.path
+# to allow imports of modules like project_startup, database_manager, etc.
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from tests.db_test_case import DatabaseTestCase
+
+class TestMonitoringControl(DatabaseTestCase):
+
+    def test_wbs_variance_data_aggregates_in_sql_with_latest_progress(self):
+        from monitoring_control import MonitoringControl
+        project_id, _ = self.project_startup.create_project("Variance Project", "2025-03-03", "2025-03-14", 3000)
+        first = self._create_dummy_wbs_element(project_id, wbs_code="V-1", estimated_cost=1000.0)
+        second = self._create_dummy_wbs_element(project_id, wbs_code="V-2", estimated_cost=2000.0)
+        for wbs_id, amount in ((first, 300), (first, 200), (None, 75)):
+            self.db_manager.execute_query(
+                "INSERT INTO actual_costs (ProjectID, WBSElementID, CostCategory, Description, Amount, TransactionDate) VALUES (?, ?, 'Labor', 'Crew', ?, '2025-03-05')",
+                (project_id, wbs_id, amount), commit=True
+            )
+        for update_date, completion in (('2025-03-04', 20), ('2025-03-06', 50), ('2025-03-06', 40)):
+            self.db_manager.execute_query(
+                "INSERT INTO progress_updates (ProjectID, WBSElementID, CompletionPercentage, UpdateDate) VALUES (?, ?, ?, ?)",
+                (project_id, first, completion, update_date), commit=True
+            )
+        monitor = MonitoringControl(self.db_manager)
+
+        variance = monitor.get_wbs_variance_data(project_id).set_index('wbs_element_id')
+        self.assertEqual(len(variance), 2)
+        # Same-day updates resolve to the last one recorded
+        self.assertEqual((variance.at[first, 'total_actual_cost'], variance.at[first, 'completion_percentage'],
+                          variance.at[first, 'earned_value']), (500.0, 40.0, 400.0))
+        self.assertTrue(pd.isna(variance.at[second, 'total_actual_cost']))
+        self.assertEqual(variance.at[second, 'earned_value'], 0.0)
+        _, progress_df = monitor.get_project_actual_data(project_id)
+        self.assertEqual(list(progress_df['completion_percentage']), [40.0])
+
+        cost_df, _ = monitor.analyze_cost_variance(project_id)
+        self.assertEqual(list(cost_df['cost_variance']), [-100.0, 0.0])
+        self.assertAlmostEqual(cost_df['cv_percentage'].iloc[0], -25.0)
+        self.assertTrue(pd.isna(cost_df['cv_percentage'].iloc[1]))
+
+    def test_wbs_variance_leaves_out_retired_budgets_but_keeps_their_spend(self):
+        from monitoring_control import MonitoringControl
+        from risk_simulation import RiskSimulator
+        project_id, _ = self.project_startup.create_project("Retired Variance Project", "2025-03-03", "2025-03-14", 3000)
+        live = self._create_dummy_wbs_element(project_id, wbs_code="RV-1", estimated_cost=1000.0)
+        retired = self._create_dummy_wbs_element(project_id, wbs_code="RV-2", estimated_cost=9000.0, status="Retired")
+        for wbs_id, amount in ((live, 400), (retired, 600)):
+            self.db_manager.execute_query(
+                "INSERT INTO actual_costs (ProjectID, WBSElementID, CostCategory, Description, Amount, TransactionDate) VALUES (?, ?, 'Labor', 'Crew', ?, '2025-03-05')",
+                (project_id, wbs_id, amount), commit=True
+            )
+        self.db_manager.execute_query(
+            "INSERT INTO progress_updates (ProjectID, WBSElementID, CompletionPercentage, UpdateDate) VALUES (?, ?, 50, '2025-03-05')",
+            (project_id, live), commit=True
+        )
+        monitor = MonitoringControl(self.db_manager)
+
+        self.assertEqual(monitor.get_wbs_variance_data(project_id)['wbs_element_id'].tolist(), [live])
+        schedule_df, _ = monitor.analyze_schedule_variance(project_id, as_of_date="2025-03-14")
+        self.assertEqual(schedule_df['wbs_code'].tolist(), ["RV-1"])
+        summary, _ = monitor.get_project_summary_performance(project_id)
+        self.assertEqual(summary['total_estimated_cost_baseline'], 1000.0)
+        self.assertEqual(summary['total_earned_value'], 500.0)
+        # Spend on the retired code is still part of the project's actual cost
+        self.assertEqual(summary['total_actual_cost_incurred'], 1000.0)
+        self.assertAlmostEqual(summary['cost_performance_index_cpi'], 0.5)
+
+        cost_model = RiskSimulator(self.db_manager, monitor_control_instance=monitor)._cost_model(project_id)
+        self.assertEqual((cost_model['budget_at_completion'], cost_model['actual_cost']), (1000.0, 1000.0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import unittest
+import os
+import sys
+
+# Add the parent directory (project_management_system) to sys.path
+# to allow imports of modules like pdf_render_cache.
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+class TestRenderedPageCache(unittest.TestCase):
+    """Page cache and prefetching renderer, driven by an injected render function (no real PDF)."""
+
+    def setUp(self):
+        import tempfile
+        self._tmp = tempfile.TemporaryDirectory()
+        self.cache_dir = self._tmp.name
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _make_cache(self, **kwargs):
+        from pdf_render_cache import RenderedPageCache
+        return RenderedPageCache(cache_dir=self.cache_dir, **kwargs)
+
+    def _clear_disk(self, cache):
+        for page in range(10):
+            path = cache._disk_path("doc", page, 1.0)
+            if os.path.exists(path):
+                os.remove(path)
+
+    def test_memory_lru_evicts_least_recently_used_within_byte_budget(self):
+        cache = self._make_cache(max_memory_bytes=100)
+        for page in range(3):
+            cache.put("doc", page, 1.0, bytes([page]) * 40)
+        self.assertEqual(cache.memory_bytes, 80, "The oldest page is evicted once 120 bytes exceed the 100-byte budget.")
+
+        self.assertIsNotNone(cache.get("doc", 1, 1.0)) # Page 1 becomes most recently used
+        cache.put("doc", 3, 1.0, b"\x03" * 40)
+        self.assertLessEqual(cache.memory_bytes, 100)
+
+        # With the disk copies gone only the pages still in memory can be served
+        self._clear_disk(cache)
+        self.assertEqual([cache.get("doc", page, 1.0) is not None for page in range(4)], [False, True, False, True])
+
+        # A page larger than the whole budget is still kept (the most recent entry is never evicted)
+        cache.put("doc", 4, 1.0, b"\x04" * 150)
+        self.assertEqual(cache.memory_bytes, 150)
+        self.assertIsNotNone(cache.get("doc", 4, 1.0))
+
+    def test_disk_cache_reloads_into_memory_and_prunes_oldest_files(self):
+        cache = self._make_cache(max_memory_bytes=1000, max_disk_bytes=100)
+        for page in range(4):
+            cache.put("doc", page, 1.0, bytes([page]) * 40)
+            os.utime(cache._disk_path("doc", page, 1.0), (1_000_000 + page, 1_000_000 + page))
+
+        # A fresh cache on the same directory is served from disk
+        reopened = self._make_cache(max_memory_bytes=1000, max_disk_bytes=100)
+        self.assertEqual(reopened.get("doc", 2, 1.0), b"\x02" * 40)
+        self.assertEqual(reopened.memory_bytes, 40)
+
+        # Reading page 2 refreshed its mtime, so pages 0 and 1 are the ones pruned
+        self.assertEqual(reopened.prune_disk(), 80)
+        on_disk = [os.path.exists(cache._disk_path("doc", page, 1.0)) for page in range(4)]
+        self.assertEqual(on_disk, [False, False, True, True])
+
+    def test_renderer_returns_requested_page_and_prefetches_neighbours(self):
+        import threading
+        import time
+        from pdf_render_cache import PdfPageRenderer
+        cache = self._make_cache()
+        rendered = []
+        lock = threading.Lock()
+
+        def render(page_index):
+            with lock:
+                rendered.append(page_index)
+            return f"page-{page_index}".encode()
+
+        renderer = PdfPageRenderer("drawings.pdf", "doc", cache, prefetch=1, render_func=render)
+        try:
+            renderer.request_page(0, page_count=5)
+            deadline = time.monotonic() + 5
+            results = []
+            while time.monotonic() < deadline and (not results or cache.get("doc", 1, 1.0) is None):
+                results.extend(renderer.drain_results())
+                time.sleep(0.01)
+            self.assertEqual(results, [(0, b"page-0", None)], "Only the requested page is delivered.")
+            self.assertEqual(sorted(rendered), [0, 1], "Page 0 has no previous neighbour; page 1 is prefetched.")
+
+            # The prefetched page is served straight from the cache without rendering again
+            renderer.request_page(1, page_count=5)
+            results = []
+            while time.monotonic() < deadline and (len(results) < 1 or cache.get("doc", 2, 1.0) is None):
+                results.extend(renderer.drain_results())
+                time.sleep(0.01)
+            self.assertEqual(results[0], (1, b"page-1", None))
+            self.assertEqual(sorted(rendered), [0, 1, 2])
+        finally:
+            renderer.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+import os
+import sys
+
+# Add the parent directory (project_management_system) to sys.path
+# to allow imports of modules like project_startup, database_manager, etc.
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from tests.db_test_case import DatabaseTestCase
+
+class TestPortfolioPerformance(DatabaseTestCase):
+
+    def test_portfolio_performance_matches_project_evm_and_caches(self):
+        from datetime import date, timedelta
+        from earned_value import EarnedValueEngine
+        from portfolio_performance import PortfolioPerformance
+        active_id = self.db_manager.execute_query("SELECT ProjectStatusID FROM ProjectStatuses WHERE StatusName = 'Active'", fetch_one=True)[0]
+        start, end = (date.today() - timedelta(days=20)).isoformat(), (date.today() + timedelta(days=40)).isoformat()
+        project_a, _ = self.project_startup.create_project("Portfolio A", start, end, 3000)
+        project_b, _ = self.project_startup.create_project("Portfolio B", start, end, 1000)
+        self.db_manager.execute_query("UPDATE Projects SET ProjectStatusID = ? WHERE ProjectID IN (?, ?)",
+                                      (active_id, project_a, project_b), commit=True)
+        first = self._create_dummy_wbs_element(project_a, wbs_code="PF-1", estimated_cost=1000.0)
+        self._create_dummy_wbs_element(project_a, wbs_code="PF-2", estimated_cost=2000.0)
+        self.db_manager.execute_query("UPDATE wbs_elements SET SpreadCurve = 'front' WHERE WBSElementID = ?", (first,), commit=True)
+        self._create_dummy_wbs_element(project_b, wbs_code="PF-3", estimated_cost=1000.0)
+        self.db_manager.execute_query(
+            "INSERT INTO actual_costs (ProjectID, WBSElementID, CostCategory, Description, Amount, TransactionDate) VALUES (?, ?, 'Labor', 'Crew', 400, ?)",
+            (project_a, first, start), commit=True
+        )
+        self.db_manager.execute_query(
+            "INSERT INTO progress_updates (ProjectID, WBSElementID, CompletionPercentage, UpdateDate) VALUES (?, ?, 50, ?)",
+            (project_a, first, start), commit=True
+        )
+        portfolio = PortfolioPerformance(self.db_manager)
+
+        portfolio_df, _ = portfolio.get_portfolio_performance()
+        rows = portfolio_df.set_index('ProjectID')
+        self.assertIn(project_b, rows.index)
+        project = EarnedValueEngine(self.db_manager).get_project_performance(project_a)
+        self.assertAlmostEqual(rows.at[project_a, 'PlannedValue'], project['planned_value'])
+        self.assertEqual((rows.at[project_a, 'EarnedValue'], rows.at[project_a, 'ActualCost']), (500.0, 400.0))
+        self.assertAlmostEqual(rows.at[project_a, 'CPI'], 1.25)
+        self.assertAlmostEqual(rows.at[project_a, 'EstimateAtCompletion'], 3000 / 1.25)
+        self.assertEqual(rows.at[project_b, 'EstimateAtCompletion'], 1000.0)  # Nothing spent: EAC = BAC
+
+        _, message = portfolio.get_portfolio_performance()
+        self.assertIn("cached", message)
+        self.db_manager.execute_query(
+            "INSERT INTO actual_costs (ProjectID, WBSElementID, CostCategory, Description, Amount, TransactionDate) VALUES (?, NULL, 'Other', 'Permit', 100, ?)",
+            (project_b, start), commit=True
+        )
+        portfolio_df, message = portfolio.get_portfolio_performance()
+        self.assertNotIn("cached", message)
+        self.assertEqual(portfolio_df.set_index('ProjectID').at[project_b, 'ActualCost'], 100.0)
+        totals = portfolio.get_portfolio_totals(portfolio_df[portfolio_df['ProjectID'].isin([project_a, project_b])])
+        self.assertEqual((totals['project_count'], totals['actual_cost']), (2, 500.0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,6 @@
 import unittest
 import os
 import sys
-import sqlite3
 import pandas as pd
 
 # Add the parent directory (project_management_system) to sys.path
@@ -10,120 +9,10 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 parent_dir = os.path.dirname(current_dir)
 sys.path.insert(0, parent_dir)
 
-from project_startup import ProjectStartup
-from database_manager import DatabaseManager, db_manager as global_db_manager
-from configuration import Config
+from tests.db_test_case import DatabaseTestCase
+import constants
 
-class TestProjectStartup(unittest.TestCase):
-
-    @classmethod
-    def setUpClass(cls):
-        """
-        Set up for all tests in this class.
-        Use a dedicated test database.
-        """
-        cls.test_db_path = os.path.join(parent_dir, 'test_project_data.db')
-        Config.DATABASE_PATH = cls.test_db_path # Override config for DB path
-
-        # Ensure any existing test DB is removed for a clean start
-        if os.path.exists(cls.test_db_path):
-            os.remove(cls.test_db_path)
-
-        # Reset the global db_manager instance to use the new test_db_path
-        # This is a bit of a hack for singletons; cleaner ways might involve dependency injection
-        # or a configurable db_path in DatabaseManager itself.
-        DatabaseManager._instance = None
-        cls.db_manager = DatabaseManager() # This will initialize and apply schema to test_project_data.db
-
-        # ---- DEBUG code removed ----
-
-        cls.project_startup = ProjectStartup(cls.db_manager) # Pass the test-specific db_manager
-
-        # Pre-populate necessary lookup data if not handled by schema or if specific IDs are needed
-        # Example: Ensure 'Pending' status and a default customer exist.
-        # The schema.sql should already insert 'Pending' status.
-        # We need a customer for project creation due to NOT NULL constraint.
-        try:
-            cls.db_manager.execute_query(
-                "INSERT OR IGNORE INTO CustomerTypes (TypeName) VALUES ('TestType')", commit=True
-            )
-            cls.db_manager.execute_query(
-                "INSERT OR IGNORE INTO Customers (CustomerID, CustomerName, CustomerTypeID) VALUES (1, 'Test Customer', (SELECT CustomerTypeID FROM CustomerTypes WHERE TypeName = 'TestType'))",
-                commit=True
-            )
-            # Ensure 'Pending' status exists and get its ID
-            pending_status_row = cls.db_manager.execute_query("SELECT ProjectStatusID FROM ProjectStatuses WHERE StatusName = 'Pending'", fetch_one=True)
-            if not pending_status_row:
-                # This should not happen if schema.sql is correct and ran
-                raise Exception("Critical: 'Pending' status not found in test database after schema application.")
-            cls.pending_status_id = pending_status_row['ProjectStatusID']
-
-        except sqlite3.Error as e:
-            print(f"SQLite error during test setup: {e}")
-            # This might indicate schema.sql issues or other DB problems
-            # Depending on the error, you might want to fail the test suite here
-            raise
-        except Exception as e:
-            print(f"General error during test setup: {e}")
-            raise
-
-
-    @classmethod
-    def tearDownClass(cls):
-        """
-        Clean up after all tests in this class.
-        """
-        cls.db_manager.close_connection()
-        if os.path.exists(cls.test_db_path):
-            os.remove(cls.test_db_path)
-        # Restore original db_manager if necessary, though for isolated test runs it might not matter
-        DatabaseManager._instance = None
-        Config.DATABASE_PATH = os.path.join(parent_dir, 'project_data.db') # Restore original path
-        _ = DatabaseManager() # Re-initialize global one with original path
-
-    def setUp(self):
-        """
-        Set up before each test method.
-        Could be used to clean specific tables or reset state if needed between tests.
-        For now, assuming tearDownClass handles the main DB cleanup.
-        """
-        # logger is not defined in this scope, so commenting out direct logger calls for now.
-        # Will rely on print for debug or pass logger instance if needed.
-        # print(f"TEST_DEBUG: setUp: self.db_manager instance: {id(self.db_manager)}")
-        # print(f"TEST_DEBUG: setUp: self.project_startup.db_manager instance: {id(self.project_startup.db_manager)}")
-        self.assertIs(self.db_manager, self.project_startup.db_manager, "Test's db_manager and ProjectStartup's db_manager are not the same instance!")
-
-        # print("TEST_DEBUG: setUp: Attempting to clear Projects, wbs_elements, and processed_estimates before test.")
-        delete_projects_success = self.db_manager.execute_query("DELETE FROM Projects", commit=True)
-        delete_wbs_success = self.db_manager.execute_query("DELETE FROM wbs_elements", commit=True)
-        delete_processed_estimates_success = self.db_manager.execute_query("DELETE FROM processed_estimates", commit=True)
-
-        # print(f"TEST_DEBUG: setUp: DELETE FROM Projects result: {delete_projects_success}")
-        # print(f"TEST_DEBUG: setUp: DELETE FROM wbs_elements result: {delete_wbs_success}")
-        # print(f"TEST_DEBUG: setUp: DELETE FROM processed_estimates result: {delete_processed_estimates_success}")
-
-        self.assertTrue(delete_projects_success, "Failed to delete projects in setUp.")
-        self.assertTrue(delete_wbs_success, "Failed to delete WBS elements in setUp.")
-        self.assertTrue(delete_processed_estimates_success, "Failed to delete processed_estimates in setUp.")
-
-        project_count = self.db_manager.execute_query("SELECT COUNT(*) FROM Projects", fetch_one=True)[0]
-        # print(f"TEST_DEBUG: setUp: Project count after delete: {project_count}")
-        self.assertEqual(project_count, 0, "Projects table should be empty at start of test after setUp delete.")
-
-        wbs_count = self.db_manager.execute_query("SELECT COUNT(*) FROM wbs_elements", fetch_one=True)[0]
-        # print(f"TEST_DEBUG: setUp: WBS count after delete: {wbs_count}")
-        self.assertEqual(wbs_count, 0, "WBS elements table should be empty at start of test after setUp delete.")
-
-        processed_estimates_count = self.db_manager.execute_query("SELECT COUNT(*) FROM processed_estimates", fetch_one=True)[0]
-        # print(f"TEST_DEBUG: setUp: Processed Estimates count after delete: {processed_estimates_count}")
-        self.assertEqual(processed_estimates_count, 0, "Processed Estimates table should be empty at start of test after setUp delete.")
-
-    def tearDown(self):
-        """
-        Clean up after each test method.
-        Primary cleanup moved to setUp. This can be used for other specific post-test cleanup if needed.
-        """
-        pass
+class TestProjectStartup(DatabaseTestCase):
 
     # --- Test Cases Will Go Here ---
 
@@ -179,6 +68,56 @@ class TestProjectStartup(unittest.TestCase):
         )[0]
         self.assertEqual(count, 1, "Should not create a duplicate project with the same name.")
 
+    def test_create_projects_bulk_returns_id_mapping(self):
+        existing_id = self._create_dummy_project("Bulk Existing")
+        records = [
+            {"project_name": "Bulk One", "start_date": "2024-02-01", "end_date": "2024-03-01", "duration_days": 20},
+            {"project_name": "Bulk Two", "customer_name": "Test Customer", "status": "Active"},
+            {"project_name": "Bulk Existing"},
+        ]
+        id_mapping, msg = self.project_startup.create_projects_bulk(records)
+        self.assertIn("2 projects created", msg)
+        self.assertEqual(set(id_mapping), {"Bulk One", "Bulk Two", "Bulk Existing"})
+        self.assertEqual(id_mapping["Bulk Existing"], existing_id)
+
+        bulk_two = self.project_startup.get_project_details(id_mapping["Bulk Two"])
+        self.assertEqual(bulk_two['StatusName'], "Active")
+        self.assertEqual(bulk_two['CustomerID'], 1)
+        self.assertEqual(self.project_startup.get_project_details(id_mapping["Bulk One"])['DurationDays'], 20)
+
+    def test_create_projects_bulk_rejects_whole_batch_on_invalid_record(self):
+        from exceptions import AppValidationError
+        records = [
+            {"project_name": "Bulk Valid"},
+            {"project_name": "Bulk Bad Dates", "start_date": "2024-05-01", "end_date": "2024-04-01"},
+            {"project_name": ""},
+        ]
+        with self.assertRaises(AppValidationError) as ctx:
+            self.project_startup.create_projects_bulk(records)
+        self.assertIn("Row 1: Start date cannot be after end date", str(ctx.exception))
+        self.assertIn("Row 2: Project name must be a non-empty string", str(ctx.exception))
+        count = self.db_manager.execute_query("SELECT COUNT(*) FROM Projects WHERE ProjectName = 'Bulk Valid'", fetch_one=True)[0]
+        self.assertEqual(count, 0, "No project should be written when the batch fails validation.")
+
+    def test_create_projects_bulk_stores_date_and_timestamp_values(self):
+        import datetime
+        records = pd.DataFrame([
+            {"project_name": "Bulk Date", "start_date": datetime.date(2024, 2, 1), "end_date": datetime.date(2024, 3, 1)},
+            {"project_name": "Bulk Timestamp", "start_date": pd.Timestamp("2024-04-01"), "end_date": pd.Timestamp("2024-05-15")},
+        ])
+        id_mapping, _ = self.project_startup.create_projects_bulk(records)
+        bulk_date = self.project_startup.get_project_details(id_mapping["Bulk Date"])
+        self.assertEqual((bulk_date['StartDate'], bulk_date['EndDate']), ("2024-02-01", "2024-03-01"))
+        bulk_ts = self.project_startup.get_project_details(id_mapping["Bulk Timestamp"])
+        self.assertEqual((bulk_ts['StartDate'], bulk_ts['EndDate']), ("2024-04-01", "2024-05-15"))
+
+    def test_create_projects_bulk_rejects_non_string_project_names(self):
+        from exceptions import AppValidationError
+        with self.assertRaises(AppValidationError) as ctx:
+            self.project_startup.create_projects_bulk([{"project_name": 1001}, {"project_name": 2002}])
+        self.assertIn("Row 0: Project name must be a non-empty string", str(ctx.exception))
+        self.assertIn("Row 1: Project name must be a non-empty string", str(ctx.exception))
+
     def test_get_all_projects_with_status_no_projects(self):
         projects = self.project_startup.get_all_projects_with_status()
         self.assertEqual(len(projects), 0, "Should return an empty list if no projects exist.")
@@ -200,28 +139,6 @@ class TestProjectStartup(unittest.TestCase):
             if p['ProjectName'] == "Project Gamma":
                 self.assertEqual(p['StatusName'], "Pending")
 
-    def _create_dummy_project(self, name="Dummy Project for WBS"):
-        """Helper to create a project and return its ID."""
-        from utils import calculate_end_date as calc_end_date_util
-        start_date = "2023-01-01"
-        duration_days = 10
-        end_date = calc_end_date_util(start_date, duration_days)
-        project_id, _ = self.project_startup.create_project(name, start_date, end_date, duration_days)
-        self.assertIsNotNone(project_id)
-        return project_id
-
-    def _create_dummy_wbs_element(self, project_id, wbs_code="WBS-001", description="Dummy WBS Item", estimated_cost=100.0, status="Planned"):
-        """Helper to insert a WBS element directly and return its ID."""
-        query = """
-        INSERT INTO wbs_elements (ProjectID, WBSCode, Description, EstimatedCost, Status)
-        VALUES (?, ?, ?, ?, ?)
-        """
-        success = self.db_manager.execute_query(query, (project_id, wbs_code, description, estimated_cost, status), commit=True)
-        self.assertTrue(success, "Failed to create dummy WBS element for test.")
-        wbs_id = self.db_manager.execute_query("SELECT last_insert_rowid()", fetch_one=True)[0]
-        self.assertIsNotNone(wbs_id)
-        return wbs_id
-
     def test_get_wbs_element_details_exists(self):
         project_id = self._create_dummy_project()
         wbs_desc = "Detailed WBS Item"
@@ -274,26 +191,6 @@ class TestProjectStartup(unittest.TestCase):
         self.assertFalse(success)
         self.assertIn("no updates provided", msg.lower())
 
-    def _insert_dummy_processed_estimate(self, project_id=None, cost_code="CC1", description="Desc1", total_cost=100.0, raw_estimate_id=1):
-        """Helper to insert a processed estimate and return its ProcessedEstimateID."""
-        # Note: schema_sql for processed_estimates uses PascalCase for column names.
-        query = """
-        INSERT INTO processed_estimates (ProjectID, CostCode, Description, Quantity, Unit, UnitCost, TotalCost, Phase, RawEstimateID)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """
-        # Make Quantity and UnitCost consistent with TotalCost for this dummy data
-        quantity = 1.0
-        unit_cost = total_cost
-        unit = "LS"
-        phase = "TestPhase"
-
-        success = self.db_manager.execute_query(query, (project_id, cost_code, description, quantity, unit, unit_cost, total_cost, phase, raw_estimate_id), commit=True)
-        self.assertTrue(success, "Failed to insert dummy processed estimate.")
-        # Fetch ProcessedEstimateID (assuming it's an alias for rowid or an auto-incrementing PK)
-        # The actual PK name in schema.sql is ProcessedEstimateID
-        last_id = self.db_manager.execute_query("SELECT last_insert_rowid()", fetch_one=True)[0]
-        return last_id
-
     def test_generate_wbs_from_estimates_no_estimates(self):
         project_id = self._create_dummy_project("Project WBS No Estimates")
         success, msg = self.project_startup.generate_wbs_from_estimates(project_id)
@@ -329,6 +226,106 @@ class TestProjectStartup(unittest.TestCase):
         )[0]
         self.assertEqual(linked_estimates, 2, "Processed estimates were not correctly linked to the project.")
 
+    def test_generate_wbs_from_estimates_regenerate_preserves_ids(self):
+        project_id = self._create_dummy_project("Project WBS Regenerate")
+        self._insert_dummy_processed_estimate(project_id=None, cost_code="REGEN-CC1", description="Kept", total_cost=1000.0, raw_estimate_id=111)
+        removed_pe_id = self._insert_dummy_processed_estimate(project_id=None, cost_code="REGEN-CC2", description="Removed", total_cost=500.0, raw_estimate_id=112)
+        success, _ = self.project_startup.generate_wbs_from_estimates(project_id)
+        self.assertTrue(success)
+        first_ids = dict(self.project_startup.get_wbs_for_project(project_id)[['WBSCode', 'WBSElementID']].values)
+
+        # Change one estimate, drop another and add a new cost code, then regenerate
+        self.db_manager.execute_query("UPDATE processed_estimates SET TotalCost = 1250.0 WHERE CostCode = 'REGEN-CC1'", commit=True)
+        self.db_manager.execute_query("DELETE FROM processed_estimates WHERE ProcessedEstimateID = ?", (removed_pe_id,), commit=True)
+        self._insert_dummy_processed_estimate(project_id=project_id, cost_code="REGEN-CC3", description="Added", total_cost=300.0, raw_estimate_id=113)
+        success, msg = self.project_startup.generate_wbs_from_estimates(project_id)
+        self.assertTrue(success, msg)
+        self.assertIn("1 added, 1 updated, 1 retired", msg)
+
+        wbs_df = self.project_startup.get_wbs_for_project(project_id).set_index('WBSCode')
+        self.assertEqual(wbs_df.at["REGEN-CC1", 'WBSElementID'], first_ids["REGEN-CC1"])
+        self.assertEqual(wbs_df.at["REGEN-CC1", 'EstimatedCost'], 1250.0)
+        self.assertEqual(wbs_df.at["REGEN-CC2", 'WBSElementID'], first_ids["REGEN-CC2"])
+        self.assertEqual(wbs_df.at["REGEN-CC2", 'Status'], "Retired")
+        self.assertEqual(wbs_df.at["REGEN-CC2", 'EstimatedCost'], 0.0)
+        self.assertIn("REGEN-CC3", wbs_df.index)
+        self.assertEqual(self.project_startup.get_project_details(project_id)['EstimatedCost'], 1550.0)
+
+    def test_generate_wbs_retires_unlinked_elements_when_estimates_are_gone(self):
+        project_id = self._create_dummy_project("Project WBS Estimates Removed")
+        pe_ids = [self._insert_dummy_processed_estimate(project_id=None, cost_code=code, description=code, total_cost=100.0, raw_estimate_id=raw_id)
+                  for code, raw_id in (("GONE-CC1", 131), ("GONE-CC2", 132))]
+        self.assertTrue(self.project_startup.generate_wbs_from_estimates(project_id)[0])
+        manual_id = self._create_dummy_wbs_element(project_id, wbs_code="MANUAL-1", estimated_cost=75.0)
+
+        # Deleting the estimates nulls the elements' links (ON DELETE SET NULL) and leaves no estimates to build from
+        self.db_manager.execute_query("UPDATE wbs_elements SET ProcessedEstimateID = NULL WHERE ProjectID = ?", (project_id,), commit=True)
+        for pe_id in pe_ids:
+            self.db_manager.execute_query("DELETE FROM processed_estimates WHERE ProcessedEstimateID = ?", (pe_id,), commit=True)
+        success, msg = self.project_startup.generate_wbs_from_estimates(project_id)
+        self.assertTrue(success, msg)
+        self.assertIn("2 retired", msg)
+        wbs_df = self.project_startup.get_wbs_for_project(project_id).set_index('WBSCode')
+        self.assertEqual(wbs_df.loc[["GONE-CC1", "GONE-CC2"], 'Status'].tolist(), ["Retired", "Retired"])
+        self.assertEqual(wbs_df.at["MANUAL-1", 'WBSElementID'], manual_id)
+        self.assertEqual(wbs_df.at["MANUAL-1", 'Status'], "Planned")
+        self.assertEqual(self.project_startup.get_project_details(project_id)['EstimatedCost'], 75.0)
+
+        success, msg = self.project_startup.generate_wbs_from_estimates(project_id)
+        self.assertIn("WBS left unchanged", msg)
+
+    def test_generate_wbs_builds_hierarchy_from_cost_code_segments(self):
+        project_id = self._create_dummy_project("Project WBS Hierarchy")
+        self._insert_dummy_processed_estimate(project_id=None, cost_code="01-010-010", description="Conduit", total_cost=100.0, raw_estimate_id=121)
+        self._insert_dummy_processed_estimate(project_id=None, cost_code="01-010-020", description="Wire", total_cost=200.0, raw_estimate_id=122)
+        self._insert_dummy_processed_estimate(project_id=None, cost_code="01-020-010", description="Fixtures", total_cost=50.0, raw_estimate_id=123)
+
+        success, msg = self.project_startup.generate_wbs_from_estimates(project_id)
+        self.assertTrue(success, msg)
+        wbs_df = self.project_startup.get_wbs_for_project(project_id).set_index('WBSCode')
+        self.assertEqual(sorted(wbs_df.index), ["01", "01-010", "01-010-010", "01-010-020", "01-020", "01-020-010"])
+        self.assertEqual(wbs_df.at["01-010-010", 'ParentWBSElementID'], wbs_df.at["01-010", 'WBSElementID'])
+        self.assertEqual(wbs_df.at["01-010", 'ParentWBSElementID'], wbs_df.at["01", 'WBSElementID'])
+        self.assertEqual(wbs_df.at["01-010-020", 'WBSLevel'], 3)
+        self.assertEqual(wbs_df.at["01", 'IsSummary'], 1)
+        self.assertEqual(self.project_startup.get_project_details(project_id)['EstimatedCost'], 350.0)
+
+        success, _ = self.project_startup.generate_project_budget(project_id)
+        self.assertTrue(success)
+        self.assertEqual(len(self.project_startup.get_budget_for_project(project_id)), 3, "Summary nodes should not be budgeted.")
+
+        top_level = self.project_startup.get_wbs_rollup_drilldown(project_id, level=1)
+        self.assertEqual(list(top_level['WBSCode']), ["01"])
+        self.assertEqual(top_level.iloc[0]['RolledEstimatedCost'], 350.0)
+        self.assertEqual(top_level.iloc[0]['RolledBudgetAmount'], 350.0)
+        children = self.project_startup.get_wbs_rollup_drilldown(project_id, parent_wbs_element_id=int(wbs_df.at["01", 'WBSElementID']))
+        self.assertEqual(dict(zip(children['WBSCode'], children['RolledEstimatedCost'])), {"01-010": 300.0, "01-020": 50.0})
+        subtree = self.project_startup.get_wbs_subtree_elements(int(wbs_df.at["01-010", 'WBSElementID']))
+        self.assertEqual(sorted(subtree['WBSCode']), ["01-010", "01-010-010", "01-010-020"])
+        self.assertEqual(wbs_df.at["01-010-010", 'WBSPath'],
+                         f"/{wbs_df.at['01', 'WBSElementID']}/{wbs_df.at['01-010', 'WBSElementID']}/{wbs_df.at['01-010-010', 'WBSElementID']}/")
+
+        # Costs recorded after generation show up in the drilldown without a rebuild
+        from execution_management import ExecutionManagement
+        ExecutionManagement(self.db_manager).record_actual_cost(
+            project_id, int(wbs_df.at["01-010-020", 'WBSElementID']), 'Labor', 'Pull wire', 80.0, "2024-01-05")
+        self.assertEqual(self.project_startup.get_wbs_rollup_drilldown(project_id, level=1).iloc[0]['RolledActualCost'], 80.0)
+        stored_actuals = lambda: {row['WBSElementID']: row['RolledActualCost'] for row in self.db_manager.execute_query(
+            "SELECT WBSElementID, RolledActualCost FROM wbs_rollups WHERE ProjectID = ?", (project_id,), fetch_all=True)}
+        self.assertEqual(stored_actuals()[int(wbs_df.at["01", 'WBSElementID'])], 80.0)
+        self.assertEqual(stored_actuals()[int(wbs_df.at["01-020", 'WBSElementID'])], 0.0)
+        success, msg = self.project_startup.refresh_wbs_rollups(project_id)
+        self.assertTrue(success, msg)
+        self.assertIn("6 WBS elements", msg)
+        self.assertIn("(0 corrected)", msg, "Triggers should already have brought the stored actuals up to date.")
+        stored = self.db_manager.execute_query(
+            "SELECT RolledActualCost FROM wbs_rollups WHERE WBSElementID = ?", (int(wbs_df.at["01", 'WBSElementID']),), fetch_one=True)
+        self.assertEqual(stored['RolledActualCost'], 80.0)
+
+        # Removing the cost takes it back off every ancestor
+        self.db_manager.execute_query("DELETE FROM actual_costs WHERE ProjectID = ?", (project_id,), commit=True)
+        self.assertEqual(set(stored_actuals().values()), {0.0})
+
     def test_generate_project_budget_no_wbs(self):
         project_id = self._create_dummy_project("Project Budget No WBS")
         success, msg = self.project_startup.generate_project_budget(project_id)
@@ -383,5 +380,359 @@ class TestProjectStartup(unittest.TestCase):
         self.assertEqual(wbs_resources_df.iloc[0]['TotalEstimatedCost'], 700.0)
 
 
+    def test_allocate_resources_uses_every_estimate_line_of_a_wbs_element(self):
+        project_id = self._create_dummy_project("Project Res Multi Line")
+        insert_query = """
+        INSERT INTO processed_estimates (ProjectID, CostCode, Description, Quantity, Unit, UnitCost, TotalCost, Phase)
+        VALUES (NULL, 'RES-MULTI', ?, ?, ?, ?, ?, 'TestPhase')
+        """
+        for description, quantity, unit, unit_cost in [("Install labor", 10, "HR", 80.0), ("Permit", 1, "LS", 250.0), ("Conduit", 100, "FT", 2.5)]:
+            self.db_manager.execute_query(insert_query, (description, quantity, unit, unit_cost, quantity * unit_cost), commit=True)
+        self.assertTrue(self.project_startup.generate_wbs_from_estimates(project_id)[0])
+
+        success, msg = self.project_startup.allocate_resources(project_id)
+        self.assertTrue(success, msg)
+        self.assertIn("3", msg)
+        rows = self.db_manager.execute_query(
+            "SELECT wr.ResourceDescription, wr.ResourceType FROM WBSElementResources wr JOIN wbs_elements w ON w.WBSElementID = wr.WBSElementID WHERE w.ProjectID = ?",
+            (project_id,), fetch_all=True
+        )
+        self.assertEqual({row['ResourceDescription']: row['ResourceType'] for row in rows},
+                         {"Install labor": "Labor", "Permit": "Lump Sum", "Conduit": "Material"})
+
+    def test_run_data_dna_pipeline_on_background_job(self):
+        from background_jobs import BackgroundJob, JOB_EVENT_DONE, JOB_EVENT_PROGRESS
+        project_id = self._create_dummy_project("Project DNA Pipeline")
+        self._insert_dummy_processed_estimate(project_id=None, cost_code="DNA-CC1", description="DNA Item", total_cost=400.0, raw_estimate_id=301)
+
+        job = BackgroundJob("test-dna", self.project_startup.run_data_dna_pipeline, project_id)
+        job.start()
+        job.wait(timeout=10)
+        events = job.drain_events()
+        self.assertEqual(events[-1][0], JOB_EVENT_DONE)
+        self.assertIn(JOB_EVENT_PROGRESS, [event_type for event_type, _ in events])
+        success, msg, stage_timings = events[-1][1]
+        self.assertTrue(success, msg)
+        self.assertEqual(list(stage_timings), ["WBS Generation", "Budget Generation", "Resource Allocation"])
+        self.assertEqual(len(self.project_startup.get_budget_for_project(project_id)), 1)
+
+    def test_run_data_dna_pipeline_cancelled_saves_nothing(self):
+        import threading
+        project_id = self._create_dummy_project("Project DNA Cancel")
+        self._insert_dummy_processed_estimate(project_id=None, cost_code="DNA-CC2", description="DNA Item", total_cost=400.0, raw_estimate_id=302)
+        cancel_event = threading.Event()
+
+        def cancel_after_wbs(stage_name, message, fraction):
+            if stage_name == "Budget Generation":
+                cancel_event.set()
+
+        # Cancellation is checked at stage boundaries, so the budget stage completes before the rollback
+        success, msg, _ = self.project_startup.run_data_dna_pipeline(project_id, progress_callback=cancel_after_wbs, cancel_event=cancel_event)
+        self.assertFalse(success)
+        self.assertIn("cancelled", msg.lower())
+        self.assertTrue(self.project_startup.get_wbs_for_project(project_id).empty, "Cancelled pipeline should not leave WBS rows.")
+        self.assertEqual(len(self.project_startup.get_budget_for_project(project_id)), 0, "Cancelled pipeline should not leave budget rows.")
+        unlinked = self.db_manager.execute_query("SELECT COUNT(*) FROM processed_estimates WHERE ProjectID IS NULL", fetch_one=True)[0]
+        self.assertEqual(unlinked, 1, "Estimate linking should be rolled back on cancel.")
+
+    def test_search_materials_ranked_and_synced_by_triggers(self):
+        insert_query = """
+        INSERT INTO Materials (StockNumber, MaterialName, ExtendedDescription, Manufacturer, ManufacturerPartNumber, UnitOfMeasure)
+        VALUES (?, ?, ?, ?, ?, 'EA')
+        """
+        self.db_manager.execute_query("DELETE FROM Materials WHERE StockNumber LIKE 'FTS-%'", commit=True)
+        self.db_manager.execute_query(insert_query, ("FTS-EMT-075", "EMT Conduit 3/4in", "Steel tubing", "Allied", "AT-075"), commit=True)
+        self.db_manager.execute_query(insert_query, ("FTS-BOX-4SQ", "Square Box", "For EMT conduit runs", "Raco", "RC-232"), commit=True)
+
+        results = self.project_startup.search_materials("emt cond")
+        self.assertEqual([r['StockNumber'] for r in results], ["FTS-EMT-075", "FTS-BOX-4SQ"])
+        self.assertEqual(self.project_startup.search_materials("rc-23")[0]['StockNumber'], "FTS-BOX-4SQ")
+
+        # Update and delete triggers keep the index in sync
+        self.db_manager.execute_query("UPDATE Materials SET Manufacturer = 'Wheatland' WHERE StockNumber = 'FTS-EMT-075'", commit=True)
+        self.assertEqual([r['StockNumber'] for r in self.project_startup.search_materials("wheatland")], ["FTS-EMT-075"])
+        self.assertEqual(self.project_startup.search_materials("allied"), [])
+        self.db_manager.execute_query("DELETE FROM Materials WHERE StockNumber = 'FTS-BOX-4SQ'", commit=True)
+        self.assertEqual(self.project_startup.search_materials("raco"), [])
+        self.assertEqual(self.project_startup.search_materials("  "), [])
+
+    def test_nested_assembly_bom_explosion_and_project_requirements(self):
+        for table in ("Production_Assembly_Tracking", "AssemblyComponents", "Assemblies"):
+            self.db_manager.execute_query(f"DELETE FROM {table}", commit=True)
+        self.db_manager.execute_query("DELETE FROM Materials WHERE StockNumber LIKE 'BOM-%'", commit=True)
+        for stock_number, name in (("BOM-WIRE", "THHN Wire"), ("BOM-BOX", "Square Box"), ("BOM-RING", "Mud Ring")):
+            self.db_manager.execute_query(
+                "INSERT INTO Materials (StockNumber, MaterialName, UnitOfMeasure) VALUES (?, ?, 'EA')",
+                (stock_number, name), commit=True
+            )
+        ps = self.project_startup
+
+        box_id, msg = ps.manage_assembly(
+            {'AssemblyItemNumber': 'ASM-BOX', 'AssemblyName': 'Box Kit'},
+            [{'MaterialStockNumber': 'BOM-BOX', 'QuantityInAssembly': 1},
+             {'MaterialStockNumber': 'BOM-RING', 'QuantityInAssembly': 1},
+             {'MaterialStockNumber': 'BOM-WIRE', 'QuantityInAssembly': 5}]
+        )
+        self.assertIsNotNone(box_id, msg)
+        room_id, msg = ps.manage_assembly(
+            {'AssemblyItemNumber': 'ASM-ROOM', 'AssemblyName': 'Room Rough-In'},
+            [{'MaterialStockNumber': 'ASM-BOX', 'QuantityInAssembly': 4},
+             {'MaterialStockNumber': 'BOM-WIRE', 'QuantityInAssembly': 20}]
+        )
+        self.assertIsNotNone(room_id, msg)
+        stored = self.db_manager.execute_query(
+            "SELECT MaterialStockNumber, ChildAssemblyID FROM AssemblyComponents WHERE AssemblyID = ? ORDER BY AssemblyComponentID",
+            (room_id,), fetch_all=True)
+        self.assertEqual([tuple(r) for r in stored], [(None, box_id), ('BOM-WIRE', None)])
+
+        # Unknown codes are reported together; cycles are rejected
+        asm_id, msg = ps.manage_assembly({'AssemblyItemNumber': 'ASM-BAD', 'AssemblyName': 'Bad'},
+                                         [{'MaterialStockNumber': 'NOPE-1', 'QuantityInAssembly': 1},
+                                          {'MaterialStockNumber': 'NOPE-2', 'QuantityInAssembly': 1}])
+        self.assertIsNone(asm_id)
+        self.assertIn("'NOPE-1', 'NOPE-2'", msg)
+        asm_id, msg = ps.manage_assembly({'AssemblyItemNumber': 'ASM-BOX', 'AssemblyName': 'Box Kit'},
+                                         [{'MaterialStockNumber': 'ASM-ROOM', 'QuantityInAssembly': 1}], assembly_id=box_id)
+        self.assertIsNone(asm_id)
+        self.assertIn("cycle", msg)
+
+        requirements, _ = ps.explode_assembly_bom(room_id, quantity=2)
+        totals = {r['MaterialStockNumber']: r['TotalQuantity'] for r in requirements}
+        self.assertEqual(totals, {'BOM-BOX': 8.0, 'BOM-RING': 8.0, 'BOM-WIRE': 80.0})
+        _, components = ps.get_assembly_details_by_item_number('ASM-ROOM')
+        self.assertEqual([(c['MaterialStockNumber'], c['IsSubAssembly']) for c in components],
+                         [('ASM-BOX', 1), ('BOM-WIRE', 0)])
+
+        project_a = self._create_dummy_project("BOM Project A")
+        project_b = self._create_dummy_project("BOM Project B")
+        ps.create_production_assembly_order(room_id, project_a, 1)
+        ps.create_production_assembly_order(box_id, project_a, 2)
+        ps.create_production_assembly_order(box_id, project_b, 3)
+        _, _, done_id = ps.create_production_assembly_order(room_id, project_b, 10)
+        self.db_manager.execute_query("UPDATE Production_Assembly_Tracking SET Status = 'Completed' WHERE ProductionID = ?",
+                                      (done_id,), commit=True)
+
+        df = ps.get_project_material_requirements()
+        got = {(r.ProjectID, r.MaterialStockNumber): r.RequiredQuantity for r in df.itertuples()}
+        self.assertEqual(got[(project_a, 'BOM-WIRE')], 50.0) # 40 + 2*5
+        self.assertEqual(got[(project_a, 'BOM-BOX')], 6.0)
+        self.assertEqual(got[(project_b, 'BOM-WIRE')], 15.0)
+        self.assertEqual(len(ps.get_project_material_requirements(project_b)), 3)
+
+        # Editing a sub-assembly's components invalidates the memoized explosions
+        ps.manage_assembly({'AssemblyItemNumber': 'ASM-BOX', 'AssemblyName': 'Box Kit'},
+                           [{'MaterialStockNumber': 'BOM-BOX', 'QuantityInAssembly': 1}], assembly_id=box_id)
+        requirements, _ = ps.explode_assembly_bom(room_id)
+        self.assertEqual({r['MaterialStockNumber']: r['TotalQuantity'] for r in requirements},
+                         {'BOM-BOX': 4.0, 'BOM-WIRE': 20.0})
+
+    def test_assembly_bom_migration_moves_sub_assemblies_to_child_assembly_id(self):
+        for table in ("Production_Assembly_Tracking", "AssemblyComponents", "Assemblies"):
+            self.db_manager.execute_query(f"DELETE FROM {table}", commit=True)
+        self.db_manager.execute_query("DELETE FROM Materials WHERE StockNumber = 'MIG-WIRE'", commit=True)
+        self.db_manager.execute_query(
+            "INSERT INTO Materials (StockNumber, MaterialName, UnitOfMeasure) VALUES ('MIG-WIRE', 'Wire', 'FT')", commit=True)
+        revision = self.project_startup._get_bom_revision()
+        inner_id = self.db_manager.execute_query(
+            "INSERT INTO Assemblies (AssemblyItemNumber, AssemblyName) VALUES ('MIG-INNER', 'Inner')", commit=True).lastrowid
+        outer_id = self.db_manager.execute_query(
+            "INSERT INTO Assemblies (AssemblyItemNumber, AssemblyName) VALUES ('MIG-OUTER', 'Outer')", commit=True).lastrowid
+        self.assertEqual(self.project_startup._get_bom_revision(), revision + 2, "Adding assemblies bumps the BOM revision.")
+
+        # Recreate the pre-ChildAssemblyID table, where sub-assemblies were stored by item number
+        conn = self.db_manager.get_connection()
+        conn.executescript("""
+            DROP TABLE AssemblyComponents;
+            CREATE TABLE AssemblyComponents (
+                AssemblyComponentID INTEGER PRIMARY KEY AUTOINCREMENT, AssemblyID INTEGER NOT NULL,
+                MaterialStockNumber TEXT NOT NULL, QuantityInAssembly REAL NOT NULL, UnitOfMeasure TEXT NULL,
+                DateCreated TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP, LastModifiedDate TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+            );
+        """)
+        conn.executemany("INSERT INTO AssemblyComponents (AssemblyID, MaterialStockNumber, QuantityInAssembly) VALUES (?, ?, ?)",
+                         [(inner_id, 'MIG-WIRE', 3), (outer_id, 'MIG-INNER', 2)])
+        conn.commit()
+
+        self.db_manager._ensure_assembly_bom_schema()
+        rows = self.db_manager.execute_query(
+            "SELECT AssemblyID, MaterialStockNumber, ChildAssemblyID FROM AssemblyComponents ORDER BY AssemblyComponentID",
+            fetch_all=True)
+        self.assertEqual([tuple(r) for r in rows], [(inner_id, 'MIG-WIRE', None), (outer_id, None, inner_id)])
+        requirements, _ = self.project_startup.explode_assembly_bom(outer_id)
+        self.assertEqual([(r['MaterialStockNumber'], r['TotalQuantity']) for r in requirements], [('MIG-WIRE', 6.0)])
+
+        revision = self.project_startup._get_bom_revision()
+        self.db_manager.execute_query("DELETE FROM AssemblyComponents", commit=True)
+        self.db_manager.execute_query("DELETE FROM Assemblies", commit=True)
+        self.assertEqual(self.project_startup._get_bom_revision(), revision + 4,
+                         "Component triggers are recreated and deleting assemblies bumps the revision.")
+
+    def test_prefab_scheduler_capacity_due_dates_and_incremental_reschedule(self):
+        from prefab_scheduling import PrefabScheduler
+        for table in ("ProductionSchedule", "ShopEmployeeAvailability", "Production_Assembly_Tracking",
+                      "AssemblyComponents", "Assemblies"):
+            self.db_manager.execute_query(f"DELETE FROM {table}", commit=True)
+        self.db_manager.execute_query("DELETE FROM Materials WHERE StockNumber LIKE 'SCH-%'", commit=True)
+        self.db_manager.execute_query(
+            "INSERT INTO Materials (StockNumber, MaterialName, UnitOfMeasure, Labor1) VALUES ('SCH-PIPE', 'Pipe', 'EA', 0.5)",
+            commit=True
+        )
+        employee_ids = []
+        for name in ("Shop A", "Shop B"):
+            cursor = self.db_manager.execute_query(
+                "INSERT INTO Employees (FirstName, LastName, DepartmentArea) VALUES (?, 'Tech', 'Prefab')", (name,), commit=True
+            )
+            employee_ids.append(cursor.lastrowid)
+        # Shop B is out on the first Monday
+        self.db_manager.execute_query(
+            "INSERT INTO ShopEmployeeAvailability (EmployeeID, AvailabilityDate, AvailableHours) VALUES (?, '2025-03-03', 0)",
+            (employee_ids[1],), commit=True
+        )
+        ps = self.project_startup
+        kit_id, msg = ps.manage_assembly({'AssemblyItemNumber': 'SCH-KIT', 'AssemblyName': 'Pipe Kit'},
+                                         [{'MaterialStockNumber': 'SCH-PIPE', 'QuantityInAssembly': 4}])
+        self.assertIsNotNone(kit_id, msg) # 2 shop hours per kit
+        _, _, urgent = ps.create_production_assembly_order(kit_id, None, 8, completion_date="2025-03-04") # 16 h
+        _, _, later = ps.create_production_assembly_order(kit_id, None, 4, completion_date="2025-03-20") # 8 h
+        _, _, pinned = ps.create_production_assembly_order(kit_id, None, 2, assigned_to_employee_id=employee_ids[1]) # 4 h
+
+        scheduler = PrefabScheduler(self.db_manager, ps)
+        schedule, msg = scheduler.schedule_shop(start_date="2025-03-03", employee_ids=employee_ids)
+        self.assertIsNotNone(schedule, msg)
+        rows = schedule.set_index('ProductionID')
+        self.assertEqual(list(schedule['ProductionID']), [urgent, later, pinned]) # Earliest due date first
+        self.assertEqual(rows.loc[urgent, 'ScheduledEmployeeID'], employee_ids[0])
+        self.assertEqual((rows.loc[urgent, 'ScheduledStartDate'], rows.loc[urgent, 'ScheduledEndDate']), ("2025-03-03", "2025-03-04"))
+        self.assertFalse(rows.loc[urgent, 'IsLate'])
+        # Shop A is busy until Tuesday night, so Shop B (back on Tuesday) takes the next order
+        self.assertEqual(rows.loc[later, 'ScheduledEmployeeID'], employee_ids[1])
+        self.assertEqual(rows.loc[later, 'ScheduledStartDate'], "2025-03-04")
+        self.assertEqual(rows.loc[pinned, 'ScheduledEmployeeID'], employee_ids[1])
+        self.assertEqual(rows.loc[pinned, 'ScheduledStartDate'], "2025-03-05")
+        self.assertEqual(len(scheduler.get_production_schedule()), 3)
+
+        # Pulling the later order's due date ahead of the urgent one moves it to the front of the queue
+        self.db_manager.execute_query("UPDATE Production_Assembly_Tracking SET CompletionDate = '2025-03-03' WHERE ProductionID = ?",
+                                      (later,), commit=True)
+        changed, msg = scheduler.reschedule_order(later)
+        self.assertEqual(len(changed), 3, msg)
+        incremental = scheduler.get_production_schedule().drop(columns=['LastScheduled', 'Status'])
+        full, _ = PrefabScheduler(self.db_manager, ps).schedule_shop(start_date="2025-03-03", employee_ids=employee_ids)
+        full_persisted = scheduler.get_production_schedule().drop(columns=['LastScheduled', 'Status'])
+        pd.testing.assert_frame_equal(incremental, full_persisted)
+        self.assertEqual(list(full['ProductionID']), [later, urgent, pinned])
+        rows = full.set_index('ProductionID')
+        self.assertEqual((rows.loc[later, 'ScheduledEmployeeID'], rows.loc[later, 'ScheduledEndDate']), (employee_ids[0], "2025-03-03"))
+        self.assertTrue(rows.loc[urgent, 'IsLate']) # Now finishes Wednesday, after its Tuesday due date
+
+        # Completing an order through ProjectStartup removes it from the schedule
+        success, msg = ps.update_production_order(urgent, status='Completed')
+        self.assertTrue(success, msg)
+        self.assertEqual(list(scheduler.get_production_schedule()['ProductionID']), [later, pinned])
+
+        # New orders and quantity changes are scheduled as they are written
+        _, _, added = ps.create_production_assembly_order(kit_id, None, 1, completion_date="2025-03-10")
+        self.assertEqual(list(scheduler.get_production_schedule()['ProductionID']), [later, added, pinned])
+        ps.update_production_order(added, quantity_to_produce=3)
+        hours = scheduler.get_production_schedule().set_index('ProductionID').loc[added, 'LaborHours']
+        self.assertEqual(hours, 6.0)
+
+    def test_consolidate_material_requests_into_vendor_purchase_orders(self):
+        for table in ("Purchasing_Log", "PurchaseOrderLineItems", "PurchaseOrders"):
+            self.db_manager.execute_query(f"DELETE FROM {table}", commit=True)
+        self.db_manager.execute_query("DELETE FROM Materials WHERE StockNumber LIKE 'PO-%'", commit=True)
+        vendor_ids = []
+        for name in ("Consolidation Supply A", "Consolidation Supply B"):
+            self.db_manager.execute_query("DELETE FROM Vendors WHERE VendorName = ?", (name,), commit=True)
+            vendor_ids.append(self.db_manager.execute_query(
+                "INSERT INTO Vendors (VendorName) VALUES (?)", (name,), commit=True).lastrowid)
+        for stock_number, vendor_id, cost in (("PO-WIRE", vendor_ids[0], 0.5), ("PO-BOX", vendor_ids[0], 2.0),
+                                              ("PO-LUG", vendor_ids[1], 1.0), ("PO-ORPHAN", None, 1.0)):
+            self.db_manager.execute_query(
+                "INSERT INTO Materials (StockNumber, MaterialName, UnitOfMeasure, DefaultCost, PreferredVendorID) VALUES (?, ?, 'EA', ?, ?)",
+                (stock_number, stock_number.title(), cost, vendor_id), commit=True
+            )
+        project_id = self._create_dummy_project("Consolidation Project")
+        ps = self.project_startup
+        requests = [
+            ("PO-WIRE - Po-Wire", 100, "2025-03-04"), ("PO-WIRE", 50, "2025-03-06"), # same vendor/window -> one line
+            ("PO-BOX", 10, "2025-03-05"),                                           # same PO, second line
+            ("PO-WIRE", 30, "2025-03-20"),                                          # later window -> second PO
+            ("PO-LUG", 4, "2025-03-04"),                                            # other vendor -> own PO
+            ("PO-ORPHAN", 1, "2025-03-04"), ("Misc fittings", 1, "2025-03-04"),     # left open
+        ]
+        log_ids = [ps.add_material_request(project_id, 1, desc, qty, None, required_by_date=date)[2]
+                   for desc, qty, date in requests]
+
+        preview, msg = ps.consolidate_material_requests(window_days=7, anchor_date="2025-03-03", dry_run=True)
+        self.assertEqual(len(preview), 4, msg)
+        self.assertEqual(self.db_manager.execute_query("SELECT COUNT(*) FROM PurchaseOrders", fetch_one=True)[0], 0)
+
+        # A missing 'Draft' order status fails loudly instead of writing POs without a status
+        self.db_manager.execute_query("UPDATE OrderStatuses SET StatusName = 'Draft (renamed)' WHERE StatusName = ?",
+                                      (constants.ORDER_STATUS_DRAFT,), commit=True)
+        try:
+            lines, msg = ps.consolidate_material_requests(window_days=7, anchor_date="2025-03-03")
+        finally:
+            self.db_manager.execute_query("UPDATE OrderStatuses SET StatusName = ? WHERE StatusName = 'Draft (renamed)'",
+                                          (constants.ORDER_STATUS_DRAFT,), commit=True)
+        self.assertIsNone(lines)
+        self.assertIn(constants.ORDER_STATUS_DRAFT, msg)
+        self.assertEqual(self.db_manager.execute_query("SELECT COUNT(*) FROM PurchaseOrders", fetch_one=True)[0], 0)
+
+        lines, msg = ps.consolidate_material_requests(window_days=7, anchor_date="2025-03-03")
+        self.assertIsNotNone(lines, msg)
+        self.assertEqual(lines['PONumber'].nunique(), 3, msg)
+        wire = lines[(lines['StockNumber'] == 'PO-WIRE') & (lines['QuantityOrdered'] == 150)].iloc[0]
+        self.assertEqual((wire['VendorID'], wire['RequestCount'], wire['LineTotal']), (vendor_ids[0], 2, 75.0))
+        self.assertEqual(len(lines[lines['PONumber'] == wire['PONumber']]), 2)
+        po = self.db_manager.execute_query("SELECT * FROM PurchaseOrders WHERE PurchaseOrderID = ?",
+                                           (int(wire['PurchaseOrderID']),), fetch_one=True)
+        self.assertEqual((po['ProjectID'], po['Subtotal'], po['ExpectedDeliveryDate']), (project_id, 95.0, "2025-03-04"))
+
+        logged = {row['InternalLogID']: dict(row) for row in self.db_manager.execute_query(
+            "SELECT InternalLogID, Status, AssociatedPOLineItemID FROM Purchasing_Log", fetch_all=True)}
+        self.assertEqual(logged[log_ids[0]]['AssociatedPOLineItemID'], logged[log_ids[1]]['AssociatedPOLineItemID'])
+        self.assertEqual(logged[log_ids[0]]['Status'], 'PO Issued')
+        self.assertIsNone(logged[log_ids[5]]['AssociatedPOLineItemID'])
+        self.assertEqual(logged[log_ids[6]]['Status'], 'Requested')
+
+        # Linked requests are not consolidated twice
+        lines, msg = ps.consolidate_material_requests(window_days=7, anchor_date="2025-03-03")
+        self.assertTrue(lines.empty, msg)
+
+    def test_add_design_drawing_stores_content_addressed_and_dedupes(self):
+        import tempfile, hashlib
+        from document_store import DocumentStore
+        with tempfile.TemporaryDirectory() as tmp:
+            original_store = self.project_startup._document_store
+            self.project_startup._document_store = DocumentStore(os.path.join(tmp, 'store'))
+            try:
+                drawing = os.path.join(tmp, 'E-101 Lighting.dwg')
+                with open(drawing, 'wb') as f:
+                    f.write(b'drawing-bytes' * 1000)
+                project_a = self._create_dummy_project("Store Project A")
+                project_b = self._create_dummy_project("Store Project B")
+
+                doc_a, msg = self.project_startup.add_design_drawing(project_a, "E-101", drawing, 1)
+                self.assertIsNotNone(doc_a, msg)
+                doc_b, _ = self.project_startup.add_design_drawing(project_b, "E-101 (copy)", drawing, 1)
+                info_a = self.project_startup.get_document_file_info(doc_a)
+                info_b = self.project_startup.get_document_file_info(doc_b)
+
+                self.assertEqual(info_a['ContentHash'], hashlib.sha256(b'drawing-bytes' * 1000).hexdigest())
+                self.assertEqual(info_a['ContentHash'], info_b['ContentHash'])
+                self.assertEqual((info_a['FileSizeBytes'], info_a['OriginalFilePath']), (13000, drawing))
+                self.assertNotEqual(info_a['FilePath'], info_b['FilePath']) # Per-project names...
+                self.assertTrue(os.path.samefile(info_a['FilePath'], info_b['FilePath'])) # ...one stored copy
+                self.assertEqual(self.project_startup._document_store.disk_usage_bytes(), 13000)
+
+                # A URL is recorded as given
+                doc_url, _ = self.project_startup.add_design_drawing(project_a, "Spec", "https://example.com/spec.pdf", 1)
+                self.assertIsNone(self.project_startup.get_document_file_info(doc_url)['ContentHash'])
+            finally:
+                self.project_startup._document_store = original_store
+
+
 if __name__ == '__main__':
     unittest.main()
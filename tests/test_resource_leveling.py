@@ -0,0 +1,67 @@
+import unittest
+import os
+import sys
+
+# Add the parent directory (project_management_system) to sys.path
+# to allow imports of modules like project_startup, database_manager, etc.
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from tests.db_test_case import DatabaseTestCase
+
+class TestResourceLeveling(DatabaseTestCase):
+
+    def test_resource_leveling_shifts_within_float_across_projects(self):
+        from resource_leveling import ResourceLeveler
+        from cpm_scheduling import CPMScheduler
+        active_id = self.db_manager.execute_query("SELECT ProjectStatusID FROM ProjectStatuses WHERE StatusName = 'Active'", fetch_one=True)[0]
+        project_a, _ = self.project_startup.create_project("Leveling A", "2025-03-03", "2025-03-31", 20)
+        project_b, _ = self.project_startup.create_project("Leveling B", "2025-03-03", "2025-03-31", 20)
+        self.db_manager.execute_query("UPDATE Projects SET ProjectStatusID = ? WHERE ProjectID IN (?, ?)",
+                                      (active_id, project_a, project_b), commit=True)
+
+        def add_task(project_id, hours, predecessor_id=None):
+            return self.db_manager.execute_query(
+                "INSERT INTO Tasks (ProjectID, TaskType, Description, EstimatedHours, PredecessorTaskID) VALUES (?, 'Work', 'Leveling', ?, ?)",
+                (project_id, hours, predecessor_id), commit=True
+            ).lastrowid
+        def add_employee(name):
+            return self.db_manager.execute_query("INSERT INTO Employees (FirstName, LastName) VALUES (?, 'Leveling')", (name,), commit=True).lastrowid
+        rough_in = add_task(project_a, 16)
+        pull_wire = add_task(project_a, 24, predecessor_id=rough_in)
+        panel = add_task(project_a, 8) # 4 days of float
+        feeders = add_task(project_b, 24)
+        cpm = CPMScheduler(self.db_manager)
+        for project_id in (project_a, project_b):
+            cpm.calculate_schedule(project_id)
+        electrician, foreman = add_employee("Electrician"), add_employee("Foreman")
+        for task_id, employee_id, start, end in [(rough_in, electrician, None, None), (panel, electrician, '2025-03-03', '2025-03-03'),
+                                                 (pull_wire, foreman, None, None), (feeders, foreman, None, None)]:
+            self.db_manager.execute_query(
+                "INSERT INTO ResourceAssignments (TaskID, EmployeeID, AssignmentStartDate, AssignmentEndDate) VALUES (?, ?, ?, ?)",
+                (task_id, employee_id, start, end), commit=True
+            )
+
+        leveler = ResourceLeveler(self.db_manager, cpm_scheduler_instance=cpm)
+        projects = [project_a, project_b]
+        histogram = leveler.get_resource_histogram(projects)
+        self.assertEqual(list(histogram.loc[('Employee', foreman)]), [1, 1, 2, 1, 1])
+        overallocated = leveler.find_overallocations(projects)
+        self.assertEqual(list(zip(overallocated['ResourceID'], overallocated['StartDate'], overallocated['PeakLoad'])),
+                         [(electrician, '2025-03-03', 2), (foreman, '2025-03-05', 2)])
+
+        # The panel moves into its float; the foreman's clash is between two critical tasks and is only reported
+        proposals, message = leveler.level_resources(projects, apply=True)
+        self.assertEqual(list(zip(proposals['TaskID'], proposals['LeveledStart'], proposals['ShiftDays'])), [(panel, '2025-03-05', 2)])
+        self.assertIn("1 tasks still overallocated", message)
+        row = self.db_manager.execute_query(
+            "SELECT r.EarlyStart, ra.AssignmentStartDate FROM TaskCPMResults r JOIN ResourceAssignments ra ON ra.TaskID = r.TaskID WHERE r.TaskID = ?",
+            (panel,), fetch_one=True
+        )
+        self.assertEqual((row['EarlyStart'], row['AssignmentStartDate']), ('2025-03-05', '2025-03-05'))
+        self.assertEqual(list(leveler.find_overallocations(projects)['ResourceID']), [foreman])
+
+
+if __name__ == '__main__':
+    unittest.main()
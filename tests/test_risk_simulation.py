@@ -0,0 +1,64 @@
+import unittest
+import os
+import sys
+
+# Add the parent directory (project_management_system) to sys.path
+# to allow imports of modules like project_startup, database_manager, etc.
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from tests.db_test_case import DatabaseTestCase
+
+class TestRiskSimulation(DatabaseTestCase):
+
+    def test_risk_simulation_reproducible_percentiles_and_eac(self):
+        from risk_simulation import RiskSimulator
+        from exceptions import AppValidationError
+        project_id, _ = self.project_startup.create_project("Risk Project", "2025-03-03", "2025-03-07", 5)
+        first = self.db_manager.execute_query(
+            "INSERT INTO Tasks (ProjectID, TaskType, Description, EstimatedHours) VALUES (?, 'Work', 'Rough-in', 16)", (project_id,), commit=True
+        ).lastrowid
+        second = self.db_manager.execute_query(
+            "INSERT INTO Tasks (ProjectID, TaskType, Description, EstimatedHours, PredecessorTaskID) VALUES (?, 'Work', 'Trim', 24, ?)",
+            (project_id, first), commit=True
+        ).lastrowid
+        wbs_id = self._create_dummy_wbs_element(project_id, wbs_code="R-1", estimated_cost=1000.0)
+        self.db_manager.execute_query(
+            "INSERT INTO actual_costs (ProjectID, WBSElementID, CostCategory, Description, Amount, TransactionDate) VALUES (?, ?, 'Labor', 'Week 1', 600, '2025-03-04')",
+            (project_id, wbs_id), commit=True
+        )
+        self.db_manager.execute_query(
+            "INSERT INTO progress_updates (ProjectID, WBSElementID, CompletionPercentage, UpdateDate) VALUES (?, ?, 50, '2025-03-04')",
+            (project_id, wbs_id), commit=True
+        )
+        simulator = RiskSimulator(self.db_manager)
+
+        # Certain durations reproduce the CPM finish exactly
+        simulator.set_task_duration_estimate(first, 2, 2, 2)
+        simulator.set_task_duration_estimate(second, 3, 3, 3)
+        summary, _ = simulator.simulate(project_id, iterations=500, seed=1)
+        self.assertEqual((summary['deterministic_finish_date'], summary['p80_finish_date']), ('2025-03-07', '2025-03-07'))
+        self.assertEqual(summary['on_time_probability'], 1.0)
+
+        simulator.set_task_duration_estimate(second, 2, 3, 8)
+        simulator.set_wbs_cost_estimate(wbs_id, 800, 1000, 1400)
+        summary, _ = simulator.simulate(project_id, iterations=3000, seed=7)
+        self.assertLess(summary['on_time_probability'], 1.0)
+        self.assertGreaterEqual(summary['p80_finish_date'], summary['p50_finish_date'])
+        # EAC = 600 spent + the unfinished half of an 800..1400 cost at completion
+        self.assertTrue(((summary['eac'] >= 1000) & (summary['eac'] <= 1300)).all())
+        self.assertEqual(summary['on_budget_probability'], (summary['eac'] <= 1000).mean())
+
+        repeat, _ = simulator.simulate(project_id, iterations=3000, seed=7, workers=2)
+        self.assertTrue((repeat['finish_days'] == summary['finish_days']).all())
+        self.assertTrue((repeat['eac'] == summary['eac']).all())
+        with self.assertRaises(AppValidationError):
+            simulator.set_task_duration_estimate(first, 3, 2, 4)
+        # Database errors are reported instead of claiming the estimate was saved
+        self.assertFalse(simulator.set_task_duration_estimate('no-such-task', 1, 2, 3)[0])
+        self.assertFalse(simulator.set_wbs_cost_estimate('no-such-wbs', 1, 2, 3)[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
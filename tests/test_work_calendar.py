@@ -0,0 +1,45 @@
+import unittest
+import os
+import sys
+
+# Add the parent directory (project_management_system) to sys.path
+# to allow imports of modules like project_startup, database_manager, etc.
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from tests.db_test_case import DatabaseTestCase
+
+class TestWorkCalendar(DatabaseTestCase):
+
+    def test_work_calendars_named_inherited_and_vectorized(self):
+        import numpy as np
+        from work_calendar import CalendarManager, CALENDAR_TYPE_PROJECT, CALENDAR_TYPE_CREW
+        from exceptions import AppOperationConflictError
+        from utils import calculate_end_date
+        self.db_manager.execute_query("DELETE FROM WorkCalendars", commit=True)
+        calendars = CalendarManager(self.db_manager)
+        project_id = self._create_dummy_project("Calendar Project")
+
+        company = calendars.get_calendar() # Created on first use with the standard holidays
+        self.assertTrue(company.is_working_day('2025-07-03')[0])
+        self.assertFalse(company.is_working_day('2025-07-04')[0])
+
+        calendars.create_calendar("Calendar Project", CALENDAR_TYPE_PROJECT, project_id=project_id)
+        calendars.add_holidays("Calendar Project", [('2025-07-07', 'Site shutdown')])
+        project_calendar = calendars.get_project_calendar(project_id)
+        # Inherits July 4th from the company calendar and adds its own shutdown day
+        self.assertEqual(calculate_end_date('2025-07-03', 2, calendar=project_calendar), '2025-07-08')
+        self.assertEqual(calculate_end_date('2025-07-03', 2, calendar=company), '2025-07-07')
+
+        calendars.create_calendar("Weekend Crew", CALENDAR_TYPE_CREW, working_days=[5, 6])
+        crew = calendars.get_calendar("Weekend Crew")
+        self.assertEqual(list(crew.end_dates(np.array(['2025-07-04', '2025-07-07'], dtype='datetime64[D]'), [3, 1]).astype(str)),
+                         ['2025-07-12', '2025-07-12'])
+        self.assertEqual(list(crew.count('2025-07-01', ['2025-07-31', '2025-06-30'])), [8, 0])
+        with self.assertRaises(AppOperationConflictError):
+            calendars.create_calendar("Weekend Crew", CALENDAR_TYPE_CREW)
+
+
+if __name__ == '__main__':
+    unittest.main()
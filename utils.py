@@ -1,21 +1,33 @@
 import datetime
 
-# Placeholder for holidays - this will be populated or made configurable later
-HOLIDAYS = [
-    datetime.date(2024, 1, 1),   # New Year's Day
-    datetime.date(2024, 7, 4),   # Independence Day
-    datetime.date(2024, 12, 25), # Christmas Day
-]
+import numpy as np
+
+from configuration import Config
+from work_calendar import WorkCalendar, standard_holidays
+
+# Defaults when no holidays/working days or calendar are passed; named calendars live in the
+# database (see work_calendar.CalendarManager)
+HOLIDAYS = standard_holidays(Config.CALENDAR_HOLIDAY_YEARS)
 
 # Default: Monday to Friday (0=Monday, 6=Sunday)
-WORKING_DAYS = [0, 1, 2, 3, 4]
+WORKING_DAYS = list(Config.DEFAULT_WORKING_DAYS)
+
+_default_calendar = None
+
+
+def _get_default_calendar():
+    global _default_calendar
+    if _default_calendar is None:
+        _default_calendar = WorkCalendar("Default", WORKING_DAYS, HOLIDAYS)
+    return _default_calendar
 
 
 def calculate_end_date(
     start_date_str: str,
     duration_days: int,
     holidays: list[datetime.date] = None,
-    working_days: list[int] = None
+    working_days: list[int] = None,
+    calendar: WorkCalendar = None
 ) -> str:
     """
     Calculates the end date based on a start date, duration in days,
@@ -26,51 +38,34 @@ def calculate_end_date(
         duration_days: Duration in working days.
         holidays: List of holiday dates. Defaults to global HOLIDAYS.
         working_days: List of working day numbers (0-6). Defaults to global WORKING_DAYS.
+        calendar: WorkCalendar to use instead of holidays/working_days (e.g. a project calendar).
 
     Returns:
         Calculated end date in 'YYYY-MM-DD', or an error message.
     """
-    holidays = holidays if holidays is not None else HOLIDAYS
-    working_days = working_days if working_days is not None else WORKING_DAYS
-
-    if not all(0 <= day <= 6 for day in working_days):
+    if working_days is not None and not (working_days and all(0 <= day <= 6 for day in working_days)):
         return "Error: Invalid working_days configuration (must be 0-6)."
     if duration_days < 0:
         return "Error: Duration must be non-negative."
 
     try:
-        current_date = datetime.datetime.strptime(start_date_str, "%Y-%m-%d").date()
+        start_date = datetime.datetime.strptime(start_date_str, "%Y-%m-%d").date()
     except ValueError:
         return "Error: Invalid start_date format. Please use YYYY-MM-DD."
 
-    # Handle zero duration: if start_date is not a working day/holiday, find the next valid one.
-    # Otherwise, the end date is the start date itself.
-    if duration_days == 0:
-        # Adjust current_date to be the first valid working day if it's not already
-        while not (current_date.weekday() in working_days and current_date not in holidays):
-            current_date += datetime.timedelta(days=1)
-        return current_date.strftime("%Y-%m-%d")
-
-    # For positive duration, count working days including the start date if it's valid
-    calculated_end_date = current_date
-    days_counted = 0
-
-    while days_counted < duration_days:
-        if calculated_end_date.weekday() in working_days and \
-           calculated_end_date not in holidays:
-            days_counted += 1
-
-        if days_counted < duration_days:
-            calculated_end_date += datetime.timedelta(days=1)
-            # Skip non-working days and holidays efficiently for the next iteration
-            while not (calculated_end_date.weekday() in working_days and \
-                       calculated_end_date not in holidays):
-                # This inner loop check is to prevent infinite loop if duration is too large
-                # and all subsequent days are non-working (highly unlikely in practice with typical setup)
-                # However, the primary loop condition (days_counted < duration_days) will handle termination.
-                calculated_end_date += datetime.timedelta(days=1)
-
-    return calculated_end_date.strftime("%Y-%m-%d")
+    if calendar is None:
+        if holidays is None and working_days is None:
+            calendar = _get_default_calendar()
+        else:
+            calendar = WorkCalendar(
+                "Custom",
+                working_days if working_days is not None else WORKING_DAYS,
+                holidays if holidays is not None else HOLIDAYS
+            )
+
+    # The start day counts when it's a working day; a zero duration rolls to the next working day
+    end_date = calendar.end_dates(np.datetime64(start_date, 'D'), duration_days)[0]
+    return str(end_date)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,302 @@
+"""
+Working-day calendars for scheduling.
+
+WorkCalendar wraps a numpy busdaycalendar (working weekdays plus a holiday set) and does
+business-day arithmetic over whole arrays of dates at once. CalendarManager stores named
+calendars in the database: the company calendar, per-project calendars and crew calendars.
+Project and crew calendars can name a parent calendar whose holidays they inherit.
+"""
+import logging
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from configuration import Config
+from exceptions import AppValidationError, AppOperationConflictError
+
+logger = logging.getLogger(__name__)
+
+CALENDAR_TYPE_COMPANY = 'Company'
+CALENDAR_TYPE_PROJECT = 'Project'
+CALENDAR_TYPE_CREW = 'Crew'
+CALENDAR_TYPES = (CALENDAR_TYPE_COMPANY, CALENDAR_TYPE_PROJECT, CALENDAR_TYPE_CREW)
+
+
+def _observed(day):
+    """US observance rule: Saturday holidays move to Friday, Sunday holidays to Monday."""
+    if day.weekday() == 5:
+        return day - timedelta(days=1)
+    if day.weekday() == 6:
+        return day + timedelta(days=1)
+    return day
+
+
+def standard_holidays(years):
+    """
+    Observed company holidays for the given years: New Year's Day, Memorial Day, Independence
+    Day, Labor Day, Thanksgiving and Christmas. Returns a sorted list of datetime.date.
+    """
+    holidays = []
+    for year in years:
+        may_31 = date(year, 5, 31)
+        sept_1 = date(year, 9, 1)
+        nov_1 = date(year, 11, 1)
+        holidays.extend([
+            _observed(date(year, 1, 1)),
+            may_31 - timedelta(days=may_31.weekday()), # Last Monday of May
+            _observed(date(year, 7, 4)),
+            sept_1 + timedelta(days=(7 - sept_1.weekday()) % 7), # First Monday of September
+            nov_1 + timedelta(days=(3 - nov_1.weekday()) % 7 + 21), # Fourth Thursday of November
+            _observed(date(year, 12, 25)),
+        ])
+    return sorted(holidays)
+
+
+def to_day_array(values):
+    """Converts a date, 'YYYY-MM-DD' string or sequence/Series of them to a datetime64[D] array."""
+    if isinstance(values, (str, date, np.datetime64)):
+        values = [values]
+    if isinstance(values, pd.Series):
+        values = values.to_numpy()
+    try:
+        return np.asarray(pd.to_datetime(np.asarray(values)).to_numpy(), dtype='datetime64[D]')
+    except (ValueError, TypeError) as e:
+        raise AppValidationError(f"Invalid date value: {e}")
+
+
+class WorkCalendar:
+    """
+    Working weekdays and holidays, with vectorized business-day operations.
+    Every method accepts a single date or an array of dates and returns numpy arrays.
+    """
+
+    def __init__(self, name, working_days=None, holidays=()):
+        """
+        Args:
+            name (str): Calendar name.
+            working_days (iterable of int, optional): Working weekdays, 0=Monday..6=Sunday.
+                Defaults to Config.DEFAULT_WORKING_DAYS.
+            holidays (iterable): Non-working dates.
+        """
+        working_days = tuple(sorted(set(Config.DEFAULT_WORKING_DAYS if working_days is None else working_days)))
+        if not working_days or not all(0 <= day <= 6 for day in working_days):
+            raise AppValidationError("Working days must be weekday numbers 0 (Monday) to 6 (Sunday).")
+        self.name = name
+        self.working_days = working_days
+        self.weekmask = ''.join('1' if day in working_days else '0' for day in range(7))
+        holidays = list(holidays)
+        self.holidays = np.unique(to_day_array(holidays)) if holidays else np.array([], dtype='datetime64[D]')
+        self._busdaycal = np.busdaycalendar(weekmask=self.weekmask, holidays=self.holidays)
+
+    def __repr__(self):
+        return f"WorkCalendar({self.name!r}, weekmask={self.weekmask!r}, holidays={len(self.holidays)})"
+
+    def with_holidays(self, extra_holidays, name=None):
+        """Returns a copy of this calendar with more holidays, e.g. a one-off shutdown."""
+        return WorkCalendar(name or self.name, self.working_days, list(self.holidays) + list(extra_holidays))
+
+    def is_working_day(self, dates):
+        return np.is_busday(to_day_array(dates), busdaycal=self._busdaycal)
+
+    def offset(self, dates, working_days, roll='forward'):
+        """Moves each date by working_days working days (negative moves back). Non-working dates roll first."""
+        return np.busday_offset(to_day_array(dates), np.asarray(working_days, dtype=np.int64), roll=roll, busdaycal=self._busdaycal)
+
+    def end_dates(self, start_dates, durations):
+        """
+        Finish dates for tasks lasting `durations` working days, counting the start day when it
+        is a working day (a 1-day task finishes the day it starts). A start on a non-working day
+        moves to the next working day; a zero duration returns that day.
+        """
+        durations = np.asarray(durations, dtype=np.int64)
+        if (durations < 0).any():
+            raise AppValidationError("Duration must be non-negative.")
+        return self.offset(start_dates, np.maximum(durations - 1, 0))
+
+    def days_between(self, start_dates, end_dates):
+        """Working days from each start up to but not including each end date (negative when end precedes start)."""
+        return np.busday_count(to_day_array(start_dates), to_day_array(end_dates), busdaycal=self._busdaycal)
+
+    def count(self, start_dates, end_dates):
+        """Working days from each start to each end date, both inclusive (0 where end precedes start)."""
+        end_exclusive = to_day_array(end_dates) + np.timedelta64(1, 'D')
+        return np.maximum(np.busday_count(to_day_array(start_dates), end_exclusive, busdaycal=self._busdaycal), 0)
+
+
+class CalendarManager:
+    """
+    Stores and loads named working calendars (WorkCalendars / CalendarHolidays tables).
+
+    The company calendar (Config.COMPANY_CALENDAR_NAME) is created on first use with the
+    standard holidays for Config.CALENDAR_HOLIDAY_YEARS. Loaded calendars are cached until a
+    calendar is changed through this manager.
+    """
+
+    def __init__(self, db_m_instance):
+        if db_m_instance is None:
+            raise ValueError("DatabaseManager instance is required for CalendarManager.")
+        self.db_manager = db_m_instance
+        self._calendars = {} # CalendarName -> WorkCalendar
+        logger.info("CalendarManager initialized with provided db_manager.")
+
+    def invalidate_cache(self):
+        self._calendars = {}
+
+    def _get_calendar_row(self, calendar_name):
+        return self.db_manager.execute_query(
+            "SELECT CalendarID, CalendarName, CalendarType, ProjectID, ParentCalendarID, WorkingDays "
+            "FROM WorkCalendars WHERE CalendarName = ?", (calendar_name,), fetch_one=True
+        )
+
+    def ensure_company_calendar(self):
+        """Creates the company calendar with the standard holidays if it doesn't exist. Returns its CalendarID."""
+        row = self._get_calendar_row(Config.COMPANY_CALENDAR_NAME)
+        if row:
+            return row['CalendarID']
+        calendar_id, _ = self.create_calendar(Config.COMPANY_CALENDAR_NAME, CALENDAR_TYPE_COMPANY)
+        self.add_holidays(Config.COMPANY_CALENDAR_NAME,
+                          [(day, None) for day in standard_holidays(Config.CALENDAR_HOLIDAY_YEARS)])
+        logger.info(f"Created company calendar '{Config.COMPANY_CALENDAR_NAME}' with standard holidays.")
+        return calendar_id
+
+    def create_calendar(self, calendar_name, calendar_type=CALENDAR_TYPE_COMPANY, working_days=None,
+                        project_id=None, parent_calendar_name=None):
+        """
+        Creates a named calendar.
+        Args:
+            calendar_name (str): Unique name, e.g. 'Project 12' or 'Night Crew'.
+            calendar_type (str): One of CALENDAR_TYPES.
+            working_days (iterable of int, optional): 0=Monday..6=Sunday; defaults to Config.DEFAULT_WORKING_DAYS.
+            project_id (int, optional): Owning project, for project calendars.
+            parent_calendar_name (str, optional): Calendar whose holidays are inherited. Project and
+                crew calendars default to the company calendar.
+        Returns:
+            tuple: (CalendarID, message).
+        Raises:
+            AppValidationError: For an empty name, unknown type, bad working days or missing parent.
+            AppOperationConflictError: If the name is taken.
+        """
+        if not calendar_name or not str(calendar_name).strip():
+            raise AppValidationError("Calendar name is required.")
+        if calendar_type not in CALENDAR_TYPES:
+            raise AppValidationError(f"Calendar type must be one of: {', '.join(CALENDAR_TYPES)}.")
+        weekmask = WorkCalendar(calendar_name, working_days).weekmask # Validates working_days
+        if self._get_calendar_row(calendar_name):
+            raise AppOperationConflictError(f"A calendar named '{calendar_name}' already exists.")
+
+        parent_id = None
+        if parent_calendar_name is None and calendar_type != CALENDAR_TYPE_COMPANY:
+            parent_id = self.ensure_company_calendar()
+        elif parent_calendar_name is not None:
+            parent_row = self._get_calendar_row(parent_calendar_name)
+            if not parent_row:
+                raise AppValidationError(f"Parent calendar '{parent_calendar_name}' not found.")
+            parent_id = parent_row['CalendarID']
+
+        cursor = self.db_manager.execute_query(
+            "INSERT INTO WorkCalendars (CalendarName, CalendarType, ProjectID, ParentCalendarID, WorkingDays) VALUES (?, ?, ?, ?, ?)",
+            (calendar_name, calendar_type, project_id, parent_id, weekmask), commit=True
+        )
+        self.invalidate_cache()
+        return cursor.lastrowid, f"Calendar '{calendar_name}' created."
+
+    def add_holidays(self, calendar_name, holidays):
+        """
+        Adds holidays to a calendar, ignoring dates it already has.
+        Args:
+            holidays (iterable): Dates, or (date, description) tuples.
+        Returns:
+            tuple: (number of holidays added, message).
+        """
+        row = self._get_calendar_row(calendar_name)
+        if not row:
+            raise AppValidationError(f"Calendar '{calendar_name}' not found.")
+        pairs = [holiday if isinstance(holiday, tuple) else (holiday, None) for holiday in holidays]
+        if not pairs:
+            return 0, "No holidays given."
+        days = to_day_array([day for day, _ in pairs])
+        params = [(row['CalendarID'], str(day), description) for day, (_, description) in zip(days, pairs)]
+        conn = self.db_manager.get_connection()
+        with self.db_manager.lock:
+            try:
+                cursor = conn.cursor()
+                before = conn.total_changes
+                cursor.executemany(
+                    "INSERT OR IGNORE INTO CalendarHolidays (CalendarID, HolidayDate, Description) VALUES (?, ?, ?)", params
+                )
+                added = conn.total_changes - before
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                logger.error(f"Error adding holidays to calendar '{calendar_name}': {e}", exc_info=True)
+                raise
+        self.invalidate_cache()
+        return added, f"{added} holidays added to '{calendar_name}'."
+
+    def remove_holiday(self, calendar_name, holiday):
+        row = self._get_calendar_row(calendar_name)
+        if not row:
+            raise AppValidationError(f"Calendar '{calendar_name}' not found.")
+        cursor = self.db_manager.execute_query(
+            "DELETE FROM CalendarHolidays WHERE CalendarID = ? AND HolidayDate = ?",
+            (row['CalendarID'], str(to_day_array(holiday)[0])), commit=True
+        )
+        self.invalidate_cache()
+        removed = cursor.rowcount if cursor else 0
+        return removed, f"{removed} holiday removed from '{calendar_name}'."
+
+    def get_calendar(self, calendar_name=None):
+        """
+        Returns the named WorkCalendar (the company calendar if no name is given), with the
+        holidays of its parent calendars included, or None if no such calendar exists.
+        """
+        calendar_name = calendar_name or Config.COMPANY_CALENDAR_NAME
+        if calendar_name in self._calendars:
+            return self._calendars[calendar_name]
+        if calendar_name == Config.COMPANY_CALENDAR_NAME:
+            self.ensure_company_calendar()
+        row = self._get_calendar_row(calendar_name)
+        if not row:
+            return None
+
+        # Walk up the parent chain collecting holidays (guarding against a cycle)
+        calendar_ids, parent_id = [row['CalendarID']], row['ParentCalendarID']
+        while parent_id is not None and parent_id not in calendar_ids:
+            calendar_ids.append(parent_id)
+            parent_row = self.db_manager.execute_query(
+                "SELECT ParentCalendarID FROM WorkCalendars WHERE CalendarID = ?", (parent_id,), fetch_one=True
+            )
+            parent_id = parent_row['ParentCalendarID'] if parent_row else None
+        holiday_rows = self.db_manager.execute_query(
+            f"SELECT DISTINCT HolidayDate FROM CalendarHolidays WHERE CalendarID IN ({', '.join('?' for _ in calendar_ids)})",
+            tuple(calendar_ids), fetch_all=True
+        ) or []
+        working_days = [day for day, flag in enumerate(row['WorkingDays']) if flag == '1']
+        calendar = WorkCalendar(calendar_name, working_days, [r['HolidayDate'] for r in holiday_rows])
+        self._calendars[calendar_name] = calendar
+        return calendar
+
+    def get_project_calendar(self, project_id):
+        """The project's own calendar if it has one, otherwise the company calendar."""
+        row = self.db_manager.execute_query(
+            "SELECT CalendarName FROM WorkCalendars WHERE CalendarType = ? AND ProjectID = ? ORDER BY CalendarID LIMIT 1",
+            (CALENDAR_TYPE_PROJECT, project_id), fetch_one=True
+        )
+        return self.get_calendar(row['CalendarName'] if row else None)
+
+    def get_all_calendars(self):
+        rows = self.db_manager.execute_query(
+            "SELECT c.CalendarID, c.CalendarName, c.CalendarType, c.ProjectID, c.WorkingDays, p.CalendarName AS ParentCalendarName, "
+            "(SELECT COUNT(*) FROM CalendarHolidays h WHERE h.CalendarID = c.CalendarID) AS HolidayCount "
+            "FROM WorkCalendars c LEFT JOIN WorkCalendars p ON p.CalendarID = c.ParentCalendarID ORDER BY c.CalendarType, c.CalendarName",
+            fetch_all=True
+        )
+        return [dict(row) for row in rows] if rows else []
+
+
+if __name__ == "__main__":
+    calendar = WorkCalendar("Example", holidays=standard_holidays([2025]))
+    starts = np.array(['2025-06-30', '2025-07-03', '2025-11-26'], dtype='datetime64[D]')
+    print(calendar.end_dates(starts, [5, 1, 3]))
+    print(calendar.count('2025-01-01', '2025-12-31'))